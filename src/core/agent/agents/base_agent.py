@@ -8,10 +8,15 @@
 
 import asyncio
 import platform
+import threading
+import time
 from abc import ABC
-from typing import Optional, Dict, ClassVar, Type, List, Any
+from collections.abc import Mapping
+from typing import Optional, Dict, ClassVar, Type, List, Any, Iterator
+from uuid import UUID
 
 from langchain_classic.agents import create_openai_tools_agent, AgentExecutor
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage, BaseMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate
@@ -20,7 +25,34 @@ from langchain_core.tools import BaseTool
 
 from src.core.agent.entities.agent_entity import AgentMetadata, AgentConfig
 from src.core.tools import ToolRegistry
+from src.utils.deadline import Deadline, Interrupted, current_deadline, deadline_scope
 from src.utils.logger import logger
+from src.utils.tracing import tracer, Span
+
+
+class ToolSpanHandler(BaseCallbackHandler):
+    """将工具调用记录为 tracing span（挂在创建时的父 span 下）"""
+
+    run_inline = True
+
+    def __init__(self, parent: Optional[Span]):
+        self.parent = parent
+        self._spans: Dict[UUID, Span] = {}
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._spans[run_id] = tracer.start_span(f"tool.{name}", parent=self.parent)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs):
+        span = self._spans.pop(run_id, None)
+        if span:
+            tracer.end_span(span)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        span = self._spans.pop(run_id, None)
+        if span:
+            span.attributes["error"] = type(error).__name__
+            tracer.end_span(span)
 
 
 class BaseAgent(Runnable, ABC):
@@ -33,6 +65,12 @@ class BaseAgent(Runnable, ABC):
     agent_description: ClassVar[str] = "基础 Agent 类"
     agent_system_prompt: ClassVar[str] = "你是一个智能代理，负责处理用户请求。"
 
+    # AgentExecutor 达到时限时的固定输出（单/多动作 Agent 不同）
+    STOPPED_OUTPUTS: ClassVar[tuple] = (
+        "Agent stopped due to iteration limit or time limit.",
+        "Agent stopped due to max iterations.",
+    )
+
     def __init_subclass__(
             cls,
             agent_type: str = None,
@@ -194,18 +232,43 @@ class BaseAgent(Runnable, ABC):
             # 构建输入消息
             task_message = f"任务描述: {user_input}\n\n请根据描述完成任务。"
 
-            result = await self.agent_executor.ainvoke({
-                "input": task_message,
-                "chat_history": self.conversation_history
-            })
+            # 截止时间取 Agent 超时和上层（命令/步骤）截止时间中较早者
+            parent = current_deadline()
+            deadline = parent.child(self.config.timeout) if parent else Deadline(self.config.timeout)
+            soft_limit = self._soft_time_limit(deadline)
 
-            # 更新对话历史
-            self.conversation_history.append(HumanMessage(content=task_message))
-            self.conversation_history.append(AIMessage(content=result["output"]))
+            # AgentExecutor 先在软截止时间停止并保留已完成的工具调用，deadline.run 兜底强制取消
+            self.agent_executor.max_execution_time = soft_limit
+            started = time.monotonic()
+
+            with tracer.span("agent", agent=self.__class__.agent_name) as span, deadline_scope(deadline):
+                result = await deadline.run(self.agent_executor.ainvoke(
+                    {
+                        "input": task_message,
+                        "chat_history": self.conversation_history
+                    },
+                    config={"callbacks": [ToolSpanHandler(span)]} if span else None
+                ))
 
             # 提取工具调用信息
             intermediate_steps = result.get("intermediate_steps", [])
 
+            if result["output"] in self.STOPPED_OUTPUTS and soft_limit is not None \
+                    and time.monotonic() - started >= soft_limit:
+                logger.warning(f"{self.__class__.agent_name} stopped at time limit ({soft_limit:.1f}s)")
+                return {
+                    "output": None,
+                    "intermediate_steps": intermediate_steps,
+                    "success": False,
+                    "iterations": len(intermediate_steps),
+                    "error": "处理超时，仅完成了部分操作",
+                    "interrupted": "timeout"
+                }
+
+            # 更新对话历史
+            self.conversation_history.append(HumanMessage(content=task_message))
+            self.conversation_history.append(AIMessage(content=result["output"]))
+
             return {
                 "output": result["output"],
                 "intermediate_steps": intermediate_steps,
@@ -213,6 +276,17 @@ class BaseAgent(Runnable, ABC):
                 "iterations": len(intermediate_steps)
             }
 
+        except Interrupted as e:
+            logger.warning(f"{self.__class__.agent_name} interrupted: {e}")
+            return {
+                "output": None,
+                "intermediate_steps": [],
+                "success": False,
+                "iterations": 0,
+                "error": str(e),
+                "interrupted": e.kind
+            }
+
         except Exception as e:
             logger.error(
                 f"{self.__class__.agent_name} error: {e}",
@@ -226,6 +300,14 @@ class BaseAgent(Runnable, ABC):
                 "error": str(e)
             }
 
+    @staticmethod
+    def _soft_time_limit(deadline: Deadline) -> Optional[float]:
+        """AgentExecutor 的协作式时限：预留一小段时间用于返回部分结果"""
+        remaining = deadline.remaining()
+        if remaining is None:
+            return None
+        return max(0.0, remaining - min(2.0, remaining * 0.1))
+
     def invoke(
             self,
             input: Dict[str, Any],
@@ -240,20 +322,39 @@ class BaseAgent(Runnable, ABC):
             cls,
             llm: BaseChatModel,
             tool_manager: ToolRegistry,
-            check_dependencies: bool = True
-    ) -> Dict[str, 'BaseAgent']:
-        """创建所有注册的 Agent - 自动检查依赖并实例化"""
+            check_dependencies: bool = True,
+            lazy: bool = False
+    ) -> Mapping:
+        """
+        创建所有注册的 Agent - 自动检查依赖并实例化
+
+        Args:
+            lazy: 为 True 时返回 AgentPool，Agent 在首次使用时才构建
+        """
+        # 惰性模式下总是检查工具依赖，避免规划器看到无法构建的 Agent
+        agent_types = cls._eligible_agent_types(tool_manager, check_dependencies or lazy)
+
+        pool = AgentPool(agent_types, llm=llm, tool_manager=tool_manager)
+        if lazy:
+            logger.info(f"Agent pool ready with {len(pool)} agent types (built on first use)")
+            return pool
+
         agents = {}
+        for agent_type in agent_types:
+            agent = pool.get(agent_type)
+            if agent is not None:
+                agents[agent_type] = agent
 
-        # 按优先级排序
-        sorted_types = sorted(
-            cls._registry.keys(),
-            key=lambda t: cls._metadata[t].priority,
-            reverse=True
+        logger.info(
+            f"Successfully loaded {len(agents)}/{len(cls._registry)} agents"
         )
+        return agents
 
-        for agent_type in sorted_types:
-            agent_class = cls._registry[agent_type]
+    @classmethod
+    def _eligible_agent_types(cls, tool_manager: ToolRegistry, check_dependencies: bool) -> List[str]:
+        """按优先级返回已启用且依赖满足的 Agent 类型（只读元数据，不实例化）"""
+        eligible = []
+        for agent_type in cls.get_all_agent_types():
             metadata = cls._metadata[agent_type]
 
             # 检查是否启用
@@ -270,25 +371,20 @@ class BaseAgent(Runnable, ABC):
                     )
                     continue
 
-            # 实例化
-            try:
-                agent = agent_class(
-                    llm=llm,
-                    tool_manager=tool_manager
-                )
-                agents[agent_type] = agent
-                logger.info(f"Created: {agent_type}")
-
-            except Exception as e:
-                logger.error(
-                    f"Failed to create {agent_type}: {e}",
-                    exc_info=True
-                )
+            eligible.append(agent_type)
+        return eligible
 
-        logger.info(
-            f"Successfully loaded {len(agents)}/{len(sorted_types)} agents"
-        )
-        return agents
+    @classmethod
+    def describe(cls, agent_type: str) -> Dict[str, Any]:
+        """从类注册表获取 Agent 能力信息（无需实例化）"""
+        agent_class = cls._registry[agent_type]
+        metadata = cls._metadata[agent_type]
+        return {
+            "name": agent_class.agent_name,
+            "description": agent_class.agent_description,
+            "tools": list(metadata.required_tools or []),
+            "max_iterations": AgentConfig().max_iterations
+        }
 
     @classmethod
     def get_all_agent_types(cls, sorted_by_priority: bool = True) -> List[str]:
@@ -316,3 +412,117 @@ class BaseAgent(Runnable, ABC):
             "tools": [tool.name for tool in self.tools],
             "max_iterations": self.config.max_iterations
         }
+
+
+class AgentPool(Mapping):
+    """惰性 Agent 池 - 按字典方式访问，Agent 在首次取用时构建并缓存"""
+
+    def __init__(
+            self,
+            agent_types: List[str],
+            llm: BaseChatModel,
+            tool_manager: ToolRegistry,
+            config: Optional[AgentConfig] = None
+    ):
+        """
+        Args:
+            agent_types: 可用的 Agent 类型（按优先级排序）
+            llm: Worker LLM
+            tool_manager: 工具注册中心
+            config: Agent 配置
+        """
+        self._agent_types = list(agent_types)
+        self.llm = llm
+        self.tool_manager = tool_manager
+        self.config = config
+
+        self._agents: Dict[str, BaseAgent] = {}
+        self._failed: Dict[str, str] = {}
+        self._build_times: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {t: threading.Lock() for t in self._agent_types}
+
+    def __getitem__(self, agent_type: str) -> BaseAgent:
+        agent = self._agents.get(agent_type)
+        if agent is not None:
+            return agent
+
+        if agent_type not in self._locks:
+            raise KeyError(agent_type)
+
+        with self._locks[agent_type]:
+            if agent_type in self._agents:
+                return self._agents[agent_type]
+            if agent_type in self._failed:
+                raise KeyError(agent_type)
+            return self._build(agent_type)
+
+    def get(self, agent_type: str, default: Any = None) -> Any:
+        try:
+            return self[agent_type]
+        except KeyError:
+            return default
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._agent_types)
+
+    def __len__(self) -> int:
+        return len(self._agent_types)
+
+    def __contains__(self, agent_type: object) -> bool:
+        return agent_type in self._locks
+
+    def _build(self, agent_type: str) -> BaseAgent:
+        """实例化 Agent 并记录构建耗时"""
+        agent_class = BaseAgent._registry[agent_type]
+        start = time.perf_counter()
+
+        try:
+            agent = agent_class(
+                llm=self.llm,
+                tool_manager=self.tool_manager,
+                config=self.config
+            )
+        except Exception as e:
+            logger.error(f"Failed to create {agent_type}: {e}", exc_info=True)
+            self._failed[agent_type] = str(e)
+            raise KeyError(agent_type) from e
+
+        elapsed = time.perf_counter() - start
+        self._agents[agent_type] = agent
+        self._build_times[agent_type] = elapsed
+        logger.info(f"Created: {agent_type} ({elapsed * 1000:.0f}ms)")
+        return agent
+
+    def fork(self) -> 'AgentPool':
+        """
+        创建同配置的空池（共享 LLM 和工具注册中心，Agent 实例各自构建）
+
+        Agent 实例带有对话状态和执行器设置，多个会话并发时每个会话使用独立的池。
+        """
+        agent_types = [t for t in self._agent_types if t not in self._failed]
+        return AgentPool(agent_types, llm=self.llm, tool_manager=self.tool_manager, config=self.config)
+
+    def describe(self, agent_type: str) -> Dict[str, Any]:
+        """
+        Agent 能力信息（始终读取类注册表）
+
+        结果不随 Agent 是否已构建而变化，规划器提示词和意图路由语料保持稳定，可命中 LLM 精确缓存
+        """
+        ability = BaseAgent.describe(agent_type)
+        if self.config is not None:
+            ability["max_iterations"] = self.config.max_iterations
+        return ability
+
+    @property
+    def built(self) -> List[str]:
+        """已构建的 Agent 类型"""
+        return list(self._agents.keys())
+
+    def stats(self) -> Dict[str, Any]:
+        """构建统计：可用/已构建/失败的 Agent 及各自构建耗时（秒）"""
+        return {
+            "available": len(self._agent_types),
+            "built": self.built,
+            "failed": dict(self._failed),
+            "build_times": dict(self._build_times)
+        }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : checkpoint_store.py
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.core.agent.entities.agent_entity import StepCheckpoint, StepState
+from src.utils.logger import logger
+
+
+class CheckpointStore:
+    """
+    步骤检查点 - 保存已成功步骤的结果，澄清对话后的新计划可复用
+
+    检查点按步骤内容寻址：Agent 类型 + 描述 + 所依赖步骤的检查点键。
+    描述或任一上游步骤发生变化时键随之变化，只有修改过的、失败的步骤及其下游会重新执行。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 600.0):
+        """
+        Args:
+            path: 持久化文件，None 时只保存在内存
+            max_age: 检查点有效期（秒）
+        """
+        self.path = Path(path) if path else None
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._checkpoints: Dict[str, StepCheckpoint] = {}
+        self._load()
+
+    @staticmethod
+    def key_for(step: StepState, dependency_keys: List[str]) -> str:
+        """计算步骤的检查点键"""
+        payload = json.dumps(
+            [step.agent_type, " ".join(step.description.split()), dependency_keys],
+            ensure_ascii=False
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, key: str) -> Optional[StepCheckpoint]:
+        """获取未过期的检查点"""
+        with self._lock:
+            checkpoint = self._checkpoints.get(key)
+            if checkpoint and time.time() - checkpoint.created_at > self.max_age:
+                del self._checkpoints[key]
+                return None
+            return checkpoint
+
+    def save(self, key: str, plan_id: Optional[str], step: StepState):
+        """保存成功步骤的检查点"""
+        checkpoint = StepCheckpoint(
+            key=key,
+            plan_id=plan_id,
+            step_id=step.step_id,
+            agent_type=step.agent_type,
+            description=step.description,
+            result=step.result,
+            iteration_count=step.iteration_count,
+            tool_calls=step.tool_calls
+        )
+        with self._lock:
+            self._checkpoints[key] = checkpoint
+            self._save_locked()
+
+    def all(self, plan_id: Optional[str] = None) -> List[StepCheckpoint]:
+        """已保存的检查点（可按计划过滤）"""
+        with self._lock:
+            return [c for c in self._checkpoints.values() if plan_id is None or c.plan_id == plan_id]
+
+    def clear(self):
+        """清空检查点（新查询开始时调用）"""
+        with self._lock:
+            if not self._checkpoints:
+                return
+            logger.debug(f"Clearing {len(self._checkpoints)} step checkpoints")
+            self._checkpoints.clear()
+            self._save_locked()
+
+    def __len__(self) -> int:
+        return len(self._checkpoints)
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            now = time.time()
+            for item in data.get("checkpoints", []):
+                checkpoint = StepCheckpoint(**item)
+                if now - checkpoint.created_at <= self.max_age:
+                    self._checkpoints[checkpoint.key] = checkpoint
+        except Exception as e:
+            logger.warning(f"Failed to load step checkpoints: {e}")
+
+    def _save_locked(self):
+        """原子写入检查点文件（调用方持有锁）"""
+        if not self.path:
+            return
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path.with_suffix(".tmp")
+            payload = {"checkpoints": [c.model_dump() for c in self._checkpoints.values()]}
+            tmp_file.write_text(json.dumps(payload, ensure_ascii=False, default=str), encoding="utf-8")
+            os.replace(tmp_file, self.path)
+        except Exception as e:
+            logger.warning(f"Failed to save step checkpoints: {e}")
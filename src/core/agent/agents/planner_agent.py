@@ -7,16 +7,26 @@
 """
 
 import json
+import time
 import uuid
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List, Type
 
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import SystemMessage, HumanMessage, BaseMessage
-
-from src.core.agent.entities.agent_prompts import PLANNER_AGENT_SYSTEM_PROMPT_TEMPLATE
-from src.core.agent.entities.plan_entity import PlannerOutput, PlanStep
+from langchain_core.runnables import Runnable
+from langchain_core.utils.json import parse_partial_json
+from pydantic import BaseModel
+
+from src.core.agent.entities.agent_prompts import (
+    PLANNER_AGENT_SYSTEM_PROMPT_TEMPLATE,
+    PLANNER_REPLAN_PROMPT_TEMPLATE
+)
+from src.core.agent.entities.plan_entity import PlannerOutput, PlanStep, ReplanOutput
 from src.core.models import ExecutionPlan, Task, TaskStatus
+from src.utils.deadline import run_with_deadline
+from src.utils.json_stream import StreamingJSONParser
 from src.utils.logger import logger
+from src.utils.tracing import tracer
 
 
 class PlannerAgent:
@@ -25,6 +35,7 @@ class PlannerAgent:
     def __init__(self, llm: BaseChatModel, available_agents: Optional[Dict[str, Any]] = None):
         self.llm = llm
         self.available_agents = available_agents or {}
+        self._structured_llms: Dict[str, Runnable] = {}
 
         # 构建 Agent 信息
         self.agent_info = self._format_agent_info()
@@ -38,9 +49,15 @@ class PlannerAgent:
         if not self.available_agents:
             return "Planner has no available agents."
 
+        # AgentPool 可直接提供元数据，避免为生成提示词而构建 Agent
+        describe = getattr(self.available_agents, "describe", None)
+
         lines = []
-        for agent_type, agent in self.available_agents.items():
-            ability = agent.get_ability_info()
+        for agent_type in self.available_agents:
+            if describe:
+                ability = describe(agent_type)
+            else:
+                ability = self.available_agents[agent_type].get_ability_info()
             lines.append(
                 f"- {agent_type}: {ability['description']}\n"
                 f"  工具: {', '.join(ability['tools'])}"
@@ -48,38 +65,42 @@ class PlannerAgent:
 
         return "\n".join(lines)
 
-    async def plan(self, user_query: str, conversation_history: Optional[List[BaseMessage]] = None) -> ExecutionPlan:
-        """生成执行计划（异步）"""
+    async def plan(
+            self,
+            user_query: str,
+            conversation_history: Optional[List[BaseMessage]] = None,
+            on_step: Optional[Callable[[Task], None]] = None
+    ) -> ExecutionPlan:
+        """
+        生成执行计划（异步）
+
+        LLM 以工具调用形式按 PlannerOutput 结构流式输出，增量解析；
+        可行性确定后每完成一个步骤就通过 on_step 回调交出，后续步骤仍在生成。
+
+        Args:
+            user_query: 用户查询
+            conversation_history: 对话历史
+            on_step: 步骤生成完成回调（用于提前分发执行）
+        """
+        dispatched: List[Task] = []
         try:
-            # 1. 构建提示词
-            system_prompt = PLANNER_AGENT_SYSTEM_PROMPT_TEMPLATE.format(
-                agent_info=self.agent_info
-            )
-
-            # 2. 调用 LLM
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_query)
-            ]
-
-            if conversation_history:
-                messages.extend(conversation_history)
-                logger.info(
-                    f"Planning with {len(conversation_history)} "
-                    f"history messages"
+            messages = self._build_messages(user_query, conversation_history)
+
+            with tracer.span("planner.llm", history=len(conversation_history or [])):
+                response_text = await self._stream_plan(messages, dispatched, on_step)
+
+            # 完整输出校验（与流式解析的步骤合并）
+            planner_output = self._parse_response(response_text, user_query)
+            if dispatched and planner_output.feasibility != "feasible":
+                logger.warning(f"Plan output invalid after {len(dispatched)} dispatched steps, keeping them")
+                planner_output = PlannerOutput(
+                    task=user_query,
+                    feasibility="feasible",
+                    reason=planner_output.reason,
+                    steps=[self._task_to_step(task) for task in dispatched]
                 )
-            else:
-                # 如果没有历史，使用单轮查询
-                messages.append(HumanMessage(content=user_query))
-
-            response = await self.llm.ainvoke(messages)
-            response_content = response.content.strip()
-
-            # 3. 解析响应
-            planner_output = self._parse_response(response_content, user_query)
 
-            # 4. 转换为 ExecutionPlan
-            execution_plan = self._convert_to_execution_plan(planner_output)
+            execution_plan = self._convert_to_execution_plan(planner_output, dispatched)
 
             logger.info(
                 f"Generated plan with {len(execution_plan.tasks)} tasks "
@@ -91,27 +112,291 @@ class PlannerAgent:
         except Exception as e:
             logger.error(f"Planning failed: {e}", exc_info=True)
 
+            # 已分发的步骤正在执行，保留为计划
+            if dispatched:
+                return self._convert_to_execution_plan(PlannerOutput(
+                    task=user_query,
+                    feasibility="feasible",
+                    reason=f"规划中断: {e}",
+                    steps=[self._task_to_step(task) for task in dispatched]
+                ), dispatched)
+
             # 返回空计划
             return self._create_empty_plan(user_query, error=str(e))
 
-    def plan_sync(self, user_query: str, conversation_history: Optional[List[BaseMessage]] = None) -> ExecutionPlan:
+    def plan_sync(
+            self,
+            user_query: str,
+            conversation_history: Optional[List[BaseMessage]] = None,
+            on_step: Optional[Callable[[Task], None]] = None
+    ) -> ExecutionPlan:
         """生成执行计划（同步）"""
         import asyncio
-        return asyncio.run(self.plan(user_query, conversation_history))
+        return asyncio.run(run_with_deadline(self.plan(user_query, conversation_history, on_step)))
+
+    def _build_messages(
+            self,
+            user_query: str,
+            conversation_history: Optional[List[BaseMessage]] = None
+    ) -> List[BaseMessage]:
+        """构建规划提示词"""
+        system_prompt = PLANNER_AGENT_SYSTEM_PROMPT_TEMPLATE.format(
+            agent_info=self.agent_info
+        )
+
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=user_query)
+        ]
+
+        if conversation_history:
+            messages.extend(conversation_history)
+            logger.info(
+                f"Planning with {len(conversation_history)} "
+                f"history messages"
+            )
+        else:
+            # 如果没有历史，使用单轮查询
+            messages.append(HumanMessage(content=user_query))
+
+        return messages
+
+    def _get_structured_llm(self, schema: Type[BaseModel] = PlannerOutput) -> Runnable:
+        """绑定输出结构工具（强制调用），模型不支持工具调用时退回纯文本 JSON"""
+        name = schema.__name__
+        if name not in self._structured_llms:
+            try:
+                self._structured_llms[name] = self.llm.bind_tools([schema], tool_choice=name)
+            except (NotImplementedError, AttributeError, TypeError) as e:
+                logger.info(f"LLM does not support tool calling, planning with plain JSON: {e}")
+                self._structured_llms[name] = self.llm
+        return self._structured_llms[name]
+
+    async def _stream_plan(
+            self,
+            messages: List[BaseMessage],
+            dispatched: List[Task],
+            on_step: Optional[Callable[[Task], None]]
+    ) -> str:
+        """流式调用 LLM，增量解析步骤，返回完整输出文本"""
+        parser = StreamingJSONParser("steps")
+        number_to_id: Dict[int, str] = {}
+        start = time.time()
+
+        async for chunk in self._get_structured_llm().astream(messages):
+            # 工具调用参数优先，否则为文本内容
+            tool_chunks = getattr(chunk, "tool_call_chunks", None) or []
+            text = "".join(tc.get("args") or "" for tc in tool_chunks if tc.get("index", 0) in (0, None))
+            if not tool_chunks and isinstance(chunk.content, str):
+                text = chunk.content
+            if not text:
+                continue
+
+            for step_dict in parser.feed(text):
+                # 只有确定可行、且 Agent 有效时才提前分发，否则留给完整校验
+                if parser.partial().get("feasibility") != "feasible":
+                    continue
+                if len(dispatched) != len(parser.items) - 1:
+                    continue
+
+                step = PlanStep(**step_dict)
+                if step.assigned_agent not in self.available_agents:
+                    continue
+                task = self._step_to_task(step, number_to_id)
+                dispatched.append(task)
+                logger.info(
+                    f"Plan step {step.step_number} ready after {time.time() - start:.2f}s: "
+                    f"[{step.assigned_agent}] {step.description}"
+                )
+                if on_step is not None:
+                    on_step(task)
+
+        return parser.text
+
+    async def replan(
+            self,
+            previous_plan: ExecutionPlan,
+            failed_step: Dict[str, Any],
+            user_clarification: str
+    ) -> Optional[ExecutionPlan]:
+        """
+        增量重新规划（异步）- 只生成替换失败步骤的新步骤，拼接回原计划
+
+        Args:
+            previous_plan: 上一次执行的计划
+            failed_step: 失败步骤 {"step_id", "error"}（TaskOrchestrator 摘要中的 failed_step）
+            user_clarification: 用户的补充/纠正
+
+        Returns:
+            拼接后的新计划；无法增量修补（找不到失败步骤、不可行、解析失败）时返回 None
+        """
+        index = next(
+            (i for i, task in enumerate(previous_plan.tasks) if task.task_id == failed_step.get("step_id")),
+            None
+        )
+        if index is None:
+            logger.info("Failed step not found in previous plan, full re-planning required")
+            return None
 
-    def _parse_response(self, response: str, original_task: str) -> PlannerOutput:
-        """解析 LLM 响应为 PlannerOutput"""
         try:
-            json_str = response.strip()
+            messages = self._build_replan_messages(previous_plan, index, failed_step, user_clarification)
+
+            with tracer.span("planner.replan"):
+                response = await self._get_structured_llm(ReplanOutput).ainvoke(messages)
+
+            tool_calls = getattr(response, "tool_calls", None) or []
+            if tool_calls:
+                output = ReplanOutput(**tool_calls[0]["args"])
+            else:
+                output = ReplanOutput(**self._load_json(response.content))
+
+            if output.feasibility != "feasible" or not output.steps:
+                logger.info(f"Incremental re-planning declined: {output.feasibility} {output.reason}")
+                return None
+
+            execution_plan = self._splice_plan(previous_plan, index, output)
+            usage = getattr(response, "usage_metadata", None)
+            if usage:
+                execution_plan.metadata["token_usage"] = dict(usage)
+
+            logger.info(
+                f"Re-planned step {index + 1}: {len(output.steps)} replacement steps, "
+                f"{len(output.updates)} updated steps"
+            )
+            return execution_plan
+
+        except Exception as e:
+            logger.warning(f"Incremental re-planning failed: {e}")
+            return None
+
+    def replan_sync(
+            self,
+            previous_plan: ExecutionPlan,
+            failed_step: Dict[str, Any],
+            user_clarification: str
+    ) -> Optional[ExecutionPlan]:
+        """增量重新规划（同步）"""
+        import asyncio
+        return asyncio.run(run_with_deadline(self.replan(previous_plan, failed_step, user_clarification)))
+
+    def _build_replan_messages(
+            self,
+            previous_plan: ExecutionPlan,
+            failed_index: int,
+            failed_step: Dict[str, Any],
+            user_clarification: str
+    ) -> List[BaseMessage]:
+        """构建精简的修补提示词：Agent 只列名称和描述，原计划每步一行"""
+        lines = []
+        for i, task in enumerate(previous_plan.tasks):
+            mark = "✅" if i < failed_index else "❌" if i == failed_index else "⏸"
+            lines.append(f"{i + 1}. {mark} [{task.assigned_agent}] {task.description}")
+
+        prompt = PLANNER_REPLAN_PROMPT_TEMPLATE.format(
+            agent_info=self._format_agent_names(),
+            plan_steps="\n".join(lines),
+            failed_number=failed_index + 1,
+            failed_error=failed_step.get("error") or "未知错误",
+            clarification=user_clarification
+        )
+        return [SystemMessage(content=prompt), HumanMessage(content=user_clarification)]
+
+    def _format_agent_names(self) -> str:
+        """Agent 简要列表（不含工具）"""
+        describe = getattr(self.available_agents, "describe", None)
+        lines = []
+        for agent_type in self.available_agents:
+            if describe:
+                description = describe(agent_type)["description"]
+            else:
+                description = self.available_agents[agent_type].get_ability_info()["description"]
+            lines.append(f"- {agent_type}: {description}")
+        return "\n".join(lines)
 
-            # 移除 Markdown 代码块
-            if "```json" in response:
-                json_str = response.split("```json")[1].split("```")[0].strip()
-            elif "```" in response:
-                json_str = response.split("```")[1].split("```")[0].strip()
+    def _splice_plan(self, previous_plan: ExecutionPlan, failed_index: int, output: ReplanOutput) -> ExecutionPlan:
+        """用替换步骤替换失败步骤，改写后续步骤描述，并修正依赖和编号"""
+        failed_task = previous_plan.tasks[failed_index]
+        failed_deps = previous_plan.dependencies.get(failed_task.task_id)
+        updates = {patch.step_number: patch.description for patch in output.updates}
+
+        replacements = []
+        for step in output.steps:
+            previous = replacements[-1].task_id if replacements else None
+            if previous is None:
+                depends_on = failed_deps
+            else:
+                depends_on = [previous] if failed_deps is not None else None
+            replacements.append(Task(
+                task_id=str(uuid.uuid4()),
+                description=step.description,
+                assigned_agent=step.assigned_agent,
+                metadata={"expected_result": step.expected_result, "depends_on": depends_on},
+                status=TaskStatus.PENDING
+            ))
+        last_replacement = replacements[-1].task_id
+
+        tasks = [task.model_copy(deep=True) for task in previous_plan.tasks[:failed_index]]
+        tasks += replacements
+        for number, task in enumerate(previous_plan.tasks[failed_index + 1:], start=failed_index + 2):
+            task = task.model_copy(deep=True)
+            if number in updates:
+                task.description = updates[number]
+            depends_on = task.metadata.get("depends_on")
+            if depends_on is not None:
+                task.metadata["depends_on"] = [
+                    last_replacement if dep == failed_task.task_id else dep for dep in depends_on
+                ]
+            tasks.append(task)
 
-            # 解析 JSON
-            plan_dict = json.loads(json_str)
+        dependencies = {}
+        for number, task in enumerate(tasks, start=1):
+            task.status = TaskStatus.PENDING
+            task.metadata["step_number"] = number
+            if task.metadata.get("depends_on") is not None:
+                dependencies[task.task_id] = task.metadata["depends_on"]
+
+        metadata = dict(previous_plan.metadata)
+        metadata.update({
+            "feasibility": "feasible",
+            "reason": output.reason,
+            "total_steps": len(tasks),
+            "replan": {
+                "previous_plan_id": previous_plan.plan_id,
+                "failed_step": failed_index + 1,
+                "replacements": len(replacements),
+                "updates": len(updates)
+            }
+        })
+        metadata.pop("token_usage", None)
+
+        return ExecutionPlan(
+            plan_id=str(uuid.uuid4()),
+            tasks=tasks,
+            dependencies=dependencies,
+            metadata=metadata
+        )
+
+    @staticmethod
+    def _load_json(text: str) -> Dict[str, Any]:
+        """解析（可能带代码块或被截断的）JSON 文本"""
+        text = text.strip()
+        if "```json" in text:
+            text = text.split("```json")[1].split("```")[0].strip()
+        elif "```" in text:
+            text = text.split("```")[1].split("```")[0].strip()
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            result = parse_partial_json(text[text.find("{"):])
+            if not isinstance(result, dict):
+                raise
+            return result
+
+    def _parse_response(self, response: str, original_task: str) -> PlannerOutput:
+        """解析 LLM 响应为 PlannerOutput"""
+        try:
+            # 移除 Markdown 代码块并解析 JSON（被截断的输出尽量补全）
+            plan_dict = self._load_json(response)
 
             # 验证必要字段
             if "feasibility" not in plan_dict:
@@ -153,8 +438,13 @@ class PlannerAgent:
                 steps=[]
             )
 
-    def _convert_to_execution_plan(self, planner_output: PlannerOutput) -> ExecutionPlan:
-        """将 PlannerOutput 转换为 ExecutionPlan"""
+    def _convert_to_execution_plan(
+            self,
+            planner_output: PlannerOutput,
+            dispatched: Optional[List[Task]] = None
+    ) -> ExecutionPlan:
+        """将 PlannerOutput 转换为 ExecutionPlan（已分发的步骤沿用原 Task）"""
+        dispatched = dispatched or []
         plan_id = str(uuid.uuid4())
 
         # 构建 metadata
@@ -174,32 +464,58 @@ class PlannerAgent:
             )
 
         # 转换步骤为 Task 列表
-        tasks = []
-        for step in planner_output.steps:
-            task_id = str(uuid.uuid4())
-
-            task = Task(
-                task_id=task_id,
-                description=step.description,
-                assigned_agent=step.assigned_agent,
-                metadata={
-                    "step_number": step.step_number,
-                    "expected_result": step.expected_result
-                },
-                status=TaskStatus.PENDING
-            )
-
-            tasks.append(task)
+        tasks = list(dispatched)
+        number_to_id = {task.metadata.get("step_number"): task.task_id for task in dispatched}
+        for step in planner_output.steps[len(dispatched):]:
+            tasks.append(self._step_to_task(step, number_to_id))
 
         metadata["total_steps"] = len(tasks)
 
+        # 只记录明确声明的依赖，未声明的步骤按顺序执行
+        dependencies = {
+            task.task_id: task.metadata["depends_on"]
+            for task in tasks if task.metadata.get("depends_on") is not None
+        }
+
         return ExecutionPlan(
             plan_id=plan_id,
             tasks=tasks,
-            dependencies={},
+            dependencies=dependencies,
             metadata=metadata
         )
 
+    @staticmethod
+    def _step_to_task(step: PlanStep, number_to_id: Dict[int, str]) -> Task:
+        """将 PlanStep 转换为 Task，depends_on 的步骤编号解析为 task_id（只保留前序步骤）"""
+        task_id = str(uuid.uuid4())
+
+        depends_on = None
+        if step.depends_on is not None:
+            depends_on = [number_to_id[n] for n in step.depends_on if n in number_to_id]
+
+        number_to_id[step.step_number] = task_id
+        return Task(
+            task_id=task_id,
+            description=step.description,
+            assigned_agent=step.assigned_agent,
+            metadata={
+                "step_number": step.step_number,
+                "expected_result": step.expected_result,
+                "depends_on": depends_on
+            },
+            status=TaskStatus.PENDING
+        )
+
+    @staticmethod
+    def _task_to_step(task: Task) -> PlanStep:
+        """将 Task 还原为 PlanStep"""
+        return PlanStep(
+            step_number=task.metadata.get("step_number") or 0,
+            assigned_agent=task.assigned_agent,
+            description=task.description,
+            expected_result=task.metadata.get("expected_result")
+        )
+
     def _create_empty_plan(self, user_query: str, error: Optional[str] = None) -> ExecutionPlan:
         """创建空计划（用于错误情况）"""
         return ExecutionPlan(
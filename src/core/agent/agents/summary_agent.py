@@ -6,7 +6,12 @@
 @File   : summary_agent.py
 """
 
-from typing import Dict, Any
+import asyncio
+import queue
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import SystemMessage, HumanMessage
@@ -14,6 +19,27 @@ from langchain_core.messages import SystemMessage, HumanMessage
 from src.core.agent.entities.agent_prompts import SUMMARY_AGENT_PROMPT
 from src.utils.logger import logger
 
+# 句末标点（可跟引号、括号）；英文句点需后跟空白，避免切断小数和文件名
+_SENTENCE_END = re.compile(r'(?:[。！？!?；;…\n]+|\.(?=\s))[”’"\'）)]*')
+
+
+def split_sentences(text: str, min_chars: int = 6) -> Tuple[List[str], str]:
+    """
+    从已生成的文本中切出完整句子，返回 (句子列表, 未完成的剩余文本)
+
+    过短的句子（如“好的。”）并入下一句，避免逐字合成；
+    句末标点恰好在文本末尾时暂不切分，等后续 token 确认标点和引号已结束。
+    """
+    sentences, start = [], 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() == len(text):
+            break
+        sentence = text[start:match.end()].strip()
+        if len(sentence) >= min_chars:
+            sentences.append(sentence)
+            start = match.end()
+    return sentences, text[start:]
+
 
 class SummaryAgent:
     """结果总结 Agent - 将执行结果转换为用户友好的自然语言"""
@@ -30,16 +56,7 @@ class SummaryAgent:
     ) -> str:
         """异步总结执行结果"""
         try:
-            # 构建输入
-            input_data = self._format_input(original_query, execution_summary)
-
-            # 调用 LLM
-            messages = [
-                SystemMessage(content=SUMMARY_AGENT_PROMPT),
-                HumanMessage(content=input_data)
-            ]
-
-            response = await self.llm.ainvoke(messages)
+            response = await self.llm.ainvoke(self._build_messages(original_query, execution_summary))
             summary = response.content.strip()
 
             logger.info(f"Generated summary: {summary[:100]}...")
@@ -56,9 +73,54 @@ class SummaryAgent:
             execution_summary: Dict[str, Any]
     ) -> str:
         """同步总结执行结果"""
-        import asyncio
         return asyncio.run(self.summarize(original_query, execution_summary))
 
+    async def summarize_stream(
+            self,
+            original_query: str,
+            execution_summary: Dict[str, Any],
+            min_chars: int = 6
+    ) -> AsyncIterator[str]:
+        """流式总结：边生成边按句切分，每凑满一句立即产出（失败或无输出时产出降级总结）"""
+        buffer, produced = "", False
+        try:
+            async for chunk in self.llm.astream(self._build_messages(original_query, execution_summary)):
+                if isinstance(chunk.content, str):
+                    buffer += chunk.content
+                sentences, buffer = split_sentences(buffer, min_chars)
+                for sentence in sentences:
+                    produced = True
+                    yield sentence
+
+            if buffer.strip():
+                produced = True
+                yield buffer.strip()
+
+        except Exception as e:
+            logger.error(f"Streaming summarization failed: {e}", exc_info=True)
+
+        if not produced:
+            yield self._create_fallback_summary(execution_summary)
+
+    def stream_sentences(
+            self,
+            original_query: str,
+            execution_summary: Dict[str, Any]
+    ) -> "SentenceStream":
+        """在后台线程中流式总结，调用方线程按句迭代（用于边生成边播报）"""
+        return SentenceStream(lambda: self.summarize_stream(original_query, execution_summary))
+
+    def _build_messages(
+            self,
+            original_query: str,
+            execution_summary: Dict[str, Any]
+    ) -> List:
+        """构建总结请求消息"""
+        return [
+            SystemMessage(content=SUMMARY_AGENT_PROMPT),
+            HumanMessage(content=self._format_input(original_query, execution_summary))
+        ]
+
     def _format_input(
             self,
             original_query: str,
@@ -124,3 +186,63 @@ class SummaryAgent:
             return "抱歉，任务执行失败了，请稍后重试。"
         else:
             return f"我已经完成了{successful_steps}个步骤，但还有{total_steps - successful_steps}个步骤未能完成。"
+
+
+class SentenceStream:
+    """
+    流式总结的同步句子迭代器
+
+    生成在后台线程的事件循环中进行，句子到达即可被调用方（TTS）取走；
+    close() 可从任意线程调用，取消仍在进行的 LLM 流。
+    """
+
+    def __init__(self, produce: Callable[[], AsyncIterator[str]]):
+        self._produce = produce
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._closed = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sentences: List[str] = []
+        self.first_sentence_latency: Optional[float] = None
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._run(),), name="summary-stream", daemon=True)
+        self._thread.start()
+
+    @property
+    def text(self) -> str:
+        """已取走句子拼成的总结文本"""
+        return "".join(self.sentences)
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        try:
+            if not self._closed.is_set():
+                async for sentence in self._produce():
+                    if self._closed.is_set():
+                        break
+                    self._queue.put(sentence)
+        except asyncio.CancelledError:
+            logger.info("Summary stream cancelled")
+        finally:
+            self._queue.put(None)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            sentence = self._queue.get()
+            if sentence is None:
+                return
+            if self.first_sentence_latency is None:
+                self.first_sentence_latency = time.perf_counter() - self._start
+            self.sentences.append(sentence)
+            yield sentence
+
+    def close(self):
+        """停止生成（已产出的句子仍可取走）"""
+        self._closed.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None and not task.done():
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # 生成已结束，事件循环已关闭
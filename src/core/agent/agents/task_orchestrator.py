@@ -2,15 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
-from typing import Dict, Any, Union
+from contextlib import AsyncExitStack
+from typing import Dict, Any, Iterable, List, Optional, Union
 
 from langgraph.constants import END
 from langgraph.graph.state import CompiledStateGraph, StateGraph
 
+from src.core.agent.agents.checkpoint_store import CheckpointStore
 from src.core.agent.entities.agent_entity import (
     ExecutionState, ExecutionStatus, StepState
 )
+from src.utils.deadline import Deadline, Interrupted, current_deadline, deadline_scope
 from src.utils.logger import logger
+from src.utils.tracing import tracer
 
 
 class TaskOrchestrator:
@@ -19,37 +23,48 @@ class TaskOrchestrator:
     name: str = "task_orchestrator"
     agents: Dict[str, Any] = {}
 
-    def __init__(self, agents: Dict[str, Any]):
+    def __init__(
+            self,
+            agents: Dict[str, Any],
+            max_concurrency: int = 4,
+            agent_limit: int = 1,
+            service_limits: Optional[Dict[str, int]] = None,
+            checkpoints: Optional[CheckpointStore] = None,
+            step_timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            agents: Agent 映射（dict 或 AgentPool）
+            max_concurrency: 同时执行的步骤总数上限
+            agent_limit: 同一 Agent 类型同时执行的步骤数（Agent 实例有对话状态，默认串行）
+            service_limits: 外部服务（工具名，"llm" 表示所有 Agent 共用的模型）并发上限
+            checkpoints: 步骤检查点，命中时复用已成功步骤的结果
+            step_timeout: 单个步骤的超时（秒），同时受调用方 Deadline 约束
+        """
         self.agents = agents
+        self.max_concurrency = max(1, max_concurrency)
+        self.agent_limit = max(1, agent_limit)
+        self.service_limits = service_limits or {}
+        self.checkpoints = checkpoints
+        self.step_timeout = step_timeout
         self.workflow = self._build_workflow()
         logger.info(f"TaskOrchestrator initialized with {len(agents)} agents")
 
     def _build_workflow(self) -> CompiledStateGraph:
-        """构建简化的 LangGraph 工作流"""
+        """构建 LangGraph 工作流"""
         workflow = StateGraph(ExecutionState)
 
         # 定义节点
         workflow.add_node("initialize", self._initialize_execution)
-        workflow.add_node("execute_step", self._execute_step)
+        workflow.add_node("execute_steps", self._execute_steps)
         workflow.add_node("finalize", self._finalize_execution)
 
         # 设置入口点
         workflow.set_entry_point("initialize")
 
         # 节点连接
-        workflow.add_edge("initialize", "execute_step")
-
-        # execute_step 之后直接判断是否继续
-        workflow.add_conditional_edges(
-            "execute_step",
-            self._route_after_execution,
-            {
-                "next_step": "execute_step",
-                "all_done": "finalize",
-                "error": "finalize"
-            }
-        )
-
+        workflow.add_edge("initialize", "execute_steps")
+        workflow.add_edge("execute_steps", "finalize")
         workflow.add_edge("finalize", END)
 
         compiled = workflow.compile()
@@ -65,14 +80,9 @@ class TaskOrchestrator:
 
         # 转换步骤
         step_states = []
-        for idx, step in enumerate(steps):
-            step_states.append(StepState(
-                step_id=step.get("task_id"),
-                description=step.get("description", ""),
-                agent_type=step.get("assigned_agent", "unknown"),
-                status=ExecutionStatus.PENDING,
-                iteration_count=0
-            ))
+        id_to_index: Dict[str, int] = {}
+        for step in steps:
+            step_states.append(self._to_step_state(step, len(step_states), id_to_index))
 
         return {
             "steps": step_states,
@@ -81,107 +91,261 @@ class TaskOrchestrator:
             "completed": False
         }
 
-    def _execute_step(self, state: Union[ExecutionState, Dict]) -> Dict[str, Any]:
-        """执行单个步骤（AgentExecutor 自动处理所有工具调用）"""
-        current_index = self._get_state_value(state, 'current_step_index', 0)
-        steps = self._get_state_value(state, 'steps', [])
+    @staticmethod
+    def _to_step_state(step: Dict[str, Any], index: int, id_to_index: Dict[str, int]) -> StepState:
+        """
+        转换步骤并解析依赖
+
+        depends_on 为步骤 task_id 列表；未提供时依赖前一步（按顺序执行）。
+        只接受对前序步骤的依赖，保证无环。
+        """
+        step_id = step.get("task_id")
+        depends_on = step.get("depends_on")
+
+        if depends_on is None:
+            dependencies = [index - 1] if index > 0 else []
+        else:
+            dependencies = []
+            for dep_id in depends_on:
+                dep_index = id_to_index.get(dep_id)
+                if dep_index is None:
+                    logger.warning(f"Step {index + 1} ignores unknown or forward dependency: {dep_id}")
+                    continue
+                dependencies.append(dep_index)
+
+        id_to_index[step_id] = index
+        return StepState(
+            step_id=step_id,
+            description=step.get("description", ""),
+            agent_type=step.get("assigned_agent", "unknown"),
+            status=ExecutionStatus.PENDING,
+            depends_on=sorted(set(dependencies)),
+            iteration_count=0
+        )
 
-        if current_index >= len(steps):
-            return {"error_message": "Step index out of range"}
+    def _execute_steps(self, state: Union[ExecutionState, Dict]) -> Dict[str, Any]:
+        """按依赖关系并发执行所有步骤"""
+        steps = self._get_state_value(state, 'steps', [])
+        plan = self._get_state_value(state, 'plan', {})
+        asyncio.run(self._run_steps(steps, plan.get("plan_id")))
+        return self._collect_results(steps)
+
+    async def _run_steps(
+            self,
+            steps: Union[List[StepState], Iterable[StepState]],
+            plan_id: Optional[str] = None
+    ) -> List[StepState]:
+        """
+        依赖就绪即执行的调度器
+
+        steps 可以是阻塞迭代器（步骤边生成边到达），到达的步骤立即按依赖调度；
+        全局、Agent 类型、外部服务三级信号量限制并发。依赖失败的步骤跳过。
+        """
+        loop = asyncio.get_running_loop()
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        semaphores: Dict[str, asyncio.Semaphore] = {}
+        scheduled: List[asyncio.Task] = []
+        arrived: List[StepState] = []
+
+        def limits_for(step: StepState) -> List[asyncio.Semaphore]:
+            names = [f"agent:{step.agent_type}"]
+            for service in self._services_for(step.agent_type):
+                names.append(f"service:{service}")
+
+            # 固定顺序获取，避免死锁
+            result = []
+            for name in sorted(names):
+                if name not in semaphores:
+                    limit = self.agent_limit if name.startswith("agent:") else self.service_limits[name[8:]]
+                    semaphores[name] = asyncio.Semaphore(max(1, limit))
+                result.append(semaphores[name])
+            return result + [global_limit]
+
+        async def run(index: int, step: StepState) -> bool:
+            for dep in step.depends_on:
+                if not await scheduled[dep]:
+                    step.status = ExecutionStatus.FAILED
+                    step.skipped = True
+                    step.error = f"跳过：依赖的步骤 {dep + 1}（{arrived[dep].description}）未成功"
+                    logger.warning(f"Step {index + 1} skipped: dependency {dep + 1} failed")
+                    return False
+
+            # 描述和上游输入都未变化的成功步骤直接复用
+            if self.checkpoints is not None:
+                step.checkpoint_key = self.checkpoints.key_for(
+                    step, [arrived[dep].checkpoint_key for dep in step.depends_on]
+                )
+                if self._restore_checkpoint(step, index):
+                    return True
+
+            async with AsyncExitStack() as stack:
+                for semaphore in limits_for(step):
+                    await stack.enter_async_context(semaphore)
+                success = await self._arun_step(step, index)
+
+            if success and self.checkpoints is not None:
+                self.checkpoints.save(step.checkpoint_key, plan_id, step)
+            return success
+
+        if isinstance(steps, list):
+            source = iter(list(steps))
+            next_step = None
+        else:
+            source = iter(steps)
+            next_step = lambda: loop.run_in_executor(None, next, source, None)
+
+        while True:
+            step = next(source, None) if next_step is None else await next_step()
+            if step is None:
+                break
+            arrived.append(step)
+            scheduled.append(asyncio.ensure_future(run(len(arrived) - 1, step)))
+
+        await asyncio.gather(*scheduled)
+        return arrived
+
+    def _restore_checkpoint(self, step: StepState, index: int) -> bool:
+        """从检查点恢复步骤结果"""
+        checkpoint = self.checkpoints.get(step.checkpoint_key)
+        if checkpoint is None:
+            return False
+
+        step.status = ExecutionStatus.SUCCESS
+        step.result = checkpoint.result
+        step.iteration_count = checkpoint.iteration_count
+        step.tool_calls = checkpoint.tool_calls
+        step.reused = True
+        logger.info(f"Step {index + 1} reused from checkpoint: {step.agent_type} - {step.description}")
+        return True
+
+    def _services_for(self, agent_type: str) -> List[str]:
+        """步骤会用到的受限外部服务：所有 Agent 共用 llm，加上该 Agent 的工具"""
+        if not self.service_limits:
+            return []
+
+        tools: List[str] = []
+        describe = getattr(self.agents, "describe", None)
+        try:
+            if describe:
+                tools = describe(agent_type)["tools"]
+            elif agent_type in self.agents:
+                tools = self.agents[agent_type].get_ability_info()["tools"]
+        except Exception:
+            tools = []
 
-        current_step = steps[current_index]
+        return [name for name in ["llm", *tools] if name in self.service_limits]
 
-        logger.info(
-            f"Step {current_index + 1}/{len(steps)}: "
-            f"{current_step.agent_type} - {current_step.description}"
-        )
+    async def _arun_step(self, step: StepState, index: int) -> bool:
+        """执行单个步骤（AgentExecutor 自动处理所有工具调用），返回是否成功"""
+        logger.info(f"Step {index + 1}: {step.agent_type} - {step.description}")
 
         # 获取 agent
-        agent = self.agents.get(current_step.agent_type)
+        agent = self.agents.get(step.agent_type)
         if not agent:
-            error_msg = f"Unknown agent type: {current_step.agent_type}"
+            error_msg = f"Unknown agent type: {step.agent_type}"
             logger.error(f"{error_msg}")
-            current_step.status = ExecutionStatus.FAILED
-            current_step.error = error_msg
-            return {
-                "steps": steps,
-                "current_step_index": current_index + 1,
-                "error_message": error_msg
-            }
+            step.status = ExecutionStatus.FAILED
+            step.error = error_msg
+            return False
 
         # 重置 agent 的对话历史
         agent.reset()
+        step.status = ExecutionStatus.RUNNING
+        deadline = Deadline(self.step_timeout, parent=current_deadline())
 
         try:
-            # 调用 agent
-            result = asyncio.run(agent.ainvoke({"user_input": current_step.description}))
+            # 命令已超时或取消时不再启动新步骤
+            deadline.check()
+
+            # 调用 agent（超时或取消时中断进行中的请求）
+            with tracer.span("step", index=index + 1, agent=step.agent_type), deadline_scope(deadline):
+                result = await deadline.run(agent.ainvoke({"user_input": step.description}))
 
             # 检查执行结果
             if not result.get("success"):
-                current_step.status = ExecutionStatus.FAILED
-                current_step.error = result.get("error", "Unknown error")
-                logger.error(f"Step failed: {current_step.error}")
-                return {
-                    "steps": steps,
-                    "current_step_index": current_index + 1,
-                    "error_message": current_step.error
-                }
+                step.status = ExecutionStatus.FAILED
+                step.error = result.get("error", "Unknown error")
+                step.interrupted = result.get("interrupted")
+                # 被中断的步骤保留已完成的工具调用，供总结时报告部分结果
+                step.tool_calls = self._extract_tool_calls(result)
+                logger.error(f"Step failed: {step.error}")
+                return False
 
             # 标记成功
-            current_step.status = ExecutionStatus.SUCCESS
-            current_step.result = result["output"]
-            current_step.iteration_count = result["iterations"]
+            step.status = ExecutionStatus.SUCCESS
+            step.result = result["output"]
+            step.iteration_count = result["iterations"]
 
             # 提取工具调用详情
-            tool_calls = []
-            for step_tuple in result.get("intermediate_steps", []):
-                agent_action, observation = step_tuple
-                tool_calls.append({
-                    "tool": agent_action.tool,
-                    "args": agent_action.tool_input,
-                    "result": observation
-                })
+            step.tool_calls = self._extract_tool_calls(result)
+            return True
 
-            # 记录执行结果
-            execution_results = self._get_state_value(state, 'execution_results', [])
-            execution_results.append({
-                "step_id": current_step.step_id,
-                "description": current_step.description,
-                "status": "success",
-                "output": result["output"],
-                "iterations": result["iterations"],
-                "tool_calls": tool_calls
-            })
-
-            return {
-                "steps": steps,
-                "execution_results": execution_results,
-                "current_step_index": current_index + 1
-            }
+        except Interrupted as e:
+            logger.warning(f"Step {index + 1} interrupted: {e}")
+            step.status = ExecutionStatus.FAILED
+            step.error = str(e)
+            step.interrupted = e.kind
+            return False
 
         except Exception as e:
             logger.error(f"Step execution error: {e}", exc_info=True)
-            current_step.status = ExecutionStatus.FAILED
-            current_step.error = str(e)
-            return {
-                "steps": steps,
-                "current_step_index": current_index + 1,
-                "error_message": str(e)
-            }
-
-    def _route_after_execution(self, state: Union[ExecutionState, Dict]) -> str:
-        """决定下一步的路由逻辑"""
-        error_message = self._get_state_value(state, 'error_message', '')
-        if error_message:
-            return "error"
+            step.status = ExecutionStatus.FAILED
+            step.error = str(e)
+            return False
 
-        current_index = self._get_state_value(state, 'current_step_index', 0)
-        steps = self._get_state_value(state, 'steps', [])
+    @staticmethod
+    def _extract_tool_calls(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """从 AgentExecutor 的 intermediate_steps 提取工具调用详情"""
+        tool_calls = []
+        for agent_action, observation in result.get("intermediate_steps", []):
+            tool_calls.append({
+                "tool": agent_action.tool,
+                "args": agent_action.tool_input,
+                "result": observation
+            })
+        return tool_calls
 
-        if current_index >= len(steps):
-            return "all_done"
-        else:
-            return "next_step"
+    @staticmethod
+    def _collect_results(steps: List[StepState]) -> Dict[str, Any]:
+        """按步骤顺序汇总结果（含被中断步骤的部分结果），错误信息取第一个失败步骤"""
+        execution_results = []
+        error_message = ""
+        for step in steps:
+            if step.status == ExecutionStatus.SUCCESS:
+                execution_results.append({
+                    "step_id": step.step_id,
+                    "description": step.description,
+                    "status": "success",
+                    "output": step.result,
+                    "iterations": step.iteration_count,
+                    "tool_calls": step.tool_calls,
+                    "reused": step.reused
+                })
+            elif step.interrupted:
+                execution_results.append({
+                    "step_id": step.step_id,
+                    "description": step.description,
+                    "status": step.interrupted,
+                    "error": step.error,
+                    "tool_calls": step.tool_calls
+                })
+            elif step.skipped:
+                execution_results.append({
+                    "step_id": step.step_id,
+                    "description": step.description,
+                    "status": "skipped",
+                    "error": step.error
+                })
+
+            if step.status == ExecutionStatus.FAILED and not error_message:
+                error_message = step.error
+
+        return {
+            "steps": steps,
+            "current_step_index": len(steps),
+            "execution_results": execution_results,
+            "error_message": error_message
+        }
 
     def _finalize_execution(self, state: Union[ExecutionState, Dict]) -> Dict[str, Any]:
         """完成执行"""
@@ -211,7 +375,8 @@ class TaskOrchestrator:
         )
 
         # 运行工作流
-        final_state = self.workflow.invoke(initial_state)
+        with tracer.span("orchestrator", steps=len(plan.get("steps", []))):
+            final_state = self.workflow.invoke(initial_state)
 
         # 生成摘要
         summary = self._generate_summary(final_state)
@@ -220,6 +385,31 @@ class TaskOrchestrator:
 
         return summary
 
+    def execute_stream(self, steps: Iterable[Dict[str, Any]], plan_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        流式执行计划（外部接口）- 步骤边生成边执行
+
+        steps 可以是阻塞的迭代器（如规划器逐步产出的队列），每取到一个步骤就按依赖调度。
+        """
+        logger.info("Starting TaskOrchestrator streaming execution")
+
+        id_to_index: Dict[str, int] = {}
+        step_states = (
+            self._to_step_state(step, index, id_to_index)
+            for index, step in enumerate(steps)
+        )
+
+        with tracer.span("orchestrator.stream"):
+            arrived = asyncio.run(self._run_steps(step_states, plan_id))
+
+        state = self._collect_results(arrived)
+        self._finalize_execution(state)
+        summary = self._generate_summary(state)
+
+        logger.info(f"Execution complete: {summary['message']}")
+
+        return summary
+
     def _generate_summary(self, state: Union[ExecutionState, Dict]) -> Dict[str, Any]:
         """生成执行摘要"""
         steps = self._get_state_value(state, 'steps', [])
@@ -227,6 +417,8 @@ class TaskOrchestrator:
 
         successful_steps = 0
         failed_steps = 0
+        failed_step = None
+        interrupted = None
 
         for s in steps:
             status = s.status if hasattr(s, 'status') else s.get('status')
@@ -234,6 +426,11 @@ class TaskOrchestrator:
                 successful_steps += 1
             elif status == ExecutionStatus.FAILED:
                 failed_steps += 1
+                if interrupted is None and getattr(s, 'interrupted', None):
+                    interrupted = s.interrupted
+                # 第一个失败步骤，供增量重新规划定位
+                if failed_step is None and hasattr(s, 'step_id'):
+                    failed_step = {"step_id": s.step_id, "description": s.description, "error": s.error}
 
         execution_results = self._get_state_value(state, 'execution_results', [])
         error_message = self._get_state_value(state, 'error_message', '')
@@ -245,11 +442,16 @@ class TaskOrchestrator:
             "failed_steps": failed_steps,
             "results": execution_results,
             "error_message": error_message,
-            "message": self._create_message(steps, successful_steps, total_steps)
+            "failed_step": failed_step,
+            "interrupted": interrupted,
+            "message": self._create_message(steps, successful_steps, total_steps, interrupted)
         }
 
-    def _create_message(self, steps: list, successful: int, total: int) -> str:
+    def _create_message(self, steps: list, successful: int, total: int, interrupted: Optional[str] = None) -> str:
         """创建用户友好的消息"""
+        if interrupted:
+            reason = "执行超时" if interrupted == "timeout" else "执行已取消"
+            return f"{reason}：成功执行了 {successful}/{total} 个步骤。"
         if successful == total:
             return f"成功执行了所有 {total} 个步骤！"
         elif successful == 0:
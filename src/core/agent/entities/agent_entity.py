@@ -6,6 +6,7 @@
 @File   : agent_entity.py
 """
 import platform
+import time
 from enum import Enum
 from typing import List, Dict, Any
 from typing import Optional
@@ -62,9 +63,30 @@ class StepState(BaseModel):
     status: ExecutionStatus = ExecutionStatus.PENDING
     result: Optional[Any] = None
     error: str = ""
+    depends_on: List[int] = Field(default_factory=list)  # 依赖的步骤下标
+    interrupted: Optional[str] = None  # 被中断时为 "timeout" 或 "cancelled"
+    skipped: bool = False  # 依赖的步骤失败而未执行（状态记为 FAILED）
 
     # 执行追踪
     iteration_count: int = 0
+    tool_calls: List[Dict[str, Any]] = Field(default_factory=list)
+
+    # 检查点
+    checkpoint_key: str = ""
+    reused: bool = False
+
+
+class StepCheckpoint(BaseModel):
+    """已成功步骤的检查点"""
+    key: str
+    plan_id: Optional[str] = None
+    step_id: str
+    agent_type: str
+    description: str
+    result: Optional[Any] = None
+    iteration_count: int = 0
+    tool_calls: List[Dict[str, Any]] = Field(default_factory=list)
+    created_at: float = Field(default_factory=time.time)
 
 
 class ExecutionState(BaseModel):
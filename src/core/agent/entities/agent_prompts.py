@@ -57,7 +57,8 @@ PLANNER_AGENT_SYSTEM_PROMPT_TEMPLATE = """你是任务规划专家，将自然
       "step_number": 1,
       "assigned_agent": "agent类型",
       "description": "操作描述",
-      "expected_result": "预期结果"
+      "expected_result": "预期结果",
+      "depends_on": []
     }}
   ]
 }}
@@ -97,6 +98,9 @@ User: 桌面，叫test.txt
 - feasible: 可执行，包含steps
 - infeasible: 不可执行，steps为空
 - invalid_input: 无效输入，steps为空
+- depends_on: 该步骤需要用到结果的前序步骤编号；互不相关的步骤填 []，可以并行执行
+  例："查北京和上海天气并打开音乐" → 三个步骤的 depends_on 都是 []
+  例："搜索天气并写入文件" → 写文件步骤的 depends_on 是 [1]
 
 【系统能力】
 ✅ 文件操作、网络搜索、数据处理、应用控制
@@ -104,6 +108,22 @@ User: 桌面，叫test.txt
 
 仅返回JSON，不要解释。"""
 
+PLANNER_REPLAN_PROMPT_TEMPLATE = """你是任务规划专家，负责修补执行失败的计划。只输出需要变化的部分，不要重写整个计划。
+
+【可用Agent】
+{agent_info}
+
+【原计划】（✅成功 ❌失败 ⏸未执行）
+{plan_steps}
+
+【失败步骤】第{failed_number}步，错误：{failed_error}
+【用户补充】{clarification}
+
+【输出】
+- steps: 替换第{failed_number}步的新步骤（通常1步），step_number 从{failed_number}开始
+- updates: 后续步骤中需要根据补充信息改写的描述（只填 step_number 和 description），没有则为空
+- 补充信息与任务无关或无法完成时 feasibility 为 infeasible 或 invalid_input"""
+
 FILE_MANAGEMENT_AGENT_PROMPT = """你是文件操作专家，快速完成用户的文件任务。
 
 【可用工具】
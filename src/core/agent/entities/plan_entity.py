@@ -5,7 +5,7 @@
 @Author : guojarrett@gmail.com
 @File   : plan_entity.py
 """
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 from pydantic import BaseModel, Field
 
@@ -16,11 +16,33 @@ class PlanStep(BaseModel):
     assigned_agent: str = Field(description="执行该步骤的 Agent 类型")
     description: str = Field(description="步骤描述")
     expected_result: Optional[str] = Field(default=None, description="预期结果")
+    depends_on: Optional[List[int]] = Field(
+        default=None,
+        description="依赖的前序步骤编号，互不依赖的步骤可并行执行；未提供时依赖上一步"
+    )
 
 
 class PlannerOutput(BaseModel):
     """Planner 输出格式"""
     task: str = Field(description="原始任务描述")
-    feasibility: str = Field(description="可行性：feasible, infeasible, invalid_input")
+    feasibility: Literal["feasible", "infeasible", "invalid_input"] = Field(
+        description="可行性：feasible, infeasible, invalid_input"
+    )
     reason: str = Field(description="可行性分析说明")
     steps: List[PlanStep] = Field(default_factory=list, description="任务步骤")
+
+
+class StepPatch(BaseModel):
+    """改写已有步骤的描述"""
+    step_number: int = Field(description="原计划中的步骤编号")
+    description: str = Field(description="新的步骤描述")
+
+
+class ReplanOutput(BaseModel):
+    """增量重新规划输出 - 只包含替换失败步骤的新步骤和需要改写的后续步骤"""
+    feasibility: Literal["feasible", "infeasible", "invalid_input"] = Field(
+        description="可行性：feasible, infeasible, invalid_input"
+    )
+    reason: str = Field(default="", description="简短说明")
+    steps: List[PlanStep] = Field(default_factory=list, description="替换失败步骤的新步骤")
+    updates: List[StepPatch] = Field(default_factory=list, description="因补充信息需要改写描述的后续步骤")
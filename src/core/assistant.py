@@ -12,8 +12,11 @@ from src.core.audio.recorder import AudioRecorder
 from src.core.audio.wake_word_detector import WakeWordDetector
 from src.core.initializer import AssistantInitializer
 from src.core.processor import CommandProcessor
+from src.core.processor_modules import PipelineJob, PipelineWorker
 from src.utils.config import config
 from src.utils.logger import logger
+from src.utils.startup import StartupGraph
+from src.utils.tracing import tracer
 
 
 class VoiceAssistant:
@@ -29,11 +32,15 @@ class VoiceAssistant:
         self.asr_language = None
         self.is_processing = False  # 是否正在处理指令
         self._initialized = False
+        self.startup: Optional[StartupGraph] = None  # 启动依赖图（提供各模块就绪状态）
 
         # 初始化和处理器
         self.initializer = AssistantInitializer(self)
         self.processor = CommandProcessor(self)
 
+        # 唤醒事件队列：检测器线程只入队，指令在专用工作线程中处理
+        self.worker = PipelineWorker(self._run_job)
+
     def initialize(self) -> bool:
         """初始化助手"""
         if self._initialized:
@@ -46,25 +53,95 @@ class VoiceAssistant:
 
         return success
 
+    def wait_until_ready(self, component: str, timeout: Optional[float] = None) -> bool:
+        """
+        等待后台预热的模块就绪（asr / tts / agents）
+
+        未使用启动图或该模块不在图中时直接返回 True，由调用方自行初始化
+        """
+        if self.startup is None or not self.startup.has(component):
+            return True
+        return self.startup.wait(component, timeout)
+
     def _on_wake_detected(self, keyword_index: int):
-        """唤醒词检测回调，当检测到唤醒词时调用"""
-        if self.is_processing:
-            logger.warning("Currently processing, please wait...")
-            return
+        """
+        唤醒词检测回调（在检测器线程中调用，不阻塞）
 
+        唤醒事件放入流水线队列，由工作线程处理；处理中再次唤醒时先取消当前指令，
+        取消专用唤醒词只取消当前指令并丢弃排队的唤醒。
+        """
         # 获取唤醒词
         keywords = self.config.get("wake_word.keywords", [])
         detected_keyword = keywords[keyword_index] if keyword_index < len(keywords) else "unknown"
 
+        if detected_keyword in (self.config.get("cancel.keywords") or []):
+            if self.cancel_processing("用户取消"):
+                self.worker.submit(PipelineJob(kind="cancel", keyword=detected_keyword))
+            return
+
+        if self.worker.busy:
+            if not self.config.get("cancel.barge_in", True):
+                logger.warning("Currently processing, please wait...")
+                return
+            logger.info(f"Wake word '{detected_keyword}' during processing, cancelling current command")
+            self.processor.cancel("重新唤醒")
+
         logger.info(f"Detected wake word: '{detected_keyword}'")
+        self.worker.submit(PipelineJob(keyword=detected_keyword))
+
+    def cancel_processing(self, reason: str = "已取消") -> bool:
+        """取消正在处理的指令并丢弃排队的唤醒（不阻塞），返回是否取消了任何内容"""
+        discarded = self.worker.discard("wake")
+        return self.processor.cancel(reason) or discarded > 0
+
+    def _run_job(self, job: PipelineJob):
+        """工作线程：处理一个流水线任务"""
+        if job.kind == "cancel":
+            # 取消反馈也是一次新的播报，先清除取消时设置的 TTS 停止标记
+            if self.processor.tts_client is not None and hasattr(self.processor.tts_client, "reset"):
+                self.processor.tts_client.reset()
+            self.processor._simple_tts_feedback("好的，已取消")
+            return
 
-        # 1. 先暂停唤醒词检测
-        if self.detector and self.detector._is_running:
-            logger.debug("Pausing wake word detector before confirmation...")
-            self.detector.pause()
-            time.sleep(0.3)
+        self.is_processing = True
+        self.processor.begin_command()
 
-        # 2. 确保 TTS 客户端已初始化
+        # 用户说话期间重新建立 LLM 连接（空闲较久时长连接可能已被关闭）；不在检测器线程中做，避免耽误读取音频
+        self.initializer._warm_llm_connections()
+        try:
+            with tracer.span("command", keyword=job.keyword, coalesced=job.coalesced):
+                tracer.record("queue.wait", job.created_at, time.time())
+                self._handle_wake()
+        finally:
+            self.processor.command_token = None
+            self.is_processing = False
+
+        stats = tracer.stats()
+        if stats:
+            logger.debug(
+                "Stage latency p50/p95: " + ", ".join(
+                    f"{name}={item['p50']:.2f}/{item['p95']:.2f}s" for name, item in stats.items()
+                )
+            )
+
+        queue_stats = self.worker.stats()
+        logger.debug(
+            f"Pipeline queue: {queue_stats['queued']} queued, {queue_stats['coalesced']} coalesced, "
+            f"{queue_stats['dropped']} dropped, wait p50/p95 "
+            f"{queue_stats['wait_p50']:.2f}/{queue_stats['wait_p95']:.2f}s"
+        )
+
+    def _handle_wake(self):
+        """唤醒后的完整处理：确认音 + 指令处理"""
+        # 1. 先暂停唤醒词检测（由检测器线程关闭音频流，pause 等待麦克风释放后返回）
+        with tracer.span("wake"):
+            if self.detector and self.detector._is_running:
+                logger.debug("Pausing wake word detector before confirmation...")
+                self.detector.pause()
+                time.sleep(0.3)
+
+        # 2. 确保 TTS 客户端已初始化（优先等待后台预热）
+        self.wait_until_ready("tts")
         if not self.processor.tts_client:
             logger.info("TTS client not initialized, initializing now...")
             try:
@@ -81,12 +158,18 @@ class VoiceAssistant:
                 logger.error(f"Failed to initialize TTS client: {e}")
 
         # 3. 播放确认音
-        self.processor._play_wake_confirmation()
+        with tracer.span("tts.confirmation"):
+            self.processor._play_wake_confirmation()
 
         # 4. 等待
         logger.debug("Waiting for user to prepare...")
         time.sleep(0.5)
 
+        # 唤醒确认阶段已被取消（用户再次唤醒）
+        if self.processor.cancelled:
+            logger.info("Command cancelled before recording")
+            return
+
         # 5. 处理用户指令
         self.processor.process_command(self.on_message)
 
@@ -101,7 +184,8 @@ class VoiceAssistant:
         self._show_ready_message()
 
         try:
-            # 开始监听唤醒词
+            # 先启动指令流水线，再开始监听唤醒词（检测循环阻塞当前线程）
+            self.worker.start()
             self.detector.start()
 
         except KeyboardInterrupt:
@@ -121,6 +205,17 @@ class VoiceAssistant:
         """清理资源"""
         logger.info("Cleaning up resources...")
 
+        # 取消进行中的指令并等待工作线程退出
+        self.processor.cancel("退出")
+        self.worker.stop(timeout=self.config.get("cancel.join_timeout", 3.0))
+
+        # 写回计划模板的命中统计
+        if self.processor.plan_cache:
+            self.processor.plan_cache.flush(force=True)
+
+        if self.processor.tts_client is not None and hasattr(self.processor.tts_client, "close"):
+            self.processor.tts_client.close()
+
         if self.detector:
             self.detector.cleanup()
 
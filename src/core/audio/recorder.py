@@ -37,6 +37,9 @@ class AudioRecorder:
         self.stream: Optional[pyaudio.Stream] = None
         self.frames = []
 
+        # 最近一次动态录音的 VAD 端点区间 (最后一次有声时间, 停止时间)
+        self.last_endpoint: Optional[tuple] = None
+
         logger.info("Recorder initialized successfully")
 
     def start_recording(self):
@@ -208,6 +211,8 @@ class AudioRecorder:
                     logger.info(f"detected {silence_time:.1f}s of silence")
                     break
 
+            self.last_endpoint = (last_sound_time, time.time())
+
             # 停止录音
             audio_data = self.stop_recording()
 
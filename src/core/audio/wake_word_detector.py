@@ -8,6 +8,7 @@
 import os
 import struct
 import sys
+import threading
 import time
 from typing import Optional, Callable
 
@@ -40,6 +41,8 @@ class WakeWordDetector:
         self.on_wake = on_wake
         self._is_running = False
         self._is_paused = False
+        self._thread: Optional[threading.Thread] = None  # 检测循环所在线程
+        self._stream_released = threading.Event()  # 暂停后检测线程已关闭音频流
 
         try:
             self.porcupine = pvporcupine.create(
@@ -101,15 +104,23 @@ class WakeWordDetector:
             # 打开音频流
             self.stream = self._open_audio_stream()
 
+            self._thread = threading.current_thread()
             self._is_running = True
             self._is_paused = False
             logger.info("Started listening for wake words...")
             logger.info(f"Try saying: {', '.join(self.keywords)}")
 
             while self._is_running:
-                # 如果暂停,跳过处理但继续循环
+                # 暂停/恢复由本线程在两次读取之间关闭或重建音频流（PortAudio 流不能跨线程关闭）
                 if self._is_paused:
-                    time.sleep(0.1)  # 暂停时减少CPU占用
+                    if self.stream is not None:
+                        self._close_audio_stream()
+                        logger.debug("Wake word detection paused (stream closed)")
+                    self._stream_released.set()
+                    time.sleep(0.05)  # 暂停时减少CPU占用
+                    continue
+
+                if self.stream is None and not self._reopen_audio_stream():
                     continue
 
                 try:
@@ -149,44 +160,64 @@ class WakeWordDetector:
             logger.error(f"Error during wake word detection: {e}")
         finally:
             self.stop()
+            self._thread = None
+
+    def _in_detector_thread(self) -> bool:
+        """当前是否在检测循环线程中（循环未启动时视为是）"""
+        return self._thread is None or self._thread is threading.current_thread()
+
+    def _reopen_audio_stream(self) -> bool:
+        """恢复后在检测线程中重新创建音频流，失败时保持暂停"""
+        # 等待音频设备完全释放
+        time.sleep(0.2)
+        if self._is_paused or not self._is_running:
+            return False
+
+        try:
+            self.stream = self._open_audio_stream()
+            logger.debug("Wake word detection resumed (stream recreated)")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to resume wake word detection: {e}")
+            self._is_paused = True  # 保持暂停状态
+            return False
 
-    def pause(self):
-        """暂停唤醒词检测 (完全关闭音频流)"""
+    def pause(self, timeout: float = 1.0):
+        """
+        暂停唤醒词检测 (完全关闭音频流)
+
+        其他线程调用时只登记暂停请求，由检测线程在两次读取之间关闭音频流；
+        等待麦克风释放（最多 timeout 秒）后返回，以便随后开始录音
+        """
         if not self._is_running:
             return
 
+        self._stream_released.clear()
         self._is_paused = True
 
-        self._close_audio_stream()
-        logger.debug("Wake word detection paused (stream closed)")
+        if self._in_detector_thread():
+            self._close_audio_stream()
+            logger.debug("Wake word detection paused (stream closed)")
+        elif not self._stream_released.wait(timeout):
+            logger.warning("Wake word detector did not release the audio stream in time")
 
     def resume(self):
-        """恢复唤醒词检测，重新创建音频流"""
+        """恢复唤醒词检测（未暂停时不做任何事），音频流由检测线程重新创建"""
         if not self._is_running:
             logger.warning("Cannot resume: detector is not running")
             return
+        if not self._is_paused:
+            return
 
-        try:
-            # 确保旧流已关闭
-            self._close_audio_stream()
-
-            # 等待音频设备完全释放
-            time.sleep(0.2)
-
-            # 重新打开音频流
-            self.stream = self._open_audio_stream()
-
-            self._is_paused = False
-            logger.debug("Wake word detection resumed (stream recreated)")
-
-        except Exception as e:
-            logger.error(f"Failed to resume wake word detection: {e}")
-            self._is_paused = True  # 保持暂停状态
+        self._is_paused = False
+        if self._in_detector_thread():
+            self._reopen_audio_stream()
 
     def stop(self):
         """停止监听"""
         self._is_running = False
         self._is_paused = False
+        self._stream_released.set()
 
         self._close_audio_stream()
         logger.info("Stopped listening for wake words.")
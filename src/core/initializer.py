@@ -12,6 +12,8 @@ from src.core.audio.recorder import AudioRecorder
 from src.core.audio.wake_word_detector import WakeWordDetector
 from src.utils.langsmith_setup import setup_langsmith
 from src.utils.logger import logger
+from src.utils.startup import StartupGraph
+from src.utils.tracing import tracer, DEFAULT_TRACE_FILE
 
 if TYPE_CHECKING:
     from src.core.assistant import VoiceAssistant
@@ -25,31 +27,38 @@ class AssistantInitializer:
         self.config = assistant.config
 
     def initialize_all(self) -> bool:
-        """初始化所有模块"""
+        """
+        按依赖图并行初始化所有模块
+
+        录音器和唤醒词检测器就绪后立即返回，以便开始监听；
+        Whisper 模型、TTS 和 Agent 栈在后台继续预热，使用方通过 assistant.wait_until_ready 等待
+        """
         logger.info("VoxAgent Voice Assistant is starting...")
 
         self._init_langsmith()
+        self._init_local_trace()
+        self._init_tracing()
 
         # 检查配置
         if not self._check_config():
             return False
 
-        # 初始化录音器（创建 PyAudio 实例）
-        if not self._init_recorder():
-            return False
+        graph = StartupGraph(max_workers=self.config.get("startup.max_workers", 4))
+        graph.add("recorder", self._init_recorder)
+        graph.add("detector", self._init_wake_word_detector, deps=["recorder"])
+        graph.add("asr", self._init_asr)
+        graph.add("tts", self._init_tts)
+        graph.add("connections", self._warm_llm_connections)
+        if self.config.get("startup.warm_agents", True):
+            graph.add("agents", self.assistant.processor._initialize_system, deps=["tts"])
 
-        # 初始化唤醒词检测器（共享 PyAudio 实例）
-        if not self._init_wake_word_detector():
-            return False
+        self.assistant.startup = graph.start()
 
-        # 初始化 ASR 客户端
-        if not self._init_asr():
+        # 只等待采集链路，其余阶段在后台预热
+        if not graph.wait_all(["recorder", "detector"]):
             return False
 
-        if not self._init_tts():
-            return False
-
-        logger.info("All modules initialized successfully")
+        logger.info("Audio capture ready, remaining modules warming up in background")
         return True
 
     def _init_langsmith(self) -> None:
@@ -59,6 +68,39 @@ class AssistantInitializer:
         except Exception as e:
             logger.warning(f"LangSmith initialization failed (non-critical): {e}")
 
+    def _init_local_trace(self) -> None:
+        """初始化本地 LangChain 运行记录"""
+        try:
+            # 依赖 langchain 回调模块，推迟导入以缩短启动时间
+            from src.utils.local_trace import setup_local_trace
+            setup_local_trace()
+        except Exception as e:
+            logger.warning(f"Local trace initialization failed (non-critical): {e}")
+
+    def _init_tracing(self) -> None:
+        """初始化本地延迟追踪"""
+        enabled = self.config.get("tracing.enabled", True)
+        trace_file = None
+        if self.config.get("tracing.persist", True):
+            trace_file = self.config.get("tracing.file") or str(DEFAULT_TRACE_FILE)
+
+        tracer.configure(
+            enabled=enabled,
+            trace_file=trace_file,
+            max_file_traces=self.config.get("tracing.max_file_traces", 500),
+            window=self.config.get("tracing.window", 200)
+        )
+        logger.info(f"Latency tracing {'enabled' if enabled else 'disabled'} (file: {trace_file})")
+
+    def _warm_llm_connections(self) -> bool:
+        """预热 LLM 共享连接池（后台建立连接，不等待结果，失败不影响启动）"""
+        try:
+            from src.services.LLMFactory import LLMFactory
+            LLMFactory.warm_connections()
+        except Exception as e:
+            logger.warning(f"LLM connection warm-up failed (non-critical): {e}")
+        return True
+
     def _check_config(self) -> bool:
         """检查配置是否有效"""
         # 检查唤醒词配置
@@ -89,10 +131,6 @@ class AssistantInitializer:
             keywords = self.config.get("wake_word.keywords", ["computer", "jarvis"])
             sensitivities = self.config.get("wake_word.sensitivities", [0.5])
 
-            # 初始化录音器
-            if not self._init_recorder():
-                return False
-
             self.assistant.detector = WakeWordDetector(
                 access_key=access_key,
                 keywords=keywords,
@@ -109,7 +147,7 @@ class AssistantInitializer:
             return False
 
     def _init_recorder(self) -> bool:
-        """初始化录音器（先于唤醒词检测器）"""
+        """初始化录音器（唤醒词检测器共享其 PyAudio 实例）"""
         try:
             sample_rate = self.config.get("recording.sample_rate", 16000)
             channels = self.config.get("recording.channels", 1)
@@ -6,25 +6,32 @@
 @File   : processor.py
 """
 
+import contextvars
+import itertools
+import queue
+import threading
 import time
-from typing import TYPE_CHECKING, Dict, Any, Optional, List, Callable
-
-from src.core.agent.agents.base_agent import BaseAgent
-from src.core.agent.agents.error_analyzer_agent import ErrorAnalyzerAgent
-from src.core.agent.agents.planner_agent import PlannerAgent
-from src.core.agent.agents.summary_agent import SummaryAgent
-from src.core.agent.agents.task_orchestrator import TaskOrchestrator
-from src.core.models import ExecutionPlan
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Callable, Iterable, Tuple
+
+from src.core.agent.agents.checkpoint_store import CheckpointStore
+from src.core.models import ExecutionPlan, Task
 from src.core.processor_modules import (
     AudioHandler,
     ConversationManager,
     ErrorHandler,
-    ErrorType
+    ErrorType,
+    IntentRouter,
+    InteractionEvent,
+    InteractionState,
+    InteractionStateMachine,
+    PlanCache,
+    ProcessingPrompt
 )
-from src.core.tools import tool_registry
-from src.services.LLMFactory import LLMFactory
-from src.services.tts_client import tts_client
+from src.core.processor_modules.plan_cache import DEFAULT_CACHE_FILE
+from src.utils.deadline import Deadline, Interrupted, current_deadline, deadline_scope
 from src.utils.logger import logger
+from src.utils.tracing import tracer
 
 if TYPE_CHECKING:
     from src.core.assistant import VoiceAssistant
@@ -44,16 +51,30 @@ class CommandProcessor:
         self.orchestrator = None
         self.summarizer = None
         self.error_analyzer = None
+        self.intent_router: Optional[IntentRouter] = None
+        self.plan_cache: Optional[PlanCache] = None
+        self._dispatched_executions: Dict[str, Tuple[Future, Deadline]] = {}  # plan_id -> 提前分发的执行及其取消令牌
+        self.deadline: Optional[Deadline] = None  # 当前指令的截止时间
+        self.command_token: Optional[Deadline] = None  # 本次唤醒的取消令牌（各轮 deadline 的父级）
         self.tts_client = None
 
         self._initialized = False
+        self._init_lock = threading.Lock()
         self.callback = None
+        self.state_machine: Optional[InteractionStateMachine] = None
 
         # 模块实例
         self.audio_handler = AudioHandler(assistant, self.config)
         self.conversation_manager = ConversationManager()
         self.error_handler = None  # 在初始化后创建
 
+        # 处理中提示语（与规划/执行并行播放）
+        skip_threshold = self.config.get("processing_prompt.skip_threshold", 1.0)
+        self.processing_prompt = ProcessingPrompt(
+            speak=self._speak_processing_prompt,
+            skip_threshold=skip_threshold if isinstance(skip_threshold, (int, float)) else 1.0
+        )
+
         # 语音提示
         self.voice_prompts = {
             "wake": ["请讲"],
@@ -70,9 +91,32 @@ class CommandProcessor:
             ]
         }
 
+    def _ensure_initialized(self) -> bool:
+        """确保系统已初始化：优先等待后台预热，未预热或预热失败时再同步初始化"""
+        if not self._initialized:
+            self.assistant.wait_until_ready("agents")
+        if not self._initialized:
+            return self._initialize_system()
+        return True
+
     def _initialize_system(self) -> bool:
-        """初始化整个系统"""
+        """初始化整个系统（可在启动线程池中后台预热）"""
+        with self._init_lock:
+            if self._initialized:
+                return True
+            return self._build_system()
+
+    def _build_system(self) -> bool:
+        """创建 LLM、Agent、规划器、编排器、总结器等组件"""
         try:
+            # Agent 栈依赖 langchain / openai，导入耗时较长，推迟到初始化时
+            from src.core.agent.agents.base_agent import BaseAgent
+            from src.core.agent.agents.error_analyzer_agent import ErrorAnalyzerAgent
+            from src.core.agent.agents.planner_agent import PlannerAgent
+            from src.core.agent.agents.summary_agent import SummaryAgent
+            from src.core.tools import tool_registry
+            from src.services.LLMFactory import LLMFactory
+
             # 导入 worker agents 以触发注册
             import src.core.agent.agents.workers.file_agent
             import src.core.agent.agents.workers.search_agent
@@ -90,19 +134,20 @@ class CommandProcessor:
                 logger.error("Failed to create LLM")
                 return False
 
-            # 2. 创建 Worker Agents
+            # 2. 创建 Worker Agents（默认惰性构建，首次分派时才实例化）
             worker_llm = LLMFactory.get_worker_llm()
             self.agents = BaseAgent.create_all_agents(
                 llm=worker_llm,
                 tool_manager=tool_registry,
-                check_dependencies=False
+                check_dependencies=False,
+                lazy=self.config.get("agent.lazy_init", True)
             )
 
             if not self.agents:
                 logger.error("No agents created")
                 return False
 
-            logger.info(f"Created {len(self.agents)} agents: {list(self.agents.keys())}")
+            logger.info(f"Available agents ({len(self.agents)}): {list(self.agents.keys())}")
 
             # 3. 创建 PlannerAgent
             planner_llm = LLMFactory.get_planner_llm()
@@ -113,7 +158,10 @@ class CommandProcessor:
             logger.info("PlannerAgent initialized")
 
             # 4. 创建 TaskOrchestrator
-            self.orchestrator = TaskOrchestrator(agents=self.agents)
+            self.orchestrator = self._create_orchestrator(
+                self.agents,
+                checkpoint_path=self.config.get("orchestrator.checkpoint.path") or None
+            )
             logger.info("TaskOrchestrator initialized")
 
             # 5. 创建 Summarizer
@@ -129,14 +177,40 @@ class CommandProcessor:
             # 7. 创建 ErrorHandler
             self.error_handler = ErrorHandler(self.error_analyzer)
 
-            # 8. 创建 TTS 客户端
-            edge_config = self.config.get("tts.edge", {})
-            self.tts_client = tts_client(
-                voice=edge_config.get("voice", "yunyang"),
-                rate=edge_config.get("rate", "+0%"),
-                volume=edge_config.get("volume", "+0%"),
-                pitch=edge_config.get("pitch", "+0Hz")
-            )
+            # 8. 创建意图路由（常见指令跳过规划 LLM）
+            if self.config.get("intent_router.enabled", True):
+                self.intent_router = IntentRouter(
+                    agents=self.agents,
+                    tool_registry=tool_registry,
+                    classifier_threshold=self.config.get("intent_router.classifier_threshold", 0.45),
+                    classifier_margin=self.config.get("intent_router.classifier_margin", 0.1),
+                    direct_tools=self.config.get("intent_router.direct_tools", True)
+                )
+                logger.info("IntentRouter initialized")
+
+            # 9. 创建计划模板缓存（重复指令跳过规划 LLM）
+            if self.config.get("plan_cache.enabled", True):
+                self.plan_cache = PlanCache(
+                    agent_types=list(self.agents),
+                    cache_file=self.config.get("plan_cache.file") or str(DEFAULT_CACHE_FILE),
+                    max_templates=self.config.get("plan_cache.max_templates", 200),
+                    ttl_days=self.config.get("plan_cache.ttl_days", 30),
+                    min_literal_ratio=self.config.get("plan_cache.min_literal_ratio", 0.3),
+                    max_slot_chars=self.config.get("plan_cache.max_slot_chars", 20),
+                    flush_interval=self.config.get("plan_cache.flush_interval", 60)
+                )
+                logger.info(f"PlanCache initialized ({len(self.plan_cache)} templates)")
+
+            # 10. 创建 TTS 客户端（启动阶段已创建时复用）
+            if self.tts_client is None:
+                from src.services.tts_client import tts_client
+                edge_config = self.config.get("tts.edge", {})
+                self.tts_client = tts_client(
+                    voice=edge_config.get("voice", "yunyang"),
+                    rate=edge_config.get("rate", "+0%"),
+                    volume=edge_config.get("volume", "+0%"),
+                    pitch=edge_config.get("pitch", "+0Hz")
+                )
 
             self._initialized = True
             logger.info("System initialized successfully")
@@ -146,17 +220,66 @@ class CommandProcessor:
             logger.error(f"System initialization failed: {e}", exc_info=True)
             return False
 
+    def _create_orchestrator(self, agents, checkpoint_path: Optional[str] = None):
+        """创建任务编排器（按配置启用步骤检查点，checkpoint_path 为空时只保存在内存）"""
+        from src.core.agent.agents.task_orchestrator import TaskOrchestrator
+
+        checkpoints = None
+        if self.config.get("orchestrator.checkpoint.enabled", True):
+            checkpoints = CheckpointStore(
+                path=checkpoint_path,
+                max_age=self.config.get("orchestrator.checkpoint.max_age", 600)
+            )
+        return TaskOrchestrator(
+            agents=agents,
+            max_concurrency=self.config.get("orchestrator.max_concurrency", 4),
+            agent_limit=self.config.get("orchestrator.agent_limit", 1),
+            service_limits=self.config.get("orchestrator.service_limits", {}),
+            checkpoints=checkpoints,
+            step_timeout=self.config.get("orchestrator.step_timeout") or None
+        )
+
+    @property
+    def cancelled(self) -> bool:
+        """本次唤醒是否已被用户取消"""
+        token = self.command_token
+        return token is not None and token.cancelled
+
+    def begin_command(self) -> Deadline:
+        """开始一次唤醒周期，返回其取消令牌（唤醒确认阶段即可被取消）"""
+        self.command_token = Deadline()
+        # 上一条指令的 stop() 只作用到这里，新指令恢复语音播放
+        if self.tts_client is not None and hasattr(self.tts_client, "reset"):
+            self.tts_client.reset()
+        return self.command_token
+
+    def cancel(self, reason: str = "已取消") -> bool:
+        """
+        取消正在处理的指令（可从其他线程调用）
+
+        中断进行中的规划/执行（LLM 流和工具调用所在的 asyncio 任务），并停止正在播放的语音。
+        """
+        token = self.command_token
+        if token is None or token.cancelled:
+            return False
+
+        logger.info(f"Cancelling current command: {reason}")
+        token.cancel(reason)
+        if self.tts_client is not None and hasattr(self.tts_client, "stop"):
+            self.tts_client.stop()
+        return True
+
     def process_command(self, callback: Optional[Callable] = None):
+        """处理语音指令的主流程（状态机驱动，一次唤醒可包含多轮对话）"""
         if callback is None:
             return
         if self.callback is None:
             self.callback = callback
-        """处理语音指令的主流程"""
+
         # 系统初始化检查
-        if not self._initialized:
-            if not self._initialize_system():
-                self._simple_tts_feedback("系统初始化失败，请重启程序")
-                return
+        if not self._ensure_initialized():
+            self._simple_tts_feedback("系统初始化失败，请重启程序")
+            return
 
         # 检查检测器状态（允许已暂停的状态）
         if not self.assistant.detector:
@@ -168,77 +291,43 @@ class CommandProcessor:
             logger.warning("Detector not active, cannot process command")
             return
 
-        try:
-            # 标记正在处理
-            self.assistant.is_processing = True
-
-            # 只在检测器还在运行时才暂停（避免重复暂停）
-            if self.assistant.detector._is_running and not self.assistant.detector._is_paused:
-                logger.debug("Pausing detector in process_command...")
-                self.assistant.detector.pause()
-                time.sleep(0.2)  # 等待检测器完全停止
-
-            # 1. 录音
-            audio_data = self.audio_handler.record_audio()
-            if audio_data is None:
-                logger.warning("录音被取消或时长不足")
-
-                # 在对话中，检查重试次数
-                if self.conversation_manager.state["active"]:
-                    retry_count = self.conversation_manager.state.get("empty_audio_retries", 0)
-
-                    if retry_count >= 2:  # 最多重试2次
-                        logger.warning("连续录音失败，退出对话")
-                        self._simple_tts_feedback("抱歉，没有听到您的声音，请重新唤醒我")
-                        self.conversation_manager.reset()
-                        return
-
-                    # 增加重试计数
-                    self.conversation_manager.state["empty_audio_retries"] = retry_count + 1
-                    self._simple_tts_feedback("没有听到声音，请再说一次")
-                    time.sleep(0.5)
-                    return self.process_command(self.callback)  # 递归重试
-                return
-
-            # 成功录音，清空重试计数
-            if self.conversation_manager.state["active"]:
-                self.conversation_manager.state["empty_audio_retries"] = 0
-
-            # 2. 语音识别
-            text = self.audio_handler.transcribe_audio(audio_data)
-            if not text:
-                # 识别为空
-                if self.conversation_manager.state["active"]:
-                    retry_count = self.conversation_manager.state.get("empty_text_retries", 0)
-
-                    if retry_count >= 2:
-                        logger.warning("连续识别失败，退出对话")
-                        self._simple_tts_feedback("抱歉，无法识别您的语音，请重新唤醒我")
-                        self.conversation_manager.reset()
-                        return
+        # 标记正在处理
+        self.assistant.is_processing = True
 
-                    self.conversation_manager.state["empty_text_retries"] = retry_count + 1
-                    self._simple_tts_feedback("没有听清楚，请再说一次")
-                    time.sleep(0.5)
-                    return self.process_command(self.callback)
-                return
+        # 只在检测器还在运行时才暂停（pause 等待检测线程关闭音频流后返回）
+        if self.assistant.detector._is_running and not self.assistant.detector._is_paused:
+            logger.debug("Pausing detector in process_command...")
+            self.assistant.detector.pause()
 
-            if self.callback is not None:
-                self.callback(f"当前输入: {text}")
+        if self.command_token is None:
+            self.begin_command()
 
-            logger.info(f"Recognized text: {text}")
+        machine = InteractionStateMachine()
+        self.state_machine = machine
+        machine.dispatch(InteractionEvent.WAKE)
 
-            # 成功识别，清空计数
-            if self.conversation_manager.state["active"]:
-                self.conversation_manager.state["empty_text_retries"] = 0
+        handlers = {
+            InteractionState.RECORD: self._on_record,
+            InteractionState.ASR: self._on_asr,
+            InteractionState.PLAN: self._on_plan,
+            InteractionState.EXECUTE: self._on_execute,
+            InteractionState.RESPOND: self._on_respond,
+            InteractionState.FOLLOW_UP: self._on_follow_up,
+        }
+        turn: Dict[str, Any] = {}
 
-            # 3. 处理查询（规划和执行都在这里面完成）
-            if self.conversation_manager.state["active"]:
-                self._handle_follow_up_input(text)
-            else:
-                self._handle_new_query(text)
+        try:
+            with tracer.span("process_command"):
+                while not machine.finished:
+                    self._listen_for_barge_in(machine.state)
+                    with tracer.span(machine.state.value, turn=machine.turn):
+                        event = handlers[machine.state](turn)
 
-            logger.info("Processing completed")
+                    if self.cancelled and event != InteractionEvent.CANCEL:
+                        self.conversation_manager.reset()
+                        machine.dispatch(InteractionEvent.CANCEL, reason=self.command_token.cancel_reason)
+                        continue
+                    machine.dispatch(event)
 
         except Exception as e:
             logger.error(f"Processing failed: {e}")
@@ -246,45 +335,259 @@ class CommandProcessor:
             traceback.print_exc()
             self._simple_tts_feedback("抱歉，处理过程中遇到了错误")
             self.conversation_manager.reset()
+            machine.dispatch(InteractionEvent.ERROR, reason=str(e))
 
         finally:
+            self._await_processing_prompt()
+            self.command_token = None
             self.assistant.is_processing = False
 
-            # 判断是否需要继续对话
-            if self.conversation_manager.state["active"]:
-                # 检查对话总重试次数
-                if self.conversation_manager.max_retries_reached():
-                    logger.warning("达到最大重试次数，退出对话")
-                    self._simple_tts_feedback("对话次数过多，请重新唤醒我")
-                    self.conversation_manager.reset()
-                else:
-                    # 继续对话
-                    logger.info("Conversation active, continuing to listen...")
-                    time.sleep(0.5)
-                    self.process_command(self.callback)
-            else:
-                # 对话结束，恢复唤醒词检测
-                time.sleep(0.3)
+            # 对话结束，恢复唤醒词检测（播报期间可能已为打断而恢复，此时不再重建音频流）
+            if self.assistant.detector._is_paused:
                 logger.info("Resuming wake word detection...")
                 self.assistant.detector.resume()
-                logger.info("Listening for wake words...\n")
+            logger.info("Listening for wake words...\n")
+
+    def _listen_for_barge_in(self, state: InteractionState):
+        """规划、执行和播报期间恢复唤醒词检测，用户可重新唤醒打断；录音时让出麦克风"""
+        if not self.config.get("cancel.barge_in"):
+            return
+
+        detector = self.assistant.detector
+        if state == InteractionState.RECORD and not detector._is_paused:
+            detector.pause()
+        elif state == InteractionState.PLAN and detector._is_paused:
+            detector.resume()
+
+    def _is_cancel_phrase(self, text: str) -> bool:
+        """识别结果是否为取消指令（如"取消"、"算了"）"""
+        phrases = self.config.get("cancel.phrases") or []
+        normalized = text.strip().strip("。！!，,. ")
+        return normalized in phrases
+
+    def _on_record(self, turn: Dict[str, Any]) -> InteractionEvent:
+        """RECORD 状态：录音"""
+        turn.clear()
+        audio_data = self.audio_handler.record_audio()
+
+        if audio_data is None:
+            logger.warning("录音被取消或时长不足")
+            return self._retry_or_end(
+                "empty_audio_retries",
+                retry_message="没有听到声音，请再说一次",
+                give_up_message="抱歉，没有听到您的声音，请重新唤醒我"
+            )
+
+        # 成功录音，清空重试计数
+        if self.conversation_manager.state["active"]:
+            self.conversation_manager.state["empty_audio_retries"] = 0
+
+        turn["audio"] = audio_data
+        return InteractionEvent.AUDIO_READY
+
+    def _on_asr(self, turn: Dict[str, Any]) -> InteractionEvent:
+        """ASR 状态：语音识别"""
+        text = self.audio_handler.transcribe_audio(turn.pop("audio"))
+
+        if not text:
+            return self._retry_or_end(
+                "empty_text_retries",
+                retry_message="没有听清楚，请再说一次",
+                give_up_message="抱歉，无法识别您的语音，请重新唤醒我"
+            )
+
+        if self.callback is not None:
+            self.callback(f"当前输入: {text}")
+
+        logger.info(f"Recognized text: {text}")
+
+        if self._is_cancel_phrase(text):
+            logger.info("Cancel phrase recognized, leaving conversation")
+            self.conversation_manager.reset()
+            self._simple_tts_feedback("好的，已取消")
+            return InteractionEvent.CANCEL
+
+        # 成功识别，清空计数
+        if self.conversation_manager.state["active"]:
+            self.conversation_manager.state["empty_text_retries"] = 0
+
+        turn["text"] = text
+        return InteractionEvent.TEXT_READY
+
+    def _on_plan(self, turn: Dict[str, Any]) -> InteractionEvent:
+        """PLAN 状态：准备查询并生成执行计划"""
+        follow_up = self.conversation_manager.state["active"]
+        prepared = self._prepare_query(turn["text"], follow_up)
+        if prepared is None:
+            return InteractionEvent.END
+
+        query, conversation_history = prepared
+        turn["follow_up"] = follow_up
+        turn["query"] = query
+        turn["plan"] = self._plan_query(query, conversation_history)
+        return InteractionEvent.PLANNED
+
+    def _on_execute(self, turn: Dict[str, Any]) -> InteractionEvent:
+        """EXECUTE 状态：执行计划"""
+        turn["result"] = self._execute_plan(turn["plan"])
+        return InteractionEvent.EXECUTED
+
+    def _on_respond(self, turn: Dict[str, Any]) -> InteractionEvent:
+        """RESPOND 状态：播报结果或进入澄清对话"""
+        self._respond(turn["query"], turn["plan"], turn["result"], turn["follow_up"])
+        logger.info("Processing completed")
+
+        if self.conversation_manager.state["active"]:
+            return InteractionEvent.CONTINUE
+        return InteractionEvent.END
+
+    def _on_follow_up(self, turn: Dict[str, Any]) -> InteractionEvent:
+        """FOLLOW_UP 状态：检查对话重试次数，决定是否继续录音"""
+        if self.conversation_manager.max_retries_reached():
+            logger.warning("达到最大重试次数，退出对话")
+            self._simple_tts_feedback("对话次数过多，请重新唤醒我")
+            self.conversation_manager.reset()
+            return InteractionEvent.END
+
+        logger.info("Conversation active, continuing to listen...")
+        return InteractionEvent.LISTEN_AGAIN
+
+    def _retry_or_end(
+            self,
+            counter_key: str,
+            retry_message: str,
+            give_up_message: str
+    ) -> InteractionEvent:
+        """录音或识别为空时：对话中最多重试 2 次，否则结束"""
+        if not self.conversation_manager.state["active"]:
+            return InteractionEvent.END
+
+        retry_count = self.conversation_manager.state.get(counter_key, 0)
+        if retry_count >= 2:
+            logger.warning(f"{counter_key} exhausted, leaving conversation")
+            self._simple_tts_feedback(give_up_message)
+            self.conversation_manager.reset()
+            return InteractionEvent.END
+
+        self.conversation_manager.state[counter_key] = retry_count + 1
+        self._simple_tts_feedback(retry_message)
+        return InteractionEvent.RETRY
 
     def _handle_new_query(self, text: str):
         """处理新的用户查询"""
-        self.conversation_manager.start_new_query(text)
-        self._play_processing_prompt()
+        query, conversation_history = self._prepare_query(text, follow_up=False)
+        execution_plan = self._plan_query(query, conversation_history)
+        execution_result = self._execute_plan(execution_plan)
+        self._respond(query, execution_plan, execution_result, follow_up=False)
 
-        execution_plan = self._understand_and_plan(text=text, conversation_history=None)
+    def _handle_follow_up_input(self, text: str):
+        """处理用户的补充输入"""
+        prepared = self._prepare_query(text, follow_up=True)
+        if prepared is None:
+            return
+
+        query, conversation_history = prepared
+        execution_plan = self._plan_query(query, conversation_history)
         execution_result = self._execute_plan(execution_plan)
+        self._respond(query, execution_plan, execution_result, follow_up=True)
 
-        if self._is_execution_successful(execution_result):
-            self._finish_execution(text, execution_plan, execution_result)
-        else:
-            if self._should_retry_with_conversation(execution_result, text):
-                self._start_conversation(execution_plan, execution_result)
-                return
+    def _prepare_query(
+            self,
+            text: str,
+            follow_up: bool
+    ) -> Optional[Tuple[str, Optional[List]]]:
+        """
+        记录用户输入并返回 (规划用查询, 对话历史)
+
+        补充输入达到最大重试次数时返回 None
+        """
+        if not follow_up:
+            self.conversation_manager.start_new_query(text)
+            # 检查点只在同一次查询的澄清对话内复用
+            self._clear_checkpoints()
+            return text, None
+
+        logger.info(f"Follow-up input: {text}")
+        self.conversation_manager.add_user_input(text)
+
+        if self.conversation_manager.max_retries_reached():
+            logger.warning("Max retries reached")
+            self._simple_tts_feedback("抱歉，尝试次数过多，请重新开始")
+            self.conversation_manager.reset()
+            return None
+
+        # 获取完整对话历史，包括之前的用户输入和系统响应
+        conversation_history = self.conversation_manager.get_conversation_history()
+        latest_input = self.conversation_manager.get_latest_user_input()
+
+        logger.info(
+            f"Conversation history: {len(conversation_history)} messages"
+        )
+        return latest_input, conversation_history + self._completed_steps_hint()
+
+    def _checkpoint_store(self):
+        """编排器的步骤检查点（未启用时为 None）"""
+        store = getattr(self.orchestrator, "checkpoints", None)
+        return store if isinstance(store, CheckpointStore) else None
+
+    def _clear_checkpoints(self):
+        store = self._checkpoint_store()
+        if store is not None:
+            store.clear()
+
+    def _completed_steps_hint(self) -> List:
+        """提示 Planner 沿用已成功步骤的描述，使这些步骤能从检查点复用"""
+        store = self._checkpoint_store()
+        if store is None or not len(store):
+            return []
+
+        from langchain_core.messages import SystemMessage
+        lines = [f"- [{c.agent_type}] {c.description}" for c in store.all()]
+        return [SystemMessage(content=(
+            "以下步骤已成功执行，若新计划仍需要，请保持 assigned_agent 和 description 完全一致"
+            "（系统会直接复用结果，不再重复执行）：\n" + "\n".join(lines)
+        ))]
+
+    def _plan_query(
+            self,
+            query: str,
+            conversation_history: Optional[List]
+    ) -> ExecutionPlan:
+        """启动处理中提示（并行播放）并生成执行计划"""
+        # 每条指令（含澄清后的补充输入）从规划开始计时，覆盖规划和执行；取消本次唤醒时一并取消
+        self.deadline = Deadline(self.config.get("agent.command_timeout") or None, parent=self.command_token)
+        self._play_processing_prompt()
+        return self._understand_and_plan(
+            text=query,
+            conversation_history=conversation_history
+        )
+
+    def _respond(
+            self,
+            query: str,
+            execution_plan: ExecutionPlan,
+            execution_result: Dict[str, Any],
+            follow_up: bool
+    ):
+        """根据执行结果播报总结，或开始/继续澄清对话"""
+        interrupted = self._interruption(execution_plan, execution_result)
+        if interrupted:
+            self._finish_interrupted(query, execution_plan, execution_result, interrupted)
+            return
+
+        successful = self._is_execution_successful(execution_result)
+        if not follow_up:
+            self._update_plan_cache(query, execution_plan, successful)
+
+        if successful:
+            self._finish_execution(query, execution_plan, execution_result)
+        elif self._should_retry_with_conversation(execution_result, query):
+            if follow_up:
+                self._continue_conversation(execution_plan, execution_result)
             else:
-                self._finish_execution_with_error(text, execution_plan, execution_result)
+                self._start_conversation(execution_plan, execution_result)
+        else:
+            self._finish_execution_with_error(query, execution_plan, execution_result)
 
     def _start_conversation(
             self,
@@ -295,6 +598,7 @@ class CommandProcessor:
         logger.info("Starting conversation")
 
         self.conversation_manager.activate_conversation(execution_plan)
+        self._remember_failure(execution_plan, execution_result)
 
         original_query = self.conversation_manager.state["original_query"]
         question = self.error_handler.generate_clarification_question(
@@ -322,6 +626,7 @@ class CommandProcessor:
     ):
         """继续多轮对话"""
         logger.info("Continuing conversation")
+        self._remember_failure(execution_plan, execution_result)
 
         original_query = self.conversation_manager.state["original_query"]
         question = self.error_handler.generate_clarification_question(
@@ -344,57 +649,54 @@ class CommandProcessor:
         """完成执行并输出结果"""
         logger.info("Execution finished")
 
-        final_summary = self._generate_final_summary(
-            original_query=query,
-            execution_plan=execution_plan,
-            execution_result=execution_result
-        )
-
+        prefix = ""
         if self.conversation_manager.state["active"]:
             retry_count = self.conversation_manager.state["retry_count"]
-            final_summary = f"好的，已为您完成。{final_summary}"
+            prefix = "好的，已为您完成。"
             logger.info(f"Completed after {retry_count} retries")
 
-        self._text_to_speech(final_summary)
+        if not self._stream_final_summary(query, execution_result, prefix):
+            final_summary = self._generate_final_summary(
+                original_query=query,
+                execution_plan=execution_plan,
+                execution_result=execution_result
+            )
+            self._text_to_speech(prefix + final_summary)
         self.conversation_manager.reset()
 
-    def _handle_follow_up_input(self, text: str):
-        """处理用户的补充输入"""
-        logger.info(f"Follow-up input: {text}")
-
-        self.conversation_manager.add_user_input(text)
-
-        if self.conversation_manager.max_retries_reached():
-            logger.warning("Max retries reached")
-            self._simple_tts_feedback("抱歉，尝试次数过多，请重新开始")
+    def _finish_interrupted(
+            self,
+            query: str,
+            execution_plan: ExecutionPlan,
+            execution_result: Dict[str, Any],
+            interrupted: str
+    ):
+        """指令超时或被取消：超时播报已完成的部分结果，取消则直接结束，都不进入澄清对话"""
+        logger.info(f"Execution interrupted: {interrupted}")
+        if interrupted == "cancelled":
             self.conversation_manager.reset()
             return
 
-        self._play_processing_prompt()
-
-        # 获取完整对话历史，包括之前的用户输入和系统响应
-        conversation_history = self.conversation_manager.get_conversation_history()
-        latest_input = self.conversation_manager.get_latest_user_input()
-
-        logger.info(
-            f"Conversation history: {len(conversation_history)} messages"
-        )
-
-        # 使用对话历史调用 Planner
-        execution_plan = self._understand_and_plan(
-            text=latest_input,  # 当前输入
-            conversation_history=conversation_history
+        prefix = "处理超时了。"
+        orchestrator_result = execution_result.get("orchestrator_result") or {}
+        has_partial = any(
+            result.get("status") == "success" or result.get("tool_calls")
+            for result in orchestrator_result.get("results", [])
         )
 
-        execution_result = self._execute_plan(execution_plan)
-
-        if self._is_execution_successful(execution_result):
-            self._finish_execution(latest_input, execution_plan, execution_result)
+        if has_partial:
+            # 由总结器报告已完成的步骤和工具调用
+            if not self._stream_final_summary(query, execution_result, prefix):
+                self._text_to_speech(prefix + self._generate_final_summary(query, execution_plan, execution_result))
         else:
-            if self._should_retry_with_conversation(execution_result, latest_input):
-                self._continue_conversation(execution_plan, execution_result)
-            else:
-                self._finish_execution_with_error(latest_input, execution_plan, execution_result)
+            self._text_to_speech(execution_result.get("summary") or f"{prefix}没有完成任何操作，请稍后再试。")
+        self.conversation_manager.reset()
+
+    @staticmethod
+    def _interruption(execution_plan: ExecutionPlan, execution_result: Dict[str, Any]) -> Optional[str]:
+        """规划或执行被中断时返回中断类型（"timeout" 或 "cancelled"）"""
+        orchestrator_result = execution_result.get("orchestrator_result") or {}
+        return execution_plan.metadata.get("interrupted") or orchestrator_result.get("interrupted")
 
     def _understand_and_plan(
             self,
@@ -402,23 +704,54 @@ class CommandProcessor:
             conversation_history: Optional[List] = None
     ) -> ExecutionPlan:
         """理解用户意图并生成执行计划（支持对话历史）"""
-        if not self._initialized:
-            if not self._initialize_system():
-                from uuid import uuid4
-                return ExecutionPlan(
-                    plan_id=str(uuid4()),
-                    tasks=[],
-                    dependencies={},
-                    metadata={"error": "System not initialized", "feasibility": "error"}
-                )
+        with deadline_scope(self.deadline):
+            return self._plan_within_deadline(text, conversation_history)
 
-        try:
-            # 传递对话历史给 Planner
-            execution_plan = self.planner.plan_sync(
-                user_query=text,
-                conversation_history=conversation_history
+    def _plan_within_deadline(
+            self,
+            text: str,
+            conversation_history: Optional[List] = None
+    ) -> ExecutionPlan:
+        """在当前指令的 Deadline 内规划：本地路由 → 计划模板 → 增量修补 → LLM 规划"""
+        if not self._ensure_initialized():
+            from uuid import uuid4
+            return ExecutionPlan(
+                plan_id=str(uuid4()),
+                tasks=[],
+                dependencies={},
+                metadata={"error": "System not initialized", "feasibility": "error"}
             )
 
+        try:
+            # 新指令先尝试本地意图路由（多轮对话需要上下文，交给 LLM）
+            execution_plan = None
+            if self.intent_router and not conversation_history:
+                route = self.intent_router.route(text)
+                if route:
+                    execution_plan = route.to_plan(text)
+
+            # 再尝试已学习的计划模板
+            if execution_plan is None and self.plan_cache and not conversation_history:
+                execution_plan = self.plan_cache.match(text)
+
+            # 澄清对话中只修补失败的步骤
+            if execution_plan is None and conversation_history and \
+                    self.config.get("agent.planner.incremental_replan", True):
+                execution_plan = self._replan(text)
+
+            if execution_plan is None:
+                plan_start = time.time()
+                # 传递对话历史给 Planner
+                if self.config.get("agent.planner.early_dispatch", True):
+                    execution_plan = self._plan_with_early_dispatch(text, conversation_history)
+                else:
+                    execution_plan = self.planner.plan_sync(
+                        user_query=text,
+                        conversation_history=conversation_history
+                    )
+                if self.intent_router:
+                    self.intent_router.record_llm_plan(time.time() - plan_start)
+
             if self.callback is not None:
                 steps = [each.description for each in execution_plan.tasks]
                 plan = "\n".join(steps)
@@ -431,6 +764,21 @@ class CommandProcessor:
             )
             return execution_plan
 
+        except Interrupted as e:
+            logger.warning(f"Planning interrupted: {e}")
+            from uuid import uuid4
+            return ExecutionPlan(
+                plan_id=str(uuid4()),
+                tasks=[],
+                dependencies={},
+                metadata={
+                    "error": str(e),
+                    "original_query": text,
+                    "feasibility": "error",
+                    "interrupted": e.kind
+                }
+            )
+
         except Exception as e:
             logger.error(f"Planning failed: {e}", exc_info=True)
             from uuid import uuid4
@@ -445,12 +793,111 @@ class CommandProcessor:
                 }
             )
 
+    def _remember_failure(self, execution_plan: ExecutionPlan, execution_result: Dict[str, Any]):
+        """记录失败的计划和步骤，供补充输入后增量修补"""
+        orchestrator_result = execution_result.get("orchestrator_result") or {}
+        self.conversation_manager.state["execution_plan"] = execution_plan
+        self.conversation_manager.state["failed_step"] = orchestrator_result.get("failed_step")
+
+    def _replan(self, clarification: str) -> Optional[ExecutionPlan]:
+        """根据用户补充增量修补上一次的计划，无法修补时返回 None（回退到完整规划）"""
+        state = self.conversation_manager.state
+        previous_plan = state.get("execution_plan")
+        failed_step = state.get("failed_step")
+        if not isinstance(previous_plan, ExecutionPlan) or not failed_step:
+            return None
+
+        plan_start = time.time()
+        execution_plan = self.planner.replan_sync(previous_plan, failed_step, clarification)
+        if execution_plan is not None:
+            logger.info(f"Incremental re-planning took {time.time() - plan_start:.2f}s")
+        return execution_plan
+
+    def _plan_with_early_dispatch(
+            self,
+            text: str,
+            conversation_history: Optional[List]
+    ) -> ExecutionPlan:
+        """流式规划：步骤生成完成即交给编排器执行，规划结束后返回完整计划"""
+        steps: "queue.Queue[Optional[Task]]" = queue.Queue()
+        sent: List[str] = []  # 已交给编排器的 task_id
+
+        def step_iter():
+            while (task := steps.get()) is not None:
+                yield self._task_to_step(task)
+
+        def run():
+            try:
+                with deadline_scope(dispatch_deadline):
+                    future.set_result(self.orchestrator.execute_stream(step_iter()))
+            except Exception as e:
+                future.set_exception(e)
+
+        def on_step(task: Task):
+            if not sent:
+                # 在当前上下文中执行，继承指令的 Deadline
+                context = contextvars.copy_context()
+                threading.Thread(target=context.run, args=(run,), name="early-dispatch", daemon=True).start()
+            sent.append(task.task_id)
+            steps.put(task)
+
+        future: Future = Future()
+        # 指令 Deadline 的子令牌：计划被放弃时只取消这次执行
+        dispatch_deadline = Deadline(parent=current_deadline())
+        try:
+            execution_plan = self.planner.plan_sync(
+                user_query=text,
+                conversation_history=conversation_history,
+                on_step=on_step
+            )
+        except BaseException:
+            steps.put(None)
+            if sent:
+                self._stop_dispatched((future, dispatch_deadline), "规划中断")
+            raise
+
+        if sent:
+            # 流式阶段未分发的步骤（如 Agent 无效的步骤及其之后的步骤）补交给同一次执行
+            for task in execution_plan.tasks:
+                if task.task_id not in sent:
+                    steps.put(task)
+            self._dispatched_executions[execution_plan.plan_id] = (future, dispatch_deadline)
+        steps.put(None)
+        return execution_plan
+
+    def _stop_dispatched(self, dispatched: Tuple[Future, Deadline], reason: str):
+        """取消提前分发的执行并等待步骤退出，避免告知用户已取消后仍有步骤在产生副作用"""
+        future, deadline = dispatched
+        deadline.cancel(reason)
+        try:
+            future.result(timeout=self.config.get("cancel.join_timeout", 3.0))
+        except FutureTimeoutError:
+            logger.warning("Early-dispatched execution did not stop in time")
+        except Exception as e:
+            logger.debug(f"Early-dispatched execution stopped: {e}")
+
     def _execute_plan(self, execution_plan: ExecutionPlan) -> Dict[str, Any]:
-        """执行任务计划"""
+        """执行任务计划（受当前指令的 Deadline 约束）"""
+        with deadline_scope(self.deadline):
+            return self._execute_within_deadline(execution_plan)
+
+    def _execute_within_deadline(self, execution_plan: ExecutionPlan) -> Dict[str, Any]:
+        """在当前指令的 Deadline 内执行（或等待提前分发的执行）"""
         logger.info("Executing plan...")
 
         feasibility = execution_plan.metadata.get("feasibility", "unknown")
         reason = execution_plan.metadata.get("reason", "")
+        dispatched = self._dispatched_executions.pop(execution_plan.plan_id, None)
+
+        if dispatched is not None and (execution_plan.metadata.get("interrupted") or feasibility != "feasible"):
+            self._stop_dispatched(dispatched, "计划已放弃")
+
+        if execution_plan.metadata.get("interrupted"):
+            return {
+                "orchestrator_result": None,
+                "summary": "抱歉，处理超时了，请稍后再试。"
+                if execution_plan.metadata["interrupted"] == "timeout" else "已取消。"
+            }
 
         if feasibility != "feasible":
             return {
@@ -464,9 +911,28 @@ class CommandProcessor:
                 "summary": "已收到您的指令，但暂时无法生成执行步骤。"
             }
 
+        # 路由命中的直接工具调用，失败时回退到 Worker Agent
+        direct = execution_plan.metadata.get("direct_tool")
+        if direct and self.intent_router:
+            orchestrator_result = self.intent_router.execute_direct(execution_plan)
+            if orchestrator_result:
+                summary = None
+                if direct.get("speak_output"):
+                    summary = orchestrator_result["results"][0]["output"]
+                self._log_router_stats()
+                return {
+                    "orchestrator_result": orchestrator_result,
+                    "summary": summary
+                }
+
         try:
-            plan_dict = self._convert_plan_to_dict(execution_plan)
-            orchestrator_result = self.orchestrator.execute(plan_dict)
+            if dispatched is not None:
+                # 规划阶段已开始执行，等待完成
+                orchestrator_result = dispatched[0].result()
+            else:
+                plan_dict = self._convert_plan_to_dict(execution_plan)
+                orchestrator_result = self.orchestrator.execute(plan_dict)
+            self._log_router_stats()
 
             return {
                 "orchestrator_result": orchestrator_result,
@@ -501,10 +967,11 @@ class CommandProcessor:
                 logger.warning("Summarizer not initialized, using simple summary")
                 return self._create_simple_summary(orchestrator_result)
 
-            summary = self.summarizer.summarize_sync(
-                original_query=original_query,
-                execution_summary=orchestrator_result
-            )
+            with tracer.span("summary.llm"):
+                summary = self.summarizer.summarize_sync(
+                    original_query=original_query,
+                    execution_summary=orchestrator_result
+                )
 
             logger.info(f"Summary generated: {summary[:100]}...")
             if self.callback is not None:
@@ -515,6 +982,62 @@ class CommandProcessor:
             logger.error(f"Summary generation failed: {e}", exc_info=True)
             return self._create_simple_summary(orchestrator_result)
 
+    def _stream_final_summary(self, original_query: str, execution_result: Dict[str, Any], prefix: str = "") -> bool:
+        """
+        边生成边播报总结：LLM 每生成完一句即送入 TTS，首句在生成结束前就开始播放
+
+        未启用（tts.stream_summary）、已有现成总结或没有总结器时返回 False，由调用方整段生成后播报。
+        """
+        stream_summary = self.config.get("tts.stream_summary", True)
+        orchestrator_result = execution_result.get("orchestrator_result")
+        if not (isinstance(stream_summary, bool) and stream_summary) or execution_result.get("summary") \
+                or not orchestrator_result or not self.summarizer:
+            return False
+
+        logger.info("Streaming user-friendly summary...")
+        stream = self.summarizer.stream_sentences(original_query, orchestrator_result)
+        try:
+            with tracer.span("summary.stream"):
+                self._speak_stream(itertools.chain([prefix] if prefix else [], stream))
+        finally:
+            stream.close()
+
+        summary = stream.text
+        if stream.first_sentence_latency is not None:
+            logger.info(f"Summary streamed: first sentence after {stream.first_sentence_latency:.2f}s: {summary[:100]}...")
+            if self.callback is not None:
+                self.callback(f"结果:\n{summary[:100]}")
+        return True
+
+    def _update_plan_cache(self, query: str, execution_plan: ExecutionPlan, successful: bool):
+        """成功执行的 LLM 计划学习为模板；按模板执行失败时使模板失效"""
+        if not self.plan_cache:
+            return
+
+        cached = execution_plan.metadata.get("plan_cache")
+        try:
+            if cached and not successful:
+                logger.info(f"Plan template {cached['template_id']} failed, invalidating")
+                self.plan_cache.invalidate(cached["template_id"])
+            elif successful and not cached and "router" not in execution_plan.metadata:
+                self.plan_cache.learn(query, execution_plan)
+            else:
+                self.plan_cache.flush()
+        except Exception as e:
+            logger.warning(f"Plan cache update failed: {e}")
+
+    def _log_router_stats(self):
+        """打印意图路由命中率和估算节省的时间"""
+        if not self.intent_router:
+            return
+
+        stats = self.intent_router.stats()
+        logger.info(
+            f"Intent router: hit rate {stats['hit_rate']:.0%} ({stats['hits']}/{stats['total']}, "
+            f"{stats['direct']} direct), avg route {stats['avg_route_ms']:.1f}ms, "
+            f"saved ~{stats['saved_seconds']:.1f}s vs LLM planning"
+        )
+
     @staticmethod
     def _handle_infeasible_plan(feasibility: str, reason: str) -> str:
         """处理不可行的计划"""
@@ -530,13 +1053,10 @@ class CommandProcessor:
         """将 ExecutionPlan 转换为 TaskOrchestrator 需要的字典格式"""
         steps = []
         for task in execution_plan.tasks:
-            steps.append({
-                "task_id": task.task_id,
-                "description": task.description,
-                "assigned_agent": task.assigned_agent,
-                "expected_result": task.metadata.get("expected_result"),
-                "step_number": task.metadata.get("step_number")
-            })
+            step = CommandProcessor._task_to_step(task)
+            if task.task_id in execution_plan.dependencies:
+                step["depends_on"] = execution_plan.dependencies[task.task_id]
+            steps.append(step)
 
         return {
             "steps": steps,
@@ -544,6 +1064,18 @@ class CommandProcessor:
             "metadata": execution_plan.metadata
         }
 
+    @staticmethod
+    def _task_to_step(task: Task) -> dict:
+        """将 Task 转换为 TaskOrchestrator 的步骤格式"""
+        return {
+            "task_id": task.task_id,
+            "description": task.description,
+            "assigned_agent": task.assigned_agent,
+            "expected_result": task.metadata.get("expected_result"),
+            "step_number": task.metadata.get("step_number"),
+            "depends_on": task.metadata.get("depends_on")  # None 表示依赖上一步
+        }
+
     @staticmethod
     def _create_simple_summary(orchestrator_result: Dict[str, Any]) -> str:
         """创建简单的总结（降级方案）"""
@@ -598,10 +1130,21 @@ class CommandProcessor:
             traceback.print_exc()
 
     def _play_processing_prompt(self):
-        """播放处理中提示语音"""
+        """播放处理中提示语音（默认在后台与规划/执行并行）"""
         import random
         prompt = random.choice(self.voice_prompts["processing"])
-        logger.info(f"Processing prompt: {prompt}")
+
+        if not self.config.get("processing_prompt.overlap", True):
+            logger.info(f"Processing prompt: {prompt}")
+            self._speak_processing_prompt(prompt)
+            return
+
+        self.processing_prompt.start(prompt)
+
+    def _speak_processing_prompt(self, prompt: str):
+        """合成并播放处理中提示"""
+        if self.cancelled:
+            return
         try:
             if self.tts_client:
                 self.tts_client.speak(prompt)
@@ -610,8 +1153,33 @@ class CommandProcessor:
         except Exception as e:
             logger.error(f"Processing prompt TTS failed: {e}")
 
+    def _await_processing_prompt(self):
+        """等待处理中提示结束（未开始则取消），避免与后续语音重叠"""
+        if not self.processing_prompt.active:
+            return
+
+        stats = self.processing_prompt.finish()
+
+        if stats["skipped"]:
+            message = f"流水线 {stats['pipeline_time']:.2f}s 内完成，跳过提示语"
+            if stats["overlap_saved"] is not None:
+                message += f"（节省约 {stats['overlap_saved']:.2f}s）"
+        else:
+            message = (
+                f"提示语与处理并行，节省 {stats['overlap_saved']:.2f}s"
+                f"（提示语 {stats['prompt_time']:.2f}s，流水线 {stats['pipeline_time']:.2f}s）"
+            )
+
+        logger.info(message)
+        if self.callback is not None:
+            self.callback(message)
+
     def _text_to_speech(self, text: str):
-        """文字转语音并播放"""
+        """文字转语音并播放（已取消时不再播报）"""
+        self._await_processing_prompt()
+        if self.cancelled:
+            return
+
         if not text or not text.strip():
             logger.warning("Empty text for TTS")
             return
@@ -619,21 +1187,8 @@ class CommandProcessor:
         logger.info("Providing voice feedback...")
         logger.info(f"Response: {text}")
 
-        if not self.tts_client:
-            logger.warning("TTS client not initialized")
-            try:
-                edge_config = self.config.get("tts.edge", {})
-                self.tts_client = tts_client(
-                    voice=edge_config.get("voice", "yunyang"),
-                    rate=edge_config.get("rate", "+0%"),
-                    volume=edge_config.get("volume", "+0%"),
-                    pitch=edge_config.get("pitch", "+0Hz")
-                )
-                logger.info("TTS client created on-demand")
-            except Exception as e:
-                logger.error(f"Failed to create TTS client: {e}")
-                logger.info("Fallback to text output only")
-                return
+        if not self._ensure_tts_client():
+            return
 
         try:
             logger.info("Starting speech playback...")
@@ -643,8 +1198,58 @@ class CommandProcessor:
             logger.error(f"TTS playback failed: {e}")
             logger.info("Fallback to text output")
 
+    def _speak_stream(self, sentences: Iterable[str]):
+        """逐句播报仍在生成中的文本（已取消时停止取句）"""
+        self._await_processing_prompt()
+        if self.cancelled:
+            return
+
+        def until_cancelled():
+            for sentence in sentences:
+                if self.cancelled:
+                    return
+                logger.info(f"Response sentence: {sentence}")
+                yield sentence
+
+        if not self._ensure_tts_client():
+            for _ in until_cancelled():
+                pass
+            return
+
+        try:
+            logger.info("Starting streaming speech playback...")
+            self.tts_client.speak_stream(until_cancelled())
+        except Exception as e:
+            logger.error(f"Streaming TTS playback failed: {e}")
+
+    def _ensure_tts_client(self) -> bool:
+        """按需创建 TTS 客户端，失败时只输出文字"""
+        if self.tts_client:
+            return True
+
+        logger.warning("TTS client not initialized")
+        try:
+            from src.services.tts_client import tts_client
+            edge_config = self.config.get("tts.edge", {})
+            self.tts_client = tts_client(
+                voice=edge_config.get("voice", "yunyang"),
+                rate=edge_config.get("rate", "+0%"),
+                volume=edge_config.get("volume", "+0%"),
+                pitch=edge_config.get("pitch", "+0Hz")
+            )
+            logger.info("TTS client created on-demand")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to create TTS client: {e}")
+            logger.info("Fallback to text output only")
+            return False
+
     def _simple_tts_feedback(self, message: str):
         """简单的TTS反馈（用于错误情况）"""
+        self._await_processing_prompt()
+        if self.cancelled:
+            return
+
         try:
             if self.tts_client:
                 self.tts_client.speak(message)
@@ -8,9 +8,24 @@
 from .audio_handler import AudioHandler
 from .conversation_manager import ConversationManager
 from .error_handler import ErrorHandler, ErrorType
+from .intent_router import IntentRoute, IntentRouter
+from .interaction_state import InteractionEvent, InteractionState, InteractionStateMachine
+from .pipeline_worker import PipelineJob, PipelineWorker
+from .plan_cache import PlanCache, PlanTemplate
+from .processing_prompt import ProcessingPrompt
 
 __all__ = [
     "AudioHandler",
     "ConversationManager",
     "ErrorHandler",
+    "IntentRoute",
+    "IntentRouter",
+    "InteractionEvent",
+    "InteractionState",
+    "InteractionStateMachine",
+    "PipelineJob",
+    "PipelineWorker",
+    "PlanCache",
+    "PlanTemplate",
+    "ProcessingPrompt",
 ]
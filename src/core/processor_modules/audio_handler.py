@@ -13,6 +13,7 @@ from typing import TYPE_CHECKING
 import numpy as np
 
 from src.utils.logger import logger
+from src.utils.tracing import tracer
 
 if TYPE_CHECKING:
     from src.core.assistant import VoiceAssistant
@@ -36,14 +37,20 @@ class AudioHandler:
         speech_threshold = self.config.get("recording.dynamic.speech_threshold", 800.0)
         min_speech_chunks = self.config.get("recording.dynamic.min_speech_chunks", 5)
 
-        audio_data = self.assistant.recorder.record_with_silence_detection(
-            min_duration=min_duration,
-            max_duration=max_duration,
-            silence_threshold=silence_threshold,
-            silence_duration=silence_duration,
-            speech_threshold=speech_threshold,
-            min_speech_chunks=min_speech_chunks
-        )
+        with tracer.span("recording"):
+            audio_data = self.assistant.recorder.record_with_silence_detection(
+                min_duration=min_duration,
+                max_duration=max_duration,
+                silence_threshold=silence_threshold,
+                silence_duration=silence_duration,
+                speech_threshold=speech_threshold,
+                min_speech_chunks=min_speech_chunks
+            )
+
+            # 补记 VAD 端点等待（最后一帧语音到停止录音）
+            endpoint = getattr(self.assistant.recorder, "last_endpoint", None)
+            if isinstance(endpoint, tuple):
+                tracer.record("vad_endpoint", start=endpoint[0], end=endpoint[1])
 
         return audio_data
 
@@ -51,6 +58,16 @@ class AudioHandler:
         """语音识别"""
         logger.info("Converting speech to text...")
 
+        # 模型可能仍在后台加载
+        if not self.assistant.wait_until_ready("asr"):
+            logger.error("ASR client is not available")
+            return ""
+
+        with tracer.span("asr", provider=self.assistant.asr_provider):
+            return self._transcribe(audio_data)
+
+    def _transcribe(self, audio_data: bytes) -> str:
+        """执行识别（不含追踪）"""
         # 检查音频能量
         if not self.has_valid_speech(audio_data):
             logger.warning("Audio contains only silence or noise, skipping transcription")
@@ -23,6 +23,7 @@ class ConversationManager:
             "max_retries": 3,
             "original_query": None,
             "execution_plan": None,
+            "failed_step": None,
             "suggestion": None,
             "messages": [],
             "conversation_start_time": None,
@@ -40,6 +41,7 @@ class ConversationManager:
             "max_retries": 3,
             "original_query": None,
             "execution_plan": None,
+            "failed_step": None,
             "suggestion": None,
             "messages": [],
             "conversation_start_time": None,
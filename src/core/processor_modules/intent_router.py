@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : intent_router.py
+"""
+
+import math
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from src.core.models import ExecutionPlan, Task, TaskStatus
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+
+
+class IntentRoute(BaseModel):
+    """路由结果"""
+    intent: str
+    agent_type: str
+    confidence: float
+    source: str  # grammar / classifier
+    tool_name: Optional[str] = None  # 非空时直接调用工具，跳过 Worker Agent
+    tool_args: Dict[str, Any] = Field(default_factory=dict)
+    speak_output: bool = False  # 直接播报工具输出，跳过总结 LLM
+
+    def to_plan(self, query: str) -> ExecutionPlan:
+        """转换为单步执行计划"""
+        task = Task(
+            task_id=str(uuid.uuid4()),
+            description=query,
+            assigned_agent=self.agent_type,
+            metadata={"step_number": 1, "expected_result": None},
+            status=TaskStatus.PENDING
+        )
+
+        metadata = {
+            "feasibility": "feasible",
+            "reason": "",
+            "original_task": query,
+            "total_steps": 1,
+            "router": {"intent": self.intent, "source": self.source, "confidence": round(self.confidence, 3)}
+        }
+        if self.tool_name:
+            metadata["direct_tool"] = {
+                "name": self.tool_name,
+                "args": self.tool_args,
+                "speak_output": self.speak_output
+            }
+
+        return ExecutionPlan(plan_id=str(uuid.uuid4()), tasks=[task], dependencies={}, metadata=metadata)
+
+
+class PatternRule:
+    """语法规则：正则匹配 + 按 Agent 类型选择工具和参数"""
+
+    def __init__(
+            self,
+            intent: str,
+            pattern: str,
+            tools: Dict[str, str],
+            build_args: Callable[[Dict[str, str], str], Optional[Dict[str, Any]]],
+            speak_output: bool = False
+    ):
+        """
+        Args:
+            intent: 意图名
+            pattern: 正则（命名分组作为槽位）
+            tools: Agent 类型 -> 工具名（按顺序选择第一个可用的）
+            build_args: (槽位, Agent 类型) -> 工具参数；返回 None 表示只路由到 Agent、不直接调用工具，
+                返回 REJECT 表示槽位不合理、规则不匹配
+            speak_output: 直接播报工具输出
+        """
+        self.intent = intent
+        self.regex = re.compile(pattern)
+        self.tools = tools
+        self.build_args = build_args
+        self.speak_output = speak_output
+
+
+# build_args 返回该值表示规则不匹配
+REJECT: Any = object()
+
+_MUSIC_ACTIONS = {
+    "播放": "play", "暂停": "pause", "停止": "stop", "继续": "play", "恢复": "play",
+    "下一首": "next", "切歌": "next", "上一首": "previous"
+}
+# Windows 播放器不支持切歌
+_PYGAME_ACTIONS = {"pause", "stop", "play"}
+_GENERIC_SONGS = {"音乐", "歌", "歌曲", "一首歌", "点音乐", "首歌"}
+_TIME_WORDS = {"今天", "明天", "后天", "最近", "现在", "这几天", "未来几天", "今日", "明日"}
+
+
+def _music_control_args(slots: Dict[str, str], agent_type: str) -> Optional[Dict[str, Any]]:
+    action = _MUSIC_ACTIONS[slots["verb"]]
+    if agent_type == "windows_music" and action not in _PYGAME_ACTIONS:
+        return None
+    return {"action": action}
+
+
+def _music_play_args(slots: Dict[str, str], agent_type: str) -> Optional[Dict[str, Any]]:
+    song = slots["song_name"].strip()
+    if song in _GENERIC_SONGS:
+        return REJECT
+    return {"song_name": song}
+
+
+def _weather_args(slots: Dict[str, str], agent_type: str) -> Optional[Dict[str, Any]]:
+    if slots["city"] in _TIME_WORDS:
+        return REJECT
+    return {"city": slots["city"]}
+
+
+def _app_control_args(slots: Dict[str, str], agent_type: str) -> Optional[Dict[str, Any]]:
+    from src.core.tools.system.app_control import AppControlTool
+
+    # 只处理已知应用，其余（如"打开文件 a.txt"）交给其他规则或 LLM
+    app_name = slots["app_name"].strip()
+    if app_name.lower() not in AppControlTool._get_app_map():
+        return REJECT
+    action = "close" if slots["verb"] in ("关闭", "退出") else "open"
+    return {"app_name": app_name, "action": action}
+
+
+DEFAULT_RULES: List[PatternRule] = [
+    PatternRule(
+        intent="music_control",
+        pattern=r"^(请)?(帮我)?(?P<verb>播放|暂停|停止|继续|恢复|下一首|切歌|上一首)(一下)?(播放)?(音乐|歌曲|歌)?$",
+        tools={"macos_music": "music_control", "windows_music": "pygame_music_control"},
+        build_args=_music_control_args,
+        speak_output=True
+    ),
+    PatternRule(
+        intent="music_play",
+        pattern=r"^(请)?(帮我)?(播放|放一首|来一首|我想听)(?P<song_name>[^，,。]{1,30}?)(这首歌|的歌)?$",
+        tools={"macos_music": "music_play", "windows_music": "pygame_music_play"},
+        build_args=_music_play_args,
+        speak_output=True
+    ),
+    PatternRule(
+        intent="weather",
+        pattern=r"^(?P<city>[一-龥]{2,8}?)市?(今天|明天|后天|最近|这几天|未来几天)?的?天气(怎么样|如何|好吗|情况)?$",
+        tools={"weather": "gaode_weather"},
+        build_args=_weather_args
+    ),
+    PatternRule(
+        intent="app_control",
+        pattern=r"^(请)?(帮我)?(?P<verb>打开|启动|运行|关闭|退出)(一下)?(?P<app_name>[\w一-龥 ]{1,20})$",
+        tools={"app_control": "app_control"},
+        build_args=_app_control_args,
+        speak_output=True
+    ),
+]
+
+# 分类器的种子语料（补充 Agent 描述和工具描述）
+DEFAULT_EXAMPLES: Dict[str, List[str]] = {
+    "weather": ["今天天气怎么样", "明天会下雨吗", "外面冷不冷", "气温多少度", "需要带伞吗"],
+    "file": ["创建一个文件", "读取文件内容", "写入文件", "新建文本文档", "删除这个文件", "查找最近的文件"],
+    "search": ["搜索一下", "帮我查一下", "是什么意思", "最新新闻", "维基百科"],
+    "image": ["画一张图", "生成一张图片", "下载这张图片", "帮我画"],
+    "app_control": ["打开应用", "关闭程序", "启动浏览器", "退出软件"],
+    "macos_music": ["播放音乐", "放首歌", "暂停音乐", "下一首", "搜索歌曲"],
+    "windows_music": ["播放音乐", "放首歌", "暂停音乐", "停止播放", "搜索歌曲"],
+    "macos_mail": ["查看邮件", "读一下最新的邮件", "搜索邮件"],
+    "windows_mail": ["查看邮件", "读一下最新的邮件", "搜索邮件"],
+}
+
+# 含有这些连接词的多步指令交给 LLM 规划
+_COMPOUND_MARKERS = re.compile(r"然后|并且|之后|接着|同时|再把|再帮|顺便|以及|，|,|;|；")
+_PUNCTUATION = re.compile(r"[\s。！!？?~～]+")
+
+
+class CharNgramClassifier:
+    """字符 n-gram TF-IDF 分类器（纯 CPU，无需训练框架）"""
+
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 2)):
+        self.ngram_range = ngram_range
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+
+    def _ngrams(self, text: str) -> Counter:
+        text = _PUNCTUATION.sub("", text.lower())
+        grams = Counter()
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                grams[text[i:i + n]] += 1
+        return grams
+
+    def _vector(self, text: str) -> Dict[str, float]:
+        grams = self._ngrams(text)
+        vector = {g: (1 + math.log(c)) * self.idf.get(g, 0.0) for g, c in grams.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {g: v / norm for g, v in vector.items() if v}
+
+    def fit(self, documents: Dict[str, List[str]]) -> 'CharNgramClassifier':
+        """按标签拟合：每个标签的所有文本合成一个质心向量"""
+        all_docs = [self._ngrams(text) for texts in documents.values() for text in texts]
+        total = len(all_docs) or 1
+        df = Counter(g for grams in all_docs for g in grams)
+        self.idf = {g: math.log((1 + total) / (1 + count)) + 1 for g, count in df.items()}
+
+        self.centroids = {}
+        for label, texts in documents.items():
+            centroid: Dict[str, float] = {}
+            for text in texts:
+                for g, v in self._vector(text).items():
+                    centroid[g] = centroid.get(g, 0.0) + v
+            norm = math.sqrt(sum(v * v for v in centroid.values())) or 1.0
+            self.centroids[label] = {g: v / norm for g, v in centroid.items()}
+        return self
+
+    def predict(self, text: str) -> List[Tuple[str, float]]:
+        """返回按相似度降序排列的 (标签, 余弦相似度)"""
+        vector = self._vector(text)
+        scores = [
+            (label, sum(v * centroid.get(g, 0.0) for g, v in vector.items()))
+            for label, centroid in self.centroids.items()
+        ]
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
+
+class IntentRouter:
+    """快速意图路由 - 常见指令不经过规划 LLM，高置信度时直接调用工具"""
+
+    def __init__(
+            self,
+            agents: Mapping[str, Any],
+            tool_registry: Any,
+            rules: Optional[List[PatternRule]] = None,
+            examples: Optional[Dict[str, List[str]]] = None,
+            classifier_threshold: float = 0.45,
+            classifier_margin: float = 0.1,
+            direct_tools: bool = True
+    ):
+        """
+        Args:
+            agents: 可用 Agent（dict 或 AgentPool）
+            tool_registry: 工具注册中心
+            rules: 语法规则，默认 DEFAULT_RULES
+            examples: 分类器种子语料，默认 DEFAULT_EXAMPLES
+            classifier_threshold: 分类器最低相似度
+            classifier_margin: 第一名与第二名的最小差距
+            direct_tools: 是否允许跳过 Worker Agent 直接调用工具
+        """
+        self.agents = agents
+        self.tool_registry = tool_registry
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.classifier_threshold = classifier_threshold
+        self.classifier_margin = classifier_margin
+        self.direct_tools = direct_tools
+
+        self.classifier = CharNgramClassifier().fit(
+            self._build_corpus(examples if examples is not None else DEFAULT_EXAMPLES)
+        )
+
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "direct": 0, "route_time": 0.0}
+        self._llm_plan_times: List[float] = []
+
+    def _describe(self, agent_type: str) -> Dict[str, Any]:
+        describe = getattr(self.agents, "describe", None)
+        if describe:
+            return describe(agent_type)
+        return self.agents[agent_type].get_ability_info()
+
+    def _build_corpus(self, examples: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """由 Agent 描述、工具描述和种子语料构建分类语料"""
+        corpus: Dict[str, List[str]] = {}
+        for agent_type in self.agents:
+            ability = self._describe(agent_type)
+            texts = [ability.get("description", "")]
+            for tool_name in ability.get("tools", []):
+                if self.tool_registry.has_tool(tool_name):
+                    texts.append(self.tool_registry.get_tool(tool_name).description)
+            texts.extend(examples.get(agent_type, []))
+            corpus[agent_type] = [t for t in texts if t]
+        return corpus
+
+    def route(self, text: str) -> Optional[IntentRoute]:
+        """路由用户指令，无法高置信度判断时返回 None（交给 LLM 规划）"""
+        start = time.perf_counter()
+        with tracer.span("router"):
+            route = self._route(text.strip())
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats["route_time"] += elapsed
+            if route:
+                self._stats["hits"] += 1
+                if route.tool_name:
+                    self._stats["direct"] += 1
+            else:
+                self._stats["misses"] += 1
+
+        if route:
+            logger.info(
+                f"Intent routed: {route.intent} -> {route.agent_type}"
+                f"{f' ({route.tool_name})' if route.tool_name else ''} "
+                f"[{route.source}, confidence={route.confidence:.2f}, {elapsed * 1000:.1f}ms]"
+            )
+        return route
+
+    def _route(self, text: str) -> Optional[IntentRoute]:
+        normalized = _PUNCTUATION.sub("", text)
+        if not normalized or _COMPOUND_MARKERS.search(text):
+            return None
+
+        return self._match_rules(normalized) or self._classify(normalized)
+
+    def _match_rules(self, text: str) -> Optional[IntentRoute]:
+        for rule in self.rules:
+            match = rule.regex.match(text)
+            if not match:
+                continue
+
+            slots = {k: v for k, v in match.groupdict().items() if v is not None}
+            for agent_type, tool_name in rule.tools.items():
+                if agent_type not in self.agents:
+                    continue
+
+                args = rule.build_args(slots, agent_type)
+                if args is REJECT:
+                    break
+                direct = (
+                        self.direct_tools
+                        and args is not None
+                        and self.tool_registry.has_tool(tool_name)
+                )
+                return IntentRoute(
+                    intent=rule.intent,
+                    agent_type=agent_type,
+                    confidence=1.0,
+                    source="grammar",
+                    tool_name=tool_name if direct else None,
+                    tool_args=args if direct else {},
+                    speak_output=rule.speak_output if direct else False
+                )
+        return None
+
+    def _classify(self, text: str) -> Optional[IntentRoute]:
+        scores = self.classifier.predict(text)
+        if not scores:
+            return None
+
+        best_label, best = scores[0]
+        runner_up = scores[1][1] if len(scores) > 1 else 0.0
+        if best < self.classifier_threshold or best - runner_up < self.classifier_margin:
+            logger.debug(f"Router low confidence: {best_label}={best:.2f} (runner-up {runner_up:.2f})")
+            return None
+
+        return IntentRoute(intent=best_label, agent_type=best_label, confidence=best, source="classifier")
+
+    def execute_direct(self, plan: ExecutionPlan) -> Optional[Dict[str, Any]]:
+        """
+        直接调用计划中的工具，返回与 TaskOrchestrator.execute 相同格式的结果
+
+        工具不存在或调用异常时返回 None（由调用方回退到 Worker Agent）
+        """
+        direct = plan.metadata.get("direct_tool")
+        if not direct or not plan.tasks:
+            return None
+
+        task = plan.tasks[0]
+        try:
+            tool = self.tool_registry.get_tool(direct["name"])
+            with tracer.span(f"tool.{direct['name']}", direct=True):
+                output = tool.invoke(direct["args"])
+        except Exception as e:
+            logger.warning(f"Direct tool call failed, falling back to agent: {e}")
+            return None
+
+        output = str(output)
+        return {
+            "success": True,
+            "total_steps": 1,
+            "successful_steps": 1,
+            "failed_steps": 0,
+            "results": [{
+                "step_id": task.task_id,
+                "description": task.description,
+                "status": "success",
+                "output": output,
+                "iterations": 0,
+                "tool_calls": [{"tool": direct["name"], "args": direct["args"], "result": output}]
+            }],
+            "error_message": "",
+            "message": "成功执行了所有 1 个步骤！"
+        }
+
+    def record_llm_plan(self, seconds: float):
+        """记录一次 LLM 规划耗时，用于估算路由节省的时间"""
+        with self._lock:
+            self._llm_plan_times.append(seconds)
+            del self._llm_plan_times[:-100]
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率和估算节省的时间（按最近 LLM 规划平均耗时估算）"""
+        with self._lock:
+            hits, misses = self._stats["hits"], self._stats["misses"]
+            total = hits + misses
+            plan_times = list(self._llm_plan_times)
+            route_time = self._stats["route_time"]
+            direct = self._stats["direct"]
+
+        avg_plan = sum(plan_times) / len(plan_times) if plan_times else 0.0
+        return {
+            "total": total,
+            "hits": hits,
+            "direct": direct,
+            "hit_rate": hits / total if total else 0.0,
+            "avg_route_ms": route_time / total * 1000 if total else 0.0,
+            "avg_llm_plan": avg_plan,
+            "saved_seconds": max(0.0, hits * avg_plan - route_time)
+        }
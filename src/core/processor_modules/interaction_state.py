@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : interaction_state.py
+"""
+
+import time
+from enum import Enum
+from typing import Dict, List, Any, Optional
+
+from src.utils.logger import logger
+
+
+class InteractionState(str, Enum):
+    """交互状态枚举"""
+    LISTEN = "listen"  # 等待唤醒词（终止状态）
+    RECORD = "record"
+    ASR = "asr"
+    PLAN = "plan"
+    EXECUTE = "execute"
+    RESPOND = "respond"
+    FOLLOW_UP = "follow_up"
+
+
+class InteractionEvent(str, Enum):
+    """驱动状态迁移的事件"""
+    WAKE = "wake"
+    AUDIO_READY = "audio_ready"
+    TEXT_READY = "text_ready"
+    PLANNED = "planned"
+    EXECUTED = "executed"
+    CONTINUE = "continue"  # 进入多轮对话
+    LISTEN_AGAIN = "listen_again"  # 对话中再次录音
+    RETRY = "retry"  # 录音或识别为空，重新录音
+    END = "end"
+    CANCEL = "cancel"  # 用户取消（重新唤醒或说"取消"）
+    ERROR = "error"
+
+
+S = InteractionState
+E = InteractionEvent
+
+# 状态迁移表：(当前状态, 事件) -> 下一个状态
+TRANSITIONS: Dict[tuple, InteractionState] = {
+    (S.LISTEN, E.WAKE): S.RECORD,
+    (S.RECORD, E.AUDIO_READY): S.ASR,
+    (S.RECORD, E.RETRY): S.RECORD,
+    (S.ASR, E.TEXT_READY): S.PLAN,
+    (S.ASR, E.RETRY): S.RECORD,
+    (S.PLAN, E.PLANNED): S.EXECUTE,
+    (S.EXECUTE, E.EXECUTED): S.RESPOND,
+    (S.RESPOND, E.CONTINUE): S.FOLLOW_UP,
+    (S.FOLLOW_UP, E.LISTEN_AGAIN): S.RECORD,
+}
+
+
+class InvalidTransitionError(Exception):
+    """非法状态迁移"""
+    pass
+
+
+class InteractionStateMachine:
+    """交互状态机 - 显式管理 LISTEN → RECORD → ASR → PLAN → EXECUTE → RESPOND → FOLLOW-UP 流程，
+    并为每次迁移记录时间戳"""
+
+    def __init__(self):
+        self.state = InteractionState.LISTEN
+        self.turn = 0
+        self.history: List[Dict[str, Any]] = []
+        self._entered_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        """是否已回到等待唤醒状态"""
+        return self.state == InteractionState.LISTEN
+
+    def dispatch(self, event: InteractionEvent, reason: str = "") -> InteractionState:
+        """处理事件并迁移状态，END / CANCEL / ERROR 在任意状态下都回到 LISTEN"""
+        if event in (InteractionEvent.END, InteractionEvent.CANCEL, InteractionEvent.ERROR):
+            next_state = InteractionState.LISTEN
+        else:
+            next_state = TRANSITIONS.get((self.state, event))
+
+        if next_state is None:
+            raise InvalidTransitionError(
+                f"Invalid transition: {self.state.value} --{event.value}-->"
+            )
+
+        now = time.time()
+        if event in (InteractionEvent.WAKE, InteractionEvent.LISTEN_AGAIN):
+            self.turn += 1
+
+        self.history.append({
+            "turn": self.turn,
+            "from": self.state.value,
+            "to": next_state.value,
+            "event": event.value,
+            "reason": reason,
+            "timestamp": now,
+            "duration": now - self._entered_at
+        })
+
+        logger.debug(
+            f"State: {self.state.value} --{event.value}--> {next_state.value} "
+            f"({now - self._entered_at:.2f}s in {self.state.value})"
+        )
+
+        self.state = next_state
+        self._entered_at = now
+
+        if next_state in (InteractionState.FOLLOW_UP, InteractionState.LISTEN):
+            self._log_turn(self.turn)
+
+        return next_state
+
+    def turn_timings(self, turn: Optional[int] = None) -> Dict[str, float]:
+        """统计某一轮中各状态的耗时（秒），默认当前轮"""
+        turn = self.turn if turn is None else turn
+        timings: Dict[str, float] = {}
+
+        for record in self.history:
+            if record["turn"] != turn:
+                continue
+            # 进入本轮的迁移记录的是上一轮末状态的耗时，不计入
+            if record["event"] in (InteractionEvent.WAKE.value, InteractionEvent.LISTEN_AGAIN.value):
+                continue
+            timings[record["from"]] = timings.get(record["from"], 0.0) + record["duration"]
+
+        return timings
+
+    def _log_turn(self, turn: int):
+        """打印一轮交互的耗时分布"""
+        timings = self.turn_timings(turn)
+        if not timings:
+            return
+
+        total = sum(timings.values())
+        details = ", ".join(f"{state}={seconds:.2f}s" for state, seconds in timings.items())
+        logger.info(f"Turn {turn} took {total:.2f}s ({details})")
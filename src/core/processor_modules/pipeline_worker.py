@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : pipeline_worker.py
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from src.utils.logger import logger
+
+
+class PipelineJob(BaseModel):
+    """检测线程提交给流水线的任务"""
+    kind: str = "wake"  # wake: 处理一条指令；cancel: 播报取消确认
+    keyword: str = ""
+    created_at: float = Field(default_factory=time.time)
+    coalesced: int = 0  # 合并进来的重复事件数
+
+
+class PipelineWorker:
+    """
+    指令流水线工作线程 - 唤醒词检测与指令处理之间的任务队列
+
+    检测线程只调用 submit（不阻塞），专用工作线程按顺序处理任务。
+    尚未开始的同类任务会被合并（如连续多次唤醒只录一次音），并统计排队等待时间。
+    """
+
+    def __init__(self, handler: Callable[[PipelineJob], None], max_pending: int = 4, window: int = 200):
+        """
+        Args:
+            handler: 处理任务的函数（在工作线程中调用）
+            max_pending: 队列上限，超出时丢弃新任务
+            window: 排队等待时间滚动统计的样本数
+        """
+        self.handler = handler
+        self.max_pending = max(1, max_pending)
+
+        self._pending: Deque[PipelineJob] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._current: Optional[PipelineJob] = None
+
+        self._counters = {"submitted": 0, "queued": 0, "coalesced": 0, "dropped": 0, "processed": 0, "failed": 0}
+        self._waits: Deque[float] = deque(maxlen=window)
+
+    @property
+    def busy(self) -> bool:
+        """是否有正在处理或排队的任务"""
+        with self._cond:
+            return self._current is not None or bool(self._pending)
+
+    def start(self):
+        """启动工作线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+
+        self._thread = threading.Thread(target=self._loop, name="pipeline-worker", daemon=True)
+        self._thread.start()
+        logger.info("Pipeline worker started")
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止工作线程（丢弃未开始的任务，等待当前任务结束）"""
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, job: PipelineJob) -> str:
+        """
+        提交任务（不阻塞），返回 "queued" / "coalesced" / "dropped"
+        """
+        with self._cond:
+            self._counters["submitted"] += 1
+
+            for pending in self._pending:
+                if pending.kind == job.kind:
+                    pending.coalesced += 1
+                    self._counters["coalesced"] += 1
+                    logger.debug(f"Pipeline job coalesced: {job.kind} ({pending.coalesced + 1} events)")
+                    return "coalesced"
+
+            if len(self._pending) >= self.max_pending:
+                self._counters["dropped"] += 1
+                logger.warning(f"Pipeline queue full, dropping {job.kind} job")
+                return "dropped"
+
+            self._pending.append(job)
+            self._counters["queued"] += 1
+            self._cond.notify()
+            return "queued"
+
+    def discard(self, kind: Optional[str] = None) -> int:
+        """丢弃尚未开始的任务（可按类型），返回丢弃数"""
+        with self._cond:
+            kept = [job for job in self._pending if kind is not None and job.kind != kind]
+            discarded = len(self._pending) - len(kept)
+            self._pending = deque(kept)
+            return discarded
+
+    def run_pending(self) -> int:
+        """在当前线程处理所有排队任务（未启动工作线程时使用，如测试），返回处理数"""
+        count = 0
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return count
+                job = self._take_locked()
+            self._process(job)
+            count += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """队列统计：提交/排队/合并/丢弃/完成数，排队等待 p50/p95（秒）"""
+        with self._cond:
+            stats: Dict[str, Any] = dict(self._counters)
+            waits = sorted(self._waits)
+            stats["pending"] = len(self._pending)
+
+        stats["wait_p50"] = self._percentile(waits, 0.5)
+        stats["wait_p95"] = self._percentile(waits, 0.95)
+        return stats
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                job = self._take_locked()
+            self._process(job)
+
+    def _take_locked(self) -> PipelineJob:
+        """取出下一个任务并记录排队时间（调用方持有锁）"""
+        job = self._pending.popleft()
+        self._current = job
+        self._waits.append(time.time() - job.created_at)
+        return job
+
+    def _process(self, job: PipelineJob):
+        try:
+            self.handler(job)
+            self._count("processed")
+        except Exception as e:
+            self._count("failed")
+            logger.error(f"Pipeline job {job.kind} failed: {e}", exc_info=True)
+        finally:
+            with self._cond:
+                self._current = None
+
+    def _count(self, name: str):
+        with self._cond:
+            self._counters[name] += 1
+
+    @staticmethod
+    def _percentile(samples: List[float], q: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : plan_cache.py
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from src.core.models import ExecutionPlan, Task, TaskStatus
+from src.utils.logger import logger
+
+DEFAULT_CACHE_FILE = Path(__file__).parent.parent.parent / "utils" / "logs" / "plan_cache.json"
+
+# 指令中的固定用词（不会被当作槽位），槽位是查询与步骤描述共有、但不属于这些词的片段
+LITERAL_WORDS = [
+    "查询", "查看", "查一下", "搜索", "搜一下", "帮我", "请", "一下", "告诉我",
+    "创建", "新建", "删除", "读取", "写入", "追加", "打开", "关闭", "启动", "退出", "列出", "查找",
+    "播放", "暂停", "下载", "生成", "发送", "画",
+    "天气", "气温", "预报", "文件", "文件夹", "目录", "桌面", "文档", "下载目录", "图片", "邮件", "音乐", "歌曲",
+    "内容", "名为", "名字", "叫做", "叫", "为", "的", "在", "里", "上", "中", "一个", "个", "和",
+    "今天", "明天", "后天", "最近", "现在", "怎么样", "如何",
+]
+
+_PUNCTUATION = re.compile(r"[\s。！!？?~～]+$|^[\s]+")
+_COMPOUND_MARKERS = re.compile(r"然后|并且|之后|接着|同时|顺便|以及|，|,|;|；")
+
+
+class PlanTemplate(BaseModel):
+    """参数化计划模板"""
+    template_id: str
+    pattern: str  # 匹配查询的正则（命名分组为槽位）
+    example_query: str
+    slots: List[str] = Field(default_factory=list)
+    steps: List[Dict[str, Any]] = Field(default_factory=list)  # description / assigned_agent / expected_result 模板
+    agents_signature: str = ""
+    created_at: float = Field(default_factory=time.time)
+    last_used: float = Field(default_factory=time.time)
+    hits: int = 0
+    successes: int = 1
+
+
+def agents_signature(agent_types: Iterable[str]) -> str:
+    """可用 Agent 集合的签名，集合变化时模板失效"""
+    return hashlib.sha1(",".join(sorted(agent_types)).encode("utf-8")).hexdigest()[:12]
+
+
+class PlanCache:
+    """计划模板缓存 - 从成功执行的计划中学习参数化模板，新查询命中时跳过规划 LLM"""
+
+    def __init__(
+            self,
+            agent_types: Iterable[str],
+            cache_file: Optional[str] = None,
+            max_templates: int = 200,
+            ttl_days: float = 30.0,
+            min_literal_ratio: float = 0.3,
+            max_slot_chars: int = 20,
+            literal_words: Optional[List[str]] = None,
+            flush_interval: float = 60.0
+    ):
+        """
+        Args:
+            agent_types: 当前可用的 Agent 类型
+            cache_file: 持久化文件，None 时只保存在内存
+            max_templates: 最多保留的模板数（LRU 淘汰）
+            ttl_days: 模板有效期（天），按最后使用时间计算
+            min_literal_ratio: 模板中固定用词占查询长度的最小比例（避免过于宽泛的模板）
+            max_slot_chars: 槽位值最大长度
+            literal_words: 固定用词表，默认 LITERAL_WORDS
+            flush_interval: 命中统计（hits / last_used）写回文件的最短间隔（秒）
+        """
+        self.signature = agents_signature(agent_types)
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.max_templates = max_templates
+        self.ttl = ttl_days * 86400
+        self.min_literal_ratio = min_literal_ratio
+        self.max_slot_chars = max_slot_chars
+        self.literal_words = sorted(literal_words or LITERAL_WORDS, key=len, reverse=True)
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._templates: "OrderedDict[str, PlanTemplate]" = OrderedDict()
+        self._compiled: Dict[str, re.Pattern] = {}
+        self.stats = {"hits": 0, "misses": 0, "learned": 0}
+        self._dirty = False  # 有未写回文件的命中统计或过期删除
+        self._last_flush = time.monotonic()
+
+        self._load()
+
+    # ---------- 学习 ----------
+
+    def learn(self, query: str, plan: ExecutionPlan) -> Optional[PlanTemplate]:
+        """从成功执行的查询和计划中抽象出模板"""
+        query = self._normalize(query)
+        if not query or not plan.tasks:
+            return None
+
+        descriptions = [task.description for task in plan.tasks]
+        slot_spans = self._find_slots(query, "\n".join(descriptions))
+
+        literal_chars = len(query) - sum(end - start for start, end in slot_spans)
+        if literal_chars / len(query) < self.min_literal_ratio:
+            logger.debug(f"Plan template too generic, not cached: {query}")
+            return None
+
+        # 构建正则和步骤模板
+        pattern_parts, values, last = [], [], 0
+        for index, (start, end) in enumerate(slot_spans):
+            pattern_parts.append(re.escape(query[last:start]))
+            pattern_parts.append(f"(?P<s{index}>.+?)")
+            values.append(query[start:end])
+            last = end
+        pattern_parts.append(re.escape(query[last:]))
+        pattern = "^" + "".join(pattern_parts) + "$"
+
+        # 依赖以步骤下标保存，实例化时换成新的 task_id
+        id_to_index = {task.task_id: index for index, task in enumerate(plan.tasks)}
+        steps = []
+        for task in plan.tasks:
+            depends_on = plan.dependencies.get(task.task_id, task.metadata.get("depends_on"))
+            steps.append({
+                "description": self._to_template(task.description, values),
+                "assigned_agent": task.assigned_agent,
+                "expected_result": self._to_template(task.metadata.get("expected_result") or "", values),
+                "depends_on": None if depends_on is None else [id_to_index[d] for d in depends_on if d in id_to_index]
+            })
+
+        template_id = hashlib.sha1(pattern.encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            existing = self._templates.get(template_id)
+            template = PlanTemplate(
+                template_id=template_id,
+                pattern=pattern,
+                example_query=query,
+                slots=[f"s{i}" for i in range(len(values))],
+                steps=steps,
+                agents_signature=self.signature,
+                hits=existing.hits if existing else 0,
+                successes=(existing.successes + 1) if existing else 1
+            )
+            self._templates[template_id] = template
+            self._templates.move_to_end(template_id)
+            self._compiled[template_id] = re.compile(pattern)
+            self._evict()
+            self.stats["learned"] += 1
+
+        logger.info(f"Plan template learned: {pattern} ({len(steps)} steps, slots={values})")
+        self._save()
+        return template
+
+    def _find_slots(self, query: str, descriptions: str) -> List[Tuple[int, int]]:
+        """对齐查询与步骤描述：找出共有片段中去掉固定用词后剩下的部分作为槽位"""
+        spans: List[Tuple[int, int]] = []
+        i = 0
+        while i < len(query):
+            # 从 i 开始、在描述中出现的最长片段
+            length = 0
+            while i + length < len(query) and query[i:i + length + 1] in descriptions:
+                length += 1
+            if length < 2:
+                i += max(length, 1)
+                continue
+
+            segment_end = i + length
+            literal = [False] * length
+            segment = query[i:segment_end]
+            for word in self.literal_words:
+                start = segment.find(word)
+                while start != -1:
+                    for k in range(start, start + len(word)):
+                        literal[k] = True
+                    start = segment.find(word, start + 1)
+
+            # 未被固定用词覆盖的连续片段
+            k = 0
+            while k < length:
+                if literal[k]:
+                    k += 1
+                    continue
+                run_start = k
+                while k < length and not literal[k]:
+                    k += 1
+                if 2 <= k - run_start <= self.max_slot_chars:
+                    spans.append((i + run_start, i + k))
+
+            i = segment_end
+        return spans
+
+    @staticmethod
+    def _to_template(text: str, values: List[str]) -> str:
+        """将描述中的槽位值替换为占位符（长值优先，避免部分替换）"""
+        order = sorted(range(len(values)), key=lambda idx: len(values[idx]), reverse=True)
+        for idx in order:
+            text = text.replace(values[idx], f"{{s{idx}}}")
+        return text
+
+    # ---------- 匹配 ----------
+
+    def match(self, query: str) -> Optional[ExecutionPlan]:
+        """匹配查询，命中时按模板实例化执行计划（不写文件，命中统计由 flush 写回）"""
+        query = self._normalize(query)
+        if not query:
+            return None
+
+        now = time.time()
+        with self._lock:
+            expired = [
+                tid for tid, t in self._templates.items()
+                if now - t.last_used > self.ttl or t.agents_signature != self.signature
+            ]
+            for tid in expired:
+                self._drop(tid)
+                self._dirty = True
+
+            for template_id in reversed(list(self._templates)):
+                match = self._compiled[template_id].match(query)
+                if not match:
+                    continue
+
+                # 槽位吞掉了复合指令或过长内容时不采用
+                values = match.groupdict()
+                if any(len(v) > self.max_slot_chars or _COMPOUND_MARKERS.search(v) for v in values.values()):
+                    continue
+
+                template = self._templates[template_id]
+                template.hits += 1
+                template.last_used = now
+                self._templates.move_to_end(template_id)
+                self.stats["hits"] += 1
+                self._dirty = True
+                break
+            else:
+                self.stats["misses"] += 1
+                return None
+
+        plan = self._instantiate(template, query, values)
+        logger.info(f"Plan cache hit: {template.pattern} slots={values} (hits={template.hits})")
+        return plan
+
+    @staticmethod
+    def _instantiate(template: PlanTemplate, query: str, values: Dict[str, str]) -> ExecutionPlan:
+        def fill(text: str) -> str:
+            for name, value in values.items():
+                text = text.replace(f"{{{name}}}", value)
+            return text
+
+        tasks = []
+        dependencies = {}
+        for number, step in enumerate(template.steps, start=1):
+            task_id = str(uuid.uuid4())
+            depends_on = step.get("depends_on")
+            if depends_on is not None:
+                depends_on = [tasks[index].task_id for index in depends_on]
+                dependencies[task_id] = depends_on
+
+            tasks.append(Task(
+                task_id=task_id,
+                description=fill(step["description"]),
+                assigned_agent=step["assigned_agent"],
+                metadata={
+                    "step_number": number,
+                    "expected_result": fill(step["expected_result"]) or None,
+                    "depends_on": depends_on
+                },
+                status=TaskStatus.PENDING
+            ))
+
+        return ExecutionPlan(
+            plan_id=str(uuid.uuid4()),
+            tasks=tasks,
+            dependencies=dependencies,
+            metadata={
+                "feasibility": "feasible",
+                "reason": "",
+                "original_task": query,
+                "total_steps": len(tasks),
+                "plan_cache": {"template_id": template.template_id, "slots": values}
+            }
+        )
+
+    def invalidate(self, template_id: str):
+        """删除模板（如按模板执行失败时）"""
+        with self._lock:
+            self._drop(template_id)
+        self._save()
+
+    def update_agents(self, agent_types: Iterable[str]):
+        """可用 Agent 变化时更新签名，旧签名的模板全部失效"""
+        signature = agents_signature(agent_types)
+        if signature == self.signature:
+            return
+
+        with self._lock:
+            self.signature = signature
+            count = len(self._templates)
+            for tid in list(self._templates):
+                self._drop(tid)
+        logger.info(f"Available agents changed, {count} plan templates invalidated")
+        self._save()
+
+    def flush(self, force: bool = False):
+        """
+        写回命中统计
+
+        Args:
+            force: 忽略 flush_interval 立即写回（退出时调用）
+        """
+        with self._lock:
+            if self._dirty and (force or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._save_locked()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    # ---------- 内部实现 ----------
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return _PUNCTUATION.sub("", query.strip())
+
+    def _drop(self, template_id: str):
+        self._templates.pop(template_id, None)
+        self._compiled.pop(template_id, None)
+
+    def _evict(self):
+        """LRU 淘汰"""
+        while len(self._templates) > self.max_templates:
+            template_id, _ = self._templates.popitem(last=False)
+            self._compiled.pop(template_id, None)
+
+    def _load(self):
+        if not self.cache_file or not self.cache_file.exists():
+            return
+
+        try:
+            data = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"Failed to load plan cache: {e}")
+            return
+
+        now = time.time()
+        for item in data.get("templates", []):
+            try:
+                template = PlanTemplate(**item)
+                if template.agents_signature != self.signature or now - template.last_used > self.ttl:
+                    continue
+                self._templates[template.template_id] = template
+                self._compiled[template.template_id] = re.compile(template.pattern)
+            except Exception as e:
+                logger.debug(f"Skipping invalid plan template: {e}")
+
+        self._evict()
+        logger.info(f"Loaded {len(self._templates)} plan templates from {self.cache_file}")
+
+    def _save(self):
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        """原子写入缓存文件（调用方持有锁）"""
+        if not self.cache_file:
+            return
+
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(".tmp")
+            payload = {"templates": [t.model_dump() for t in self._templates.values()]}
+            tmp_file.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+            os.replace(tmp_file, self.cache_file)
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Failed to save plan cache: {e}")
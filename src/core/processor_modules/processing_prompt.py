@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : processing_prompt.py
+"""
+
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+
+from src.utils.logger import logger
+
+
+class ProcessingPrompt:
+    """处理中提示模块 - 在后台线程播放提示语，与规划/执行并行"""
+
+    def __init__(self, speak: Callable[[str], None], skip_threshold: float = 1.0):
+        """
+        Args:
+            speak: 合成并播放语音的函数（阻塞调用）
+            skip_threshold: 流水线在该时长（秒）内完成时跳过提示语
+        """
+        self.speak = speak
+        self.skip_threshold = skip_threshold
+
+        self._thread: Optional[threading.Thread] = None
+        self._finished = threading.Event()
+        self._pipeline_start = 0.0
+        self._prompt_start: Optional[float] = None
+        self._prompt_end: Optional[float] = None
+
+        # 最近一次提示语的播放时长，用于估算跳过时节省的时间（尚未播放过时为 None）
+        self.last_prompt_duration: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        """是否有尚未收尾的提示语"""
+        return self._thread is not None
+
+    def start(self, prompt: str):
+        """开始计时，超过阈值仍未完成时播放提示语"""
+        if self._thread is not None:
+            self.finish()
+
+        self._finished.clear()
+        self._pipeline_start = time.time()
+        self._prompt_start = None
+        self._prompt_end = None
+
+        # 复制上下文，使提示语的 tracing span 挂在当前命令下
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(
+            target=context.run,
+            args=(self._run, prompt),
+            name="processing-prompt",
+            daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, prompt: str):
+        """后台线程：等待阈值，未完成则播放"""
+        if self._finished.wait(timeout=self.skip_threshold):
+            logger.debug("Pipeline finished before threshold, prompt skipped")
+            return
+
+        logger.info(f"Processing prompt: {prompt}")
+        self._prompt_start = time.time()
+        try:
+            self.speak(prompt)
+        except Exception as e:
+            logger.error(f"Processing prompt TTS failed: {e}")
+        finally:
+            self._prompt_end = time.time()
+            self.last_prompt_duration = self._prompt_end - self._prompt_start
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        流水线结束时调用：取消尚未开始的提示语，等待正在播放的提示语结束
+
+        Returns:
+            统计信息：
+            - skipped: 是否跳过了提示语
+            - pipeline_time: 流水线耗时（秒）
+            - prompt_time: 提示语播放耗时（秒）
+            - overlap_saved: 与流水线重叠（即并行节省）的时长（秒）；跳过时按上一次提示语的时长估算，
+              还没有播放过提示语时为 None
+        """
+        if self._thread is None:
+            return {"skipped": True, "pipeline_time": 0.0, "prompt_time": 0.0, "overlap_saved": None}
+
+        finish_time = time.time()
+        self._finished.set()
+        self._thread.join()
+        self._thread = None
+
+        pipeline_time = finish_time - self._pipeline_start
+
+        if self._prompt_start is None:
+            return {
+                "skipped": True,
+                "pipeline_time": pipeline_time,
+                "prompt_time": 0.0,
+                "overlap_saved": self.last_prompt_duration
+            }
+
+        prompt_time = self._prompt_end - self._prompt_start
+        overlap = max(0.0, min(self._prompt_end, finish_time) - self._prompt_start)
+
+        return {
+            "skipped": False,
+            "pipeline_time": pipeline_time,
+            "prompt_time": prompt_time,
+            "overlap_saved": overlap
+        }
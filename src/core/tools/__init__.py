@@ -6,12 +6,22 @@
 @File   : __init__.py
 """
 
-from .file import file_create, FileCreateTool
-from .image import dalle3
-from .registry import tool_registry, ToolRegistry
-from .search import duckduckgo_search, wikipedia_search
-from .system import app_control, AppControlTool
-from .weather import gaode_weather, GaodeWeatherTool
+from src.utils.lazy import lazy_exports
+
+# 工具模块依赖较重（langchain_community、requests 等），首次访问时再导入
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "tool_registry": ".registry",
+    "ToolRegistry": ".registry",
+    "app_control": ".system",
+    "AppControlTool": ".system",
+    "file_create": ".file",
+    "FileCreateTool": ".file",
+    "duckduckgo_search": ".search",
+    "wikipedia_search": ".search",
+    "gaode_weather": ".weather",
+    "GaodeWeatherTool": ".weather",
+    "dalle3": ".image",
+})
 
 __all__ = [
     "tool_registry",
@@ -6,8 +6,13 @@
 @File   : __init__.py.py
 """
 
-from .dalle3 import dalle3
-from .image_download import image_download
+from src.utils.lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "dalle3": ".dalle3",
+    "image_download": ".image_download",
+})
+
 __all__ = [
     "dalle3",
     "image_download"
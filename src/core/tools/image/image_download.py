@@ -9,6 +9,7 @@ import requests
 from langchain_core.tools import BaseTool
 
 from src.core.tools.base.schemas import ImageDownloadSchema
+from src.utils.deadline import timeout_for
 
 
 class ImageDownloadTool(BaseTool):
@@ -38,7 +39,7 @@ class ImageDownloadTool(BaseTool):
             save_path = desktop / filename
 
             # 下载图片
-            response = requests.get(url, timeout=30)
+            response = requests.get(url, timeout=timeout_for(30))
             response.raise_for_status()
 
             # 保存到桌面
@@ -7,20 +7,11 @@
 """
 
 import platform
+import threading
 from typing import Dict, List, Optional
 
 from langchain_core.tools import BaseTool
 
-from src.core.tools import dalle3
-# 导入工具
-from src.core.tools.file import (
-    file_create, file_read, file_search, file_list,
-    file_find_recent, file_delete, file_append, file_write
-)
-from src.core.tools.image import image_download
-from src.core.tools.search import duckduckgo_search, wikipedia_search, google_serper
-from src.core.tools.system import app_control
-from src.core.tools.weather import gaode_weather
 from src.utils.config import config
 from src.utils.logger import logger
 
@@ -29,40 +20,68 @@ class ToolRegistry:
     """工具注册中心 - 管理所有可用工具"""
 
     def __init__(self):
-        """初始化工具注册中心"""
-        self._tools: Dict[str, BaseTool] = {}
-        self._register_default_tools()
+        """初始化工具注册中心（默认工具在首次访问时才导入和注册）"""
+        self._registry: Dict[str, BaseTool] = {}
+        self._defaults_loaded = False
+        self._load_lock = threading.RLock()
+
+    @property
+    def _tools(self) -> Dict[str, BaseTool]:
+        """工具表，首次访问时注册默认工具"""
+        if not self._defaults_loaded:
+            with self._load_lock:
+                if not self._defaults_loaded:
+                    # 注册完成后才置位：其他线程在此之前会等锁，不会读到注册了一半的工具表；
+                    # 注册抛错时下次访问重试
+                    self._register_default_tools()
+                    self._defaults_loaded = True
+        return self._registry
+
+    def _add_default(self, tool: BaseTool) -> None:
+        """加载默认工具时直接写入工具表（不经过 _tools，避免重入加载）"""
+        self._registry[tool.name] = tool
+        logger.debug(f"Registered tool: {tool.name}")
 
     def _register_default_tools(self):
         """注册默认工具（保持原有逻辑）"""
+        # 导入工具
+        from src.core.tools.file import (
+            file_create, file_read, file_search, file_list,
+            file_find_recent, file_delete, file_append, file_write
+        )
+        from src.core.tools.image import dalle3, image_download
+        from src.core.tools.search import duckduckgo_search, wikipedia_search, google_serper
+        from src.core.tools.system import app_control
+        from src.core.tools.weather import gaode_weather
+
         # 系统工具
-        self.register(app_control())
+        self._add_default(app_control())
 
         # 文件工具
-        self.register(file_create())
-        self.register(file_read())
-        self.register(file_write())
-        self.register(file_append())
-        self.register(file_delete())
-        self.register(file_search())
-        self.register(file_list())
-        self.register(file_find_recent())
+        self._add_default(file_create())
+        self._add_default(file_read())
+        self._add_default(file_write())
+        self._add_default(file_append())
+        self._add_default(file_delete())
+        self._add_default(file_search())
+        self._add_default(file_list())
+        self._add_default(file_find_recent())
 
         # 搜索工具
         try:
-            self.register(duckduckgo_search())
+            self._add_default(duckduckgo_search())
         except Exception as e:
             logger.warning(f"DuckDuckGo registration failed: {e}")
 
         try:
-            self.register(wikipedia_search())
+            self._add_default(wikipedia_search())
         except Exception as e:
             logger.warning(f"Wikipedia registration failed: {e}")
 
         try:
             api_key = config.get("google_serper.api_key")
             if api_key:
-                self.register(google_serper(api_key=api_key))
+                self._add_default(google_serper(api_key=api_key))
             else:
                 logger.warning("Google Serper API key not configured, skipping")
         except Exception as e:
@@ -72,17 +91,17 @@ class ToolRegistry:
         try:
             api_key = config.get("gaode_weather.api_key")
             if api_key:
-                self.register(gaode_weather(api_key=api_key))
+                self._add_default(gaode_weather(api_key=api_key))
         except Exception as e:
             logger.warning(f"Gaode Weather registration failed: {e}")
 
         # 图像工具
         try:
             api_key = config.get("openai.api_key")
-            self.register(dalle3(api_key=api_key))
+            self._add_default(dalle3(api_key=api_key))
         except Exception as e:
             logger.warning(f"DALL·E 3 registration failed: {e}")
-        self.register(image_download())
+        self._add_default(image_download())
 
         # macOS 专用工具
         if platform.system() == "Darwin":
@@ -180,14 +199,14 @@ class ToolRegistry:
             )
 
             # 邮件工具
-            self.register(mail_search())
-            self.register(mail_read())
-            # self.register(mail_send())
+            self._add_default(mail_search())
+            self._add_default(mail_read())
+            # self._add_default(mail_send())
 
             # 音乐工具
-            self.register(music_play())
-            self.register(music_control())
-            self.register(music_search())
+            self._add_default(music_play())
+            self._add_default(music_control())
+            self._add_default(music_search())
 
             logger.info("macOS tools registered")
 
@@ -203,15 +222,15 @@ class ToolRegistry:
             )
 
             # 邮件工具
-            self.register(outlook_search())
-            self.register(outlook_read())
-            # self.register(outlook_send())
+            self._add_default(outlook_search())
+            self._add_default(outlook_read())
+            # self._add_default(outlook_send())
 
             # 音乐工具
-            self.register(pygame_music_search())
-            self.register(pygame_music_play())
-            self.register(pygame_music_control())
-            self.register(pygame_music_fetch())
+            self._add_default(pygame_music_search())
+            self._add_default(pygame_music_play())
+            self._add_default(pygame_music_control())
+            self._add_default(pygame_music_fetch())
 
             logger.info("windows tools registered")
 
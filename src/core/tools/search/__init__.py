@@ -6,9 +6,13 @@
 @File   : __init__.py.py
 """
 
-from .duckduckgo import duckduckgo_search
-from .google import google_serper
-from .wikipedia import wikipedia_search
+from src.utils.lazy import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    "duckduckgo_search": ".duckduckgo",
+    "wikipedia_search": ".wikipedia",
+    "google_serper": ".google",
+})
 
 __all__ = [
     "duckduckgo_search",
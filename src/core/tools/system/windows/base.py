@@ -1,7 +1,10 @@
 import platform
 from abc import ABC
 
-import win32com
+try:
+    import win32com
+except ImportError:
+    win32com = None
 from langchain_core.tools import BaseTool
 from pydantic import Field
 
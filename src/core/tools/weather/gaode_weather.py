@@ -8,6 +8,7 @@ from langchain_core.tools import BaseTool
 from pydantic import Field  # 添加 Field 导入
 
 from src.core.tools.base.schemas import GaodeWeatherSchema
+from src.utils.deadline import Interrupted, check_deadline, timeout_for
 from src.utils.logger import logger
 
 
@@ -48,7 +49,7 @@ class GaodeWeatherTool(BaseTool):
                     "subdistrict": 0,
                 },
                 headers={"Content-Type": "application/json; charset=utf-8"},
-                timeout=10,
+                timeout=timeout_for(10),
             )
             city_response.raise_for_status()
             city_data = city_response.json()
@@ -59,7 +60,8 @@ class GaodeWeatherTool(BaseTool):
 
             ad_code = city_data["districts"][0]["adcode"]
 
-            # 2. 查询天气预报
+            # 2. 查询天气预报（命令已超时或取消时不再发起第二个请求）
+            check_deadline()
             weather_response = session.get(
                 f"{api_domain}/weather/weatherInfo",
                 params={
@@ -68,7 +70,7 @@ class GaodeWeatherTool(BaseTool):
                     "extensions": "all",  # 获取预报天气
                 },
                 headers={"Content-Type": "application/json; charset=utf-8"},
-                timeout=10,
+                timeout=timeout_for(10),
             )
             weather_response.raise_for_status()
             weather_data = weather_response.json()
@@ -82,6 +84,9 @@ class GaodeWeatherTool(BaseTool):
 
             return formatted_result
 
+        except Interrupted:
+            raise
+
         except requests.exceptions.Timeout:
             error_msg = f"Timeout when querying weather for city: {city}"
             logger.error(error_msg)
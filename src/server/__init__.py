@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : __init__.py
+"""
+from .session import (
+    HeadlessHost,
+    ServerBusy,
+    ServerSession,
+    SessionBusy,
+    SessionLimitReached,
+    SessionManager,
+    SessionProcessor
+)
+
+__all__ = [
+    "HeadlessHost",
+    "ServerBusy",
+    "ServerSession",
+    "SessionBusy",
+    "SessionLimitReached",
+    "SessionManager",
+    "SessionProcessor",
+]
@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : __main__.py
+"""
+
+from src.server.app import main
+
+if __name__ == "__main__":
+    main()
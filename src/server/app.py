@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : app.py
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from aiohttp import WSMsgType, web
+
+from src.core.processor import CommandProcessor
+from src.server.session import HeadlessHost, ServerBusy, SessionBusy, SessionLimitReached, SessionManager
+from src.services.LLMFactory import LLMFactory
+from src.utils.logger import logger
+
+MANAGER_KEY = web.AppKey("manager", SessionManager)
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+
+AUDIO_CONTENT_TYPES = ("audio/wav", "audio/x-wav", "audio/wave", "application/octet-stream")
+
+
+def create_manager(config, engine: Optional[CommandProcessor] = None, **overrides) -> SessionManager:
+    """
+    初始化共享引擎（LLM、规划器、总结器、工具注册中心等）并创建会话管理器
+
+    Args:
+        config: 配置对象
+        engine: 已初始化的引擎（测试或压测时传入使用假模型的引擎）
+        overrides: 覆盖 server 配置中的同名参数
+    """
+    host = HeadlessHost(config)
+    if engine is None:
+        engine = CommandProcessor(host)
+        if not engine._initialize_system():
+            raise RuntimeError("System initialization failed")
+
+    options = {
+        "max_sessions": config.get("server.max_sessions", 100),
+        "global_concurrency": config.get("server.global_concurrency", 8),
+        "per_session_pending": config.get("server.per_session_pending", 2),
+        "queue_timeout": config.get("server.queue_timeout", 30.0),
+        "session_ttl": config.get("server.session_ttl", 1800),
+    }
+    options.update(overrides)
+    return SessionManager(engine=engine, host=host, **options)
+
+
+def create_app(manager: SessionManager, worker_threads: int = 32, expire_interval: float = 60.0) -> web.Application:
+    """
+    创建 HTTP/WebSocket 应用
+
+    指令处理是同步流程（内部各自运行事件循环），在线程池中执行，不阻塞服务端事件循环。
+    """
+    app = web.Application()
+    app[MANAGER_KEY] = manager
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="session")
+
+    app.router.add_post("/sessions", create_session)
+    app.router.add_delete("/sessions/{session_id}", close_session)
+    app.router.add_post("/sessions/{session_id}/commands", post_command)
+    app.router.add_post("/sessions/{session_id}/cancel", cancel_command)
+    app.router.add_get("/stats", get_stats)
+    app.router.add_get("/ws", websocket_handler)
+
+    async def expire_sessions(app: web.Application):
+        async def loop():
+            while True:
+                await asyncio.sleep(expire_interval)
+                manager.expire_idle()
+
+        task = asyncio.create_task(loop())
+        yield
+        task.cancel()
+        app[EXECUTOR_KEY].shutdown(wait=False, cancel_futures=True)
+        if manager.engine.plan_cache:
+            manager.engine.plan_cache.flush(force=True)
+
+    app.cleanup_ctx.append(expire_sessions)
+    return app
+
+
+async def _run_command(
+        request: web.Request,
+        session_id: Optional[str],
+        text: Optional[str] = None,
+        audio: Optional[bytes] = None,
+        on_event: Optional[Callable[[str], None]] = None
+) -> Dict[str, Any]:
+    manager = request.app[MANAGER_KEY]
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        request.app[EXECUTOR_KEY],
+        partial(manager.handle, session_id, text=text, audio=audio, on_event=on_event)
+    )
+
+
+def _error_response(error: Exception) -> web.Response:
+    """并发上限类错误映射为 HTTP 状态码"""
+    status = 429 if isinstance(error, SessionBusy) else 503
+    return web.json_response({"error": str(error)}, status=status)
+
+
+async def create_session(request: web.Request) -> web.Response:
+    """POST /sessions：创建会话"""
+    try:
+        session = request.app[MANAGER_KEY].create()
+    except SessionLimitReached as e:
+        return _error_response(e)
+    return web.json_response({"session_id": session.session_id}, status=201)
+
+
+async def close_session(request: web.Request) -> web.Response:
+    """DELETE /sessions/{id}：关闭会话"""
+    if not request.app[MANAGER_KEY].close(request.match_info["session_id"]):
+        raise web.HTTPNotFound()
+    return web.json_response({"closed": True})
+
+
+async def post_command(request: web.Request) -> web.Response:
+    """
+    POST /sessions/{id}/commands：处理一条指令
+
+    JSON 请求体 {"text": "..."} 为文字指令，audio/wav 请求体为语音指令；会话不存在时自动创建
+    """
+    session_id = request.match_info["session_id"]
+    text, audio = None, None
+
+    if request.content_type in AUDIO_CONTENT_TYPES:
+        audio = await request.read()
+    else:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="Expected JSON body or audio/wav")
+        text = (body.get("text") or "").strip()
+        if not text:
+            raise web.HTTPBadRequest(text="Missing 'text'")
+
+    try:
+        result = await _run_command(request, session_id, text=text, audio=audio)
+    except (SessionBusy, ServerBusy, SessionLimitReached) as e:
+        return _error_response(e)
+    return web.json_response(result)
+
+
+async def cancel_command(request: web.Request) -> web.Response:
+    """POST /sessions/{id}/cancel：取消会话中正在处理的指令"""
+    manager = request.app[MANAGER_KEY]
+    session_id = request.match_info["session_id"]
+    if manager.get(session_id) is None:
+        raise web.HTTPNotFound()
+    return web.json_response({"cancelled": manager.cancel(session_id)})
+
+
+async def get_stats(request: web.Request) -> web.Response:
+    """GET /stats：会话数、并发与延迟统计，以及 LLM 连接复用和响应缓存命中情况"""
+    stats = request.app[MANAGER_KEY].stats()
+    stats["llm_connections"] = LLMFactory.connection_stats()
+    stats["llm_cache"] = LLMFactory.cache_stats()
+    stats["llm_hedging"] = LLMFactory.hedge_stats()
+    stats["llm_router"] = LLMFactory.router_stats()
+    return web.json_response(stats)
+
+
+async def websocket_handler(request: web.Request) -> web.WebSocketResponse:
+    """
+    GET /ws?session_id=...：一个连接对应一个会话
+
+    客户端发送 {"type": "command", "text": "..."}、{"type": "cancel"} 或二进制 WAV 音频；
+    服务端推送 {"type": "event"}（计划等进度）和 {"type": "result"}。
+    指令在后台处理，处理期间仍可接收取消消息。
+    """
+    manager = request.app[MANAGER_KEY]
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+
+    try:
+        session = manager.create(request.query.get("session_id"))
+    except SessionLimitReached as e:
+        await ws.send_json({"type": "error", "error": str(e)})
+        await ws.close()
+        return ws
+
+    session_id = session.session_id
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    def on_event(message: str):
+        # 在处理线程中调用
+        if not ws.closed:
+            asyncio.run_coroutine_threadsafe(ws.send_json({"type": "event", "message": message}), loop)
+
+    async def run(text: Optional[str] = None, audio: Optional[bytes] = None):
+        try:
+            result = await _run_command(request, session_id, text=text, audio=audio, on_event=on_event)
+            payload = {"type": "result", **result}
+        except (SessionBusy, ServerBusy) as e:
+            payload = {"type": "error", "error": str(e)}
+        if not ws.closed:
+            await ws.send_json(payload)
+
+    def start(**command):
+        task = asyncio.create_task(run(**command))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await ws.send_json({"type": "session", "session_id": session_id})
+
+    async for message in ws:
+        if message.type == WSMsgType.BINARY:
+            start(audio=message.data)
+        elif message.type == WSMsgType.TEXT:
+            try:
+                data = json.loads(message.data)
+            except json.JSONDecodeError:
+                await ws.send_json({"type": "error", "error": "invalid json"})
+                continue
+
+            if data.get("type") == "cancel":
+                manager.cancel(session_id, data.get("reason") or "已取消")
+            elif (data.get("text") or "").strip():
+                start(text=data["text"].strip())
+            else:
+                await ws.send_json({"type": "error", "error": "missing text"})
+        elif message.type == WSMsgType.ERROR:
+            logger.warning(f"WebSocket error in session {session_id}: {ws.exception()}")
+
+    # 连接断开：取消进行中的指令，会话保留到过期（可用同一 session_id 重连）
+    manager.cancel(session_id, "连接已断开")
+    for task in list(tasks):
+        task.cancel()
+    return ws
+
+
+def main():
+    from src.utils.config import config
+
+    parser = argparse.ArgumentParser(description="VoxAgent 无界面多会话服务")
+    parser.add_argument("--host", default=config.get("server.host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=config.get("server.port", 8765))
+    args = parser.parse_args()
+
+    manager = create_manager(config)
+    app = create_app(manager, worker_threads=config.get("server.worker_threads", 32))
+    logger.info(f"VoxAgent server listening on http://{args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : batch.py
+
+批量文字指令运行器：不经过麦克风，按 规划 → 执行 → 总结 处理 JSONL/标准输入中的指令，
+逐条输出结果、各阶段耗时和 token 用量（JSONL），用于吞吐量回归测试和无人值守的批量任务。
+
+用法：
+    python -m src.server.batch commands.jsonl -o results.jsonl --concurrency 4
+    echo '{"id": "1", "text": "搜索北京天气"}' | python -m src.server.batch
+    python -m src.server.batch commands.jsonl --stub-latency 0.2   # 使用假模型测试流水线吞吐量
+
+输入每行为 {"id": ..., "text": ...}、JSON 字符串或纯文本。
+"""
+
+import argparse
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from pydantic import BaseModel, Field
+
+from src.core.processor import CommandProcessor
+from src.server.session import HeadlessHost, SessionProcessor
+from src.services.LLMFactory import LLMFactory
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+
+# 当前指令的 token 用量收集器（随上下文传递到规划/执行线程和所有 LLM 调用）
+_usage_handler: ContextVar[Optional[UsageMetadataCallbackHandler]] = ContextVar(
+    "voxagent_batch_usage", default=None
+)
+register_configure_hook(_usage_handler, inheritable=True)
+
+STAGES = ("plan", "execute", "summary", "total")
+
+
+class BatchCommand(BaseModel):
+    """一条批量指令"""
+    id: str
+    text: str
+
+
+class BatchResult(BaseModel):
+    """一条指令的处理结果"""
+    id: str
+    text: str
+    status: str  # success / failed / clarification / timeout / cancelled / error
+    reply: str = ""
+    plan_source: str = ""  # llm / router / plan_cache
+    plan: List[Dict[str, Any]] = Field(default_factory=list)
+    steps: List[Dict[str, Any]] = Field(default_factory=list)
+    timings: Dict[str, float] = Field(default_factory=dict)
+    tokens: Dict[str, int] = Field(default_factory=dict)
+    tokens_by_model: Dict[str, Dict[str, int]] = Field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class BatchRunner:
+    """
+    批量运行器 - 每个并发槽位一个 SessionProcessor（共享引擎，对话状态和 Agent 实例独立）
+
+    指令之间互不影响：需要澄清的指令记为 clarification 并重置对话，不进入多轮对话。
+    """
+
+    def __init__(self, engine: CommandProcessor, host: HeadlessHost, concurrency: int = 4):
+        self.concurrency = max(1, concurrency)
+        self._processors: "queue.Queue[SessionProcessor]" = queue.Queue()
+        for i in range(self.concurrency):
+            self._processors.put(SessionProcessor(host, engine, f"batch-{i}"))
+
+    def run(
+            self,
+            commands: Iterable[BatchCommand],
+            on_result: Optional[Callable[[BatchResult], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        并发处理所有指令（按完成顺序回调 on_result），返回汇总统计
+
+        输入按需读取（最多预取 2 倍并发数），可处理标准输入流。
+        """
+        results: List[BatchResult] = []
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+
+        def process(command: BatchCommand):
+            try:
+                result = self.run_one(command)
+                with lock:
+                    results.append(result)
+                    if on_result is not None:
+                        on_result(result)
+            finally:
+                slots.release()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+            for command in commands:
+                slots.acquire()
+                executor.submit(process, command)
+
+        return self.summarize(results, time.perf_counter() - start)
+
+    def run_one(self, command: BatchCommand) -> BatchResult:
+        """在空闲的处理器上处理一条指令"""
+        processor = self._processors.get()
+        try:
+            return self._run(processor, command)
+        finally:
+            processor.conversation_manager.reset()
+            self._processors.put(processor)
+
+    def _run(self, processor: SessionProcessor, command: BatchCommand) -> BatchResult:
+        handler = UsageMetadataCallbackHandler()
+        token = _usage_handler.set(handler)
+        timings: Dict[str, float] = {}
+        plan, execution_result, status, error = None, None, "error", None
+
+        processor.replies = []
+        processor.begin_command()
+        start = time.perf_counter()
+        try:
+            with tracer.span("batch.command", command_id=command.id):
+                query, history = processor._prepare_query(command.text, follow_up=False)
+                with self._timed(timings, "plan"):
+                    plan = processor._plan_query(query, history)
+                with self._timed(timings, "execute"):
+                    execution_result = processor._execute_plan(plan)
+                with self._timed(timings, "summary"):
+                    processor._respond(query, plan, execution_result, follow_up=False)
+            status = self._status(processor, plan, execution_result)
+
+        except Exception as e:
+            logger.error(f"Batch command {command.id} failed: {e}", exc_info=True)
+            error = str(e)
+
+        finally:
+            timings["total"] = time.perf_counter() - start
+            processor.command_token = None
+            _usage_handler.reset(token)
+
+        return BatchResult(
+            id=command.id,
+            text=command.text,
+            status=status,
+            reply="\n".join(processor.replies),
+            plan_source=self._plan_source(plan) if plan is not None else "",
+            plan=[{"agent": t.assigned_agent, "description": t.description} for t in plan.tasks] if plan else [],
+            steps=self._steps(execution_result),
+            timings=timings,
+            tokens=self._total_tokens(handler.usage_metadata),
+            tokens_by_model={
+                model: {k: usage.get(k, 0) for k in ("input_tokens", "output_tokens", "total_tokens")}
+                for model, usage in handler.usage_metadata.items()
+            },
+            error=error or (plan.metadata.get("error") if plan is not None else None)
+        )
+
+    @staticmethod
+    @contextmanager
+    def _timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    @staticmethod
+    def _status(processor: SessionProcessor, plan, execution_result: Dict[str, Any]) -> str:
+        interrupted = processor._interruption(plan, execution_result)
+        if interrupted:
+            return interrupted
+        if processor.conversation_active:
+            return "clarification"
+        return "success" if processor._is_execution_successful(execution_result) else "failed"
+
+    @staticmethod
+    def _plan_source(plan) -> str:
+        for source in ("router", "plan_cache"):
+            if source in plan.metadata:
+                return source
+        return "llm"
+
+    @staticmethod
+    def _steps(execution_result: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        orchestrator_result = (execution_result or {}).get("orchestrator_result") or {}
+        return [
+            {
+                "step_id": step.get("step_id"),
+                "status": step.get("status"),
+                "tool_calls": len(step.get("tool_calls") or []),
+                "reused": bool(step.get("reused")),
+                "error": step.get("error")
+            }
+            for step in orchestrator_result.get("results", [])
+        ]
+
+    @staticmethod
+    def _total_tokens(usage_by_model: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+        totals = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        for usage in usage_by_model.values():
+            for key in totals:
+                totals[key] += usage.get(key, 0)
+        return totals
+
+    @staticmethod
+    def summarize(results: List[BatchResult], elapsed: float) -> Dict[str, Any]:
+        """汇总：各状态数量、吞吐量、各阶段 p50/p95（秒）和 token 总量"""
+        statuses: Dict[str, int] = {}
+        for result in results:
+            statuses[result.status] = statuses.get(result.status, 0) + 1
+
+        def percentile(samples: List[float], q: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        stages = {}
+        for stage in STAGES:
+            samples = sorted(r.timings[stage] for r in results if stage in r.timings)
+            stages[stage] = {"p50": percentile(samples, 0.5), "p95": percentile(samples, 0.95)}
+
+        return {
+            "commands": len(results),
+            "statuses": statuses,
+            "elapsed": elapsed,
+            "throughput": len(results) / elapsed if elapsed else 0.0,
+            "stages": stages,
+            "tokens": BatchRunner._total_tokens({r.id: r.tokens for r in results})
+        }
+
+
+def read_commands(stream: IO[str]) -> Iterator[BatchCommand]:
+    """逐行读取指令：{"id", "text"} 对象、JSON 字符串或纯文本，跳过空行"""
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            data = line
+
+        if isinstance(data, dict):
+            text = str(data.get("text") or "").strip()
+            command_id = str(data.get("id") or number)
+        else:
+            text, command_id = str(data).strip(), str(number)
+
+        if not text:
+            logger.warning(f"Line {number}: missing text, skipped")
+            continue
+        yield BatchCommand(id=command_id, text=text)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    from src.utils.config import config
+
+    parser = argparse.ArgumentParser(description="VoxAgent 批量文字指令运行器")
+    parser.add_argument("input", nargs="?", default="-", help="指令 JSONL 文件，省略或 - 表示标准输入")
+    parser.add_argument("-o", "--output", default="-", help="结果 JSONL 文件，默认标准输出")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="同时处理的指令数")
+    parser.add_argument("--stub-latency", type=float, default=None, help="使用固定延迟的假模型（秒），不调用真实 LLM")
+    parser.add_argument("--quiet", action="store_true", help="只输出警告及以上日志")
+    args = parser.parse_args(argv)
+
+    # 结果写入标准输出时，日志改到标准错误
+    for handler in logger.handlers:
+        if isinstance(handler, logging.StreamHandler) and getattr(handler, "stream", None) is sys.stdout:
+            handler.setStream(sys.stderr)
+            if args.quiet:
+                handler.setLevel(logging.WARNING)
+
+    host = HeadlessHost(config)
+    if args.stub_latency is not None:
+        from src.server.load_test import build_stub_engine
+        engine = build_stub_engine(args.stub_latency)
+    else:
+        engine = CommandProcessor(host)
+        if not engine._initialize_system():
+            raise SystemExit("System initialization failed")
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    def write(result: BatchResult):
+        sink.write(result.model_dump_json() + "\n")
+        sink.flush()
+
+    try:
+        summary = BatchRunner(engine, host, concurrency=args.concurrency).run(read_commands(source), on_result=write)
+    finally:
+        if engine.plan_cache:
+            engine.plan_cache.flush(force=True)
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    stages = ", ".join(
+        f"{stage} p50 {summary['stages'][stage]['p50']:.2f}s / p95 {summary['stages'][stage]['p95']:.2f}s"
+        for stage in STAGES
+    )
+    print(
+        f"{summary['commands']} commands in {summary['elapsed']:.2f}s "
+        f"({summary['throughput']:.2f}/s), statuses {summary['statuses']}\n"
+        f"{stages}\n"
+        f"tokens {summary['tokens']}",
+        file=sys.stderr
+    )
+    for base_url, stats in LLMFactory.connection_stats().items():
+        print(
+            f"connections {base_url}: {stats['requests']} requests, {stats['new_connections']} new, "
+            f"reuse {stats['reuse_ratio']:.0%}",
+            file=sys.stderr
+        )
+    for llm_type, stats in LLMFactory.hedge_stats().items():
+        print(
+            f"hedging {llm_type}: {stats['requests']} requests, {stats['hedged']} hedged "
+            f"({stats['hedge_wins']} won), {stats['retries']} retries, {stats['denied']} over budget",
+            file=sys.stderr
+        )
+    for llm_type, backends in LLMFactory.router_stats().items():
+        routes = ", ".join(
+            f"{name} {stats['requests']} ({stats['errors']} errors, ~{stats['expected_latency']:.2f}s"
+            f"{', shed' if stats['shed'] else ''})"
+            for name, stats in backends.items()
+        )
+        print(f"routing {llm_type}: {routes}", file=sys.stderr)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
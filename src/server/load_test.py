@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : load_test.py
+
+无界面服务压测：启动进程内服务（规划/Worker/总结均使用固定延迟的假模型），
+模拟多个并发客户端各自发送多条指令，统计吞吐量和延迟。
+
+用法：
+    python -m src.server.load_test --clients 20 --commands 5 --latency 0.2
+    python -m src.server.load_test --url http://127.0.0.1:8765   # 压测已运行的服务
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DEFAULT_COMMANDS = [
+    "在桌面创建 notes.txt",
+    "搜索北京明天的天气",
+    "把会议纪要写入 todo.txt",
+    "搜索最新的科技新闻",
+]
+
+
+class StubChatModel(BaseChatModel):
+    """
+    固定延迟的假模型
+
+    绑定输出结构工具（规划器）时流式输出单步骤计划，Worker Agent 调用时直接给出最终答复，
+    其余调用（总结、错误分析）返回固定文本。
+    """
+
+    latency: float = 0.2
+    agent: str = "file"
+    chunk_size: int = 16
+    structured: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        if tool_choice:
+            return self.model_copy(update={"structured": True})
+        return self
+
+    def _message(self, messages, **kwargs) -> AIMessage:
+        query = messages[-1].content if messages else ""
+        if self.structured:
+            plan = {
+                "task": query,
+                "feasibility": "feasible",
+                "reason": "",
+                "steps": [{
+                    "step_number": 1,
+                    "assigned_agent": self.agent,
+                    "description": query,
+                    "expected_result": "完成",
+                    "depends_on": []
+                }]
+            }
+            message = AIMessage(content="", tool_calls=[{"name": "PlannerOutput", "args": plan, "id": "plan"}])
+        elif kwargs.get("tools"):
+            message = AIMessage(content="已完成")
+        else:
+            message = AIMessage(content="好的，已经完成了。")
+
+        # 按字符数估算 token 用量
+        input_tokens = sum(len(str(m.content)) for m in messages)
+        output_tokens = len(message.content) + len(json.dumps(message.tool_calls, ensure_ascii=False))
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+        message.response_metadata = {"model_name": "stub"}
+        return message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, **kwargs))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, **kwargs))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        message = self._message(messages, **kwargs)
+        if message.tool_calls:
+            arguments = json.dumps(message.tool_calls[0]["args"], ensure_ascii=False)
+            for i in range(0, len(arguments), self.chunk_size):
+                yield ChatGenerationChunk(message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[{
+                        "name": "PlannerOutput" if i == 0 else None,
+                        "args": arguments[i:i + self.chunk_size],
+                        "id": "plan" if i == 0 else None,
+                        "index": 0
+                    }]
+                ))
+        else:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=message.content))
+
+        # 最后一块带上用量（与 OpenAI stream_options.include_usage 一致）
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            usage_metadata=message.usage_metadata,
+            response_metadata=message.response_metadata
+        ))
+
+
+def build_stub_engine(latency: float):
+    """用假模型初始化共享引擎（关闭意图路由和计划缓存，使每条指令都经过规划、执行和总结）"""
+    from src.core.processor import CommandProcessor
+    from src.server.session import HeadlessHost
+    from src.services.LLMFactory import LLMFactory
+    from src.utils.config import config
+
+    stub = StubChatModel(latency=latency)
+    for llm_type in ("planner", "worker", "summary"):
+        LLMFactory._instances[llm_type] = stub
+
+    engine = CommandProcessor(HeadlessHost(config))
+    if not engine._initialize_system():
+        raise RuntimeError("System initialization failed")
+
+    stub.agent = next(iter(engine.agents))
+    engine.intent_router = None
+    engine.plan_cache = None
+    return engine
+
+
+async def run_client(
+        http: aiohttp.ClientSession,
+        url: str,
+        commands: List[str],
+        latencies: List[float],
+        statuses: Dict[int, int]
+):
+    """一个客户端：创建会话后依次发送指令"""
+    async with http.post(f"{url}/sessions") as response:
+        if response.status != 201:
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            return
+        session_id = (await response.json())["session_id"]
+
+    for text in commands:
+        start = time.perf_counter()
+        async with http.post(f"{url}/sessions/{session_id}/commands", json={"text": text}) as response:
+            await response.read()
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            if response.status == 200:
+                latencies.append(time.perf_counter() - start)
+
+    await http.delete(f"{url}/sessions/{session_id}")
+
+
+async def load_test(url: str, clients: int, commands_per_client: int) -> Dict[str, Any]:
+    """并发运行多个客户端，返回吞吐量、延迟分位数和服务端统计"""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    commands = [DEFAULT_COMMANDS[i % len(DEFAULT_COMMANDS)] for i in range(commands_per_client)]
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(run_client(http, url, commands, latencies, statuses) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+        async with http.get(f"{url}/stats") as response:
+            server_stats = await response.json()
+
+    latencies.sort()
+
+    def percentile(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+    return {
+        "clients": clients,
+        "commands": clients * commands_per_client,
+        "statuses": statuses,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(0.5),
+        "latency_p95": percentile(0.95),
+        "latency_max": latencies[-1] if latencies else 0.0,
+        "server": server_stats
+    }
+
+
+async def run_local(args) -> Dict[str, Any]:
+    """启动进程内服务（假模型）并压测"""
+    from src.server.app import create_app, create_manager
+    from src.utils.config import config
+
+    engine = build_stub_engine(args.latency)
+    manager = create_manager(config, engine=engine, global_concurrency=args.global_concurrency)
+
+    runner = web.AppRunner(create_app(manager, worker_threads=args.clients + 4))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    try:
+        return await load_test(f"http://127.0.0.1:{port}", args.clients, args.commands)
+    finally:
+        await runner.cleanup()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="VoxAgent 无界面服务压测")
+    parser.add_argument("--url", help="已运行的服务地址，不填则启动进程内服务（假模型）")
+    parser.add_argument("--clients", type=int, default=20, help="并发客户端（会话）数")
+    parser.add_argument("--commands", type=int, default=5, help="每个客户端发送的指令数")
+    parser.add_argument("--latency", type=float, default=0.2, help="假模型每次调用的延迟（秒）")
+    parser.add_argument("--global-concurrency", type=int, default=8, help="进程内服务的全局并发上限")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        report = asyncio.run(load_test(args.url.rstrip("/"), args.clients, args.commands))
+    else:
+        report = asyncio.run(run_local(args))
+
+    print(f"\n{report['commands']} commands from {report['clients']} clients in {report['elapsed']:.2f}s")
+    print(f"Throughput: {report['throughput']:.1f} commands/s")
+    print(
+        f"Latency: p50 {report['latency_p50'] * 1000:.0f}ms, p95 {report['latency_p95'] * 1000:.0f}ms, "
+        f"max {report['latency_max'] * 1000:.0f}ms"
+    )
+    print(f"Status codes: {report['statuses']}")
+    print(f"Server: {json.dumps(report['server'], ensure_ascii=False)}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
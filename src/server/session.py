@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : session.py
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from src.core.processor import CommandProcessor
+from src.utils.logger import logger
+from src.utils.tracing import tracer
+
+
+class ServerBusy(Exception):
+    """全局并发已满，在排队超时内没有空位"""
+
+
+class SessionBusy(Exception):
+    """会话排队的指令数已达上限"""
+
+
+class SessionLimitReached(Exception):
+    """会话数已达上限"""
+
+
+class HeadlessHost:
+    """
+    无界面宿主 - 代替 VoiceAssistant 提供给 CommandProcessor
+
+    没有录音器、唤醒词检测器和扬声器；ASR 在第一条音频指令到达时加载，所有会话共用。
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.detector = None
+        self.recorder = None
+        self.is_processing = False
+
+        self.asr_client = None
+        self.asr_provider = None
+        self.asr_language = "zh"
+        self.asr_lock = threading.Lock()  # 本地 Whisper 模型不支持并发推理
+        self._asr_attempted = False
+
+    def wait_until_ready(self, stage: str, timeout: Optional[float] = None) -> bool:
+        """Agent 栈在服务启动时已初始化；ASR 按需加载"""
+        if stage != "asr":
+            return True
+
+        with self.asr_lock:
+            if self.asr_client is None and not self._asr_attempted:
+                self._asr_attempted = True
+                from src.core.initializer import AssistantInitializer
+                AssistantInitializer(self)._init_asr()
+        return self.asr_client is not None
+
+
+class SessionProcessor(CommandProcessor):
+    """
+    会话级命令处理器 - 每个客户端会话一个实例
+
+    共享引擎中无状态或线程安全的组件（LLM 客户端、规划器、总结器、意图路由、计划缓存、工具注册中心），
+    会话独立持有对话状态、Agent 实例（AgentPool.fork）、编排器及其检查点、截止时间和取消令牌。
+    语音播报改为收集文字回复，由服务端返回给客户端。
+    """
+
+    def __init__(self, host: HeadlessHost, engine: CommandProcessor, session_id: str):
+        super().__init__(host)
+        self.session_id = session_id
+
+        self.llm = engine.llm
+        self.planner = engine.planner
+        self.summarizer = engine.summarizer
+        self.error_analyzer = engine.error_analyzer
+        self.error_handler = engine.error_handler
+        self.intent_router = engine.intent_router
+        self.plan_cache = engine.plan_cache
+
+        self.agents = self._fork_agents(engine.agents)
+        self.orchestrator = self._create_orchestrator(self.agents)
+        self._initialized = True
+
+        self.replies: List[str] = []
+        self.created_at = time.time()
+        self.last_active = self.created_at
+
+    @staticmethod
+    def _fork_agents(agents):
+        """Agent 实例有对话状态和执行器设置，会话之间不能共用"""
+        fork = getattr(agents, "fork", None)
+        if fork is not None:
+            return fork()
+
+        from src.core.agent.agents.base_agent import AgentPool
+        from src.core.tools import tool_registry
+        from src.services.LLMFactory import LLMFactory
+        logger.info("Engine agents are not pooled, building a lazy pool for the session")
+        return AgentPool(list(agents), llm=LLMFactory.get_worker_llm(), tool_manager=tool_registry)
+
+    @property
+    def conversation_active(self) -> bool:
+        return bool(self.conversation_manager.state["active"])
+
+    def handle_text(self, text: str, on_event: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        处理一条文字指令（对话进行中时作为补充输入），返回本轮的文字回复
+
+        Args:
+            text: 指令文本
+            on_event: 进度回调（计划、总结等），同 CommandProcessor.callback
+        """
+        start = time.time()
+        self.last_active = start
+        self.replies = []
+        self.callback = on_event
+        self.begin_command()
+
+        try:
+            with tracer.span("process_command", session=self.session_id):
+                if self._is_cancel_phrase(text):
+                    self.conversation_manager.reset()
+                    self._simple_tts_feedback("好的，已取消")
+                elif self.conversation_active:
+                    self._handle_follow_up_input(text)
+                else:
+                    self._handle_new_query(text)
+
+            if self.cancelled:
+                self.conversation_manager.reset()
+
+        except Exception as e:
+            logger.error(f"Session {self.session_id} processing failed: {e}", exc_info=True)
+            self.conversation_manager.reset()
+            self._simple_tts_feedback("抱歉，处理过程中遇到了错误")
+
+        finally:
+            cancelled = self.cancelled
+            self.command_token = None
+            self.callback = None
+            self.last_active = time.time()
+
+        return {
+            "session_id": self.session_id,
+            "text": text,
+            "replies": list(self.replies),
+            "conversation_active": self.conversation_active,
+            "cancelled": cancelled,
+            "elapsed": self.last_active - start
+        }
+
+    def handle_audio(self, audio_data: bytes, on_event: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """识别一段 WAV 音频后按文字指令处理"""
+        text = self.audio_handler.transcribe_audio(audio_data)
+        if not text:
+            return {
+                "session_id": self.session_id,
+                "text": "",
+                "replies": ["没有听清楚，请再说一次"],
+                "conversation_active": self.conversation_active,
+                "cancelled": False,
+                "elapsed": 0.0
+            }
+        return self.handle_text(text, on_event)
+
+    def _play_processing_prompt(self):
+        """无界面模式不播放处理中提示"""
+
+    def _text_to_speech(self, text: str):
+        """收集回复文字（已取消时丢弃）"""
+        if self.cancelled or not text or not text.strip():
+            return
+        self.replies.append(text)
+
+    def _speak_stream(self, sentences: Iterable[str]):
+        """流式总结按整段收集为一条回复"""
+        self._text_to_speech("".join(sentences))
+
+    def _simple_tts_feedback(self, message: str):
+        self._text_to_speech(message)
+
+
+class ServerSession:
+    """会话：处理器 + 会话级排队上限"""
+
+    def __init__(self, processor: SessionProcessor, max_pending: int = 2):
+        self.processor = processor
+        self.max_pending = max(1, max_pending)
+        self.lock = threading.Lock()  # 同一会话的指令按顺序处理（共享对话状态）
+        self.pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def session_id(self) -> str:
+        return self.processor.session_id
+
+    @property
+    def busy(self) -> bool:
+        return self.pending > 0
+
+    def reserve(self):
+        """占用一个排队名额，已满时抛出 SessionBusy"""
+        with self._pending_lock:
+            if self.pending >= self.max_pending:
+                raise SessionBusy(f"会话 {self.session_id} 已有 {self.pending} 条指令在处理")
+            self.pending += 1
+
+    def release(self):
+        with self._pending_lock:
+            self.pending -= 1
+
+
+class SessionManager:
+    """
+    会话管理器 - 创建/过期会话，并施加会话级和全局并发上限
+
+    每个会话同一时间只处理一条指令（其余最多排队 per_session_pending 条）；
+    所有会话合计同时处理的指令数不超过 global_concurrency，排队超过 queue_timeout 秒则拒绝。
+    """
+
+    def __init__(
+            self,
+            engine: CommandProcessor,
+            host: HeadlessHost,
+            max_sessions: int = 100,
+            global_concurrency: int = 8,
+            per_session_pending: int = 2,
+            queue_timeout: float = 30.0,
+            session_ttl: float = 1800.0,
+            window: int = 500
+    ):
+        """
+        Args:
+            engine: 已初始化的共享 CommandProcessor（提供 LLM、规划器等共享组件）
+            host: 无界面宿主
+            max_sessions: 最大会话数（超出时先清理过期会话）
+            global_concurrency: 全局同时处理的指令数
+            per_session_pending: 每个会话最多排队（含处理中）的指令数
+            queue_timeout: 等待全局空位的最长时间（秒）
+            session_ttl: 会话空闲多久后过期（秒）
+            window: 延迟统计的样本数
+        """
+        self.engine = engine
+        self.host = host
+        self.max_sessions = max_sessions
+        self.global_concurrency = max(1, global_concurrency)
+        self.per_session_pending = per_session_pending
+        self.queue_timeout = queue_timeout
+        self.session_ttl = session_ttl
+
+        self._sessions: Dict[str, ServerSession] = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.global_concurrency)
+
+        self._counters = {"commands": 0, "completed": 0, "failed": 0, "rejected": 0, "active": 0}
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._waits: Deque[float] = deque(maxlen=window)
+
+    def create(self, session_id: Optional[str] = None) -> ServerSession:
+        """创建会话（已存在时直接返回）"""
+        with self._lock:
+            if session_id and session_id in self._sessions:
+                return self._sessions[session_id]
+
+            if len(self._sessions) >= self.max_sessions:
+                self._expire_locked(time.time())
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitReached(f"会话数已达上限 {self.max_sessions}")
+
+            session_id = session_id or uuid.uuid4().hex
+            processor = SessionProcessor(self.host, self.engine, session_id)
+            session = ServerSession(processor, max_pending=self.per_session_pending)
+            self._sessions[session_id] = session
+
+        logger.info(f"Session created: {session_id} ({len(self._sessions)} active)")
+        return session
+
+    def get(self, session_id: str) -> Optional[ServerSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id: str) -> bool:
+        """关闭会话（取消其进行中的指令）"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+
+        session.processor.cancel("会话已关闭")
+        logger.info(f"Session closed: {session_id}")
+        return True
+
+    def cancel(self, session_id: str, reason: str = "已取消") -> bool:
+        """取消会话中正在处理的指令"""
+        session = self.get(session_id)
+        return session is not None and session.processor.cancel(reason)
+
+    def expire_idle(self) -> int:
+        """清理空闲超过 session_ttl 的会话，返回清理数"""
+        with self._lock:
+            return self._expire_locked(time.time())
+
+    def _expire_locked(self, now: float) -> int:
+        expired = [
+            sid for sid, session in self._sessions.items()
+            if not session.busy and now - session.processor.last_active > self.session_ttl
+        ]
+        for sid in expired:
+            del self._sessions[sid]
+        if expired:
+            logger.info(f"Expired {len(expired)} idle sessions")
+        return len(expired)
+
+    def handle(
+            self,
+            session_id: Optional[str],
+            text: Optional[str] = None,
+            audio: Optional[bytes] = None,
+            on_event: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        在会话中处理一条文字或音频指令（阻塞，由服务端在线程池中调用）
+
+        Raises:
+            SessionBusy: 会话排队已满
+            ServerBusy: 等待全局空位超时
+            SessionLimitReached: 会话数已达上限
+        """
+        session = self.get(session_id) if session_id else None
+        if session is None:
+            session = self.create(session_id)
+
+        try:
+            session.reserve()
+        except SessionBusy:
+            self._count("rejected")
+            raise
+
+        try:
+            with session.lock:
+                queued_at = time.time()
+                if not self._slots.acquire(timeout=self.queue_timeout):
+                    self._count("rejected")
+                    raise ServerBusy(f"服务繁忙（{self.global_concurrency} 条指令处理中）")
+
+                try:
+                    self._count("commands", "active")
+                    started = time.time()
+                    if audio is not None:
+                        result = session.processor.handle_audio(audio, on_event)
+                    else:
+                        result = session.processor.handle_text(text or "", on_event)
+                    self._record(started - queued_at, time.time() - started)
+                    self._count("completed")
+                    return result
+                except Exception:
+                    self._count("failed")
+                    raise
+                finally:
+                    self._count_down("active")
+                    self._slots.release()
+        finally:
+            session.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """会话数、指令计数、排队等待与处理耗时 p50/p95（秒）"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["sessions"] = len(self._sessions)
+            latencies = sorted(self._latencies)
+            waits = sorted(self._waits)
+
+        stats["latency_p50"] = self._percentile(latencies, 0.5)
+        stats["latency_p95"] = self._percentile(latencies, 0.95)
+        stats["wait_p50"] = self._percentile(waits, 0.5)
+        stats["wait_p95"] = self._percentile(waits, 0.95)
+        return stats
+
+    def _record(self, wait: float, latency: float):
+        with self._lock:
+            self._waits.append(wait)
+            self._latencies.append(latency)
+
+    def _count(self, *names: str):
+        with self._lock:
+            for name in names:
+                self._counters[name] += 1
+
+    def _count_down(self, name: str):
+        with self._lock:
+            self._counters[name] -= 1
+
+    @staticmethod
+    def _percentile(samples: List[float], q: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
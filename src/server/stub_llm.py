@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : stub_llm.py
+
+本地 OpenAI 兼容的假 LLM 服务（/v1/chat/completions），用于在可控延迟下压测编排器、规划器和多会话服务：
+- 可配置首 token 延迟（TTFT）和输出速度（tokens/s），支持流式（SSE）和非流式；
+  可按比例让部分请求使用更长的首 token 延迟，模拟云端长尾
+- 支持工具调用：强制调用 PlannerOutput 时根据系统提示中的 Agent 列表生成单步骤计划，
+  其余强制调用按参数 JSON Schema 生成最小参数；也可用脚本规则指定回复或工具调用
+- 故障注入：按比例返回 429 / 500 或挂起请求（模拟超时）
+
+用法：
+    python -m src.server.stub_llm --port 8766 --ttft 0.3 --tps 40 --rate-limit 0.05
+    # 将 qiniu.base_url（或环境变量 QINIU_BASE_URL）设为 http://127.0.0.1:8766/v1，QINIU_API_KEY 任意填写
+
+脚本规则文件（YAML/JSON 列表，按顺序匹配最后一条用户消息，首条命中生效）：
+    - match: "天气"                 # 正则
+      agent: "search"               # 规划请求：计划分配给该 Agent
+    - match: "创建.*文件"
+      tool: "create_file"           # Worker 请求：调用该工具（工具结果返回后给出最终答复）
+      args: {"path": "notes.txt"}
+    - match: ".*"
+      content: "好的，已经完成了。"   # 文本回复
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+from aiohttp import web
+from pydantic import BaseModel, Field
+
+from src.utils.logger import logger
+
+PLANNER_TOOL = "PlannerOutput"
+
+# 近似分词：中文按字，英文/数字按词，标点单独成 token（前导空白并入下一个 token）
+_TOKEN_PATTERN = re.compile(r"\s*(?:[\u4e00-\u9fff]|[^\W\u4e00-\u9fff]+|[^\w\s])|\s+$")
+# 规划提示词中的 Agent 列表行：- file: 文件管理
+_AGENT_LINE = re.compile(r"^- (\w+): ", re.MULTILINE)
+
+
+class StubRule(BaseModel):
+    """脚本规则"""
+    match: str = ".*"
+    content: Optional[str] = None
+    tool: Optional[str] = None
+    args: Dict[str, Any] = Field(default_factory=dict)
+    agent: Optional[str] = None
+
+
+class StubSettings(BaseModel):
+    """假服务的延迟和故障注入参数（运行中可通过 POST /_stub/config 修改）"""
+    ttft: float = 0.3                 # 首 token 延迟（秒）
+    slow_rate: float = 0.0            # 慢请求比例（模拟长尾延迟）
+    slow_ttft: float = 3.0            # 慢请求的首 token 延迟（秒）
+    tokens_per_second: float = 50.0   # 输出速度，<= 0 表示不限速
+    rate_limit_rate: float = 0.0      # 返回 429 的比例
+    server_error_rate: float = 0.0    # 返回 500 的比例
+    timeout_rate: float = 0.0         # 挂起不响应的比例（模拟超时）
+    hang_seconds: float = 600.0       # 挂起时长（秒）
+    retry_after: float = 1.0          # 429 响应的 Retry-After（秒）
+    seed: Optional[int] = None        # 故障注入随机种子
+    rules: List[StubRule] = Field(default_factory=list)
+
+
+def count_tokens(text: str) -> int:
+    """近似 token 数"""
+    return len(_TOKEN_PATTERN.findall(text or ""))
+
+
+def split_tokens(text: str) -> List[str]:
+    """按近似 token 切分（拼接后与原文一致）"""
+    return _TOKEN_PATTERN.findall(text or "")
+
+
+def _text(content: Any) -> str:
+    """消息内容（字符串或多段内容）转为文本"""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _sample_args(schema: Dict[str, Any], query: str) -> Any:
+    """按 JSON Schema 生成最小参数：必填字段、枚举取第一个值、字符串填入用户输入"""
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "anyOf" in schema:
+        return _sample_args(schema["anyOf"][0], query)
+
+    kind = schema.get("type")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        return {
+            name: _sample_args(properties[name], query)
+            for name in schema.get("required", [])
+            if name in properties
+        }
+    if kind == "array":
+        return []
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "boolean":
+        return False
+    if kind == "null":
+        return None
+    return query
+
+
+class StubLLM:
+    """按请求生成回复（规则优先，其次按请求类型给出默认回复），并统计请求"""
+
+    def __init__(self, settings: Optional[StubSettings] = None):
+        self.settings = settings or StubSettings()
+        self._random = random.Random(self.settings.seed)
+        self.active = 0
+        self.peak = 0
+        self.total = 0
+        self.slow = 0
+        self.statuses: Dict[str, int] = {}
+
+    def configure(self, **updates) -> StubSettings:
+        """修改参数（未提供的保持不变）"""
+        data = self.settings.model_dump()
+        data.update(updates)
+        self.settings = StubSettings.model_validate(data)
+        if "seed" in updates:
+            self._random = random.Random(self.settings.seed)
+        return self.settings
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "peak": self.peak,
+            "total": self.total,
+            "slow": self.slow,
+            "statuses": dict(self.statuses)
+        }
+
+    def count(self, status: str):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def fault(self) -> Optional[str]:
+        """按比例抽取本次请求要注入的故障：rate_limit / server_error / timeout"""
+        roll = self._random.random()
+        for fault, rate in (
+                ("rate_limit", self.settings.rate_limit_rate),
+                ("server_error", self.settings.server_error_rate),
+                ("timeout", self.settings.timeout_rate)
+        ):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    def sample_ttft(self) -> float:
+        """本次请求的首 token 延迟：按 slow_rate 抽中的慢请求使用 slow_ttft"""
+        if self.settings.slow_rate > 0 and self._random.random() < self.settings.slow_rate:
+            self.slow += 1
+            return self.settings.slow_ttft
+        return self.settings.ttft
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        生成回复
+
+        Returns:
+            (文本, 工具调用列表 [{"name", "arguments"}])
+        """
+        messages = body.get("messages") or []
+        tools = {
+            tool["function"]["name"]: tool["function"]
+            for tool in body.get("tools") or []
+            if tool.get("type") == "function"
+        }
+        forced = self._forced_tool(body.get("tool_choice"))
+        query = next((_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+        rule = next((r for r in self.settings.rules if re.search(r.match, query)), None)
+
+        if forced == PLANNER_TOOL:
+            return "", [self._call(PLANNER_TOOL, self._plan(messages, query, rule))]
+
+        if forced:
+            if rule and rule.tool == forced:
+                return "", [self._call(forced, rule.args)]
+            schema = (tools.get(forced) or {}).get("parameters") or {}
+            return "", [self._call(forced, _sample_args(schema, query))]
+
+        # Worker：有工具且尚未拿到工具结果时，按规则调用工具
+        has_tool_result = bool(messages) and messages[-1].get("role") == "tool"
+        if rule and rule.tool and rule.tool in tools and not has_tool_result:
+            return "", [self._call(rule.tool, rule.args)]
+
+        if rule and rule.content is not None:
+            return rule.content, []
+        if tools:
+            return f"已完成：{query}", []
+        return "好的，已经完成了。", []
+
+    @staticmethod
+    def _forced_tool(tool_choice: Any) -> Optional[str]:
+        if isinstance(tool_choice, dict):
+            return (tool_choice.get("function") or {}).get("name")
+        return None
+
+    @staticmethod
+    def _call(name: str, args: Any) -> Dict[str, Any]:
+        return {"name": name, "arguments": json.dumps(args, ensure_ascii=False)}
+
+    @staticmethod
+    def _plan(messages: List[Dict[str, Any]], query: str, rule: Optional[StubRule]) -> Dict[str, Any]:
+        """单步骤计划，分配给规则指定的 Agent 或系统提示中列出的第一个 Agent"""
+        system = "\n".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+        agents = _AGENT_LINE.findall(system)
+        agent = rule.agent if rule and rule.agent else (agents[0] if agents else "file")
+        return {
+            "task": query,
+            "feasibility": "feasible",
+            "reason": "",
+            "steps": [{
+                "step_number": 1,
+                "assigned_agent": agent,
+                "description": query,
+                "expected_result": "完成",
+                "depends_on": []
+            }]
+        }
+
+
+STUB_KEY = web.AppKey("stub", StubLLM)
+
+
+def create_stub_app(stub: Optional[StubLLM] = None) -> web.Application:
+    """创建假服务应用"""
+    app = web.Application()
+    app[STUB_KEY] = stub or StubLLM()
+
+    for prefix in ("/v1", ""):
+        app.router.add_post(f"{prefix}/chat/completions", chat_completions)
+        app.router.add_get(f"{prefix}/models", list_models)
+    app.router.add_post("/_stub/config", update_config)
+    app.router.add_get("/_stub/stats", get_stats)
+    return app
+
+
+def _error(status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    """OpenAI 格式的错误响应"""
+    return web.json_response(
+        {"error": {"message": message, "type": error_type, "code": status}},
+        status=status,
+        headers=headers
+    )
+
+
+async def chat_completions(request: web.Request) -> web.StreamResponse:
+    """POST /v1/chat/completions"""
+    stub = request.app[STUB_KEY]
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return _error(400, "Invalid JSON body", "invalid_request_error")
+
+    stub.total += 1
+    stub.active += 1
+    stub.peak = max(stub.peak, stub.active)
+    try:
+        fault = stub.fault()
+        if fault == "rate_limit":
+            stub.count("429")
+            return _error(
+                429, "Rate limit exceeded (stub)", "rate_limit_error",
+                headers={"Retry-After": f"{stub.settings.retry_after:g}"}
+            )
+        if fault == "server_error":
+            stub.count("500")
+            return _error(500, "Internal server error (stub)", "server_error")
+        if fault == "timeout":
+            stub.count("timeout")
+            await asyncio.sleep(stub.settings.hang_seconds)
+            return _error(504, "Timed out (stub)", "timeout")
+
+        content, tool_calls = stub.respond(body)
+        stub.count("200")
+        if body.get("stream"):
+            return await _stream(request, stub, body, content, tool_calls)
+        return await _complete(stub, body, content, tool_calls)
+    finally:
+        stub.active -= 1
+
+
+def _usage(body: Dict[str, Any], content: str, tool_calls: List[Dict[str, Any]]) -> Dict[str, int]:
+    prompt = count_tokens("\n".join(_text(m.get("content")) for m in body.get("messages") or []))
+    completion = count_tokens(content) + sum(count_tokens(call["arguments"]) for call in tool_calls)
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _tool_call(index: int, call: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": call["name"], "arguments": call["arguments"]}
+    }
+
+
+async def _complete(
+        stub: StubLLM,
+        body: Dict[str, Any],
+        content: str,
+        tool_calls: List[Dict[str, Any]]
+) -> web.Response:
+    """非流式：等待 TTFT + 全部 token 的生成时间后一次返回"""
+    usage = _usage(body, content, tool_calls)
+    delay = stub.sample_ttft()
+    if stub.settings.tokens_per_second > 0:
+        delay += usage["completion_tokens"] / stub.settings.tokens_per_second
+    await asyncio.sleep(delay)
+
+    message: Dict[str, Any] = {"role": "assistant", "content": content or None}
+    if tool_calls:
+        message["tool_calls"] = [_tool_call(i, call) for i, call in enumerate(tool_calls)]
+        for call in message["tool_calls"]:
+            call.pop("index")
+
+    return web.json_response({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model") or "stub",
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if tool_calls else "stop"
+        }],
+        "usage": usage
+    })
+
+
+async def _stream(
+        request: web.Request,
+        stub: StubLLM,
+        body: Dict[str, Any],
+        content: str,
+        tool_calls: List[Dict[str, Any]]
+) -> web.StreamResponse:
+    """流式（SSE）：TTFT 后按 tokens/s 逐 token 输出，最后按 stream_options.include_usage 输出用量"""
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model") or "stub"
+
+    async def send(delta: Optional[Dict[str, Any]], finish_reason: Optional[str] = None, usage=None):
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+        chunk["choices"] = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        if usage is not None:
+            chunk["usage"] = usage
+        await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    # 各 token 的增量：文本为 content，工具调用首块带 id/name，之后为参数片段
+    deltas: List[Dict[str, Any]] = [{"content": piece} for piece in split_tokens(content)]
+    for index, call in enumerate(tool_calls):
+        head = _tool_call(index, call)
+        head["function"]["arguments"] = ""
+        deltas.append({"tool_calls": [head]})
+        deltas.extend(
+            {"tool_calls": [{"index": index, "function": {"arguments": piece}}]}
+            for piece in split_tokens(call["arguments"])
+        )
+
+    start, ttft = time.perf_counter(), stub.sample_ttft()
+    await asyncio.sleep(ttft)
+    try:
+        await send({"role": "assistant", "content": ""})
+
+        tps = stub.settings.tokens_per_second
+        for i, delta in enumerate(deltas):
+            if tps > 0:
+                wait = start + ttft + i / tps - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            await send(delta)
+
+        await send({}, finish_reason="tool_calls" if tool_calls else "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await send(None, usage=_usage(body, content, tool_calls))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+    except ConnectionResetError:
+        # 客户端中途断开（如对冲请求落败被取消）
+        stub.count("disconnected")
+    return response
+
+
+async def list_models(request: web.Request) -> web.Response:
+    """GET /v1/models"""
+    return web.json_response({"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+
+
+async def update_config(request: web.Request) -> web.Response:
+    """POST /_stub/config：修改延迟、故障比例或规则，返回当前参数"""
+    try:
+        settings = request.app[STUB_KEY].configure(**await request.json())
+    except (json.JSONDecodeError, ValueError) as e:
+        return _error(400, str(e), "invalid_request_error")
+    return web.json_response(settings.model_dump())
+
+
+async def get_stats(request: web.Request) -> web.Response:
+    """GET /_stub/stats：当前/峰值并发、请求总数、慢请求数和各状态数量"""
+    return web.json_response(request.app[STUB_KEY].stats())
+
+
+def load_rules(path: str) -> List[StubRule]:
+    """读取脚本规则文件（YAML 或 JSON 列表）"""
+    data = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or []
+    return [StubRule.model_validate(item) for item in data]
+
+
+def main(argv: Optional[List[str]] = None):
+    from src.utils.config import config
+
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容假 LLM 服务")
+    parser.add_argument("--host", default=config.get("stub_llm.host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=config.get("stub_llm.port", 8766))
+    parser.add_argument("--ttft", type=float, default=config.get("stub_llm.ttft", 0.3), help="首 token 延迟（秒）")
+    parser.add_argument("--tps", type=float, default=config.get("stub_llm.tokens_per_second", 50.0), help="tokens/s")
+    parser.add_argument("--slow-rate", type=float, default=config.get("stub_llm.slow_rate", 0.0), help="慢请求比例")
+    parser.add_argument("--slow-ttft", type=float, default=config.get("stub_llm.slow_ttft", 3.0), help="慢请求首 token 延迟")
+    parser.add_argument("--rate-limit", type=float, default=config.get("stub_llm.rate_limit_rate", 0.0), help="429 比例")
+    parser.add_argument("--server-error", type=float, default=config.get("stub_llm.server_error_rate", 0.0), help="500 比例")
+    parser.add_argument("--timeout-rate", type=float, default=config.get("stub_llm.timeout_rate", 0.0), help="挂起比例")
+    parser.add_argument("--hang", type=float, default=config.get("stub_llm.hang_seconds", 600.0), help="挂起时长（秒）")
+    parser.add_argument("--seed", type=int, default=config.get("stub_llm.seed"))
+    parser.add_argument("--script", default=config.get("stub_llm.script") or None, help="脚本规则文件")
+    args = parser.parse_args(argv)
+
+    settings = StubSettings(
+        ttft=args.ttft,
+        slow_rate=args.slow_rate,
+        slow_ttft=args.slow_ttft,
+        tokens_per_second=args.tps,
+        rate_limit_rate=args.rate_limit,
+        server_error_rate=args.server_error,
+        timeout_rate=args.timeout_rate,
+        hang_seconds=args.hang,
+        seed=args.seed,
+        rules=load_rules(args.script) if args.script else []
+    )
+    logger.info(
+        f"Stub LLM listening on http://{args.host}:{args.port}/v1 "
+        f"(ttft={settings.ttft}s, tps={settings.tokens_per_second}, rules={len(settings.rules)})"
+    )
+    web.run_app(create_stub_app(StubLLM(settings)), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
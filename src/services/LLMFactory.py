@@ -6,9 +6,8 @@
 @File   : LLMFactory.py
 """
 
-from typing import Dict
+from typing import Any, Dict, Optional
 
-from langchain_community.chat_models import ChatOllama
 from langchain_openai import ChatOpenAI
 
 from src.utils.config import config
@@ -19,6 +18,11 @@ class LLMFactory:
     """LLM 工厂类 - 根据用途创建不同的模型"""
 
     _instances: Dict[str, ChatOpenAI] = {}
+    _cassette: Optional[Any] = None  # LLM 录制/回放文件（首次创建 LLM 时按配置加载，False 表示未启用）
+    _pools: Dict[str, Any] = {}  # base_url -> 共享 HTTP 连接池
+    _response_cache: Optional[Any] = None  # LLM 响应缓存（首次创建 LLM 时按配置加载，False 表示未启用）
+    _hedger: Optional[Any] = None  # 对冲请求的延迟统计和预算（首次创建 LLM 时按配置加载，False 表示未启用）
+    _router: Optional[Any] = None  # 云端/本地模型路由状态（首次创建 LLM 时按配置加载，False 表示未启用）
 
     @classmethod
     def get_llm(cls, llm_type: str = "worker") -> ChatOpenAI:
@@ -28,43 +32,23 @@ class LLMFactory:
             logger.debug(f"Using cached {llm_type} LLM")
             return cls._instances[llm_type]
 
-        api_key = config.get('qiniu.api_key')
-        base_url = config.get('qiniu.base_url')
-
-        model = config.get(f'qiniu.models.{llm_type}.model')
-        temperature = config.get(f'qiniu.models.{llm_type}.temperature', 0.0)
-        max_tokens = config.get(f'qiniu.models.{llm_type}.max_tokens', 500)
-
-        # 获取基础配置
-        if not model:
-            logger.warning(f"No config for {llm_type}, using defaults")
-            defaults = {
-                'planner': ('qwen3-max', 0.0, 500),
-                'worker': ('qwen3-next-80b-a3b-instruct', 0.0, 300),
-                'summary': ('qwen3-next-80b-a3b-instruct', 0.3, 200),
-            }
-            model, temperature, max_tokens = defaults.get(
-                llm_type,
-                ('qwen3-next-80b-a3b-instruct', 0.0, 500)
-            )
-
+        cassette = cls._get_cassette()
         try:
-            llm = ChatOpenAI(
-                api_key=api_key,
-                base_url=base_url,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
+            # 回放不访问网络，无需真实密钥
+            replay = cassette is not None and cassette.mode == "replay"
+            llm = cls._create_qiniu_llm(llm_type, api_key="cassette-replay" if replay else None)
+            model = llm.model_name
+
+            if cassette is not None:
+                from src.services.llm_cassette import CassetteChatModel
+                llm = CassetteChatModel(delegate=llm, cassette=cassette, name_in_cassette=f"{llm_type}:{model}")
+            else:
+                # 录制/回放时不使用响应缓存、对冲和路由，保证每次调用都经过录制层；缓存命中时不再发出请求
+                llm = cls._with_routing(cls._with_hedging(llm, llm_type), llm_type)
+                llm = cls._with_response_cache(llm, llm_type)
 
             # 缓存实例
             cls._instances[llm_type] = llm
-
-            logger.info(
-                f"Created {llm_type} LLM: "
-                f"model={model}, temp={temperature}, max_tokens={max_tokens}"
-            )
-
             return llm
 
         except Exception as e:
@@ -72,85 +56,221 @@ class LLMFactory:
             raise
 
     @classmethod
-    def _create_ollama_llm(cls) -> ChatOpenAI:
-        """创建 Ollama 本地模型"""
-        try:
-            ollama_config = config.get("ollama", {})
-
-            if not ollama_config.get("enabled", False):
-                raise ValueError("Ollama is not enabled in config")
-
-            model_name = ollama_config.get("model", "qwen2.5:7b")
-            base_url = ollama_config.get("base_url", "http://localhost:11434")
-            temperature = ollama_config.get("temperature", 0.0)
-            timeout = ollama_config.get("timeout", 60)
-
-            llm = ChatOllama(
-                model=model_name,
-                base_url=base_url,
-                temperature=temperature,
-                timeout=timeout,
-                num_ctx=4096,  # 上下文长度
-            )
+    def _get_cassette(cls):
+        """llm_cassette.mode 为 record / replay 时返回录制文件，否则返回 None"""
+        if cls._cassette is None:
+            from src.services.llm_cassette import create_cassette
+            cassette = create_cassette(config)
+            # Cassette 定义了 __len__，空录制文件为假值，需显式判断
+            cls._cassette = cassette if cassette is not None else False
+        return cls._cassette if cls._cassette is not False else None
 
-            logger.info(
-                f"Created Worker Ollama LLM: "
-                f"model={model_name}, "
-                f"temp={temperature}, "
-                f"base_url={base_url}"
-            )
+    @classmethod
+    def _with_response_cache(cls, llm, llm_type: str):
+        """按 llm_cache 配置为该类型 LLM 包装响应缓存"""
+        if cls._response_cache is None:
+            from src.services.llm_cache import create_response_cache
+            cache = create_response_cache(config)
+            cls._response_cache = cache if cache is not None else False
+        if cls._response_cache is False:
+            return llm
 
+        from src.services.llm_cache import CachedChatModel, CachePolicy, cache_policies
+        policy = cache_policies(config).get(llm_type, CachePolicy())
+        if not policy.enabled:
             return llm
+        return CachedChatModel(delegate=llm, response_cache=cls._response_cache, llm_type=llm_type, policy=policy)
 
-        except Exception as e:
-            logger.error(f"Failed to create Ollama LLM: {e}")
-            logger.warning("Falling back to Qiniu cloud for Worker")
-            # 降级到七牛云
-            return cls._create_qiniu_llm("worker")
+    @classmethod
+    def _with_hedging(cls, llm, llm_type: str):
+        """按 llm_hedging 配置为该类型 LLM 包装对冲请求"""
+        if cls._hedger is None:
+            from src.services.llm_hedging import create_hedger
+            hedger = create_hedger(config)
+            cls._hedger = hedger if hedger is not None else False
+        if cls._hedger is False:
+            return llm
+
+        from src.services.llm_hedging import HedgedChatModel, HedgePolicy, hedge_policies
+        policy = hedge_policies(config).get(llm_type, HedgePolicy())
+        if not policy.enabled:
+            return llm
+        return HedgedChatModel(delegate=llm, hedger=cls._hedger, llm_type=llm_type, policy=policy)
 
     @classmethod
-    def _create_qiniu_llm(cls, llm_type: str) -> ChatOpenAI:
-        """创建七牛云 LLM"""
-        try:
-            # 获取基础配置
-            qiniu_config = config.get("qiniu")
-            if not qiniu_config:
-                raise ValueError("Qiniu config not found")
-
-            # 获取模型特定配置
-            model_config = config.get(f"qiniu.models.{llm_type}")
-
-            if not model_config:
-                logger.warning(
-                    f"No specific config for {llm_type}, using default config"
-                )
-                model_config = {
-                    "model": "doubao-1.5-pro-32k",
-                    "temperature": 0.0,
-                    "max_tokens": 500
-                }
-
-            # 创建实例
-            llm = ChatOpenAI(
-                api_key=qiniu_config.get("api_key"),
-                base_url=qiniu_config.get("base_url"),
-                model=model_config.get("model"),
-                temperature=model_config.get("temperature", 0.0),
-                max_tokens=model_config.get("max_tokens", 500),
-            )
+    def _with_routing(cls, cloud_llm, llm_type: str):
+        """
+        按 llm_router 配置在云端和本地 Ollama 之间路由
+
+        llm_router.roles 中该类型只允许一个可用后端（或路由未启用）时直接返回该后端模型
+        """
+        if cls._router is None:
+            from src.services.llm_router import create_router
+            router = create_router(config)
+            cls._router = router if router is not None else False
+        if cls._router is False:
+            return cloud_llm
+
+        backends = {}
+        for name in config.get(f"llm_router.roles.{llm_type}") or ["cloud"]:
+            if name == "cloud":
+                backends[name] = cloud_llm
+            elif name == "local":
+                try:
+                    backends[name] = cls._create_ollama_llm(llm_type)
+                except Exception as e:
+                    logger.warning(f"Local LLM unavailable for {llm_type}: {e}")
+            else:
+                logger.warning(f"Unknown LLM backend for {llm_type}: {name}")
+
+        if len(backends) <= 1:
+            return next(iter(backends.values()), cloud_llm)
+
+        from src.services.llm_router import RoutedChatModel
+        logger.info(f"Routing {llm_type} LLM between {', '.join(backends)}")
+        return RoutedChatModel(backends=backends, router=cls._router, llm_type=llm_type)
+
+    @classmethod
+    def router_stats(cls) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """路由各 LLM 类型、各后端的请求数、错误率、预期延迟和熔断状态（未启用时为空）"""
+        return cls._router.stats() if cls._router not in (None, False) else {}
+
+    @classmethod
+    def hedge_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """对冲请求各 LLM 类型的对冲、重试次数和首 token 延迟（未启用时为空）"""
+        return cls._hedger.stats() if cls._hedger not in (None, False) else {}
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """响应缓存各 LLM 类型的命中统计（未启用时为空）"""
+        return cls._response_cache.stats() if cls._response_cache not in (None, False) else {}
 
-            logger.info(
-                f"Created {llm_type} Qiniu LLM: "
-                f"model={model_config.get('model')}, "
-                f"temp={model_config.get('temperature')}, "
-                f"max_tokens={model_config.get('max_tokens')}"
+    @classmethod
+    def get_http_pool(cls, base_url: Optional[str] = None):
+        """
+        获取 base_url 对应的共享连接池（qiniu.http_pool.enabled 为 false 或未配置 base_url 时返回 None）
+
+        同一 base_url 的所有 LLM 实例共用同步和异步长连接
+        """
+        base_url = base_url or config.get('qiniu.base_url')
+        if not base_url or not config.get('qiniu.http_pool.enabled', True):
+            return None
+
+        pool = cls._pools.get(base_url)
+        if pool is None:
+            from src.services.http_pool import LLMHttpPool
+            pool = LLMHttpPool(
+                base_url,
+                max_connections=config.get('qiniu.http_pool.max_connections', 20),
+                max_keepalive=config.get('qiniu.http_pool.max_keepalive', 10),
+                keepalive_expiry=config.get('qiniu.http_pool.keepalive_expiry', 30.0),
+                warm_connections=config.get('qiniu.http_pool.warm_connections', 2),
             )
+            cls._pools[base_url] = pool
+            logger.info(f"Created shared HTTP pool for {base_url}")
+        return pool
 
-            return llm
+    @classmethod
+    def _http_clients(cls, base_url: Optional[str]) -> Dict[str, Any]:
+        """ChatOpenAI 的 http_client / http_async_client 参数"""
+        pool = cls.get_http_pool(base_url)
+        if pool is None:
+            return {}
+        return {"http_client": pool.sync_client, "http_async_client": pool.async_client}
 
-        except Exception as e:
-            logger.error(f"Failed to create Qiniu LLM for {llm_type}: {e}")
-            raise
+    @classmethod
+    def warm_connections(cls):
+        """
+        预热 LLM 连接（不阻塞，启动时和唤醒时调用）
+
+        Returns:
+            预热 Future（结果为新建连接数）；未启用连接池或回放录制时返回 None
+        """
+        cassette = cls._get_cassette()
+        if cassette is not None and cassette.mode == "replay":
+            return None
+        pool = cls.get_http_pool()
+        return pool.warm() if pool else None
+
+    @classmethod
+    def connection_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """各连接池的请求数、新建连接数和连接复用率"""
+        return {base_url: pool.stats() for base_url, pool in cls._pools.items()}
+
+    @classmethod
+    def _create_ollama_llm(cls, llm_type: str = "worker") -> ChatOpenAI:
+        """
+        创建 Ollama 本地模型
+
+        使用 Ollama 的 OpenAI 兼容接口（{base_url}/v1），与云端模型一样支持工具调用和流式输出；
+        温度和最大 token 数沿用该类型云端模型的配置。
+        """
+        if not config.get("ollama.enabled", False):
+            raise ValueError("Ollama is not enabled in config")
+
+        model_name = config.get("ollama.model", "qwen2.5:7b")
+        base_url = config.get("ollama.base_url", "http://localhost:11434").rstrip("/")
+        if not base_url.endswith("/v1"):
+            base_url += "/v1"
+        temperature = config.get(f"qiniu.models.{llm_type}.temperature", config.get("ollama.temperature", 0.0))
+        max_tokens = config.get(f"qiniu.models.{llm_type}.max_tokens", 500)
+
+        llm = ChatOpenAI(
+            api_key="ollama",  # Ollama 不校验密钥
+            base_url=base_url,
+            model=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=config.get("ollama.timeout", 60),
+            max_retries=0,  # 失败由路由转到其他后端
+            stream_usage=True,
+            **cls._http_clients(base_url),
+        )
+
+        logger.info(
+            f"Created {llm_type} Ollama LLM: "
+            f"model={model_name}, temp={temperature}, base_url={base_url}"
+        )
+        return llm
+
+    @classmethod
+    def _create_qiniu_llm(cls, llm_type: str, api_key: Optional[str] = None) -> ChatOpenAI:
+        """创建七牛云 LLM（未配置该类型时使用默认模型）"""
+        base_url = config.get('qiniu.base_url')
+
+        model = config.get(f'qiniu.models.{llm_type}.model')
+        temperature = config.get(f'qiniu.models.{llm_type}.temperature', 0.0)
+        max_tokens = config.get(f'qiniu.models.{llm_type}.max_tokens', 500)
+
+        # 获取基础配置
+        if not model:
+            logger.warning(f"No config for {llm_type}, using defaults")
+            defaults = {
+                'planner': ('qwen3-max', 0.0, 500),
+                'worker': ('qwen3-next-80b-a3b-instruct', 0.0, 300),
+                'summary': ('qwen3-next-80b-a3b-instruct', 0.3, 200),
+            }
+            model, temperature, max_tokens = defaults.get(
+                llm_type,
+                ('qwen3-next-80b-a3b-instruct', 0.0, 500)
+            )
+
+        llm = ChatOpenAI(
+            api_key=config.get('qiniu.api_key') or api_key,
+            base_url=base_url,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            # 流式输出（规划器）也返回 token 用量，用于批量运行统计
+            stream_usage=config.get('qiniu.stream_usage', True),
+            **cls._http_clients(base_url),
+        )
+
+        logger.info(
+            f"Created {llm_type} LLM: "
+            f"model={model}, temp={temperature}, max_tokens={max_tokens}"
+        )
+        return llm
 
     @classmethod
     def get_planner_llm(cls) -> ChatOpenAI:
@@ -182,6 +302,15 @@ class LLMFactory:
     def clear_cache(cls):
         """清除缓存（用于测试或重新配置）"""
         cls._instances.clear()
+        cls._cassette = None
+        if cls._response_cache not in (None, False):
+            cls._response_cache.close()
+        cls._response_cache = None
+        cls._hedger = None
+        cls._router = None
+        for pool in cls._pools.values():
+            pool.close()
+        cls._pools.clear()
         logger.info("LLM cache cleared")
 
     @classmethod
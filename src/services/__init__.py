@@ -6,7 +6,10 @@
 @File   : __init__.py.py
 """
 
-from .whisper_asr import WhisperASR
+from src.utils.lazy import lazy_exports
+
+# WhisperASR 依赖 torch / transformers，首次访问时再导入
+__getattr__, __dir__ = lazy_exports(__name__, {"WhisperASR": ".whisper_asr"})
 
 __all__ = [
     "WhisperASR",
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : http_pool.py
+
+LLM 共享 HTTP 连接池：同一 base_url 的所有 ChatOpenAI（规划、Worker、总结）共用长连接，
+避免每个实例首次调用各自建立 TCP/TLS 连接。
+
+异步调用分散在各处 asyncio.run 创建的临时事件循环中，连接若绑定在这些循环上会随循环关闭而失效；
+因此异步连接池运行在一个常驻后台事件循环中，调用方循环通过桥接传输层把请求和响应流转发过去，
+取消调用方任务时后台请求一并取消。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from src.utils.logger import logger
+
+# httpcore 建立新连接时的追踪事件
+_CONNECT_EVENT = "connection.connect_tcp.complete"
+
+
+class LLMHttpPool:
+    """
+    一个 base_url 的连接池（同步 + 异步）及连接复用统计
+
+    sync_client / async_client 传给 ChatOpenAI 的 http_client / http_async_client。
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            max_connections: int = 20,
+            max_keepalive: int = 10,
+            keepalive_expiry: float = 30.0,
+            warm_connections: int = 2
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.warm_connections = warm_connections
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+
+        self._sync_transport = httpx.HTTPTransport(limits=limits)
+        self._async_transport = httpx.AsyncHTTPTransport(limits=limits)
+        self.sync_client = httpx.Client(transport=_MeteredTransport(self))
+        self.async_client = httpx.AsyncClient(transport=_BridgedAsyncTransport(self))
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "reused": 0, "warmups": 0, "warm_connections": 0}
+        self._warming: Optional[Future] = None
+
+    # ---------- 统计 ----------
+
+    def record(self, reused: bool, warmup: bool = False):
+        with self._lock:
+            if warmup:
+                self._counters["warmups"] += 1
+                self._counters["warm_connections"] += 0 if reused else 1
+            else:
+                self._counters["requests"] += 1
+                self._counters["reused"] += 1 if reused else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """LLM 请求数、复用已有连接的请求数及复用率（不含预热请求）"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        stats["base_url"] = self.base_url
+        stats["new_connections"] = stats["requests"] - stats["reused"]
+        stats["reuse_ratio"] = stats["reused"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
+
+    # ---------- 后台事件循环 ----------
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """常驻后台事件循环（首次使用时启动）"""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-http-pool", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def bridge(self, coro):
+        """在后台循环中运行协程并在当前循环中等待结果（当前任务取消时后台任务一并取消）"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    # ---------- 请求 ----------
+
+    def send(self, request: httpx.Request, warmup: bool = False) -> httpx.Response:
+        """同步连接池发送请求"""
+        opened: List[str] = []
+        request.extensions["trace"] = lambda event, info: opened.append(event) if event == _CONNECT_EVENT else None
+        response = self._sync_transport.handle_request(request)
+        self.record(reused=not opened, warmup=warmup)
+        return response
+
+    async def asend(self, request: httpx.Request, warmup: bool = False) -> httpx.Response:
+        """异步连接池发送请求（在后台循环中调用）"""
+        opened: List[str] = []
+
+        async def trace(event: str, info: Dict[str, Any]):
+            if event == _CONNECT_EVENT:
+                opened.append(event)
+
+        request.extensions["trace"] = trace
+        response = await self._async_transport.handle_async_request(request)
+        self.record(reused=not opened, warmup=warmup)
+        return response
+
+    # ---------- 预热 ----------
+
+    def warm(self, connections: Optional[int] = None) -> Future:
+        """
+        预热连接（不阻塞）：异步连接池并发建立 connections 条连接，同步连接池建立 1 条
+
+        已有空闲长连接时复用，不会额外建连；上一次预热未结束时直接返回它。
+        返回的 Future 结果为新建的连接数。
+        """
+        with self._lock:
+            if self._warming is not None and not self._warming.done():
+                return self._warming
+            self._warming = asyncio.run_coroutine_threadsafe(
+                self._warm(connections or self.warm_connections), self.loop
+            )
+            return self._warming
+
+    async def _warm(self, connections: int) -> int:
+        before = self.stats()["warm_connections"]
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            loop.run_in_executor(None, self._warm_sync),
+            *(self._warm_async() for _ in range(connections)),
+        )
+        opened = self.stats()["warm_connections"] - before
+        logger.debug(f"Warmed {opened} LLM connection(s) to {self.base_url}")
+        return opened
+
+    def _warm_request(self) -> httpx.Request:
+        # 任意响应（包括 401/404）都已完成 TCP/TLS 握手，连接随后回到池中
+        return httpx.Request(
+            "GET", f"{self.base_url}/models",
+            extensions={"timeout": httpx.Timeout(5.0).as_dict()}
+        )
+
+    def _warm_sync(self):
+        try:
+            response = self.send(self._warm_request(), warmup=True)
+            response.read()
+            response.close()
+        except httpx.HTTPError as e:
+            logger.debug(f"LLM connection warm-up failed: {e}")
+
+    async def _warm_async(self):
+        try:
+            response = await self.asend(self._warm_request(), warmup=True)
+            await response.aread()
+            await response.aclose()
+        except httpx.HTTPError as e:
+            logger.debug(f"LLM connection warm-up failed: {e}")
+
+    def close(self):
+        """关闭连接池和后台循环"""
+        self._sync_transport.close()
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._async_transport.aclose(), loop).result(timeout=5)
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+
+
+class _MeteredTransport(httpx.BaseTransport):
+    """同步传输层：走共享连接池并统计连接复用"""
+
+    def __init__(self, pool: LLMHttpPool):
+        self._pool = pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self._pool.send(request)
+
+
+class _BridgedAsyncTransport(httpx.AsyncBaseTransport):
+    """异步传输层：把请求转发到后台循环中的共享连接池，响应流逐块桥接回调用方循环"""
+
+    def __init__(self, pool: LLMHttpPool):
+        self._pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # 请求体先在调用方循环中读完，后台循环只处理内存中的字节
+        await request.aread()
+        future = asyncio.run_coroutine_threadsafe(self._pool.asend(request), self._pool.loop)
+        try:
+            response = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # 取消时后台请求可能已拿到响应，需关闭以归还连接
+            future.add_done_callback(self._discard)
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_BridgedStream(self._pool, response),
+            extensions=response.extensions
+        )
+
+    def _discard(self, future: Future):
+        if not future.cancelled() and future.exception() is None:
+            asyncio.run_coroutine_threadsafe(future.result().aclose(), self._pool.loop)
+
+
+class _BridgedStream(httpx.AsyncByteStream):
+    """后台循环中的响应流（SSE 等逐块读取）"""
+
+    def __init__(self, pool: LLMHttpPool, response: httpx.Response):
+        self._pool = pool
+        self._chunks = response.stream.__aiter__()
+        self._stream = response.stream
+
+    async def _next(self) -> Optional[bytes]:
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while True:
+            try:
+                chunk = await self._pool.bridge(self._next())
+            except asyncio.CancelledError:
+                # 读取中途取消：流已不可用，在后台关闭以归还连接
+                asyncio.run_coroutine_threadsafe(self._stream.aclose(), self._pool.loop)
+                raise
+            if chunk is None:
+                break
+            yield chunk
+
+    async def aclose(self):
+        # OpenAI SDK 读到 [DONE] 即关闭响应，此时分块结束标记可能还未读取，直接关闭会丢弃连接；
+        # 在后台读完剩余内容再关闭，连接得以回到池中（不阻塞调用方）
+        asyncio.run_coroutine_threadsafe(self._drain_and_close(), self._pool.loop)
+
+    async def _drain_and_close(self, max_bytes: int = 64 * 1024, timeout: float = 1.0):
+        async def drain():
+            size = 0
+            async for chunk in self._chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    break
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except Exception:
+            pass
+        finally:
+            await self._stream.aclose()
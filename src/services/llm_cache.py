@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : llm_cache.py
+
+LLM 响应缓存：相同的总结模板 + 工具输出、相同的错误分析输入、重复的规划请求直接返回已保存的响应。
+
+- 精确层：按模型、参数（temperature / max_tokens）和规范化后的消息哈希匹配
+- 语义层（仅规划器）：上下文（除最后一条用户消息外的请求）完全相同、用户指令字符二元组相似度
+  超过阈值、其中的英文/数字片段（文件名、数量等）一致，且不同之处只有语气词/客套话时命中
+- SQLite 持久化，按 LLM 类型设置有效期，超出容量时按最近使用时间淘汰
+"""
+
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding
+from pydantic import BaseModel, ConfigDict
+
+from src.services.llm_cassette import chunk_to_message, message_chunks, normalize_request, request_key
+from src.utils.logger import logger
+
+DEFAULT_CACHE_DB = Path(__file__).parent.parent / "utils" / "logs" / "llm_cache.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    llm_type TEXT NOT NULL,
+    context TEXT NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_context ON responses (llm_type, context);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed);
+"""
+
+_SALIENT_RE = re.compile(r"[A-Za-z0-9_.\-]+")
+_IGNORED_RE = re.compile(r"[\s，。！？、,.!?~～]+")
+_CJK_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+# 不影响指令含义的语气词/客套话，两条指令只在这些字上不同时才允许语义命中
+_FILLER_RE = re.compile(r"请|帮我|给我|麻烦|一下|吧|呢|啊|呀|吗|嘛|哦|哈")
+
+
+class CachePolicy(BaseModel):
+    """某一类 LLM 的缓存策略"""
+    enabled: bool = True
+    ttl: float = 3600.0            # 有效期（秒）
+    semantic: bool = False         # 是否启用语义层
+    threshold: float = 0.9         # 语义层相似度阈值
+    tool_calls: bool = False       # 是否缓存绑定了工具（非强制调用）的请求，即 Agent 工具调用循环
+
+
+def query_similarity(a: str, b: str) -> float:
+    """
+    两条指令的相似度（字符二元组余弦相似度）
+
+    英文/数字片段（文件名、数量等）不一致时为 0，避免“创建 a.txt”命中“创建 b.txt”的响应；
+    不同之处含语气词以外的汉字（地名、人名、对象等）时也为 0，避免长指令中“北京”命中“上海”的响应
+    """
+    if set(_SALIENT_RE.findall(a)) != set(_SALIENT_RE.findall(b)):
+        return 0.0
+
+    first_text, second_text = _IGNORED_RE.sub("", a.lower()), _IGNORED_RE.sub("", b.lower())
+    matcher = SequenceMatcher(None, first_text, second_text, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal" and _CJK_RE.search(_FILLER_RE.sub("", first_text[i1:i2] + second_text[j1:j2])):
+            return 0.0
+
+    def grams(text: str) -> Counter:
+        return Counter(text[i:i + 2] for i in range(max(1, len(text) - 1)))
+
+    first, second = grams(first_text), grams(second_text)
+    dot = sum(count * second[gram] for gram, count in first.items())
+    norm = math.sqrt(sum(v * v for v in first.values())) * math.sqrt(sum(v * v for v in second.values()))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """SQLite 响应缓存（线程安全，按 LLM 类型统计命中率）"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 5000, semantic_candidates: int = 200):
+        """
+        Args:
+            path: SQLite 文件路径，默认 src/utils/logs/llm_cache.db；":memory:" 只保存在内存
+            max_entries: 最多保留的条目数（按最近使用时间淘汰）
+            semantic_candidates: 语义层每次比较的最近条目数
+        """
+        self.path = path or str(DEFAULT_CACHE_DB)
+        self.max_entries = max_entries
+        self.semantic_candidates = semantic_candidates
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _count(self, llm_type: str, name: str, amount: int = 1):
+        counters = self._stats.setdefault(
+            llm_type, {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stored": 0, "bypassed": 0, "evicted": 0}
+        )
+        counters[name] += amount
+
+    def count(self, llm_type: str, name: str):
+        with self._lock:
+            self._count(llm_type, name)
+
+    def lookup(
+            self,
+            llm_type: str,
+            key: str,
+            context: str,
+            query: str,
+            policy: CachePolicy
+    ) -> Optional[Tuple[AIMessage, str]]:
+        """
+        查找响应
+
+        Returns:
+            (响应, "exact" / "semantic")，未命中返回 None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, response FROM responses WHERE key = ? AND created > ?",
+                (key, now - policy.ttl)
+            ).fetchone()
+            kind = "exact"
+
+            if row is None and policy.semantic and query:
+                candidates = self._conn.execute(
+                    "SELECT key, response, query FROM responses "
+                    "WHERE llm_type = ? AND context = ? AND created > ? ORDER BY accessed DESC LIMIT ?",
+                    (llm_type, context, now - policy.ttl, self.semantic_candidates)
+                ).fetchall()
+                scored = [(query_similarity(query, cached), candidate) for *candidate, cached in candidates]
+                best = max(scored, key=lambda item: item[0], default=None)
+                if best is not None and best[0] >= policy.threshold:
+                    row, kind = best[1], "semantic"
+
+            if row is None:
+                self._count(llm_type, "misses")
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed = ?, hits = hits + 1 WHERE key = ?", (now, row[0]))
+            self._conn.commit()
+            self._count(llm_type, f"{kind}_hits")
+
+        return messages_from_dict([json.loads(row[1])])[0], kind
+
+    def store(self, llm_type: str, key: str, context: str, query: str, response: AIMessage):
+        """保存响应并按容量淘汰最久未使用的条目"""
+        now = time.time()
+        payload = json.dumps(message_to_dict(response), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, llm_type, context, query, response, created, accessed, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, llm_type, context, query, payload, now, now)
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            self._conn.commit()
+            self._count(llm_type, "stored")
+            if evicted:
+                self._count(llm_type, "evicted", evicted)
+
+    def purge_expired(self, policies: Dict[str, CachePolicy]) -> int:
+        """删除各类型已过期的条目，返回删除数"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for llm_type, policy in policies.items():
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE llm_type = ? AND created <= ?",
+                    (llm_type, now - policy.ttl)
+                ).rowcount
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各 LLM 类型的命中/未命中/写入/绕过/淘汰次数及命中率"""
+        with self._lock:
+            stats = {llm_type: dict(counters) for llm_type, counters in self._stats.items()}
+        for counters in stats.values():
+            hits = counters["exact_hits"] + counters["semantic_hits"]
+            lookups = hits + counters["misses"]
+            counters["hit_ratio"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedChatModel(BaseChatModel):
+    """
+    带响应缓存的模型
+
+    与录制层相同，bind_tools 借用真实模型生成绑定参数再绑定到本模型，使工具定义参与缓存键；
+    命中时不调用真实模型（流式调用把缓存的响应拆块输出），响应元数据中标记 cache 来源，用量记为空。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    delegate: BaseChatModel
+    response_cache: ResponseCache
+    llm_type: str = "worker"
+    policy: CachePolicy = CachePolicy()
+    chunk_size: int = 16
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.delegate._llm_type}"
+
+    def bind_tools(self, tools, **kwargs):
+        binding = self.delegate.bind_tools(tools, **kwargs)
+        if isinstance(binding, RunnableBinding) and binding.bound is self.delegate:
+            return self.bind(**binding.kwargs)
+        return self.model_copy(update={"delegate": binding})
+
+    # ---- 缓存键 ----
+
+    def _keys(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]):
+        """
+        Returns:
+            (精确键, 上下文键, 最后一条用户消息)；不缓存的请求返回 None
+        """
+        forced = kwargs.get("tool_choice") not in (None, "auto", "none")
+        if kwargs.get("tools") and not forced and not self.policy.tool_calls:
+            self.response_cache.count(self.llm_type, "bypassed")
+            return None
+
+        model = getattr(self.delegate, "model_name", None) or self.delegate._llm_type
+        params = {
+            "temperature": getattr(self.delegate, "temperature", None),
+            "max_tokens": getattr(self.delegate, "max_tokens", None),
+        }
+        request = normalize_request(model, messages, stop=stop, **kwargs)
+        request["params"] = params
+
+        # 用户指令为最后一条用户消息（规划器会重复放入），上下文去掉所有与它相同的用户消息
+        query = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        query = query if isinstance(query, str) else ""
+        context = dict(request, messages=[
+            normalized for message, normalized in zip(messages, request["messages"])
+            if not (isinstance(message, HumanMessage) and message.content == query)
+        ])
+        return request_key(request), request_key(context), query
+
+    def _lookup(self, keys) -> Optional[AIMessage]:
+        if keys is None:
+            return None
+        key, context, query = keys
+        found = self.response_cache.lookup(self.llm_type, key, context, query, self.policy)
+        if found is None:
+            return None
+
+        message, kind = found
+        logger.debug(f"LLM cache {kind} hit for {self.llm_type}")
+        return AIMessage(
+            content=message.content,
+            tool_calls=message.tool_calls,
+            response_metadata={**message.response_metadata, "cache": kind}
+        )
+
+    def _store(self, keys, message: AIMessage):
+        # 被截断或空的响应不缓存
+        if keys is None or message.response_metadata.get("finish_reason") == "length":
+            return
+        if not message.content and not message.tool_calls:
+            return
+        key, context, query = keys
+        try:
+            self.response_cache.store(self.llm_type, key, context, query, message)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store LLM cache entry: {e}")
+
+    # ---- BaseChatModel 实现 ----
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        keys = self._keys(messages, stop, kwargs)
+        cached = self._lookup(keys)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=cached)])
+
+        result = self.delegate._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._store(keys, result.generations[0].message)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        keys = self._keys(messages, stop, kwargs)
+        cached = self._lookup(keys)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=cached)])
+
+        result = await self.delegate._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._store(keys, result.generations[0].message)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        keys = self._keys(messages, stop, kwargs)
+        cached = self._lookup(keys)
+        if cached is not None:
+            for chunk in message_chunks(cached, self.chunk_size):
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        merged = None
+        for chunk in self.delegate._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            self._store(keys, chunk_to_message(merged.message))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        keys = self._keys(messages, stop, kwargs)
+        cached = self._lookup(keys)
+        if cached is not None:
+            for chunk in message_chunks(cached, self.chunk_size):
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        merged = None
+        async for chunk in self.delegate._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            self._store(keys, chunk_to_message(merged.message))
+
+
+def cache_policies(config) -> Dict[str, CachePolicy]:
+    """llm_cache.policies 配置（未配置的类型使用默认策略）"""
+    return {
+        llm_type: CachePolicy.model_validate(options or {})
+        for llm_type, options in (config.get("llm_cache.policies") or {}).items()
+    }
+
+
+def create_response_cache(config) -> Optional[ResponseCache]:
+    """按 llm_cache 配置创建缓存，未启用时返回 None"""
+    if not config.get("llm_cache.enabled", False):
+        return None
+
+    cache = ResponseCache(
+        path=config.get("llm_cache.path") or None,
+        max_entries=config.get("llm_cache.max_entries", 5000)
+    )
+    removed = cache.purge_expired(cache_policies(config))
+    logger.info(f"LLM response cache enabled: {len(cache)} entries ({removed} expired removed), file={cache.path}")
+    return cache
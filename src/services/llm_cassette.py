@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : llm_cassette.py
+
+LLM 录制/回放层：record 模式把每次请求和响应（含工具调用）按规范化后的消息哈希写入 JSONL，
+replay 模式按哈希回放并模拟延迟，使完整流水线可以离线、可复现地做性能分析。
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+from src.utils.logger import logger
+
+DEFAULT_CASSETTE_FILE = Path(__file__).parent.parent / "utils" / "logs" / "llm_cassette.jsonl"
+
+_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+class CassetteMiss(LookupError):
+    """回放模式下没有匹配的录制记录"""
+
+
+class LatencyModel:
+    """
+    回放延迟模型
+
+    - none: 不等待
+    - recorded: 按录制时的耗时（乘以 scale）
+    - fixed: 固定秒数
+    - lognormal: 对数正态分布（median 为中位数，sigma 为离散程度），seed 固定时可复现
+    """
+
+    def __init__(
+            self,
+            kind: str = "recorded",
+            scale: float = 1.0,
+            fixed: float = 0.5,
+            median: float = 0.8,
+            sigma: float = 0.4,
+            seed: Optional[int] = None
+    ):
+        if kind not in ("none", "recorded", "fixed", "lognormal"):
+            raise ValueError(f"Unknown latency model: {kind}")
+        self.kind = kind
+        self.scale = scale
+        self.fixed = fixed
+        self.median = median
+        self.sigma = sigma
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, recorded: float) -> float:
+        """本次回放的总耗时（秒）"""
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "fixed":
+            value = self.fixed
+        elif self.kind == "lognormal":
+            with self._lock:
+                value = self.median * self._random.lognormvariate(0.0, self.sigma)
+        else:
+            value = recorded
+        return max(0.0, value * self.scale)
+
+
+class Cassette:
+    """
+    录制文件 - 每行一条记录：{"key", "model", "request", "response", "latency", "ttft"}
+
+    同一请求录制多次时按顺序回放（用完后循环），保证并发与重复调用下结果确定。
+    """
+
+    def __init__(
+            self,
+            path: Optional[str] = None,
+            mode: str = "replay",
+            latency: Optional[LatencyModel] = None,
+            on_miss: str = "error"
+    ):
+        """
+        Args:
+            path: JSONL 文件路径，默认 src/utils/logs/llm_cassette.jsonl
+            mode: record（清空后重新录制）/ replay（回放）
+            latency: 回放延迟模型
+            on_miss: 回放未命中时 error（抛出 CassetteMiss）或 passthrough（调用真实模型并追加录制）
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path) if path else DEFAULT_CASSETTE_FILE
+        self.mode = mode
+        self.latency = latency or LatencyModel()
+        self.on_miss = on_miss
+
+        self._lock = threading.Lock()
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._stats = {"hits": 0, "misses": 0, "recorded": 0}
+
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("", encoding="utf-8")
+        else:
+            self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(records) for records in self._records.values())
+
+    def _load(self):
+        if not self.path.exists():
+            logger.warning(f"Cassette file not found: {self.path}")
+            return
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupt cassette line")
+                    continue
+                self._records.setdefault(record["key"], []).append(record)
+
+        logger.info(f"Cassette loaded: {len(self)} records from {self.path}")
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """取出下一条匹配的记录，未命中返回 None"""
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                self._stats["misses"] += 1
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            self._stats["hits"] += 1
+            return records[cursor % len(records)]
+
+    def record(self, key: str, model: str, request: Dict[str, Any], response: AIMessage, latency: float,
+               ttft: Optional[float] = None):
+        """追加一条录制记录"""
+        record = {
+            "key": key,
+            "model": model,
+            "request": request,
+            "response": message_to_dict(response),
+            "latency": round(latency, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._records.setdefault(key, []).append(record)
+            self._stats["recorded"] += 1
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+def normalize_request(model: str, messages: Sequence[BaseMessage], **kwargs) -> Dict[str, Any]:
+    """
+    规范化请求：保留角色、内容、工具调用名称和参数、绑定的工具及 tool_choice，
+    去掉每次运行都会变化的 ID（UUID、工具调用 ID）并合并空白
+    """
+
+    def clean(text: Any) -> Any:
+        if isinstance(text, str):
+            return _SPACE_RE.sub(" ", _UUID_RE.sub("<id>", text)).strip()
+        return json.loads(clean(json.dumps(text, ensure_ascii=False, sort_keys=True)))
+
+    normalized_messages = []
+    for message in messages:
+        item: Dict[str, Any] = {"type": message.type, "content": clean(message.content)}
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            item["tool_calls"] = [{"name": tc["name"], "args": clean(tc["args"])} for tc in tool_calls]
+        normalized_messages.append(item)
+
+    tools = [convert_to_openai_tool(tool)["function"]["name"] for tool in kwargs.get("tools") or []]
+    tool_choice = kwargs.get("tool_choice")
+    if isinstance(tool_choice, dict):
+        tool_choice = tool_choice.get("function", {}).get("name")
+
+    return {
+        "model": model,
+        "messages": normalized_messages,
+        "tools": tools,
+        "tool_choice": tool_choice,
+        "stop": kwargs.get("stop")
+    }
+
+
+def message_chunks(message: AIMessage, chunk_size: int = 16) -> Iterator[AIMessageChunk]:
+    """把完整响应拆成流式块（工具调用参数 / 文本），最后一块带用量"""
+    for index, tool_call in enumerate(message.tool_calls):
+        arguments = json.dumps(tool_call["args"], ensure_ascii=False)
+        for i in range(0, max(1, len(arguments)), chunk_size):
+            yield AIMessageChunk(content="", tool_call_chunks=[{
+                "name": tool_call["name"] if i == 0 else None,
+                "args": arguments[i:i + chunk_size],
+                "id": tool_call.get("id") if i == 0 else None,
+                "index": index
+            }])
+
+    content = message.content if isinstance(message.content, str) else ""
+    for i in range(0, len(content), chunk_size):
+        yield AIMessageChunk(content=content[i:i + chunk_size])
+
+    yield AIMessageChunk(
+        content="",
+        usage_metadata=message.usage_metadata,
+        response_metadata=message.response_metadata
+    )
+
+
+def chunk_to_message(chunk: AIMessageChunk) -> AIMessage:
+    """合并后的流式块转为完整消息（工具调用参数已解析）"""
+    return AIMessage(
+        content=chunk.content,
+        tool_calls=chunk.tool_calls,
+        usage_metadata=chunk.usage_metadata,
+        response_metadata=chunk.response_metadata
+    )
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class CassetteChatModel(BaseChatModel):
+    """
+    包装真实模型的录制/回放模型
+
+    bind_tools 借用真实模型生成绑定参数，再绑定到本模型，使工具定义随调用传入 _generate / _stream；
+    调用真实模型时直接使用其 _generate / _stream，回调只在本模型层触发一次。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    delegate: BaseChatModel
+    cassette: Cassette
+    name_in_cassette: str = "llm"
+    chunk_size: int = 16
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cassette-{self.delegate._llm_type}"
+
+    def bind_tools(self, tools, **kwargs):
+        binding = self.delegate.bind_tools(tools, **kwargs)
+        if isinstance(binding, RunnableBinding) and binding.bound is self.delegate:
+            return self.bind(**binding.kwargs)
+        # 模型自行返回了新实例（不经 bind 传参），改为包装该实例
+        return self.model_copy(update={"delegate": binding})
+
+    # ---- 录制/回放 ----
+
+    def _request(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]):
+        request = normalize_request(self.name_in_cassette, messages, stop=stop, **kwargs)
+        return request, request_key(request)
+
+    def _replay_record(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.cassette.mode != "replay":
+            return None
+        record = self.cassette.lookup(key)
+        if record is None and self.cassette.on_miss != "passthrough":
+            raise CassetteMiss(f"No cassette record for {self.name_in_cassette} request {key}")
+        return record
+
+    @staticmethod
+    def _restore(record: Dict[str, Any]) -> AIMessage:
+        return messages_from_dict([record["response"]])[0]
+
+    def _chunks(self, message: AIMessage) -> Iterator[AIMessageChunk]:
+        return message_chunks(message, self.chunk_size)
+
+    def _replay_delays(self, record: Dict[str, Any], chunks: int):
+        """(首块前等待, 之后每块间隔)"""
+        total = self.cassette.latency.sample(record.get("latency") or 0.0)
+        recorded_ttft = record.get("ttft")
+        ratio = recorded_ttft / record["latency"] if recorded_ttft and record.get("latency") else 0.5
+        first = total * ratio
+        return first, (total - first) / max(1, chunks - 1)
+
+    # ---- BaseChatModel 实现 ----
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        request, key = self._request(messages, stop, kwargs)
+        record = self._replay_record(key)
+        if record is not None:
+            time.sleep(self.cassette.latency.sample(record.get("latency") or 0.0))
+            return ChatResult(generations=[ChatGeneration(message=self._restore(record))])
+
+        start = time.perf_counter()
+        result = self.delegate._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self.cassette.record(key, self.name_in_cassette, request, result.generations[0].message,
+                             time.perf_counter() - start)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        request, key = self._request(messages, stop, kwargs)
+        record = self._replay_record(key)
+        if record is not None:
+            await asyncio.sleep(self.cassette.latency.sample(record.get("latency") or 0.0))
+            return ChatResult(generations=[ChatGeneration(message=self._restore(record))])
+
+        start = time.perf_counter()
+        result = await self.delegate._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self.cassette.record(key, self.name_in_cassette, request, result.generations[0].message,
+                             time.perf_counter() - start)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        request, key = self._request(messages, stop, kwargs)
+        record = self._replay_record(key)
+        if record is not None:
+            chunks = list(self._chunks(self._restore(record)))
+            first, interval = self._replay_delays(record, len(chunks))
+            for i, chunk in enumerate(chunks):
+                time.sleep(first if i == 0 else interval)
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        start = time.perf_counter()
+        ttft, merged = None, None
+        for chunk in self.delegate._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            ttft = ttft if ttft is not None else time.perf_counter() - start
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            self.cassette.record(key, self.name_in_cassette, request, self._to_message(merged.message),
+                                 time.perf_counter() - start, ttft)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        request, key = self._request(messages, stop, kwargs)
+        record = self._replay_record(key)
+        if record is not None:
+            chunks = list(self._chunks(self._restore(record)))
+            first, interval = self._replay_delays(record, len(chunks))
+            for i, chunk in enumerate(chunks):
+                await asyncio.sleep(first if i == 0 else interval)
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        start = time.perf_counter()
+        ttft, merged = None, None
+        async for chunk in self.delegate._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            ttft = ttft if ttft is not None else time.perf_counter() - start
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            self.cassette.record(key, self.name_in_cassette, request, self._to_message(merged.message),
+                                 time.perf_counter() - start, ttft)
+
+    @staticmethod
+    def _to_message(chunk: AIMessageChunk) -> AIMessage:
+        return chunk_to_message(chunk)
+
+
+def create_cassette(config) -> Optional[Cassette]:
+    """按 llm_cassette 配置创建录制文件，mode 为 off 时返回 None"""
+    mode = (config.get("llm_cassette.mode") or "off").lower()
+    if mode == "off":
+        return None
+
+    latency = LatencyModel(
+        kind=config.get("llm_cassette.latency", "recorded"),
+        scale=config.get("llm_cassette.latency_scale", 1.0),
+        fixed=config.get("llm_cassette.fixed_latency", 0.5),
+        median=config.get("llm_cassette.lognormal.median", 0.8),
+        sigma=config.get("llm_cassette.lognormal.sigma", 0.4),
+        seed=config.get("llm_cassette.seed")
+    )
+    cassette = Cassette(
+        path=config.get("llm_cassette.path") or None,
+        mode=mode,
+        latency=latency,
+        on_miss=config.get("llm_cassette.on_miss", "error")
+    )
+    logger.info(f"LLM cassette enabled: mode={mode}, latency={latency.kind}, file={cassette.path}")
+    return cassette
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : llm_hedging.py
+
+LLM 对冲请求：调用等到最近首 token 延迟的高分位（如 p90）仍没有响应时，再发出一个相同的请求，
+先返回的一方胜出，其余请求被取消（流式调用以第一个 chunk 为准，非流式以完整响应为准）。
+
+- 延迟按 LLM 类型和调用方式（流式/非流式）分别统计滚动窗口，样本不足时等待 max_delay
+- 额外请求受预算限制：每个主请求积累 budget_ratio 个令牌（最多 budget_burst 个），对冲或重试消耗一个，
+  长期来看额外请求不超过主请求的 budget_ratio
+- 所有进行中的请求都失败（连接错误、超时、5xx）时，在预算内立即重试，不等待退避；429 交给 SDK 退避重试
+- 只对冲异步调用（规划、Worker、总结都经由 ainvoke / astream）；同步调用直接转发
+
+用本地假服务测量长尾改善（10% 的请求首 token 延迟 1s）：
+    python -m src.services.llm_hedging --requests 200 --slow-rate 0.1 --slow-ttft 1.0
+"""
+
+import argparse
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import openai
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.runnables import RunnableBinding
+from pydantic import BaseModel, ConfigDict
+
+from src.utils.logger import logger
+
+
+class HedgePolicy(BaseModel):
+    """某类 LLM 的对冲策略"""
+    enabled: bool = True
+    percentile: float = 0.9        # 等待到最近首 token 延迟的该分位仍无响应时对冲
+    min_samples: int = 20          # 样本不足时等待 max_delay
+    min_delay: float = 0.2         # 对冲等待时间下限（秒）
+    max_delay: float = 3.0         # 对冲等待时间上限（秒）
+    max_attempts: int = 2          # 单次调用最多同时进行的请求数（含主请求）
+    max_retries: int = 1           # 全部失败后立即重试的次数
+    budget_ratio: float = 0.1      # 每个主请求积累的额外请求令牌
+    budget_burst: float = 3.0      # 最多积攒的令牌数
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """最近邻分位数（samples 为空时返回 0）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def _retryable(error: Optional[BaseException]) -> bool:
+    """连接错误、超时和 5xx 可立即重试；429 立即重试只会加重限流"""
+    if isinstance(error, openai.RateLimitError):
+        return False
+    return isinstance(error, (
+        openai.APIConnectionError,
+        openai.InternalServerError,
+        httpx.TransportError,
+        asyncio.TimeoutError,
+        ConnectionError
+    ))
+
+
+class Hedger:
+    """对冲请求的共享状态：各 LLM 类型的延迟窗口、额外请求预算和统计（线程安全）"""
+
+    _COUNTERS = ("requests", "hedged", "hedge_wins", "retries", "denied", "failed")
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._tokens: Dict[str, float] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, llm_type: str, name: str):
+        counters = self._counters.setdefault(llm_type, dict.fromkeys(self._COUNTERS, 0))
+        counters[name] += 1
+
+    def count(self, llm_type: str, name: str):
+        with self._lock:
+            self._count(llm_type, name)
+
+    def record(self, key: str, latency: float):
+        """记录一次成功请求的首 token 延迟（key 为 LLM 类型:调用方式）"""
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(latency)
+
+    def delay(self, key: str, policy: HedgePolicy) -> float:
+        """对冲等待时间：最近延迟的 policy.percentile 分位，限制在 [min_delay, max_delay]"""
+        with self._lock:
+            samples = list(self._latencies.get(key, ()))
+        if len(samples) < policy.min_samples:
+            return policy.max_delay
+        return min(policy.max_delay, max(policy.min_delay, percentile(samples, policy.percentile)))
+
+    def admit(self, llm_type: str, policy: HedgePolicy):
+        """主请求：积累额外请求预算"""
+        with self._lock:
+            self._count(llm_type, "requests")
+            tokens = self._tokens.get(llm_type, policy.budget_burst)
+            self._tokens[llm_type] = min(policy.budget_burst, tokens + policy.budget_ratio)
+
+    def spend(self, llm_type: str, policy: HedgePolicy, kind: str) -> bool:
+        """为一次对冲（hedged）或重试（retries）消耗预算，预算不足返回 False"""
+        with self._lock:
+            tokens = self._tokens.get(llm_type, policy.budget_burst)
+            if tokens < 1:
+                self._count(llm_type, "denied")
+                return False
+            self._tokens[llm_type] = tokens - 1
+            self._count(llm_type, kind)
+            return True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各 LLM 类型的请求数、对冲/重试次数、额外请求比例和各调用方式的 p50/p95 首 token 延迟"""
+        with self._lock:
+            counters = {llm_type: dict(values) for llm_type, values in self._counters.items()}
+            latencies = {key: list(values) for key, values in self._latencies.items()}
+
+        for llm_type, stats in counters.items():
+            extra = stats["hedged"] + stats["retries"]
+            stats["extra_ratio"] = extra / stats["requests"] if stats["requests"] else 0.0
+            for key, samples in latencies.items():
+                kind, _, mode = key.partition(":")
+                if kind == llm_type:
+                    stats[f"{mode}_p50"] = percentile(samples, 0.5)
+                    stats[f"{mode}_p95"] = percentile(samples, 0.95)
+        return counters
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    带对冲请求的模型
+
+    与响应缓存层相同，bind_tools 借用真实模型生成绑定参数再绑定到本模型；
+    各请求不传入 run_manager，回调只由本模型对胜出的响应触发一次。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    delegate: BaseChatModel
+    hedger: Hedger
+    llm_type: str = "worker"
+    policy: HedgePolicy = HedgePolicy()
+
+    @property
+    def _llm_type(self) -> str:
+        return f"hedged-{self.delegate._llm_type}"
+
+    def bind_tools(self, tools, **kwargs):
+        binding = self.delegate.bind_tools(tools, **kwargs)
+        if isinstance(binding, RunnableBinding) and binding.bound is self.delegate:
+            return self.bind(**binding.kwargs)
+        return self.model_copy(update={"delegate": binding})
+
+    # ---- 竞速 ----
+
+    async def _race(
+            self,
+            mode: str,
+            attempt: Callable[[], Awaitable[Any]],
+            discard: Optional[Callable[[Any], Awaitable[None]]] = None
+    ) -> Any:
+        """
+        运行主请求，超过对冲等待时间仍未返回时（预算内）发出相同请求，返回最先成功的结果
+
+        Args:
+            mode: 调用方式（stream / invoke），延迟按类型和方式分别统计
+            attempt: 发起一次请求，返回首个结果
+            discard: 释放落败但已成功的结果（如关闭流）
+        """
+        key = f"{self.llm_type}:{mode}"
+        policy = self.policy
+        self.hedger.admit(self.llm_type, policy)
+        delay = self.hedger.delay(key, policy)
+
+        running: Dict[asyncio.Future, Tuple[float, str]] = {}
+        retries, error = 0, None
+
+        def launch(kind: str):
+            running[asyncio.ensure_future(attempt())] = (time.perf_counter(), kind)
+
+        launch("primary")
+        hedge_at: Optional[float] = time.perf_counter() + delay
+        try:
+            while running:
+                can_hedge = hedge_at is not None and len(running) < policy.max_attempts
+                timeout = max(0.0, hedge_at - time.perf_counter()) if can_hedge else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if self.hedger.spend(self.llm_type, policy, "hedged"):
+                        logger.debug(f"Hedging {self.llm_type} LLM call after {delay:.2f}s")
+                        launch("hedge")
+                        hedge_at = time.perf_counter() + delay
+                    else:
+                        hedge_at = None
+                    continue
+
+                winner = None
+                for task in done:
+                    started, kind = running.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = (task.result(), started, kind)
+                    elif discard is not None:
+                        await discard(task.result())
+
+                if winner is not None:
+                    result, started, kind = winner
+                    self.hedger.record(key, time.perf_counter() - started)
+                    if kind != "primary":
+                        self.hedger.count(self.llm_type, "hedge_wins")
+                    return result
+
+                if not running and retries < policy.max_retries and _retryable(error) \
+                        and self.hedger.spend(self.llm_type, policy, "retries"):
+                    logger.debug(f"Retrying {self.llm_type} LLM call immediately after {type(error).__name__}")
+                    retries += 1
+                    launch("retry")
+                    # 重试重新计时，否则已过期的对冲时间会让重试立即被对冲
+                    hedge_at = time.perf_counter() + delay
+
+            self.hedger.count(self.llm_type, "failed")
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+                task.add_done_callback(lambda t: self._release(t, discard))
+
+    @staticmethod
+    def _release(task: asyncio.Future, discard: Optional[Callable[[Any], Awaitable[None]]]):
+        """被取消的请求结束后：取回异常，取消前已成功的结果交给 discard 释放"""
+        if task.cancelled() or task.exception() is not None:
+            return
+        if discard is not None:
+            asyncio.ensure_future(discard(task.result()))
+
+    # ---- BaseChatModel 实现 ----
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.delegate._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        yield from self.delegate._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self.policy.enabled:
+            return await self.delegate._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return await self._race("invoke", lambda: self.delegate._agenerate(messages, stop=stop, **kwargs))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        if not self.policy.enabled:
+            async for chunk in self.delegate._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+
+        async def attempt():
+            stream = self.delegate._astream(messages, stop=stop, **kwargs)
+            try:
+                return await anext(stream, None), stream
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        async def discard(result):
+            await result[1].aclose()
+
+        first, stream = await self._race("stream", attempt, discard)
+        try:
+            if first is None:
+                return
+            yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+
+def hedge_policies(config) -> Dict[str, HedgePolicy]:
+    """llm_hedging.policies 配置（未配置的类型使用默认策略）"""
+    return {
+        llm_type: HedgePolicy.model_validate(options or {})
+        for llm_type, options in (config.get("llm_hedging.policies") or {}).items()
+    }
+
+
+def create_hedger(config) -> Optional[Hedger]:
+    """按 llm_hedging 配置创建共享状态，未启用时返回 None"""
+    if not config.get("llm_hedging.enabled", False):
+        return None
+    logger.info("LLM request hedging enabled")
+    return Hedger(window=config.get("llm_hedging.window", 200))
+
+
+# ---------- 测量 ----------
+
+async def _measure(llm: BaseChatModel, requests: int, concurrency: int) -> List[float]:
+    """并发运行流式调用，返回各调用的首 token 延迟"""
+    from langchain_core.messages import HumanMessage
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            stream = llm.astream([HumanMessage(content=f"总结第 {index} 条结果")])
+            try:
+                await anext(stream, None)
+                return time.perf_counter() - start
+            finally:
+                await stream.aclose()
+
+    return list(await asyncio.gather(*(one(i) for i in range(requests))))
+
+
+async def benchmark(
+        requests: int = 200,
+        concurrency: int = 4,
+        ttft: float = 0.05,
+        slow_rate: float = 0.1,
+        slow_ttft: float = 1.0,
+        policy: Optional[HedgePolicy] = None,
+        seed: int = 7
+) -> Dict[str, Dict[str, float]]:
+    """
+    在本地假服务上对比不对冲和对冲的首 token 延迟分位
+
+    Returns:
+        {"baseline": {...}, "hedged": {...}}，含 p50/p90/p95/p99/max、服务端请求数和额外请求比例
+    """
+    from aiohttp import web
+    from langchain_openai import ChatOpenAI
+
+    from src.server.stub_llm import StubLLM, StubSettings, create_stub_app
+
+    stub = StubLLM(StubSettings(ttft=ttft, tokens_per_second=0, slow_rate=slow_rate, slow_ttft=slow_ttft, seed=seed))
+    runner = web.AppRunner(create_stub_app(stub))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    try:
+        llm = ChatOpenAI(api_key="stub", base_url=f"http://127.0.0.1:{port}/v1", model="stub", max_retries=0)
+        results = {}
+        for name, model in (
+                ("baseline", llm),
+                ("hedged", HedgedChatModel(delegate=llm, hedger=Hedger(), llm_type="bench", policy=policy or HedgePolicy()))
+        ):
+            stub.configure(seed=seed)
+            before = stub.stats()["total"]
+            latencies = await _measure(model, requests, concurrency)
+            sent = stub.stats()["total"] - before
+            results[name] = {
+                "p50": percentile(latencies, 0.5),
+                "p90": percentile(latencies, 0.9),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+                "max": max(latencies),
+                "server_requests": sent,
+                "extra_ratio": sent / requests - 1
+            }
+        return results
+    finally:
+        await runner.cleanup()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="在本地假 LLM 服务上测量对冲请求对首 token 长尾延迟的改善")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--ttft", type=float, default=0.05, help="正常请求首 token 延迟（秒）")
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="慢请求比例")
+    parser.add_argument("--slow-ttft", type=float, default=1.0, help="慢请求首 token 延迟（秒）")
+    parser.add_argument("--percentile", type=float, default=0.9, help="对冲等待的延迟分位")
+    parser.add_argument("--budget", type=float, default=0.2, help="额外请求预算比例")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    policy = HedgePolicy(percentile=args.percentile, budget_ratio=args.budget, min_delay=0.05)
+    results = asyncio.run(benchmark(
+        args.requests, args.concurrency, args.ttft, args.slow_rate, args.slow_ttft, policy, args.seed
+    ))
+    for name, stats in results.items():
+        print(
+            f"{name:<9} p50 {stats['p50']:.3f}s  p95 {stats['p95']:.3f}s  p99 {stats['p99']:.3f}s  "
+            f"max {stats['max']:.3f}s  requests {stats['server_requests']} (+{stats['extra_ratio']:.0%})"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : llm_router.py
+
+LLM 路由：按延迟在云端（七牛）和本地（Ollama 的 OpenAI 兼容接口）模型之间选择后端。
+
+- 按后端和 LLM 类型（planner / worker / summary）统计最近的首 token 延迟和错误率，
+  每次调用发往当前预期最快的后端；llm_router.roles 限定各类型可用的后端（质量约束，如规划只用云端）
+- 失败和超时按超时时间计入延迟样本；连续失败或窗口内错误率过高时熔断该后端一段时间，
+  期间流量转到其他后端，冷却结束后按预期延迟重新参与选择（再失败立即重新熔断）
+- 没有样本或样本已过期的后端按先验延迟估计：先验低于当前最快后端时会被重新尝试
+- 请求在产出首个 chunk 前失败或超时，自动转到下一个后端；同步调用在守护线程中等待首个结果，
+  超时后放弃该线程（结果丢弃）并转到下一个后端
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.runnables import RunnableBinding
+from pydantic import BaseModel, ConfigDict
+
+from src.utils.logger import logger
+
+
+class BackendPolicy(BaseModel):
+    """一个后端的路由参数"""
+    prior_latency: float = 1.0     # 没有近期样本时的预期首 token 延迟（秒）
+    timeout: float = 20.0          # 首 token 超时（非流式为响应超时），超时转到下一个后端
+    max_failures: int = 3          # 连续失败达到该次数后熔断
+    max_error_rate: float = 0.5    # 窗口内错误率达到该值后熔断（样本数不少于 min_samples 时）
+    min_samples: int = 4
+    cooldown: float = 30.0         # 熔断时长（秒）
+    stale_after: float = 300.0     # 最新样本超过该时长后按先验延迟估计
+
+
+class _BackendState:
+    """一个后端在一类 LLM 上的滚动样本和熔断状态"""
+
+    def __init__(self, window: int):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)  # (延迟, 是否成功)
+        self.updated = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples) if self.samples else 0.0
+
+
+class LLMRouter:
+    """各后端、各类 LLM 的滚动延迟和错误率，负责给后端排序（线程安全）"""
+
+    def __init__(
+            self,
+            policies: Optional[Dict[str, BackendPolicy]] = None,
+            window: int = 50,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        self.policies = policies or {}
+        self.window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._states: Dict[Tuple[str, str], _BackendState] = {}
+
+    def policy(self, backend: str) -> BackendPolicy:
+        return self.policies.get(backend) or BackendPolicy()
+
+    def _state(self, backend: str, llm_type: str) -> _BackendState:
+        return self._states.setdefault((backend, llm_type), _BackendState(self.window))
+
+    def _expected(self, backend: str, llm_type: str, now: float) -> float:
+        state, policy = self._state(backend, llm_type), self.policy(backend)
+        if not state.samples or now - state.updated > policy.stale_after:
+            return policy.prior_latency
+        return sum(latency for latency, _ in state.samples) / len(state.samples)
+
+    def expected(self, backend: str, llm_type: str) -> float:
+        """预期首 token 延迟：近期样本（失败按超时计）的均值，没有近期样本时为先验延迟"""
+        with self._lock:
+            return self._expected(backend, llm_type, self._clock())
+
+    def rank(self, llm_type: str, backends: List[str]) -> List[str]:
+        """按预期延迟排序（相同时保持偏好顺序）；熔断中的后端排在最后，仅在其他后端都失败时使用"""
+        with self._lock:
+            now = self._clock()
+            order = sorted(backends, key=lambda name: (
+                self._state(name, llm_type).open_until > now,
+                self._expected(name, llm_type, now)
+            ))
+        return order
+
+    def record(self, backend: str, llm_type: str, latency: float, ok: bool):
+        """记录一次调用；失败时检查是否需要熔断"""
+        with self._lock:
+            state, policy = self._state(backend, llm_type), self.policy(backend)
+            state.samples.append((latency, ok))
+            state.updated = self._clock()
+            state.requests += 1
+            if ok:
+                state.consecutive_failures = 0
+                return
+
+            state.errors += 1
+            state.consecutive_failures += 1
+            if state.consecutive_failures >= policy.max_failures or (
+                    len(state.samples) >= policy.min_samples and state.error_rate >= policy.max_error_rate
+            ):
+                state.open_until = state.updated + policy.cooldown
+                logger.warning(
+                    f"Shedding {llm_type} LLM traffic from {backend} for {policy.cooldown:.0f}s "
+                    f"({state.consecutive_failures} consecutive failures, error rate {state.error_rate:.0%})"
+                )
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """{LLM 类型: {后端: 请求数、错误数、近期错误率、预期延迟、是否熔断}}"""
+        with self._lock:
+            now = self._clock()
+            result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (backend, llm_type), state in self._states.items():
+                result.setdefault(llm_type, {})[backend] = {
+                    "requests": state.requests,
+                    "errors": state.errors,
+                    "error_rate": state.error_rate,
+                    "expected_latency": self._expected(backend, llm_type, now),
+                    "shed": state.open_until > now
+                }
+        return result
+
+
+def _call_in_thread(fn: Callable[[], Any]) -> Future:
+    """在守护线程中（继承当前上下文）调用 fn，调用方按超时等待；超时后线程继续运行至结束，不阻塞进程退出"""
+    future: Future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            future.set_result(context.run(fn))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="llm-router-sync", daemon=True).start()
+    return future
+
+
+class RoutedChatModel(BaseChatModel):
+    """
+    按延迟路由的模型
+
+    backends 按偏好排序（预期延迟相同时靠前者优先），各后端须接受相同的工具绑定参数
+    （都是 OpenAI 兼容模型或其包装），bind_tools 借用第一个后端生成参数再绑定到本模型。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    backends: Dict[str, BaseChatModel]
+    router: LLMRouter
+    llm_type: str = "worker"
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed-" + "+".join(backend._llm_type for backend in self.backends.values())
+
+    def bind_tools(self, tools, **kwargs):
+        first = next(iter(self.backends.values()))
+        binding = first.bind_tools(tools, **kwargs)
+        if isinstance(binding, RunnableBinding) and binding.bound is first:
+            return self.bind(**binding.kwargs)
+        return self.model_copy(update={
+            "backends": {name: backend.bind_tools(tools, **kwargs) for name, backend in self.backends.items()}
+        })
+
+    def _candidates(self) -> List[str]:
+        return self.router.rank(self.llm_type, list(self.backends))
+
+    def _failed(self, name: str, error: BaseException):
+        self.router.record(name, self.llm_type, self.router.policy(name).timeout, ok=False)
+        logger.warning(f"{self.llm_type} LLM backend {name} failed ({type(error).__name__}: {error}), trying next")
+
+    # ---- BaseChatModel 实现 ----
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        error: Optional[BaseException] = None
+        for name in self._candidates():
+            start = time.perf_counter()
+            call = _call_in_thread(
+                partial(self.backends[name]._generate, messages, stop=stop, run_manager=run_manager, **kwargs)
+            )
+            try:
+                result = call.result(timeout=self.router.policy(name).timeout)
+            except Exception as e:
+                self._failed(name, e)
+                error = e
+                continue
+            self.router.record(name, self.llm_type, time.perf_counter() - start, ok=True)
+            return result
+        raise error
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        error: Optional[BaseException] = None
+        for name in self._candidates():
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    self.backends[name]._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs),
+                    self.router.policy(name).timeout
+                )
+            except Exception as e:
+                self._failed(name, e)
+                error = e
+                continue
+            self.router.record(name, self.llm_type, time.perf_counter() - start, ok=True)
+            return result
+        raise error
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        error: Optional[BaseException] = None
+        for name in self._candidates():
+            start = time.perf_counter()
+            stream = self.backends[name]._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            call = _call_in_thread(partial(next, stream, None))
+            try:
+                first = call.result(timeout=self.router.policy(name).timeout)
+            except Exception as e:
+                # 超时时生成器仍在线程中执行，结束后再关闭
+                call.add_done_callback(lambda _, stream=stream: stream.close())
+                self._failed(name, e)
+                error = e
+                continue
+            self.router.record(name, self.llm_type, time.perf_counter() - start, ok=True)
+            try:
+                if first is not None:
+                    yield first
+                    yield from stream
+            finally:
+                stream.close()
+            return
+        raise error
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        error: Optional[BaseException] = None
+        for name in self._candidates():
+            start = time.perf_counter()
+            stream = self.backends[name]._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            try:
+                first = await asyncio.wait_for(anext(stream, None), self.router.policy(name).timeout)
+            except Exception as e:
+                await stream.aclose()
+                self._failed(name, e)
+                error = e
+                continue
+            except BaseException:
+                await stream.aclose()
+                raise
+            self.router.record(name, self.llm_type, time.perf_counter() - start, ok=True)
+            try:
+                if first is not None:
+                    yield first
+                    async for chunk in stream:
+                        yield chunk
+            finally:
+                await stream.aclose()
+            return
+        raise error
+
+
+def create_router(config) -> Optional[LLMRouter]:
+    """按 llm_router 配置创建路由状态，未启用时返回 None"""
+    if not config.get("llm_router.enabled", False):
+        return None
+    policies = {
+        backend: BackendPolicy.model_validate(options or {})
+        for backend, options in (config.get("llm_router.backends") or {}).items()
+    }
+    logger.info(f"LLM router enabled (backends: {', '.join(policies) or 'default'})")
+    return LLMRouter(policies, window=config.get("llm_router.window", 50))
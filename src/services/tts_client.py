@@ -8,13 +8,17 @@
 
 import asyncio
 import io
-from typing import Optional
+import queue
+import threading
+from typing import Iterable, Optional
 
 import edge_tts
 from pydub import AudioSegment
 from pydub.playback import play
+from pydub.utils import make_chunks
 
 from src.utils.logger import logger
+from src.utils.tracing import tracer
 
 
 class tts_client:
@@ -53,6 +57,9 @@ class tts_client:
         self.rate = rate
         self.volume = volume
         self.pitch = pitch
+        self._stopped = threading.Event()  # stop() 后中断当前合成和播放，直到下一条指令 reset()
+        self._pa = None  # 播放用 PyAudio 实例（首次播放时创建，close() 释放）
+        self._pa_lock = threading.Lock()
 
         logger.info(f"EdgeTTS initialized (voice={self.voice_id}, rate={rate})")
 
@@ -81,6 +88,9 @@ class tts_client:
             # 合成音频
             audio_data = b""
             async for chunk in communicate.stream():
+                if self._stopped.is_set():
+                    logger.info("Speech synthesis interrupted")
+                    return b""
                 if chunk["type"] == "audio":
                     audio_data += chunk["data"]
 
@@ -105,21 +115,35 @@ class tts_client:
         """同步合成语音 - 返回音频数据 (MP3)"""
         return asyncio.run(self.synthesize_async(text, save_to))
 
+    def stop(self):
+        """中断正在进行的合成和播放（线程安全），直到 reset() 前的 speak 都不再出声"""
+        self._stopped.set()
+
+    def reset(self):
+        """新指令开始时清除 stop 标记（每条指令一次，避免 speak 开头清除而丢失取消）"""
+        self._stopped.clear()
+
     def speak(self, text: str) -> None:
-        """合成并播放语音"""
+        """合成并播放语音（可被 stop 中断）"""
+        if self._stopped.is_set():
+            logger.info("Speech skipped: TTS stopped")
+            return
         try:
-            # 合成音频
-            audio_data = self.synthesize(text)
+            with tracer.span("tts", chars=len(text or "")):
+                # 合成音频
+                with tracer.span("tts.synthesize"):
+                    audio_data = self.synthesize(text)
 
-            if not audio_data:
-                logger.warning("No audio data to play")
-                return
+                if not audio_data:
+                    logger.warning("No audio data to play")
+                    return
 
-            logger.info("Playing audio...")
+                logger.info("Playing audio...")
 
-            # 播放音频
-            audio = AudioSegment.from_mp3(io.BytesIO(audio_data))
-            play(audio)
+                # 播放音频
+                with tracer.span("tts.playback"):
+                    audio = AudioSegment.from_mp3(io.BytesIO(audio_data))
+                    self._play(audio)
 
             logger.info("Audio playback completed")
 
@@ -127,6 +151,80 @@ class tts_client:
             logger.error(f"Failed to play audio: {e}")
             raise
 
+    def speak_stream(self, sentences: Iterable[str]) -> None:
+        """
+        逐句合成并播放（可被 stop 中断）
+
+        后台线程按到达顺序合成，当前线程依次播放：第一句合成完即开始出声，
+        播放当前句时同时合成下一句，sentences 可以是仍在生成中的流。
+        """
+        audio_queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+
+        def synthesize_all():
+            try:
+                for sentence in sentences:
+                    if self._stopped.is_set():
+                        break
+                    if sentence and sentence.strip():
+                        audio_queue.put(self.synthesize(sentence))
+            except Exception as e:
+                logger.error(f"Streaming TTS synthesis failed: {e}")
+            finally:
+                audio_queue.put(None)
+
+        threading.Thread(target=synthesize_all, name="tts-synthesize", daemon=True).start()
+
+        with tracer.span("tts", streaming=True):
+            while not self._stopped.is_set():
+                audio_data = audio_queue.get()
+                if audio_data is None:
+                    break
+                if not audio_data or self._stopped.is_set():
+                    continue
+                with tracer.span("tts.playback"):
+                    self._play(AudioSegment.from_mp3(io.BytesIO(audio_data)))
+
+        logger.info("Streaming playback completed")
+
+    def _play(self, audio: AudioSegment, chunk_ms: int = 100):
+        """分块播放，每块之间检查是否被中断"""
+        try:
+            import pyaudio
+        except ImportError:
+            play(audio)
+            return
+
+        with self._pa_lock:
+            if self._pa is None:
+                self._pa = pyaudio.PyAudio()
+            pa = self._pa
+
+        stream = pa.open(
+            format=pa.get_format_from_width(audio.sample_width),
+            channels=audio.channels,
+            rate=audio.frame_rate,
+            output=True
+        )
+        try:
+            for chunk in make_chunks(audio, chunk_ms):
+                if self._stopped.is_set():
+                    logger.info("Audio playback interrupted")
+                    break
+                stream.write(chunk.raw_data)
+        finally:
+            stream.stop_stream()
+            stream.close()
+
+    def close(self):
+        """释放播放用的 PyAudio 实例"""
+        with self._pa_lock:
+            pa, self._pa = self._pa, None
+        if pa is not None:
+            try:
+                pa.terminate()
+            except Exception as e:
+                logger.warning(f"Releasing TTS PyAudio failed: {e}")
+
     @classmethod
     def list_voices(cls) -> dict:
         """列出所有可用音色"""
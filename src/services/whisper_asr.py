@@ -13,9 +13,6 @@ import tempfile
 from pathlib import Path
 from typing import Dict, Any, Optional
 
-import torch
-from transformers import pipeline
-
 from src.utils.logger import logger
 
 if getattr(sys, 'frozen', False):
@@ -25,8 +22,6 @@ else:
     # Running as Python script
     model_dir = Path(__file__).parent.parent / "models"
 
-model_dir.mkdir(exist_ok=True)
-
 
 class WhisperASR:
     """
@@ -42,6 +37,10 @@ class WhisperASR:
             chunk_length_s: int = 30
     ):
         """初始化本地 Whisper ASR"""
+        # torch / transformers 导入耗时较长，推迟到创建实例时
+        import torch
+        from transformers import pipeline
+
         self.model_name = model_name
         self.batch_size = batch_size
         self.chunk_length_s = chunk_length_s
@@ -55,6 +54,7 @@ class WhisperASR:
         logger.info(f"Initializing Whisper ASR...")
 
         # 使用本地缓存目录
+        model_dir.mkdir(exist_ok=True)
         cache_dir = str(model_dir / "huggingface")
 
         # 初始化 pipeline
@@ -19,6 +19,14 @@ class Config:
     """配置管理类"""
 
     def __init__(self, config_path: Optional[str] = None):
+        self._config_path = config_path
+        self._config: Optional[dict] = None
+
+    def _ensure_loaded(self) -> None:
+        """首次读取配置时才加载 .env 和 config.yaml，避免导入时的文件 I/O"""
+        if self._config is not None:
+            return
+
         # 加载 .env 文件
         if getattr(sys, 'frozen', False):
             # 运行编译后的 exe
@@ -34,16 +42,25 @@ class Config:
             print(f"Warning: .env file not found at {env_path}")
 
         # 加载 config.yaml (仅用于非敏感配置)
-        if config_path is None:
-            config_path = project_root / "config" / "config.yaml"
+        if self._config_path is None:
+            self._config_path = project_root / "config" / "config.yaml"
+
+        self._config = self._load_config()
 
-        self.config_path = config_path
-        self.config = self._load_config()
+    @property
+    def config_path(self):
+        self._ensure_loaded()
+        return self._config_path
+
+    @property
+    def config(self) -> dict:
+        self._ensure_loaded()
+        return self._config
 
     def _load_config(self) -> dict:
         """加载 YAML 配置文件"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
+            with open(self._config_path, 'r', encoding='utf-8') as f:
                 return yaml.safe_load(f) or {}
         except FileNotFoundError:
             return self._get_default_config()
@@ -84,6 +101,8 @@ class Config:
         1. 先尝试从环境变量获取 (自动映射)
         2. 再从 YAML 配置获取
         """
+        self._ensure_loaded()
+
         # 尝试从环境变量获取
         env_key = self._map_to_env_key(key)
         if env_key:
@@ -116,6 +135,9 @@ class Config:
             'google_serper.api_key': 'GOOGLE_SERPER_API_KEY',
             # 七牛云
             'qiniu.api_key': 'QINIU_API_KEY',
+            'qiniu.base_url': 'QINIU_BASE_URL',  # 如指向本地假 LLM 服务压测
+            # Ollama
+            'ollama.base_url': 'OLLAMA_BASE_URL',
         }
         return mapping.get(yaml_key)
 
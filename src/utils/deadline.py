@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : deadline.py
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, List, Optional
+
+from src.utils.logger import logger
+
+_current_deadline: contextvars.ContextVar[Optional['Deadline']] = contextvars.ContextVar(
+    "voxagent_current_deadline", default=None
+)
+
+
+class Interrupted(Exception):
+    """执行被中断（超时或取消）"""
+
+    kind = "interrupted"
+
+
+class DeadlineExceeded(Interrupted):
+    """超过截止时间"""
+
+    kind = "timeout"
+
+
+class OperationCancelled(Interrupted):
+    """被主动取消"""
+
+    kind = "cancelled"
+
+
+class Deadline:
+    """
+    截止时间 + 协作式取消令牌
+
+    子 Deadline 的截止时间不晚于父级，父级取消时子级同时取消。
+    通过 deadline_scope 放入 contextvar，asyncio 任务和 langchain 的工具线程会自动继承。
+    """
+
+    def __init__(self, timeout: Optional[float] = None, parent: Optional['Deadline'] = None):
+        """
+        Args:
+            timeout: 从现在起的秒数，None 表示不限（仍受父级约束）
+            parent: 父级 Deadline
+        """
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        if parent is not None and parent.expires_at is not None:
+            expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+
+        self.parent = parent
+        self.expires_at = expires_at
+        self._lock = threading.Lock()
+        self._cancel_reason: Optional[str] = None
+        self._callbacks: List[Callable[[], None]] = []
+
+    def child(self, timeout: Optional[float] = None) -> 'Deadline':
+        """创建子 Deadline"""
+        return Deadline(timeout, parent=self)
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数（不小于 0），不限时返回 None"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    @property
+    def cancel_reason(self) -> Optional[str]:
+        if self._cancel_reason is not None:
+            return self._cancel_reason
+        return self.parent.cancel_reason if self.parent is not None else None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    @property
+    def done(self) -> bool:
+        return self.cancelled or self.expired
+
+    def cancel(self, reason: str = "已取消"):
+        """取消（线程安全），触发所有已注册的回调"""
+        with self._lock:
+            if self._cancel_reason is not None:
+                return
+            self._cancel_reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+
+        logger.info(f"Deadline cancelled: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancel callback failed: {e}")
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        注册取消回调（本级或任一父级取消时调用），返回注销函数
+
+        已取消时立即调用；回调可能被调用多次，应保证幂等。
+        """
+        with self._lock:
+            fired = self._cancel_reason is not None
+            if not fired:
+                self._callbacks.append(callback)
+        remove_parent = self.parent.add_callback(callback) if self.parent is not None else None
+
+        if fired:
+            callback()
+
+        def remove():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+            if remove_parent is not None:
+                remove_parent()
+
+        return remove
+
+    def check(self):
+        """已取消或已超时时抛出 Interrupted"""
+        reason = self.cancel_reason
+        if reason is not None:
+            raise OperationCancelled(reason)
+        if self.expired:
+            raise DeadlineExceeded("处理超时")
+
+    async def run(self, awaitable: Awaitable[Any]) -> Any:
+        """
+        在截止时间内等待 awaitable，超时或取消时取消底层任务（中断进行中的 LLM/HTTP 请求）
+
+        Raises:
+            DeadlineExceeded: 超时
+            OperationCancelled: 被取消
+        """
+        try:
+            self.check()
+        except Interrupted:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(awaitable)
+
+        def cancel_task():
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+        remove = self.add_callback(cancel_task)
+        try:
+            return await asyncio.wait_for(task, self.remaining())
+        except asyncio.TimeoutError:
+            if task.cancelled() or self.expired:
+                raise DeadlineExceeded("处理超时") from None
+            raise
+        except asyncio.CancelledError:
+            if self.cancelled:
+                raise OperationCancelled(self.cancel_reason) from None
+            raise
+        finally:
+            remove()
+
+
+def current_deadline() -> Optional[Deadline]:
+    """当前上下文的 Deadline"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """在上下文中设置当前 Deadline（None 时不做任何事）"""
+    if deadline is None:
+        yield None
+        return
+
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+async def run_with_deadline(awaitable: Awaitable[Any]) -> Any:
+    """按当前上下文的 Deadline 等待 awaitable，没有 Deadline 时直接等待"""
+    deadline = current_deadline()
+    if deadline is None:
+        return await awaitable
+    return await deadline.run(awaitable)
+
+
+def check_deadline():
+    """同步代码中的协作式检查点：当前 Deadline 已取消或超时时抛出 Interrupted"""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
+
+
+def timeout_for(default: float, minimum: float = 1.0) -> float:
+    """HTTP 请求超时：不超过当前 Deadline 的剩余时间"""
+    deadline = current_deadline()
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is None:
+        return default
+    return max(minimum, min(default, remaining))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : json_stream.py
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from langchain_core.utils.json import parse_partial_json
+
+
+class StreamingJSONParser:
+    """
+    增量 JSON 解析器 - 逐块输入 LLM 流式输出，顶层对象中指定数组的元素一闭合就返回
+
+    只跟踪字符串/转义状态和括号深度，每块输入的处理代价与块长度成正比。
+    根对象之前的文字（如 ```json 代码块标记）会被忽略。
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.text = ""
+
+        self._pos = 0
+        self._root_start: Optional[int] = None
+        self._stack: List[str] = []  # "{" / "[" 或 "items"（目标数组）
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = ""
+        self._item_start: Optional[int] = None
+        self.closed = False
+        self.items: List[Any] = []
+
+    def feed(self, chunk: str) -> List[Any]:
+        """输入一块文本，返回本次新闭合的数组元素"""
+        self.text += chunk
+        completed = []
+
+        while self._pos < len(self.text) and not self.closed:
+            char = self.text[self._pos]
+            index = self._pos
+            self._pos += 1
+
+            if self._root_start is None:
+                if char == "{":
+                    self._root_start = index
+                    self._stack.append("{")
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = self.text[self._string_start:index]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index + 1
+            elif char in "{[":
+                # 根对象中 key 为 array_key 的数组
+                if char == "[" and self._stack == ["{"] and self._last_string == self.array_key:
+                    self._stack.append("items")
+                    continue
+                if self._stack and self._stack[-1] == "items":
+                    self._item_start = index
+                self._stack.append(char)
+            elif char in "}]":
+                if not self._stack:
+                    self.closed = True
+                    break
+                self._stack.pop()
+                if self._stack and self._stack[-1] == "items" and self._item_start is not None:
+                    item = json.loads(self.text[self._item_start:index + 1])
+                    self._item_start = None
+                    self.items.append(item)
+                    completed.append(item)
+                elif not self._stack:
+                    self.closed = True
+
+        return completed
+
+    def partial(self) -> Dict[str, Any]:
+        """当前已输入内容的最佳解析结果（未闭合部分自动补全）"""
+        if self._root_start is None:
+            return {}
+
+        end = self._pos if self.closed else len(self.text)
+        try:
+            return parse_partial_json(self.text[self._root_start:end]) or {}
+        except Exception:
+            return {}
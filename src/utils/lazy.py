@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : lazy.py
+"""
+
+import importlib
+from typing import Callable, Dict, List, Tuple, Any
+
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    为包生成模块级 __getattr__ / __dir__（PEP 562），首次访问导出名时才导入所在子模块
+
+    用法（在 __init__.py 中）：
+        __getattr__, __dir__ = lazy_exports(__name__, {"WhisperASR": ".whisper_asr"})
+
+    Args:
+        package: 包名（传入 __name__）
+        exports: 导出名 -> 子模块（相对路径以 "." 开头）
+    """
+
+    def __getattr__(name: str) -> Any:
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module '{package}' has no attribute '{name}'")
+
+        value = getattr(importlib.import_module(module_name, package), name)
+        # 缓存到包命名空间，后续访问不再经过 __getattr__
+        setattr(importlib.import_module(package), name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(importlib.import_module(package))) | set(exports))
+
+    return __getattr__, __dir__
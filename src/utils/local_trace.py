@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : local_trace.py
+"""
+
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+from src.utils.config import config
+from src.utils.logger import logger
+
+DEFAULT_DB_PATH = Path(__file__).parent / "logs" / "langchain_runs.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    parent_id TEXT,
+    run_type TEXT NOT NULL,
+    name TEXT,
+    model TEXT,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    duration REAL NOT NULL,
+    inputs TEXT,
+    outputs TEXT,
+    error TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_runs_duration ON runs (run_type, duration);
+"""
+
+
+class LocalTraceHandler(BaseCallbackHandler):
+    """本地 LangChain 运行记录器 - 将 chain / LLM / tool 运行写入 SQLite（离线可用）"""
+
+    run_inline = True
+
+    def __init__(
+            self,
+            db_path: Optional[str] = None,
+            max_rows: int = 20000,
+            max_field_chars: int = 500,
+            flush_interval: float = 1.0
+    ):
+        """
+        Args:
+            db_path: SQLite 文件路径
+            max_rows: 最多保留的运行记录数（超出后删除最旧记录）
+            max_field_chars: 输入/输出字段截断长度
+            flush_interval: 后台批量写入间隔（秒）
+        """
+        self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        self.max_rows = max_rows
+        self.max_field_chars = max_field_chars
+        self.flush_interval = flush_interval
+
+        self._pending: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript(_SCHEMA)
+
+        self._writer = threading.Thread(target=self._write_loop, name="local-trace-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- 回调 ----------
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "chain", self._name(serialized, kwargs), inputs)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id, outputs=outputs)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        inputs = [[f"{m.type}: {m.content}" for m in batch] for batch in messages]
+        self._start(run_id, parent_run_id, "llm", self._name(serialized, kwargs), inputs, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "llm", self._name(serialized, kwargs), prompts, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        outputs = [g.text for batch in response.generations for g in batch]
+        self._end(run_id, outputs=outputs, usage=self._token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "tool", self._name(serialized, kwargs), input_str)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, outputs=output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    # ---------- 内部实现 ----------
+
+    @staticmethod
+    def _name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+        if kwargs.get("name"):
+            return kwargs["name"]
+        if serialized:
+            if serialized.get("name"):
+                return serialized["name"]
+            ids = serialized.get("id") or []
+            if ids:
+                return ids[-1]
+        return "unknown"
+
+    def _truncate(self, value: Any) -> str:
+        try:
+            text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+        except Exception:
+            text = str(value)
+        if len(text) > self.max_field_chars:
+            return text[:self.max_field_chars] + "..."
+        return text
+
+    def _start(self, run_id: UUID, parent_id: Optional[UUID], run_type: str, name: str,
+               inputs: Any, kwargs: Optional[Dict[str, Any]] = None):
+        model = None
+        if kwargs:
+            params = kwargs.get("invocation_params") or {}
+            model = params.get("model") or params.get("model_name")
+
+        with self._lock:
+            self._pending[run_id] = {
+                "run_id": str(run_id),
+                "parent_id": str(parent_id) if parent_id else None,
+                "run_type": run_type,
+                "name": name,
+                "model": model,
+                "start": time.time(),
+                "inputs": self._truncate(inputs)
+            }
+
+    def _end(self, run_id: UUID, outputs: Any = None, error: Optional[BaseException] = None,
+             usage: Optional[Dict[str, int]] = None):
+        with self._lock:
+            run = self._pending.pop(run_id, None)
+        if run is None:
+            return
+
+        end = time.time()
+        usage = usage or {}
+        self._queue.put((
+            run["run_id"], run["parent_id"], run["run_type"], run["name"], run["model"],
+            run["start"], end, end - run["start"], run["inputs"],
+            self._truncate(outputs) if outputs is not None else None,
+            repr(error)[:self.max_field_chars] if error else None,
+            usage.get("prompt_tokens"), usage.get("completion_tokens"), usage.get("total_tokens")
+        ))
+
+    @staticmethod
+    def _token_usage(response: LLMResult) -> Dict[str, int]:
+        """从 LLMResult 中提取 token 用量"""
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            return usage
+
+        for batch in response.generations:
+            for generation in batch:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    return {
+                        "prompt_tokens": metadata.get("input_tokens"),
+                        "completion_tokens": metadata.get("output_tokens"),
+                        "total_tokens": metadata.get("total_tokens")
+                    }
+        return {}
+
+    def _write_loop(self):
+        """后台线程：批量写入并维持记录数上限"""
+        conn = sqlite3.connect(self.db_path)
+        running = True
+        while running:
+            try:
+                items = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [item for item in items if item is not None]
+            running = len(rows) == len(items)
+            if rows:
+                self._write(conn, rows)
+            for _ in items:
+                self._queue.task_done()
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, rows: List[tuple]):
+        try:
+            conn.executemany(
+                "INSERT INTO runs (run_id, parent_id, run_type, name, model, start, end, duration, "
+                "inputs, outputs, error, prompt_tokens, completion_tokens, total_tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "DELETE FROM runs WHERE seq <= (SELECT MAX(seq) FROM runs) - ?",
+                (self.max_rows,)
+            )
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Failed to write local trace: {e}")
+
+    def flush(self):
+        """等待已结束的运行全部落盘"""
+        self._queue.join()
+
+    def close(self):
+        """停止后台写入线程"""
+        self._queue.put(None)
+        self._writer.join(timeout=5.0)
+
+
+class LocalTraceManager:
+    """本地运行记录管理器 - 注册为 LangChain 全局回调"""
+
+    handler: Optional[LocalTraceHandler] = None
+    _context_var: Optional[ContextVar] = None
+
+    @classmethod
+    def initialize(
+            cls,
+            db_path: Optional[str] = None,
+            max_rows: int = 20000,
+            max_field_chars: int = 500
+    ) -> bool:
+        """创建处理器并注册到 LangChain（所有线程中的运行都会被记录）"""
+        if cls.handler is not None:
+            logger.warning("Local trace already initialized")
+            return True
+
+        try:
+            cls.handler = LocalTraceHandler(
+                db_path=db_path,
+                max_rows=max_rows,
+                max_field_chars=max_field_chars
+            )
+            # 使用默认值而非 set()，新线程中同样可见
+            cls._context_var = ContextVar("voxagent_local_trace", default=cls.handler)
+            register_configure_hook(cls._context_var, inheritable=True)
+
+            logger.info(f"Local trace sink initialized: {cls.handler.db_path}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to initialize local trace sink: {e}")
+            cls.handler = None
+            return False
+
+
+def setup_local_trace() -> bool:
+    """根据配置启用本地运行记录（便捷函数）"""
+    if not config.get("local_trace.enabled", False):
+        logger.info("Local trace sink is disabled")
+        return False
+
+    return LocalTraceManager.initialize(
+        db_path=config.get("local_trace.path"),
+        max_rows=config.get("local_trace.max_rows", 20000),
+        max_field_chars=config.get("local_trace.max_field_chars", 500)
+    )
+
+
+def query_slowest(
+        db_path: Path,
+        limit: int = 10,
+        run_type: Optional[str] = None,
+        name: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """查询最慢的运行"""
+    sql = "SELECT * FROM runs"
+    conditions, params = [], []
+    if run_type:
+        conditions.append("run_type = ?")
+        params.append(run_type)
+    if name:
+        conditions.append("name LIKE ?")
+        params.append(f"%{name}%")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY duration DESC LIMIT ?"
+    params.append(limit)
+
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(sql, params)]
+
+
+def query_summary(db_path: Path) -> List[Dict[str, Any]]:
+    """按类型和名称汇总次数、平均/最大耗时和 token 用量"""
+    sql = (
+        "SELECT run_type, name, COUNT(*) AS count, AVG(duration) AS avg, MAX(duration) AS max, "
+        "SUM(COALESCE(total_tokens, 0)) AS tokens FROM runs "
+        "GROUP BY run_type, name ORDER BY avg DESC"
+    )
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(sql)]
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行：查询本地记录中最慢的运行"""
+    parser = argparse.ArgumentParser(description="Query local LangChain run traces")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="SQLite 文件路径")
+    parser.add_argument("-n", "--slowest", type=int, default=10, help="显示最慢的 N 条运行")
+    parser.add_argument("-t", "--type", choices=["chain", "llm", "tool"], help="按运行类型过滤")
+    parser.add_argument("--name", help="按名称过滤（模糊匹配）")
+    parser.add_argument("--summary", action="store_true", help="按名称汇总")
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db)
+    if not db_path.exists():
+        print(f"No trace database at {db_path}")
+        return
+
+    if args.summary:
+        print(f"{'type':<6} {'name':<40} {'count':>6} {'avg':>8} {'max':>8} {'tokens':>8}")
+        for row in query_summary(db_path):
+            print(
+                f"{row['run_type']:<6} {str(row['name'])[:40]:<40} {row['count']:>6} "
+                f"{row['avg']:>7.2f}s {row['max']:>7.2f}s {row['tokens']:>8}"
+            )
+        return
+
+    for row in query_slowest(db_path, args.slowest, args.type, args.name):
+        started = time.strftime("%m-%d %H:%M:%S", time.localtime(row["start"]))
+        tokens = f" tokens={row['total_tokens']}" if row["total_tokens"] else ""
+        model = f" model={row['model']}" if row["model"] else ""
+        print(f"{row['duration']:>7.2f}s  {row['run_type']:<5} {row['name']}{model}{tokens}  [{started}]")
+        print(f"          in:  {(row['inputs'] or '')[:120]}")
+        if row["error"]:
+            print(f"          err: {row['error'][:120]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,42 @@
 import logging
 import sys
-from pathlib import Path
+import threading
 from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+
+class DeferredFileHandler(RotatingFileHandler):
+    """日志文件处理器 - 写入第一条日志时才创建目录和文件（导入时不做文件 I/O）"""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(exist_ok=True)
+        return super()._open()
+
+
+class StartupBanner(logging.Filter):
+    """第一条日志之前经 logger 输出一次启动标记（控制台和文件都可见，日志轮转时不重复）"""
+
+    def __init__(self, logger: logging.Logger, log_file: Path):
+        super().__init__()
+        self.logger = logger
+        self.log_file = log_file
+        self._written = False
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self._written:
+            with self._lock:
+                if not self._written:
+                    self._written = True  # 先置位：下面的启动标记本身也会经过该过滤器
+                    self.logger.info("=" * 50)
+                    self.logger.info("应用启动 / Application started")
+                    self.logger.info(f"日志文件: {self.log_file}")
+                    self.logger.info("=" * 50)
+        return True
 
 
 def setup_logger(name: str = "VoiceAssistant", level: str = "INFO", enable_file_logging: bool = True) -> logging.Logger:
@@ -55,14 +90,9 @@ def setup_logger(name: str = "VoiceAssistant", level: str = "INFO", enable_file_
 
     # === 文件Handler (生产环境) ===
     if enable_file_logging:
-        from logging.handlers import RotatingFileHandler
+        log_file = app_dir / "logs" / f"app_{datetime.now().strftime('%Y%m%d')}.log"
 
-        log_dir = app_dir / "logs"
-        log_dir.mkdir(exist_ok=True)
-
-        log_file = log_dir / f"app_{datetime.now().strftime('%Y%m%d')}.log"
-
-        file_handler = RotatingFileHandler(
+        file_handler = DeferredFileHandler(
             log_file,
             maxBytes=10 * 1024 * 1024,
             backupCount=5,
@@ -76,11 +106,7 @@ def setup_logger(name: str = "VoiceAssistant", level: str = "INFO", enable_file_
         )
         file_handler.setFormatter(file_formatter)
         logger.addHandler(file_handler)
-
-        logger.info("=" * 50)
-        logger.info(f"应用启动 / Application started")
-        logger.info(f"日志文件: {log_file}")
-        logger.info("=" * 50)
+        logger.addFilter(StartupBanner(logger, log_file))
 
     return logger
 
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : startup.py
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Any
+
+from src.utils.logger import logger
+
+
+class StartupStage:
+    """启动图中的一个阶段"""
+
+    def __init__(self, name: str, func: Callable[[], Any], deps: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.future: Future = Future()
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        """阶段是否已成功完成"""
+        return self.future.done() and self.future.exception() is None and self.future.result() is not False
+
+
+class StartupGraph:
+    """启动依赖图 - 在线程池上并行执行各初始化阶段，每个阶段提供就绪 Future"""
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.stages: Dict[str, StartupStage] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._origin = 0.0
+
+    def add(self, name: str, func: Callable[[], Any], deps: Iterable[str] = ()) -> 'StartupGraph':
+        """
+        添加阶段
+
+        Args:
+            name: 阶段名
+            func: 初始化函数，返回 False 或抛出异常视为失败
+            deps: 依赖的阶段名（全部成功后才会执行）
+        """
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Unknown dependency '{dep}' for stage '{name}'")
+        self.stages[name] = StartupStage(name, func, deps)
+        return self
+
+    def has(self, name: str) -> bool:
+        return name in self.stages
+
+    def start(self) -> 'StartupGraph':
+        """开始执行（非阻塞），没有依赖的阶段立即提交"""
+        self._origin = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup")
+
+        for stage in self.stages.values():
+            if not stage.deps:
+                self._submit(stage)
+            else:
+                for dep in stage.deps:
+                    self.stages[dep].future.add_done_callback(lambda _, s=stage: self._on_dep_done(s))
+
+        # 全部完成后打印时间线并释放线程池
+        remaining = [s.future for s in self.stages.values()]
+        counter = {"left": len(remaining)}
+
+        def on_any_done(_):
+            with self._lock:
+                counter["left"] -= 1
+                last = counter["left"] == 0
+            if last:
+                logger.info("Startup timeline:\n" + self.format_timeline())
+                self._executor.shutdown(wait=False)
+
+        for future in remaining:
+            future.add_done_callback(on_any_done)
+
+        return self
+
+    def _on_dep_done(self, stage: StartupStage):
+        """某个依赖完成：依赖全部成功则提交，有失败则直接标记失败"""
+        with self._lock:
+            if stage.start is not None or stage.future.done():
+                return
+            deps = [self.stages[d] for d in stage.deps]
+            if not all(d.future.done() for d in deps):
+                return
+            failed = [d.name for d in deps if not d.ok]
+            if failed:
+                stage.start = stage.end = time.time()
+            else:
+                stage.start = time.time()
+
+        if failed:
+            logger.warning(f"Startup stage '{stage.name}' skipped, dependency failed: {failed}")
+            stage.future.set_result(False)
+        else:
+            self._executor.submit(self._run, stage)
+
+    def _submit(self, stage: StartupStage):
+        stage.start = time.time()
+        self._executor.submit(self._run, stage)
+
+    @staticmethod
+    def _run(stage: StartupStage):
+        try:
+            result = stage.func()
+        except Exception as e:
+            logger.error(f"Startup stage '{stage.name}' failed: {e}", exc_info=True)
+            stage.end = time.time()
+            stage.future.set_exception(e)
+            return
+
+        stage.end = time.time()
+        if result is False:
+            logger.error(f"Startup stage '{stage.name}' failed")
+        else:
+            logger.debug(f"Startup stage '{stage.name}' ready in {stage.end - stage.start:.2f}s")
+        stage.future.set_result(result)
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        等待某个阶段就绪
+
+        Returns:
+            成功就绪返回 True；失败、超时或阶段不存在返回 False
+        """
+        stage = self.stages.get(name)
+        if stage is None:
+            return False
+
+        if not stage.future.done():
+            logger.info(f"Waiting for '{name}' to become ready...")
+            waited = time.time()
+            try:
+                stage.future.exception(timeout=timeout)
+            except TimeoutError:
+                logger.warning(f"Timed out waiting for '{name}'")
+                return False
+            logger.info(f"'{name}' ready after waiting {time.time() - waited:.2f}s")
+
+        return stage.ok
+
+    def wait_all(self, names: Iterable[str], timeout: Optional[float] = None) -> bool:
+        """等待多个阶段全部就绪"""
+        return all(self.wait(name, timeout) for name in names)
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        """各阶段相对启动时刻的起止时间"""
+        items = []
+        for stage in self.stages.values():
+            items.append({
+                "name": stage.name,
+                "start": (stage.start - self._origin) if stage.start else None,
+                "end": (stage.end - self._origin) if stage.end else None,
+                "ok": stage.ok
+            })
+        return items
+
+    def format_timeline(self, width: int = 40) -> str:
+        """将启动时间线格式化为文本"""
+        items = self.timeline()
+        total = max([item["end"] or 0.0 for item in items] + [1e-6])
+        lines = []
+        for item in sorted(items, key=lambda i: (i["start"] is None, i["start"] or 0.0)):
+            if item["start"] is None:
+                lines.append(f"  {item['name']:<16} (not started)")
+                continue
+            end = item["end"] if item["end"] is not None else item["start"]
+            offset = int(item["start"] / total * width)
+            length = max(1, int((end - item["start"]) / total * width))
+            bar = " " * offset + "█" * min(length, width - offset)
+            status = "ok" if item["ok"] else "FAILED"
+            lines.append(
+                f"  {item['name']:<16} |{bar:<{width}}| "
+                f"{item['start']:.2f}s → {end:.2f}s {status}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : tracing.py
+"""
+
+import argparse
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Deque, Iterator
+
+from src.utils.logger import logger
+
+DEFAULT_TRACE_FILE = Path(__file__).parent / "logs" / "traces.jsonl"
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar(
+    "voxagent_current_span", default=None
+)
+
+
+class Span:
+    """一个计时区间（父子关系通过 parent_id 关联）"""
+
+    __slots__ = ("name", "span_id", "parent_id", "trace_id", "start", "end", "attributes")
+
+    def __init__(
+            self,
+            name: str,
+            trace_id: str,
+            parent_id: Optional[str] = None,
+            start: Optional[float] = None,
+            attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:12]
+        self.parent_id = parent_id
+        self.trace_id = trace_id
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+
+    @property
+    def duration(self) -> float:
+        """耗时（秒），未结束时按当前时间计算"""
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "trace_id": self.trace_id,
+            "start": self.start,
+            "end": self.end,
+            "attributes": self.attributes
+        }
+
+
+class Tracer:
+    """进程内轻量追踪器 - 记录各阶段耗时，维护滚动 p50/p95 直方图"""
+
+    def __init__(self, max_traces: int = 50, window: int = 200):
+        """
+        Args:
+            max_traces: 内存中保留的最近命令数
+            window: 每个阶段滚动统计的样本数
+        """
+        self.enabled = True
+        self.window = window
+        self.trace_file: Optional[Path] = None
+        self.max_file_traces = 500
+
+        self._lock = threading.Lock()
+        self._open_traces: Dict[str, List[Span]] = {}
+        self._traces: Deque[List[Dict[str, Any]]] = deque(maxlen=max_traces)
+        self._histograms: Dict[str, Deque[float]] = {}
+
+    def configure(
+            self,
+            enabled: bool = True,
+            trace_file: Optional[str] = None,
+            max_file_traces: int = 500,
+            window: Optional[int] = None
+    ):
+        """应用配置（由初始化器调用）"""
+        self.enabled = enabled
+        self.trace_file = Path(trace_file) if trace_file else None
+        self.max_file_traces = max_file_traces
+        if window:
+            self.window = window
+            with self._lock:
+                for name, samples in self._histograms.items():
+                    self._histograms[name] = deque(samples, maxlen=window)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """
+        记录一个阶段：with tracer.span("asr"): ...
+
+        当前上下文中没有父 span 时，新建一条 trace（一次命令）
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Span:
+        """手动开始一个 span（跨回调场景使用），需配合 end_span"""
+        parent = parent or _current_span.get()
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex[:12]
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes
+        )
+        with self._lock:
+            if trace_id not in self._open_traces and len(self._open_traces) >= 256:
+                # 丢弃最早的未闭合 trace，防止泄漏
+                self._open_traces.pop(next(iter(self._open_traces)))
+            self._open_traces.setdefault(trace_id, []).append(span)
+        return span
+
+    def end_span(self, span: Span):
+        """结束 span，根 span 结束时归档整条 trace"""
+        if span.end is None:
+            span.end = time.time()
+
+        with self._lock:
+            samples = self._histograms.get(span.name)
+            if samples is None:
+                samples = self._histograms[span.name] = deque(maxlen=self.window)
+            samples.append(span.duration)
+
+            if span.parent_id is not None:
+                return
+
+            spans = self._open_traces.pop(span.trace_id, [])
+            trace = [s.to_dict() for s in spans]
+            self._traces.append(trace)
+
+        self._persist(trace)
+
+    def record(self, name: str, start: float, end: float, **attributes):
+        """补记一个已发生的阶段（如 VAD 端点等待），挂在当前 span 下"""
+        if not self.enabled:
+            return
+        span = self.start_span(name, **attributes)
+        span.start = start
+        span.end = end
+        self.end_span(span)
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    def percentiles(self, name: str) -> Dict[str, float]:
+        """某阶段的滚动 p50/p95（秒）"""
+        with self._lock:
+            samples = list(self._histograms.get(name, []))
+        return _percentiles(samples)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """所有阶段的滚动统计"""
+        with self._lock:
+            names = list(self._histograms.keys())
+        return {name: self.percentiles(name) for name in names}
+
+    def recent_traces(self, n: int = 5) -> List[List[Dict[str, Any]]]:
+        """最近 n 条命令的 span 列表"""
+        with self._lock:
+            return list(self._traces)[-n:]
+
+    def reset(self):
+        """清空统计（测试用）"""
+        with self._lock:
+            self._open_traces.clear()
+            self._traces.clear()
+            self._histograms.clear()
+
+    def _persist(self, trace: List[Dict[str, Any]]):
+        """将完成的 trace 追加到 JSONL 文件，超出上限时截断旧记录"""
+        if not self.trace_file or not trace:
+            return
+
+        try:
+            self.trace_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.trace_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+
+            if self.trace_file.stat().st_size > self.max_file_traces * 4096:
+                lines = self.trace_file.read_text(encoding="utf-8").splitlines()
+                if len(lines) > self.max_file_traces:
+                    kept = lines[-self.max_file_traces:]
+                    self.trace_file.write_text("\n".join(kept) + "\n", encoding="utf-8")
+
+        except Exception as e:
+            logger.warning(f"Failed to persist trace: {e}")
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    """计算样本的 p50/p95"""
+    if not samples:
+        return {"count": 0, "p50": 0.0, "p95": 0.0}
+
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+    return {"count": len(ordered), "p50": pick(0.5), "p95": pick(0.95)}
+
+
+def format_waterfall(trace: List[Dict[str, Any]], width: int = 40) -> str:
+    """将一条 trace 格式化为瀑布图文本"""
+    if not trace:
+        return "(empty trace)"
+
+    by_id = {s["span_id"]: s for s in trace}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in trace:
+        parent_id = s["parent_id"] if s["parent_id"] in by_id else None
+        children.setdefault(parent_id, []).append(s)
+
+    roots = children.get(None, [])
+    origin = min(s["start"] for s in trace)
+    finish = max((s["end"] or s["start"]) for s in trace)
+    total = max(finish - origin, 1e-6)
+
+    header_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(origin))
+    lines = [f"Trace {trace[0]['trace_id']}  {header_time}  total {total:.2f}s"]
+
+    def walk(span: Dict[str, Any], depth: int):
+        end = span["end"] or span["start"]
+        offset = int((span["start"] - origin) / total * width)
+        length = max(1, int((end - span["start"]) / total * width))
+        bar = " " * offset + "█" * min(length, width - offset)
+        label = ("  " * depth + span["name"])[:32]
+        lines.append(f"  {label:<32} |{bar:<{width}}| {end - span['start']:.2f}s")
+        for child in sorted(children.get(span["span_id"], []), key=lambda c: c["start"]):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda r: r["start"]):
+        walk(root, 0)
+
+    return "\n".join(lines)
+
+
+def format_stats(stats: Dict[str, Dict[str, float]]) -> str:
+    """将阶段统计格式化为表格文本"""
+    lines = [f"  {'stage':<32} {'count':>6} {'p50':>8} {'p95':>8}"]
+    for name, item in sorted(stats.items(), key=lambda kv: -kv[1]["p50"]):
+        lines.append(f"  {name:<32} {item['count']:>6} {item['p50']:>7.2f}s {item['p95']:>7.2f}s")
+    return "\n".join(lines)
+
+
+def load_traces(trace_file: Path) -> List[List[Dict[str, Any]]]:
+    """读取 JSONL trace 文件"""
+    if not trace_file.exists():
+        return []
+
+    traces = []
+    for line in trace_file.read_text(encoding="utf-8").splitlines():
+        try:
+            traces.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return traces
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行：打印最近 N 条命令的瀑布图和各阶段 p50/p95"""
+    parser = argparse.ArgumentParser(description="VoxAgent latency waterfall")
+    parser.add_argument("-n", "--last", type=int, default=5, help="显示最近 N 条命令")
+    parser.add_argument("-f", "--file", default=str(DEFAULT_TRACE_FILE), help="trace 文件路径")
+    parser.add_argument("--width", type=int, default=40, help="瀑布图宽度")
+    args = parser.parse_args(argv)
+
+    traces = load_traces(Path(args.file))
+    if not traces:
+        print(f"No traces found in {args.file}")
+        return
+
+    for trace in traces[-args.last:]:
+        print(format_waterfall(trace, width=args.width))
+        print()
+
+    samples: Dict[str, List[float]] = {}
+    for trace in traces:
+        for s in trace:
+            if s["end"] is not None:
+                samples.setdefault(s["name"], []).append(s["end"] - s["start"])
+
+    print(f"Stage latency over {len(traces)} commands:")
+    print(format_stats({name: _percentiles(values) for name, values in samples.items()}))
+
+
+# 全局追踪器实例
+tracer = Tracer()
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,20 @@
 BaseAgent 核心功能测试
 """
 
+import asyncio
 import os
 import tempfile
+import time
+from unittest.mock import Mock
 
 import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
 from langchain_openai import ChatOpenAI
 
-from src.core.agent.agents.base_agent import BaseAgent
+from src.core.agent.agents.base_agent import BaseAgent, AgentPool
+from src.core.agent.agents.planner_agent import PlannerAgent
 from src.core.agent.entities.agent_entity import AgentConfig
 from src.core.tools import ToolRegistry
 from src.utils.config import config
@@ -152,5 +159,137 @@ class TestBaseAgentCore:
         assert len(agent.conversation_history) == 0
 
 
+class TestAgentPool:
+    """测试惰性 Agent 池"""
+
+    @pytest.fixture
+    def offline_llm(self):
+        """无需网络的 LLM（只用于构建 Agent）"""
+        return ChatOpenAI(api_key="test-key", base_url="http://localhost:1/v1", model="gpt-4o-mini")
+
+    @pytest.fixture
+    def pool(self, offline_llm, tool_manager):
+        return BaseAgent.create_all_agents(
+            llm=offline_llm,
+            tool_manager=tool_manager,
+            check_dependencies=False,
+            lazy=True
+        )
+
+    def test_pool_builds_nothing_upfront(self, pool):
+        """💤 测试创建 Agent 池时不实例化任何 Agent"""
+        assert isinstance(pool, AgentPool)
+        assert "test_agent" in pool
+        assert len(pool) == len(list(pool))
+        assert pool.built == []
+
+    def test_describe_without_instantiation(self, pool):
+        """📋 测试从类注册表读取能力信息"""
+        ability = pool.describe("test_agent")
+
+        assert ability["description"] == "用于测试的Agent"
+        assert ability["tools"] == ["file_create"]
+        assert pool.built == []
+
+    def test_describe_is_stable_after_build(self, pool):
+        """🪞 测试 Agent 构建前后能力信息一致"""
+        before = pool.describe("test_agent")
+        agent = pool["test_agent"]
+
+        assert pool.describe("test_agent") == before
+        assert before["tools"] == agent.get_ability_info()["tools"]
+
+    def test_planner_reads_metadata_only(self, pool, offline_llm):
+        """🧭 测试规划器生成 Agent 信息时不触发构建"""
+        planner = PlannerAgent(llm=offline_llm, available_agents=pool)
+
+        assert "test_agent: 用于测试的Agent" in planner.agent_info
+        assert pool.built == []
+
+    def test_agent_built_on_first_use_and_cached(self, pool):
+        """🏗️ 测试首次取用时构建并缓存"""
+        agent = pool["test_agent"]
+
+        assert isinstance(agent, TestAgent)
+        assert pool.get("test_agent") is agent
+        assert pool.built == ["test_agent"]
+        assert "test_agent" in pool.stats()["build_times"]
+
+    def test_fork_isolates_instances(self, pool):
+        """🔀 测试 fork 出的池共享 LLM 和工具，但各自构建 Agent 实例"""
+        first = pool["test_agent"]
+        forked = pool.fork()
+
+        assert forked.built == []
+        assert forked.llm is pool.llm and forked.tool_manager is pool.tool_manager
+        assert forked["test_agent"] is not first
+        assert forked["test_agent"].llm is first.llm
+
+    def test_failed_build_returns_none(self, offline_llm):
+        """❌ 测试构建失败时 get 返回 None 且不重复尝试"""
+        tool_manager = Mock()
+        tool_manager.get_tools_by_names.side_effect = ValueError("Tool 'file_create' not found")
+        pool = AgentPool(["test_agent"], llm=offline_llm, tool_manager=tool_manager)
+
+        assert pool.get("test_agent") is None
+        assert pool.get("test_agent") is None
+        assert tool_manager.get_tools_by_names.call_count == 1
+        assert "test_agent" in pool.stats()["failed"]
+
+    def test_unknown_agent_type(self, pool):
+        """🚫 测试未知 Agent 类型"""
+        assert pool.get("no_such_agent") is None
+        with pytest.raises(KeyError):
+            pool["no_such_agent"]
+
+
+class SlowToolLLM(BaseChatModel):
+    """第一次调用返回工具调用，之后每次调用都很慢的假模型"""
+
+    file_path: str
+    delay: float = 5.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-tool-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "file_create", "args": {"file_path": self.file_path, "content": "x"}, "id": "1"}
+            ])
+        else:
+            await asyncio.sleep(self.delay)
+            message = AIMessage(content="完成")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class TestAgentTimeout:
+    """测试 Agent 超时"""
+
+    def test_timeout_returns_partial_result(self, tool_manager, tmp_path):
+        """⏰ 测试超时中断进行中的 LLM 调用，并保留已完成的工具调用"""
+        llm = SlowToolLLM(file_path=str(tmp_path / "a.txt"))
+        agent = TestAgent(llm=llm, tool_manager=tool_manager, config=AgentConfig(timeout=1))
+
+        start = time.time()
+        result = agent.invoke({"user_input": "创建文件"})
+
+        assert time.time() - start < 2
+        assert result["success"] is False
+        assert result["interrupted"] == "timeout"
+        assert result["iterations"] == 1
+        assert result["intermediate_steps"][0][0].tool == "file_create"
+        assert (tmp_path / "a.txt").exists()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
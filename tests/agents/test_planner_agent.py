@@ -13,9 +13,19 @@
 @File   : test_text_to_plan_flow.py
 """
 
+import json
 import sys
 from pathlib import Path
+from unittest.mock import Mock
 
+import pytest
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.core.models import ExecutionPlan, Task
 from src.utils.langsmith_setup import setup_langsmith
 
 # 添加项目根目录到路径
@@ -124,3 +134,270 @@ def test_text_to_plan_flow():
 
 if __name__ == "__main__":
     test_text_to_plan_flow()
+
+
+class StreamingToolLLM(BaseChatModel):
+    """按小块流式输出工具调用参数的假模型"""
+
+    arguments: str
+    chunk_size: int = 8
+    tool_calling: bool = True
+    emitted: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "streaming-tool-fake"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        if not self.tool_calling:
+            raise NotImplementedError
+        assert tool_choice == tools[0].__name__
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.tool_calling:
+            message = AIMessage(content="", tool_calls=[{"name": "tool", "args": json.loads(self.arguments), "id": "1"}])
+        else:
+            message = AIMessage(content=self.arguments)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i in range(0, len(self.arguments), self.chunk_size):
+            self.emitted = i + self.chunk_size
+            text = self.arguments[i:i + self.chunk_size]
+            if self.tool_calling:
+                message = AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[{"name": None, "args": text, "id": None, "index": 0}]
+                )
+            else:
+                message = AIMessageChunk(content=text)
+            yield ChatGenerationChunk(message=message)
+
+
+PLAN_ARGUMENTS = json.dumps({
+    "task": "创建文件并搜索",
+    "feasibility": "feasible",
+    "reason": "可以完成",
+    "steps": [
+        {"step_number": 1, "assigned_agent": "file", "description": "在桌面创建 notes.txt", "expected_result": "文件已创建"},
+        {"step_number": 2, "assigned_agent": "search", "description": "搜索北京天气", "expected_result": "天气信息"},
+    ]
+}, ensure_ascii=False)
+
+
+class TestPlannerStreaming:
+    """PlannerAgent 流式规划与提前分发测试"""
+
+    AGENTS = {
+        "file": {"description": "文件管理", "tools": []},
+        "search": {"description": "搜索", "tools": []},
+    }
+
+    class FakeAgents(dict):
+        def describe(self, agent_type):
+            return self[agent_type]
+
+    def make_planner(self, llm):
+        from src.core.agent.agents.planner_agent import PlannerAgent
+        return PlannerAgent(llm=llm, available_agents=self.FakeAgents(self.AGENTS))
+
+    def test_first_step_dispatched_before_stream_ends(self):
+        """⚡ 测试第一个步骤在输出结束前就被分发"""
+        llm = StreamingToolLLM(arguments=PLAN_ARGUMENTS)
+        planner = self.make_planner(llm)
+        dispatched = []
+
+        plan = planner.plan_sync("创建文件并搜索", on_step=lambda task: dispatched.append((llm.emitted, task)))
+
+        assert [task.description for _, task in dispatched] == ["在桌面创建 notes.txt", "搜索北京天气"]
+        assert dispatched[0][0] < len(PLAN_ARGUMENTS)
+        # 最终计划沿用已分发的 Task
+        assert [task.task_id for task in plan.tasks] == [task.task_id for _, task in dispatched]
+        assert plan.metadata["feasibility"] == "feasible"
+
+    def test_plain_json_fallback(self):
+        """📄 测试模型不支持工具调用时解析文本 JSON"""
+        llm = StreamingToolLLM(arguments=f"```json\n{PLAN_ARGUMENTS}\n```", tool_calling=False)
+        plan = self.make_planner(llm).plan_sync("创建文件并搜索")
+
+        assert len(plan.tasks) == 2
+        assert plan.tasks[1].assigned_agent == "search"
+
+    def test_infeasible_plan_not_dispatched(self):
+        """🚫 测试不可行的计划不分发步骤"""
+        arguments = json.dumps({"task": "订票", "feasibility": "infeasible", "reason": "没有订票能力", "steps": []})
+        dispatched = []
+        plan = self.make_planner(StreamingToolLLM(arguments=arguments)).plan_sync("订票", on_step=dispatched.append)
+
+        assert dispatched == []
+        assert plan.metadata["feasibility"] == "infeasible"
+
+    def test_truncated_output_keeps_dispatched_steps(self):
+        """✂️ 测试输出被截断时保留已完成的步骤"""
+        truncated = PLAN_ARGUMENTS[:PLAN_ARGUMENTS.index('{"step_number": 2')]
+        plan = self.make_planner(StreamingToolLLM(arguments=truncated)).plan_sync("创建文件并搜索")
+
+        assert plan.metadata["feasibility"] == "feasible"
+        assert [task.assigned_agent for task in plan.tasks] == ["file"]
+
+    def test_orchestrator_executes_stream(self):
+        """🔗 测试编排器按到达顺序执行步骤，失败后停止"""
+        from src.core.agent.agents.task_orchestrator import TaskOrchestrator
+
+        calls = []
+
+        def make_agent(success):
+            agent = Mock()
+
+            async def ainvoke(payload):
+                calls.append(payload["user_input"])
+                if success:
+                    return {"success": True, "output": "ok", "iterations": 1}
+                return {"success": False, "error": "boom"}
+
+            agent.ainvoke = ainvoke
+            return agent
+
+        orchestrator = TaskOrchestrator({"file": make_agent(True), "search": make_agent(False)})
+        steps = [
+            {"task_id": "1", "description": "a", "assigned_agent": "file"},
+            {"task_id": "2", "description": "b", "assigned_agent": "search"},
+            {"task_id": "3", "description": "c", "assigned_agent": "file"},
+        ]
+        result = orchestrator.execute_stream(iter(steps))
+
+        assert calls == ["a", "b"]
+        assert result["success"] is False
+        assert result["total_steps"] == 3
+        assert result["successful_steps"] == 1
+        assert result["error_message"] == "boom"
+
+    def test_depends_on_becomes_dependencies(self):
+        """🔗 测试 depends_on 步骤编号转换为 task_id 依赖"""
+        arguments = json.dumps({
+            "task": "搜索天气并写入文件",
+            "feasibility": "feasible",
+            "reason": "",
+            "steps": [
+                {"step_number": 1, "assigned_agent": "search", "description": "搜索北京天气", "depends_on": []},
+                {"step_number": 2, "assigned_agent": "search", "description": "搜索上海天气", "depends_on": []},
+                {"step_number": 3, "assigned_agent": "file", "description": "写入文件", "depends_on": [1, 2]},
+            ]
+        }, ensure_ascii=False)
+        plan = self.make_planner(StreamingToolLLM(arguments=arguments)).plan_sync("搜索天气并写入文件")
+
+        first, second, third = plan.tasks
+        assert plan.dependencies == {
+            first.task_id: [],
+            second.task_id: [],
+            third.task_id: [first.task_id, second.task_id],
+        }
+        assert third.metadata["depends_on"] == [first.task_id, second.task_id]
+
+
+class TestIncrementalReplan:
+    """PlannerAgent 增量重新规划测试"""
+
+    AGENTS = {
+        "search": {"description": "网络搜索：使用搜索引擎查询实时信息、新闻、百科知识", "tools": ["duckduckgo_search", "wikipedia_search", "google_serper"]},
+        "weather": {"description": "天气查询：查询中国城市的实时天气和未来几天的天气预报", "tools": ["gaode_weather"]},
+        "file": {"description": "文件管理：创建、读取、写入、追加、删除、搜索文件，列出目录内容", "tools": ["file_create", "file_read", "file_write", "file_append", "file_delete", "file_search", "file_list", "file_find_recent"]},
+        "macos_music": {"description": "音乐控制：播放、暂停、切换 Apple Music 歌曲，搜索音乐库", "tools": ["music_play", "music_control", "music_search"]},
+    }
+
+    REPLAN = json.dumps({
+        "feasibility": "feasible",
+        "reason": "用户确认城市为波士顿",
+        "steps": [{"step_number": 2, "assigned_agent": "search", "description": "搜索波士顿今天的天气"}],
+        "updates": [{"step_number": 3, "description": "把波士顿的天气写入桌面的 weather.txt"}]
+    }, ensure_ascii=False)
+
+    @pytest.fixture
+    def previous_plan(self):
+        tasks = [
+            Task(task_id="t1", description="查询北京今天的天气", assigned_agent="weather",
+                 metadata={"step_number": 1, "depends_on": []}),
+            Task(task_id="t2", description="搜索波士炖今天的天气", assigned_agent="search",
+                 metadata={"step_number": 2, "depends_on": []}),
+            Task(task_id="t3", description="把波士炖的天气写入桌面的 weather.txt", assigned_agent="file",
+                 metadata={"step_number": 3, "depends_on": ["t1", "t2"]}),
+        ]
+        return ExecutionPlan(
+            plan_id="previous",
+            tasks=tasks,
+            dependencies={"t1": [], "t2": [], "t3": ["t1", "t2"]},
+            metadata={"feasibility": "feasible", "original_task": "查北京和波士炖天气并写入文件"}
+        )
+
+    def make_planner(self, arguments, tool_calling=True):
+        from src.core.agent.agents.planner_agent import PlannerAgent
+        llm = StreamingToolLLM(arguments=arguments, tool_calling=tool_calling)
+        return PlannerAgent(llm=llm, available_agents=TestPlannerStreaming.FakeAgents(self.AGENTS))
+
+    def test_splices_replacement_steps(self, previous_plan):
+        """🩹 测试替换失败步骤并改写下游描述，已成功的步骤保持不变"""
+        planner = self.make_planner(self.REPLAN)
+        failed_step = {"step_id": "t2", "error": "未找到城市: 波士炖"}
+
+        plan = planner.replan_sync(previous_plan, failed_step, "是波士顿")
+
+        first, replacement, downstream = plan.tasks
+        assert first.task_id == "t1" and first.description == "查询北京今天的天气"
+        assert replacement.task_id != "t2"
+        assert replacement.description == "搜索波士顿今天的天气"
+        assert downstream.description == "把波士顿的天气写入桌面的 weather.txt"
+        assert plan.dependencies[replacement.task_id] == []
+        assert plan.dependencies[downstream.task_id] == ["t1", replacement.task_id]
+        assert [task.metadata["step_number"] for task in plan.tasks] == [1, 2, 3]
+        assert plan.metadata["replan"]["previous_plan_id"] == "previous"
+        # 原计划不被修改
+        assert previous_plan.tasks[2].description == "把波士炖的天气写入桌面的 weather.txt"
+
+    def test_plain_json_fallback(self, previous_plan):
+        """📄 测试模型不支持工具调用时解析文本 JSON"""
+        planner = self.make_planner(f"```json\n{self.REPLAN}\n```", tool_calling=False)
+        plan = planner.replan_sync(previous_plan, {"step_id": "t2", "error": "x"}, "是波士顿")
+
+        assert plan.tasks[1].description == "搜索波士顿今天的天气"
+
+    def test_declines_when_not_patchable(self, previous_plan):
+        """↩️ 测试无法修补时返回 None（回退完整规划）"""
+        infeasible = json.dumps({"feasibility": "infeasible", "reason": "无关", "steps": []})
+
+        assert self.make_planner(self.REPLAN).replan_sync(previous_plan, {"step_id": "missing"}, "是的") is None
+        assert self.make_planner(infeasible).replan_sync(previous_plan, {"step_id": "t2"}, "算了") is None
+
+    def test_token_benchmark(self, previous_plan):
+        """📊 基准：增量修补与完整重新规划的提示词和输出 token 对比"""
+        planner = self.make_planner(self.REPLAN)
+        history = [
+            HumanMessage(content="查北京和波士炖天气并写入文件"),
+            AIMessage(content="您是想查询\"波士顿\"的天气吗？"),
+            HumanMessage(content="是波士顿"),
+        ]
+        full_prompt = count_tokens_approximately(planner._build_messages("是波士顿", history))
+        replan_prompt = count_tokens_approximately(planner._build_replan_messages(
+            previous_plan, 1, {"error": "未找到城市: 波士炖"}, "是波士顿"
+        ))
+
+        full_output = len(json.dumps({
+            "task": "查询北京和波士顿的天气并写入文件",
+            "feasibility": "feasible",
+            "reason": "可以完成",
+            "steps": [
+                {"step_number": i + 1, "assigned_agent": t.assigned_agent, "description": t.description,
+                 "expected_result": "完成", "depends_on": d}
+                for i, (t, d) in enumerate(zip(previous_plan.tasks, [[], [], [1, 2]]))
+            ]
+        }, ensure_ascii=False)) / 4
+        replan_output = len(self.REPLAN) / 4
+
+        print(
+            f"\nprompt tokens: full={full_prompt} incremental={replan_prompt} "
+            f"({1 - replan_prompt / full_prompt:.0%} fewer)"
+            f"\ncompletion tokens: full≈{full_output:.0f} incremental≈{replan_output:.0f} "
+            f"({1 - replan_output / full_output:.0%} fewer)"
+        )
+        assert replan_prompt < full_prompt * 0.6
+        assert replan_output < full_output
@@ -6,12 +6,14 @@
 @File   : test_processor.py
 """
 
+import time
 from unittest.mock import Mock
 
 import pytest
 
 from src.core.models import ExecutionPlan, Task, TaskStatus
 from src.core.processor import CommandProcessor
+from src.utils.deadline import Deadline, OperationCancelled
 
 
 class TestCommandProcessor:
@@ -172,6 +174,197 @@ class TestCommandProcessor:
         assert result["orchestrator_result"] is None
         assert "错误" in result["summary"]
 
+    def test_early_dispatch_executes_streamed_steps(self, initialized_processor):
+        """⚡ 测试流式规划的步骤在规划阶段就交给编排器"""
+        initialized_processor.config.get = Mock(
+            side_effect=lambda key, default=None: True if key == "agent.planner.early_dispatch" else {}
+        )
+        task = Task(task_id="task1", description="创建文件", assigned_agent="file")
+        plan = ExecutionPlan(plan_id="streamed", tasks=[task], metadata={"feasibility": "feasible"})
+        received = []
+
+        def plan_sync(user_query, conversation_history, on_step):
+            on_step(task)
+            return plan
+
+        def execute_stream(steps):
+            received.extend(step["task_id"] for step in steps)
+            return {"success": True, "total_steps": 1, "successful_steps": 1, "results": []}
+
+        initialized_processor.planner.plan_sync.side_effect = plan_sync
+        initialized_processor.orchestrator.execute_stream.side_effect = execute_stream
+
+        execution_plan = initialized_processor._understand_and_plan("创建文件")
+        result = initialized_processor._execute_plan(execution_plan)
+
+        assert received == ["task1"]
+        assert result["orchestrator_result"]["success"] is True
+        initialized_processor.orchestrator.execute.assert_not_called()
+
+    def test_early_dispatch_runs_undispatched_tail(self, initialized_processor):
+        """🧩 测试流式阶段跳过的中间步骤及其后续步骤仍交给同一次执行"""
+        initialized_processor.config.get = Mock(
+            side_effect=lambda key, default=None: True if key == "agent.planner.early_dispatch" else {}
+        )
+        tasks = [
+            Task(task_id=f"s{i}", description=f"步骤{i}", assigned_agent=agent)
+            for i, agent in enumerate(("file", "filez", "weather"), start=1)
+        ]
+        plan = ExecutionPlan(plan_id="streamed", tasks=tasks, metadata={"feasibility": "feasible"})
+        received = []
+
+        def plan_sync(user_query, conversation_history, on_step):
+            on_step(tasks[0])  # filez 不是可用 Agent，s2 和 s3 都不会提前分发
+            return plan
+
+        def execute_stream(steps):
+            received.extend(step["task_id"] for step in steps)
+            return {"success": True, "total_steps": len(received), "successful_steps": len(received), "results": []}
+
+        initialized_processor.planner.plan_sync.side_effect = plan_sync
+        initialized_processor.orchestrator.execute_stream.side_effect = execute_stream
+
+        execution_plan = initialized_processor._understand_and_plan("创建文件并查天气")
+        result = initialized_processor._execute_plan(execution_plan)
+
+        assert received == ["s1", "s2", "s3"]
+        assert result["orchestrator_result"]["total_steps"] == 3
+        initialized_processor.orchestrator.execute.assert_not_called()
+
+    def test_interrupted_planning_stops_dispatched_steps(self, initialized_processor):
+        """🛑 测试规划被取消时等待已分发的步骤退出后才返回，不再执行后续步骤"""
+        initialized_processor.config.get = Mock(
+            side_effect=lambda key, default=None: True if key == "agent.planner.early_dispatch" else default
+        )
+        initialized_processor.deadline = Deadline(parent=initialized_processor.begin_command())
+        events = []
+
+        def plan_sync(user_query, conversation_history, on_step):
+            on_step(Task(task_id="s1", description="写文件", assigned_agent="file"))
+            initialized_processor.cancel("已取消")
+            raise OperationCancelled("已取消")
+
+        def execute_stream(steps):
+            from src.utils.deadline import current_deadline
+            for step in steps:
+                while not current_deadline().done:
+                    time.sleep(0.01)
+                events.append(("stopped", step["task_id"]))
+            return {"success": False, "total_steps": 1, "successful_steps": 0, "results": []}
+
+        initialized_processor.planner.plan_sync.side_effect = plan_sync
+        initialized_processor.orchestrator.execute_stream.side_effect = execute_stream
+
+        execution_plan = initialized_processor._understand_and_plan("写文件")
+        events.append(("returned", None))
+        result = initialized_processor._execute_plan(execution_plan)
+
+        assert events == [("stopped", "s1"), ("returned", None)]
+        assert result["summary"] == "已取消。"
+
+    def test_follow_up_uses_incremental_replan(self, initialized_processor):
+        """🩹 测试补充输入后只修补失败步骤，修补失败时回退完整规划"""
+        initialized_processor.config.get = Mock(
+            side_effect=lambda key, default=None: True if key == "agent.planner.incremental_replan" else {}
+        )
+        previous = ExecutionPlan(
+            plan_id="previous",
+            tasks=[Task(task_id="t1", description="查询波士炖天气", assigned_agent="weather")],
+            metadata={"feasibility": "feasible"}
+        )
+        patched = ExecutionPlan(plan_id="patched", tasks=[], metadata={"feasibility": "feasible"})
+        initialized_processor.conversation_manager.state.update({
+            "execution_plan": previous,
+            "failed_step": {"step_id": "t1", "error": "未找到城市"}
+        })
+        initialized_processor.planner.replan_sync.return_value = patched
+
+        history = [Mock()]
+        assert initialized_processor._understand_and_plan("是波士顿", history) is patched
+        initialized_processor.planner.replan_sync.assert_called_once_with(
+            previous, {"step_id": "t1", "error": "未找到城市"}, "是波士顿"
+        )
+        initialized_processor.planner.plan_sync.assert_not_called()
+
+        initialized_processor.planner.replan_sync.return_value = None
+        initialized_processor._understand_and_plan("是波士顿", history)
+        initialized_processor.planner.plan_sync.assert_called_once()
+
+    def test_timeout_reports_partial_result(self, initialized_processor):
+        """⏰ 测试执行超时时总结已完成的部分，不进入澄清对话"""
+        task = Task(task_id="task1", description="查询天气", assigned_agent="weather")
+        plan = ExecutionPlan(plan_id="p1", tasks=[task], metadata={"feasibility": "feasible"})
+        initialized_processor.planner.plan_sync.return_value = plan
+        initialized_processor.orchestrator.execute.return_value = {
+            "success": False,
+            "total_steps": 2,
+            "successful_steps": 1,
+            "interrupted": "timeout",
+            "results": [{"status": "success", "output": "北京晴"}, {"status": "timeout", "tool_calls": []}]
+        }
+        initialized_processor.summarizer.summarize_sync.return_value = "北京今天晴，上海的天气还没查到"
+
+        initialized_processor._handle_new_query("查询北京和上海的天气")
+
+        initialized_processor.tts_client.speak.assert_called_with("处理超时了。北京今天晴，上海的天气还没查到")
+        initialized_processor.conversation_manager.activate_conversation.assert_not_called()
+        initialized_processor.error_handler.analyze_error.assert_not_called()
+
+    def test_planning_timeout(self, initialized_processor):
+        """⏰ 测试规划阶段超时直接提示用户"""
+        from src.utils.deadline import DeadlineExceeded
+        initialized_processor.planner.plan_sync.side_effect = DeadlineExceeded("处理超时")
+
+        initialized_processor._handle_new_query("查询天气")
+
+        initialized_processor.orchestrator.execute.assert_not_called()
+        initialized_processor.tts_client.speak.assert_called_with("抱歉，处理超时了，请稍后再试。")
+
+    def test_cancel_during_execution(self, initialized_processor):
+        """🛑 测试执行中被取消：中断编排、停止播报并结束本次唤醒"""
+        processor = initialized_processor
+        processor.assistant.detector._is_running = True
+        processor.assistant.detector._is_paused = False
+
+        task = Task(task_id="task1", description="查询天气", assigned_agent="weather")
+        processor.planner.plan_sync.return_value = ExecutionPlan(
+            plan_id="p1", tasks=[task], metadata={"feasibility": "feasible"}
+        )
+
+        def execute(plan):
+            # 模拟用户在执行过程中重新唤醒
+            assert processor.cancel("重新唤醒") is True
+            assert processor.deadline.cancelled
+            processor.tts_client.speak.reset_mock()
+            return {"success": False, "interrupted": "cancelled", "successful_steps": 0, "results": []}
+
+        processor.orchestrator.execute.side_effect = execute
+        processor.audio_handler.record_audio.return_value = b"a"
+        processor.audio_handler.transcribe_audio.return_value = "查询天气"
+
+        processor.process_command(Mock())
+
+        machine = processor.state_machine
+        assert machine.history[-1]["event"] == "cancel"
+        assert machine.history[-1]["reason"] == "重新唤醒"
+        processor.tts_client.stop.assert_called_once()
+        processor.tts_client.speak.assert_not_called()
+        processor.summarizer.summarize_sync.assert_not_called()
+        assert processor.command_token is None
+        assert processor.cancel() is False
+
+    def test_cancel_phrase_ends_conversation(self, initialized_processor):
+        """🙅 测试识别到"取消"时不再规划，直接结束对话"""
+        initialized_processor.config.get = Mock(
+            side_effect=lambda key, default=None: ["取消", "算了"] if key == "cancel.phrases" else {}
+        )
+        initialized_processor.audio_handler.transcribe_audio.return_value = "算了。"
+
+        from src.core.processor_modules import InteractionEvent
+        assert initialized_processor._on_asr({"audio": b"a"}) == InteractionEvent.CANCEL
+        initialized_processor.conversation_manager.reset.assert_called_once()
+        initialized_processor.tts_client.speak.assert_called_with("好的，已取消")
+
     # 4. 错误处理测试
     def test_process_command_initialization_fails(self, mock_assistant):
         """❌ 测试系统初始化失败"""
@@ -196,5 +389,47 @@ class TestCommandProcessor:
         initialized_processor.conversation_manager.reset.assert_called()
 
 
+    # 5. 状态机流程测试
+    def test_process_command_runs_as_state_machine(self, initialized_processor):
+        """🔁 测试空录音重试和多轮对话在同一循环内完成（无递归）"""
+        from src.core.processor_modules import ConversationManager
+
+        processor = initialized_processor
+        processor.conversation_manager = ConversationManager()
+        detector = processor.assistant.detector
+        detector._is_running = True
+        detector._is_paused = False
+        detector.pause.side_effect = lambda: setattr(detector, "_is_paused", True)
+        detector.resume.side_effect = lambda: setattr(detector, "_is_paused", False)
+
+        task = Task(task_id="task1", description="查询天气", assigned_agent="weather")
+        plan = ExecutionPlan(plan_id="p1", tasks=[task], metadata={"feasibility": "feasible"})
+        processor.planner.plan_sync.return_value = plan
+
+        failed = {"success": False, "results": [{"status": "failed", "error": "未指定城市"}]}
+        succeeded = {"success": True, "results": [{"status": "success", "result": "晴"}]}
+        processor.orchestrator.execute.side_effect = [failed, succeeded]
+        processor.summarizer.summarize_sync.return_value = "北京今天晴"
+
+        from src.core.processor_modules import ErrorType
+        processor.error_handler.analyze_error.return_value = (ErrorType.MISSING_INFO, {})
+        processor.error_handler.generate_clarification_question.return_value = "请问哪个城市？"
+
+        # 第二轮先录到空音频，重试后成功
+        processor.audio_handler.record_audio.side_effect = [b"a", None, b"b"]
+        processor.audio_handler.transcribe_audio.side_effect = ["查询天气", "北京"]
+
+        processor.process_command(Mock())
+
+        machine = processor.state_machine
+        assert machine.finished
+        assert machine.turn == 2
+        events = [record["event"] for record in machine.history]
+        assert events.count("retry") == 1
+        assert events[-1] == "end"
+        processor.assistant.detector.resume.assert_called_once()
+        assert processor.assistant.is_processing is False
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
@@ -7,6 +7,8 @@
 """
 
 import io
+import threading
+import time
 import wave
 from unittest.mock import Mock
 
@@ -17,8 +19,18 @@ from src.core.processor_modules import (
     AudioHandler,
     ConversationManager,
     ErrorHandler,
-    ErrorType
+    ErrorType,
+    InteractionEvent,
+    InteractionState,
+    IntentRouter,
+    InteractionStateMachine,
+    PipelineJob,
+    PipelineWorker,
+    PlanCache,
+    ProcessingPrompt
 )
+from src.core.models import ExecutionPlan, Task
+from src.core.processor_modules.interaction_state import InvalidTransitionError
 
 
 class TestAudioHandler:
@@ -240,6 +252,399 @@ class TestErrorHandler:
         assert len(question) > 0
 
 
+class TestProcessingPrompt:
+    """ProcessingPrompt 并行提示测试"""
+
+    def test_skip_when_pipeline_fast(self):
+        """⚡ 测试流水线快速完成时跳过提示语"""
+        speak = Mock()
+        prompt = ProcessingPrompt(speak=speak, skip_threshold=0.5)
+
+        prompt.start("好的，请稍等")
+        stats = prompt.finish()
+
+        assert stats["skipped"] is True
+        assert stats["overlap_saved"] is None  # 还没有播放过提示语，无从估算
+        speak.assert_not_called()
+        assert prompt.active is False
+
+        prompt.skip_threshold = 0.0
+        prompt.start("好的，请稍等")
+        time.sleep(0.05)
+        prompt.finish()
+        prompt.skip_threshold = 0.5
+        prompt.start("好的，请稍等")
+        assert prompt.finish()["overlap_saved"] == prompt.last_prompt_duration
+
+    def test_overlap_with_slow_pipeline(self):
+        """🔀 测试提示语与慢流水线并行播放"""
+        speak = Mock(side_effect=lambda text: time.sleep(0.1))
+        prompt = ProcessingPrompt(speak=speak, skip_threshold=0.0)
+
+        prompt.start("好的，请稍等")
+        time.sleep(0.3)  # 模拟规划和执行
+        stats = prompt.finish()
+
+        speak.assert_called_once_with("好的，请稍等")
+        assert stats["skipped"] is False
+        assert stats["overlap_saved"] >= 0.09
+        assert stats["pipeline_time"] >= stats["prompt_time"]
+
+    def test_finish_waits_for_playing_prompt(self):
+        """⏳ 测试收尾时等待正在播放的提示语"""
+        speak = Mock(side_effect=lambda text: time.sleep(0.2))
+        prompt = ProcessingPrompt(speak=speak, skip_threshold=0.0)
+
+        prompt.start("收到，正在处理")
+        time.sleep(0.05)
+        stats = prompt.finish()
+
+        assert stats["skipped"] is False
+        assert stats["prompt_time"] >= 0.19
+        assert stats["overlap_saved"] < stats["prompt_time"]
+
+
+class TestInteractionStateMachine:
+    """InteractionStateMachine 状态迁移测试"""
+
+    def test_full_turn_with_follow_up(self):
+        """🔁 测试完整一轮并进入多轮对话"""
+        machine = InteractionStateMachine()
+
+        for event in [
+            InteractionEvent.WAKE,
+            InteractionEvent.AUDIO_READY,
+            InteractionEvent.TEXT_READY,
+            InteractionEvent.PLANNED,
+            InteractionEvent.EXECUTED,
+            InteractionEvent.CONTINUE,
+        ]:
+            machine.dispatch(event)
+
+        assert machine.state == InteractionState.FOLLOW_UP
+        assert machine.turn == 1
+
+        machine.dispatch(InteractionEvent.LISTEN_AGAIN)
+        assert machine.state == InteractionState.RECORD
+        assert machine.turn == 2
+
+        machine.dispatch(InteractionEvent.END)
+        assert machine.finished
+
+    def test_transitions_are_timestamped(self):
+        """⏱️ 测试每次迁移都有时间戳和耗时"""
+        machine = InteractionStateMachine()
+        machine.dispatch(InteractionEvent.WAKE)
+        time.sleep(0.05)
+        machine.dispatch(InteractionEvent.AUDIO_READY)
+
+        assert len(machine.history) == 2
+        record = machine.history[-1]
+        assert record["from"] == "record" and record["to"] == "asr"
+        assert record["timestamp"] >= machine.history[0]["timestamp"]
+        assert machine.turn_timings()["record"] >= 0.04
+
+    def test_retry_stays_in_turn(self):
+        """🔄 测试重试录音不增加轮次"""
+        machine = InteractionStateMachine()
+        machine.dispatch(InteractionEvent.WAKE)
+        machine.dispatch(InteractionEvent.RETRY)
+        machine.dispatch(InteractionEvent.AUDIO_READY)
+        machine.dispatch(InteractionEvent.RETRY)
+
+        assert machine.state == InteractionState.RECORD
+        assert machine.turn == 1
+
+    def test_invalid_transition(self):
+        """❌ 测试非法迁移"""
+        machine = InteractionStateMachine()
+
+        with pytest.raises(InvalidTransitionError):
+            machine.dispatch(InteractionEvent.PLANNED)
+
+
+class TestIntentRouter:
+    """IntentRouter 核心功能测试"""
+
+    class FakeAgents(dict):
+        """带 describe 的 Agent 映射（与 AgentPool 接口一致）"""
+
+        def describe(self, agent_type):
+            return self[agent_type]
+
+    @pytest.fixture
+    def tool_registry(self):
+        tools = {}
+        for name, description, output in [
+            ("music_control", "控制 Apple Music 的播放状态", "已pause"),
+            ("gaode_weather", "查询中国城市的天气预报", '{"city": "北京", "weather": "晴"}'),
+            ("file_create", "创建文件并写入内容", "ok"),
+        ]:
+            tool = Mock()
+            tool.description = description
+            tool.invoke.return_value = output
+            tools[name] = tool
+
+        registry = Mock()
+        registry.has_tool.side_effect = lambda name: name in tools
+        registry.get_tool.side_effect = lambda name: tools[name]
+        return registry
+
+    @pytest.fixture
+    def router(self, tool_registry):
+        agents = self.FakeAgents({
+            "macos_music": {"description": "控制音乐播放", "tools": ["music_control"]},
+            "weather": {"description": "查询天气预报", "tools": ["gaode_weather"]},
+            "file": {"description": "文件管理：创建、读取、写入文件", "tools": ["file_create"]},
+        })
+        return IntentRouter(agents, tool_registry)
+
+    def test_grammar_direct_tool(self, router):
+        """🎵 测试规则命中时直接调用工具"""
+        route = router.route("暂停音乐。")
+
+        assert route.source == "grammar"
+        assert route.agent_type == "macos_music"
+        assert route.tool_name == "music_control"
+        assert route.tool_args == {"action": "pause"}
+
+        plan = route.to_plan("暂停音乐。")
+        assert plan.metadata["feasibility"] == "feasible"
+        assert plan.tasks[0].assigned_agent == "macos_music"
+
+        result = router.execute_direct(plan)
+        assert result["success"] is True
+        assert result["results"][0]["output"] == "已pause"
+
+    def test_grammar_extracts_slots(self, router):
+        """🌤️ 测试规则提取槽位"""
+        route = router.route("上海明天天气怎么样")
+
+        assert route.tool_name == "gaode_weather"
+        assert route.tool_args == {"city": "上海"}
+        assert route.speak_output is False
+
+    def test_classifier_routes_to_agent(self, router):
+        """🧮 测试分类器高置信度时只路由到 Agent（不直接调用工具）"""
+        # 没有城市，规则不匹配，由分类器判断
+        route = router.route("今天天气怎么样")
+
+        assert route.source == "classifier"
+        assert route.agent_type == "weather"
+        assert route.tool_name is None
+
+    def test_fallback_to_llm(self, router):
+        """🤖 测试低置信度和多步指令交给 LLM"""
+        assert router.route("帮我写一首诗") is None
+        assert router.route("创建文件然后查一下北京天气") is None
+
+    def test_unavailable_agent_is_skipped(self, router):
+        """🚫 测试规则对应的 Agent 不可用时不命中"""
+        assert router.route("打开记事本") is None
+
+    def test_direct_tool_failure_returns_none(self, router, tool_registry):
+        """❌ 测试工具异常时回退"""
+        tool_registry.get_tool("music_control").invoke.side_effect = RuntimeError("Music not running")
+        plan = router.route("暂停音乐").to_plan("暂停音乐")
+
+        assert router.execute_direct(plan) is None
+
+    def test_stats(self, router):
+        """📊 测试命中率和节省时间统计"""
+        router.route("暂停音乐")
+        router.route("帮我写一首诗")
+        router.record_llm_plan(2.0)
+
+        stats = router.stats()
+        assert stats["total"] == 2
+        assert stats["hit_rate"] == 0.5
+        assert 1.9 < stats["saved_seconds"] <= 2.0
+
+
+class TestPlanCache:
+    """PlanCache 核心功能测试"""
+
+    @staticmethod
+    def make_plan(*steps):
+        return ExecutionPlan(
+            plan_id="plan",
+            tasks=[
+                Task(task_id=str(i), description=description, assigned_agent=agent,
+                     metadata={"step_number": i + 1, "expected_result": None})
+                for i, (description, agent) in enumerate(steps)
+            ]
+        )
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return PlanCache(["file", "weather"], cache_file=str(tmp_path / "plan_cache.json"))
+
+    def test_learn_and_match(self, cache):
+        """🧩 测试从计划中学习槽位并实例化新计划"""
+        template = cache.learn("在桌面创建test文件", self.make_plan(("在桌面上创建名为test的文件", "file")))
+        assert template.steps[0]["description"] == "在桌面上创建名为{s0}的文件"
+
+        plan = cache.match("在桌面创建report文件")
+        assert plan.tasks[0].description == "在桌面上创建名为report的文件"
+        assert plan.tasks[0].assigned_agent == "file"
+        assert plan.metadata["feasibility"] == "feasible"
+        assert plan.metadata["plan_cache"]["slots"] == {"s0": "report"}
+
+    def test_multi_step_template(self, cache):
+        """🔗 测试多步计划中的槽位替换"""
+        cache.learn("查询北京天气", self.make_plan(
+            ("查询北京的天气信息", "weather"),
+            ("把北京的天气写入桌面的weather.txt", "file")
+        ))
+
+        plan = cache.match("查询上海天气")
+        assert [t.description for t in plan.tasks] == [
+            "查询上海的天气信息",
+            "把上海的天气写入桌面的weather.txt"
+        ]
+
+    def test_dependencies_are_remapped(self, cache):
+        """🔗 测试模板保留步骤依赖并映射到新的 task_id"""
+        plan = self.make_plan(("查询北京的天气信息", "weather"), ("把北京的天气写入桌面", "file"))
+        plan.dependencies = {plan.tasks[0].task_id: [], plan.tasks[1].task_id: [plan.tasks[0].task_id]}
+        cache.learn("查询北京天气", plan)
+
+        first, second = cache.match("查询上海天气").tasks
+        assert first.metadata["depends_on"] == []
+        assert second.metadata["depends_on"] == [first.task_id]
+
+    def test_no_match(self, cache):
+        """🤖 测试不匹配和复合指令交给 LLM"""
+        cache.learn("查询北京天气", self.make_plan(("查询北京的天气信息", "weather")))
+
+        assert cache.match("播放音乐") is None
+        assert cache.match("查询上海，然后创建文件天气") is None
+
+    def test_generic_template_not_learned(self, cache):
+        """🚫 测试几乎全是槽位的查询不学习"""
+        assert cache.learn("hello world", self.make_plan(("hello world", "file"))) is None
+        assert len(cache) == 0
+
+    def test_persistence_and_agent_invalidation(self, cache, tmp_path):
+        """💾 测试持久化，以及可用 Agent 变化时失效"""
+        cache.learn("查询北京天气", self.make_plan(("查询北京的天气信息", "weather")))
+
+        reloaded = PlanCache(["weather", "file"], cache_file=str(tmp_path / "plan_cache.json"))
+        assert reloaded.match("查询广州天气") is not None
+
+        changed = PlanCache(["weather"], cache_file=str(tmp_path / "plan_cache.json"))
+        assert len(changed) == 0
+
+        reloaded.update_agents(["weather"])
+        assert reloaded.match("查询广州天气") is None
+
+    def test_hits_flushed_without_writing_on_match(self, cache, tmp_path, monkeypatch):
+        """📝 测试命中时不写文件，命中统计按间隔或退出时写回"""
+        cache.learn("查询北京天气", self.make_plan(("查询北京的天气信息", "weather")))
+        writes = []
+        save = cache._save_locked
+        monkeypatch.setattr(cache, "_save_locked", lambda: (writes.append(1), save()))
+
+        for city in ("上海", "广州", "深圳"):
+            assert cache.match(f"查询{city}天气") is not None
+        cache.flush()
+        assert writes == []
+
+        cache.flush(force=True)
+        assert len(writes) == 1
+        reloaded = PlanCache(["weather", "file"], cache_file=str(tmp_path / "plan_cache.json"))
+        assert next(iter(reloaded._templates.values())).hits == 3
+
+        cache.flush(force=True)
+        assert len(writes) == 1
+
+    def test_lru_and_ttl_eviction(self, tmp_path):
+        """⏳ 测试 LRU 淘汰和过期"""
+        cache = PlanCache(["weather", "file"], max_templates=2, ttl_days=1)
+        cache.learn("查询北京天气", self.make_plan(("查询北京的天气信息", "weather")))
+        cache.learn("在桌面创建test文件", self.make_plan(("在桌面上创建名为test的文件", "file")))
+        cache.match("查询上海天气")
+        cache.learn("读取桌面的notes文件", self.make_plan(("读取桌面的notes文件内容", "file")))
+
+        assert len(cache) == 2
+        assert cache.match("在桌面创建a1文件") is None
+        assert cache.match("查询上海天气") is not None
+
+        for template in cache._templates.values():
+            template.last_used -= 2 * 86400
+        assert cache.match("查询上海天气") is None
+        assert len(cache) == 0
+
+    def test_invalidate(self, cache):
+        """❌ 测试按模板执行失败后失效"""
+        cache.learn("查询北京天气", self.make_plan(("查询北京的天气信息", "weather")))
+        plan = cache.match("查询上海天气")
+
+        cache.invalidate(plan.metadata["plan_cache"]["template_id"])
+        assert cache.match("查询上海天气") is None
+
+
+class TestPipelineWorker:
+    """指令流水线队列测试"""
+
+    def test_detector_never_blocks(self):
+        """⚡ 测试提交任务立即返回，任务在工作线程中依次处理"""
+        release = threading.Event()
+        handled = []
+
+        def handler(job):
+            release.wait(2)
+            handled.append((job.keyword, threading.current_thread().name))
+
+        worker = PipelineWorker(handler)
+        worker.start()
+        try:
+            start = time.time()
+            assert worker.submit(PipelineJob(keyword="jarvis")) == "queued"
+            assert time.time() - start < 0.05
+            time.sleep(0.05)
+            assert worker.busy
+
+            release.set()
+            deadline = time.time() + 2
+            while worker.busy and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            worker.stop(timeout=1)
+
+        assert handled == [("jarvis", "pipeline-worker")]
+
+    def test_pending_wakes_are_coalesced(self):
+        """🧲 测试尚未开始的重复唤醒合并为一个任务，并统计排队时间"""
+        handled = []
+        worker = PipelineWorker(handled.append)
+
+        assert worker.submit(PipelineJob(keyword="jarvis")) == "queued"
+        assert worker.submit(PipelineJob(keyword="computer")) == "coalesced"
+        assert worker.submit(PipelineJob(kind="cancel")) == "queued"
+        time.sleep(0.02)
+
+        assert worker.run_pending() == 2
+        assert [job.kind for job in handled] == ["wake", "cancel"]
+        assert handled[0].coalesced == 1
+
+        stats = worker.stats()
+        assert stats["submitted"] == 3
+        assert stats["coalesced"] == 1
+        assert stats["processed"] == 2
+        assert stats["wait_p95"] >= 0.02
+
+    def test_discard_and_overflow(self):
+        """🗑️ 测试丢弃排队的唤醒和队列满时丢弃新任务"""
+        worker = PipelineWorker(Mock(), max_pending=1)
+
+        worker.submit(PipelineJob())
+        assert worker.submit(PipelineJob(kind="cancel")) == "dropped"
+        assert worker.discard("wake") == 1
+        assert not worker.busy
+        assert worker.stats()["dropped"] == 1
+
+
 class TestIntegration:
     """模块集成测试"""
 
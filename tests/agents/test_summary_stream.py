@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_summary_stream.py
+"""
+
+import asyncio
+import time
+from unittest.mock import Mock
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.core.agent.agents.summary_agent import SummaryAgent, split_sentences
+from src.core.processor import CommandProcessor
+from src.services import tts_client as tts_module
+
+EXECUTION_SUMMARY = {"success": True, "total_steps": 1, "successful_steps": 1, "results": []}
+
+
+class SlowStreamLLM(BaseChatModel):
+    """按固定间隔逐 token 输出的假模型"""
+
+    tokens: list = ["文件", "已经", "创建好了", "。", "内容", "写入了", "三行", "。", "还有", "别的吗", "？"]
+    delay: float = 0.05
+    fail_after: int = -1
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-stream-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self.tokens)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for index, token in enumerate(self.tokens):
+            if index == self.fail_after:
+                raise ConnectionError("stream broken")
+            await asyncio.sleep(self.delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class TestSummaryStream:
+    """总结流式播报测试"""
+
+    def test_split_sentences(self):
+        """✂️ 测试按句切分：过短句子并入下一句，末尾标点等待后续 token，小数不切开"""
+        sentences, rest = split_sentences("好的。温度是 3.5 度。湿度也很高！明天")
+        assert sentences == ["好的。温度是 3.5 度。", "湿度也很高！"]
+        assert rest == "明天"
+
+        sentences, rest = split_sentences("已经完成了。")
+        assert sentences == [] and rest == "已经完成了。"
+
+    def test_first_sentence_before_generation_ends(self):
+        """⚡ 测试第一句在 LLM 生成结束前就已产出"""
+        agent = SummaryAgent(SlowStreamLLM())
+
+        async def collect():
+            start, arrivals = time.perf_counter(), []
+            async for sentence in agent.summarize_stream("创建文件", EXECUTION_SUMMARY):
+                arrivals.append((sentence, time.perf_counter() - start))
+            return arrivals, time.perf_counter() - start
+
+        arrivals, total = asyncio.run(collect())
+        assert [sentence for sentence, _ in arrivals] == ["文件已经创建好了。", "内容写入了三行。", "还有别的吗？"]
+        assert arrivals[0][1] < total / 2
+
+    def test_fallback_when_stream_fails(self):
+        """🛟 测试流在首句前中断时播报降级总结，首句后中断则保留已产出的句子"""
+        stream = SummaryAgent(SlowStreamLLM(fail_after=2, delay=0)).stream_sentences("创建文件", EXECUTION_SUMMARY)
+        assert list(stream) == ["好的，我已经完成了所有1个任务步骤。"]
+
+        stream = SummaryAgent(SlowStreamLLM(fail_after=6, delay=0)).stream_sentences("创建文件", EXECUTION_SUMMARY)
+        assert list(stream) == ["文件已经创建好了。"]
+
+    def test_speak_stream_pipelines_synthesis(self, monkeypatch):
+        """🔊 测试逐句合成播放：首句生成后即开始播放，播放当前句时合成下一句"""
+        events = []
+        client = tts_module.tts_client()
+
+        def synthesize(text, save_to=None):
+            time.sleep(0.05)
+            events.append(("synthesized", text))
+            return text.encode()
+
+        monkeypatch.setattr(client, "synthesize", synthesize)
+
+        def play(audio):
+            events.append(("play", audio.decode()))
+            time.sleep(0.3)
+            events.append(("played", audio.decode()))
+
+        monkeypatch.setattr(client, "_play", play)
+        monkeypatch.setattr(tts_module.AudioSegment, "from_mp3", lambda data: data.getvalue())
+
+        stream = SummaryAgent(SlowStreamLLM(delay=0.02)).stream_sentences("创建文件", EXECUTION_SUMMARY)
+        client.speak_stream(stream)
+
+        assert [text for kind, text in events if kind == "play"] == stream.sentences
+        # 第二句在第一句播放期间合成完成
+        assert events.index(("synthesized", stream.sentences[1])) < events.index(("played", stream.sentences[0]))
+        assert events[:2] == [("synthesized", stream.sentences[0]), ("play", stream.sentences[0])]
+
+    def test_stop_holds_until_next_command(self, monkeypatch):
+        """🔇 测试 stop 后直到下一条指令 reset 前的播报都被跳过，取消不会被下一次 speak 清除"""
+        client = tts_module.tts_client()
+        played = []
+        monkeypatch.setattr(client, "synthesize", lambda text, save_to=None: text.encode())
+        monkeypatch.setattr(client, "_play", lambda audio: played.append(audio.decode()))
+        monkeypatch.setattr(tts_module.AudioSegment, "from_mp3", lambda data: data.getvalue())
+
+        client.stop()
+        client.speak("已取消的播报")
+        assert played == []
+
+        processor = CommandProcessor(Mock())
+        processor.tts_client = client
+        processor.begin_command()
+        client.speak("新指令的播报")
+        assert played == ["新指令的播报"]
+
+    def test_processor_streams_summary(self):
+        """🗣️ 测试处理器启用流式总结时逐句送入 TTS（追问后完成带前缀），并回调完整总结"""
+        assistant = Mock()
+        assistant.config.get = lambda key, default=None: True if key == "tts.stream_summary" else default
+        processor = CommandProcessor(assistant)
+        processor.summarizer = SummaryAgent(SlowStreamLLM(delay=0))
+        processor.tts_client = Mock()
+        processor.tts_client.speak_stream = lambda sentences: spoken.extend(sentences)
+        processor.callback = Mock()
+        spoken = []
+
+        streamed = processor._stream_final_summary(
+            "创建文件", {"orchestrator_result": EXECUTION_SUMMARY}, prefix="好的，已为您完成。"
+        )
+
+        assert streamed
+        assert spoken == ["好的，已为您完成。", "文件已经创建好了。", "内容写入了三行。", "还有别的吗？"]
+        processor.callback.assert_called_once_with("结果:\n文件已经创建好了。内容写入了三行。还有别的吗？")
+        processor.tts_client.speak.assert_not_called()
+        assert not processor._stream_final_summary("创建文件", {"summary": "已完成", "orchestrator_result": {}})
+
+    def test_close_cancels_generation(self):
+        """✋ 测试关闭句子流后后台生成被取消"""
+        stream = SummaryAgent(SlowStreamLLM(delay=0.2)).stream_sentences("创建文件", EXECUTION_SUMMARY)
+        iterator = iter(stream)
+        assert next(iterator) == "文件已经创建好了。"
+
+        start = time.perf_counter()
+        stream.close()
+        assert list(iterator) == []
+        assert time.perf_counter() - start < 0.5
+        stream._thread.join(timeout=1)
+        assert not stream._thread.is_alive()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_task_orchestrator.py
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from src.core.agent.agents.checkpoint_store import CheckpointStore
+from src.core.agent.agents.task_orchestrator import TaskOrchestrator
+from src.utils.deadline import Deadline, deadline_scope
+
+
+class ConcurrencyProbe:
+    """记录同时运行的步骤数"""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.calls = []
+
+    def agent(self, delay=0.2, success=True, tools=()):
+        agent = Mock()
+        agent.get_ability_info.return_value = {"tools": list(tools)}
+
+        async def ainvoke(payload):
+            self.calls.append(payload["user_input"])
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            await asyncio.sleep(delay)
+            self.running -= 1
+            if success:
+                return {"success": True, "output": f"done: {payload['user_input']}", "iterations": 1}
+            return {"success": False, "error": f"failed: {payload['user_input']}"}
+
+        agent.ainvoke = ainvoke
+        return agent
+
+
+def make_plan(*steps):
+    """steps: (task_id, agent, depends_on)"""
+    return {
+        "steps": [
+            {"task_id": task_id, "description": task_id, "assigned_agent": agent, "depends_on": depends_on}
+            for task_id, agent, depends_on in steps
+        ]
+    }
+
+
+class TestTaskOrchestrator:
+    """TaskOrchestrator 依赖调度测试"""
+
+    @pytest.fixture
+    def probe(self):
+        return ConcurrencyProbe()
+
+    def test_independent_steps_run_concurrently(self, probe):
+        """⚡ 测试互不依赖的步骤并发执行，结果按步骤顺序汇总"""
+        orchestrator = TaskOrchestrator({
+            "weather": probe.agent(delay=0.3),
+            "search": probe.agent(delay=0.1),
+            "music": probe.agent(delay=0.2),
+        })
+
+        start = time.time()
+        result = orchestrator.execute(make_plan(
+            ("beijing", "weather", []),
+            ("shanghai", "search", []),
+            ("music", "music", []),
+        ))
+
+        assert time.time() - start < 0.55
+        assert probe.peak == 3
+        assert result["success"] is True
+        assert [r["step_id"] for r in result["results"]] == ["beijing", "shanghai", "music"]
+
+    def test_same_agent_type_is_serialized(self, probe):
+        """🔒 测试同一 Agent 类型的步骤不会同时执行"""
+        orchestrator = TaskOrchestrator({"weather": probe.agent(delay=0.05)})
+
+        result = orchestrator.execute(make_plan(("a", "weather", []), ("b", "weather", [])))
+
+        assert probe.peak == 1
+        assert result["successful_steps"] == 2
+
+    def test_service_limit(self, probe):
+        """🚦 测试外部服务并发上限"""
+        orchestrator = TaskOrchestrator(
+            {"weather": probe.agent(delay=0.05), "search": probe.agent(delay=0.05)},
+            service_limits={"llm": 1}
+        )
+
+        orchestrator.execute(make_plan(("a", "weather", []), ("b", "search", [])))
+
+        assert probe.peak == 1
+
+    def test_dependencies_and_failure(self, probe):
+        """🔗 测试依赖失败时跳过下游步骤，独立步骤照常执行"""
+        orchestrator = TaskOrchestrator({
+            "search": probe.agent(delay=0.05, success=False),
+            "file": probe.agent(delay=0.05),
+            "music": probe.agent(delay=0.05),
+        })
+
+        result = orchestrator.execute(make_plan(
+            ("search", "search", []),
+            ("write", "file", ["search"]),
+            ("music", "music", []),
+        ))
+
+        assert "write" not in probe.calls
+        assert result["success"] is False
+        assert result["total_steps"] == 3
+        assert result["successful_steps"] == 1
+        assert result["failed_steps"] == 2
+        assert result["error_message"] == "failed: search"
+        assert result["failed_step"]["step_id"] == "search"
+
+    def test_skipped_dependents_are_reported(self, probe):
+        """⏭️ 测试依赖失败而跳过的步骤（含间接依赖）计为失败，结果中注明失败的依赖"""
+        orchestrator = TaskOrchestrator({
+            "search": probe.agent(delay=0.05, success=False),
+            "file": probe.agent(delay=0.05),
+            "music": probe.agent(delay=0.05),
+        })
+
+        result = orchestrator.execute(make_plan(
+            ("search", "search", []),
+            ("write", "file", ["search"]),
+            ("play", "music", ["write"]),
+        ))
+
+        assert probe.calls == ["search"]
+        assert (result["successful_steps"], result["failed_steps"]) == (0, 3)
+        assert result["message"] == "执行失败，所有步骤都未能完成。"
+        skipped = {r["step_id"]: r for r in result["results"]}
+        assert skipped["write"]["status"] == "skipped"
+        assert "依赖的步骤 1（search）" in skipped["write"]["error"]
+        assert "依赖的步骤 2（write）" in skipped["play"]["error"]
+
+    def test_missing_dependencies_run_sequentially(self, probe):
+        """📋 测试未声明依赖的计划按顺序执行"""
+        orchestrator = TaskOrchestrator({"weather": probe.agent(delay=0.05), "search": probe.agent(delay=0.05)})
+
+        orchestrator.execute(make_plan(("a", "weather", None), ("b", "search", None)))
+
+        assert probe.peak == 1
+        assert probe.calls == ["a", "b"]
+
+
+class TestCheckpoints:
+    """步骤检查点测试"""
+
+    @pytest.fixture
+    def probe(self):
+        return ConcurrencyProbe()
+
+    def make_orchestrator(self, probe, store):
+        failing = probe.agent(delay=0, success=False)
+        return TaskOrchestrator(
+            {"search": probe.agent(delay=0), "file": probe.agent(delay=0), "broken": failing},
+            checkpoints=store
+        )
+
+    def test_follow_up_plan_reuses_successful_steps(self, probe):
+        """♻️ 测试澄清后的新计划只执行修改过和失败的步骤"""
+        store = CheckpointStore()
+        orchestrator = self.make_orchestrator(probe, store)
+
+        first = orchestrator.execute(make_plan(
+            ("搜索北京天气", "search", []),
+            ("写入波士炖.txt", "broken", ["搜索北京天气"]),
+        ))
+        assert first["success"] is False
+        assert len(store) == 1
+
+        second = orchestrator.execute(make_plan(
+            ("搜索北京天气", "search", []),
+            ("写入波士顿.txt", "file", ["搜索北京天气"]),
+        ))
+
+        assert probe.calls == ["搜索北京天气", "写入波士炖.txt", "写入波士顿.txt"]
+        assert second["success"] is True
+        assert [r["reused"] for r in second["results"]] == [True, False]
+        assert second["results"][0]["output"] == "done: 搜索北京天气"
+
+    def test_changed_upstream_invalidates_downstream(self, probe):
+        """🔗 测试上游步骤变化时下游步骤重新执行"""
+        orchestrator = self.make_orchestrator(probe, CheckpointStore())
+
+        orchestrator.execute(make_plan(("搜索北京天气", "search", None), ("写入文件", "file", None)))
+        orchestrator.execute(make_plan(("搜索上海天气", "search", None), ("写入文件", "file", None)))
+
+        assert probe.calls.count("写入文件") == 2
+
+    def test_persistence_and_expiry(self, probe, tmp_path):
+        """💾 测试检查点写入磁盘并在过期后失效"""
+        path = tmp_path / "checkpoints.json"
+        self.make_orchestrator(probe, CheckpointStore(path=str(path))).execute(
+            make_plan(("搜索北京天气", "search", []))
+        )
+
+        reloaded = CheckpointStore(path=str(path))
+        assert len(reloaded) == 1
+        self.make_orchestrator(probe, reloaded).execute(make_plan(("搜索北京天气", "search", [])))
+        assert probe.calls == ["搜索北京天气"]
+
+        assert len(CheckpointStore(path=str(path), max_age=-1)) == 0
+
+
+class TestDeadlines:
+    """步骤超时与取消测试"""
+
+    @pytest.fixture
+    def probe(self):
+        return ConcurrencyProbe()
+
+    def test_step_timeout_keeps_other_results(self, probe):
+        """⏰ 测试单步超时被中断，其余步骤结果照常汇总"""
+        orchestrator = TaskOrchestrator(
+            {"weather": probe.agent(delay=5), "search": probe.agent(delay=0.05)},
+            step_timeout=0.2
+        )
+
+        start = time.time()
+        result = orchestrator.execute(make_plan(("slow", "weather", []), ("fast", "search", [])))
+
+        assert time.time() - start < 1
+        assert result["interrupted"] == "timeout"
+        assert result["successful_steps"] == 1
+        assert [r["status"] for r in result["results"]] == ["timeout", "success"]
+        assert result["message"].startswith("执行超时")
+
+    def test_command_deadline_cancels_pending_steps(self, probe):
+        """🛑 测试指令被取消时中断进行中的步骤，后续步骤不再启动"""
+        orchestrator = TaskOrchestrator({"weather": probe.agent(delay=5), "search": probe.agent(delay=0)})
+        deadline = Deadline(10)
+        threading.Timer(0.1, deadline.cancel).start()
+
+        with deadline_scope(deadline):
+            result = orchestrator.execute(make_plan(("slow", "weather", None), ("next", "search", None)))
+
+        assert probe.calls == ["slow"]
+        assert result["interrupted"] == "cancelled"
+        assert result["successful_steps"] == 0
+
+    def test_partial_tool_calls_are_reported(self):
+        """🧩 测试被中断的步骤保留已完成的工具调用"""
+        action = Mock(tool="gaode_weather", tool_input={"city": "北京"})
+        agent = Mock()
+        agent.get_ability_info.return_value = {"tools": []}
+
+        async def ainvoke(payload):
+            return {
+                "success": False, "output": None, "error": "处理超时，仅完成了部分操作",
+                "interrupted": "timeout", "intermediate_steps": [(action, "晴")]
+            }
+
+        agent.ainvoke = ainvoke
+        result = TaskOrchestrator({"weather": agent}).execute(make_plan(("a", "weather", [])))
+
+        assert result["interrupted"] == "timeout"
+        assert result["results"][0]["tool_calls"] == [
+            {"tool": "gaode_weather", "args": {"city": "北京"}, "result": "晴"}
+        ]
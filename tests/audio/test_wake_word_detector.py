@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_wake_word_detector.py
+"""
+
+import threading
+import time
+from unittest.mock import Mock
+
+from src.core.audio.wake_word_detector import WakeWordDetector
+
+
+class FakeStream:
+    """模拟 PortAudio 输入流，记录由哪个线程关闭"""
+
+    def __init__(self):
+        self.closed_by = None
+        self.reading = False
+
+    def read(self, frames, exception_on_overflow=False):
+        self.reading = True
+        time.sleep(0.01)
+        self.reading = False
+        if self.closed_by is not None:
+            raise OSError("stream closed")
+        return b"\x00\x00" * frames
+
+    def is_active(self):
+        return self.closed_by is None
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        assert not self.reading, "stream closed while read() in progress"
+        self.closed_by = threading.current_thread()
+
+
+def make_detector():
+    detector = WakeWordDetector.__new__(WakeWordDetector)
+    detector.keywords = ["jarvis"]
+    detector.on_wake = None
+    detector._is_running = False
+    detector._is_paused = False
+    detector._thread = None
+    detector._stream_released = threading.Event()
+    detector.porcupine = Mock(frame_length=4, sample_rate=16000)
+    detector.porcupine.process.return_value = -1
+    detector.streams = []
+
+    def open_stream():
+        detector.streams.append(FakeStream())
+        return detector.streams[-1]
+
+    detector._open_audio_stream = open_stream
+    detector.stream = None
+    return detector
+
+
+class TestWakeWordDetectorPause:
+    """唤醒词检测器暂停/恢复测试"""
+
+    def test_pause_and_resume_from_other_thread(self):
+        """🎙️ 测试其他线程暂停/恢复时由检测线程关闭和重建音频流"""
+        detector = make_detector()
+        loop = threading.Thread(target=detector.start, daemon=True)
+        loop.start()
+        time.sleep(0.05)
+
+        detector.pause()
+        assert detector.stream is None
+        assert detector.streams[0].closed_by is loop
+
+        detector.resume()
+        time.sleep(0.3)
+        assert not detector._is_paused
+        assert len(detector.streams) == 2
+        assert detector.stream is detector.streams[1]
+
+        detector._is_running = False
+        loop.join(timeout=1)
+        assert not loop.is_alive()
+
+    def test_resume_when_not_paused_keeps_stream(self):
+        """🔁 测试未暂停时调用 resume 不重建正在读取的音频流"""
+        detector = make_detector()
+        loop = threading.Thread(target=detector.start, daemon=True)
+        loop.start()
+        time.sleep(0.05)
+
+        detector.resume()
+        time.sleep(0.05)
+        assert detector._is_running
+        assert detector.stream is detector.streams[0]
+        assert detector.streams[0].closed_by is None
+
+        detector._is_running = False
+        loop.join(timeout=1)
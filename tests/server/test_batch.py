@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_batch.py
+"""
+
+import io
+import time
+
+import pytest
+
+from src.server import HeadlessHost
+from src.server.batch import BatchRunner, read_commands
+from src.server.load_test import build_stub_engine
+from src.services.LLMFactory import LLMFactory
+from src.utils.config import config
+
+
+class TestBatchRunner:
+    """批量指令运行器测试"""
+
+    def test_read_commands(self):
+        """📄 测试读取 JSON 对象、JSON 字符串和纯文本，跳过空行和缺少文本的行"""
+        stream = io.StringIO('{"id": "a", "text": "搜索北京天气"}\n\n"创建文件"\n打开音乐\n{"id": "b"}\n')
+
+        commands = list(read_commands(stream))
+
+        assert [(c.id, c.text) for c in commands] == [("a", "搜索北京天气"), ("3", "创建文件"), ("4", "打开音乐")]
+
+    def test_results_timings_and_tokens(self, monkeypatch):
+        """📊 测试并发处理指令，逐条输出结果、阶段耗时和 token 用量"""
+        monkeypatch.setattr(LLMFactory, "_instances", {})
+        runner = BatchRunner(build_stub_engine(latency=0.1), HeadlessHost(config), concurrency=4)
+        commands = read_commands(io.StringIO("\n".join(f"指令 {i}" for i in range(8))))
+        results = []
+
+        start = time.time()
+        summary = runner.run(commands, on_result=results.append)
+
+        # 每条指令 3 次模型调用（规划、Worker、总结），串行约 2.4s
+        assert time.time() - start < 1.5
+        assert summary["commands"] == 8
+        assert summary["statuses"] == {"success": 8}
+        assert sorted(r.id for r in results) == [str(i) for i in range(1, 9)]
+
+        result = results[0]
+        assert result.reply == "好的，已经完成了。"
+        assert result.plan_source == "llm"
+        assert set(result.timings) == {"plan", "execute", "summary", "total"}
+        assert result.timings["total"] >= result.timings["plan"]
+        assert result.tokens["total_tokens"] > 0
+        assert "stub" in result.tokens_by_model
+        assert summary["tokens"]["total_tokens"] == sum(r.tokens["total_tokens"] for r in results)
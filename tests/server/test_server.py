@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_server.py
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+from aiohttp import test_utils
+
+from src.server import HeadlessHost, SessionBusy, SessionManager, SessionProcessor
+from src.server.app import create_app, create_manager
+from src.server.load_test import build_stub_engine
+from src.services.LLMFactory import LLMFactory
+from src.utils.config import config
+
+
+def make_engine():
+    """共享引擎：Agent 池每次 fork 出新的实例"""
+    engine = Mock()
+    engine.agents.fork.side_effect = lambda: {"file": Mock()}
+    return engine
+
+
+class TestSessionManager:
+    """会话隔离与并发上限测试"""
+
+    def make_manager(self, **kwargs):
+        return SessionManager(make_engine(), HeadlessHost(config), **kwargs)
+
+    def test_sessions_are_isolated(self):
+        """🔒 测试会话共享规划器，但对话状态、Agent 实例和编排器各自独立"""
+        manager = self.make_manager()
+        first = manager.create("a").processor
+        second = manager.create("b").processor
+
+        assert isinstance(first, SessionProcessor)
+        assert first.planner is second.planner
+        assert first.conversation_manager is not second.conversation_manager
+        assert first.agents is not second.agents
+        assert first.orchestrator is not second.orchestrator
+        assert manager.create("a").processor is first
+
+    def test_concurrency_limits(self, monkeypatch):
+        """🚦 测试全局并发上限、同一会话按顺序处理、排队满时拒绝"""
+        state = {"running": 0, "peak": 0, "per_session": {}}
+        lock = threading.Lock()
+
+        def handle_text(processor, text, on_event=None):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+                sid = processor.session_id
+                state["per_session"][sid] = state["per_session"].get(sid, 0) + 1
+                assert state["per_session"][sid] == 1
+            time.sleep(0.1)
+            with lock:
+                state["running"] -= 1
+                state["per_session"][processor.session_id] -= 1
+            return {"session_id": processor.session_id, "replies": [text]}
+
+        monkeypatch.setattr(SessionProcessor, "handle_text", handle_text)
+        manager = self.make_manager(global_concurrency=2, per_session_pending=2)
+        errors = []
+
+        def client(sid):
+            try:
+                manager.handle(sid, text="你好")
+            except SessionBusy as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=client, args=(sid,)) for sid in ["a", "a", "a", "b", "c", "d"]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = manager.stats()
+        assert state["peak"] == 2
+        assert len(errors) == 1
+        assert stats["completed"] == 5
+        assert stats["rejected"] == 1
+        assert stats["sessions"] == 4
+
+    def test_idle_sessions_expire(self):
+        """⌛ 测试空闲会话过期，会话数满时先清理过期会话"""
+        manager = self.make_manager(max_sessions=1, session_ttl=0)
+        manager.create("a")
+        time.sleep(0.01)
+
+        manager.create("b")
+        assert manager.get("a") is None
+        assert manager.get("b") is not None
+
+
+class TestServer:
+    """HTTP/WebSocket 端到端测试（假模型）"""
+
+    @pytest.fixture
+    def manager(self, monkeypatch):
+        monkeypatch.setattr(LLMFactory, "_instances", {})
+        return create_manager(config, engine=build_stub_engine(latency=0.01))
+
+    def test_http_and_websocket(self, manager):
+        """🌐 测试多个会话并发处理指令，WebSocket 推送计划进度和结果"""
+
+        async def scenario():
+            async with test_utils.TestClient(test_utils.TestServer(create_app(manager))) as client:
+                sessions = []
+                for _ in range(3):
+                    response = await client.post("/sessions")
+                    sessions.append((await response.json())["session_id"])
+
+                responses = await asyncio.gather(*(
+                    client.post(f"/sessions/{sid}/commands", json={"text": "在桌面创建 notes.txt"})
+                    for sid in sessions
+                ))
+                results = [await response.json() for response in responses]
+
+                ws = await client.ws_connect("/ws")
+                hello = await ws.receive_json()
+                await ws.send_json({"type": "command", "text": "在桌面创建 todo.txt"})
+                messages = [await ws.receive_json()]
+                while messages[-1]["type"] != "result":
+                    messages.append(await ws.receive_json())
+                await ws.close()
+
+                stats = await (await client.get("/stats")).json()
+                return sessions, results, hello, messages, stats
+
+        sessions, results, hello, messages, stats = asyncio.run(scenario())
+
+        assert [r["session_id"] for r in results] == sessions
+        assert all(r["replies"] == ["好的，已经完成了。"] for r in results)
+        assert hello["type"] == "session"
+        assert any(m["type"] == "event" and m["message"].startswith("当前计划") for m in messages)
+        assert messages[-1]["replies"] == ["好的，已经完成了。"]
+        assert stats["completed"] == 4
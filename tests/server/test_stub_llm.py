@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_stub_llm.py
+"""
+
+import asyncio
+import time
+
+import openai
+import pytest
+from aiohttp import test_utils
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_openai import ChatOpenAI
+
+from src.core.agent.entities.plan_entity import PlannerOutput
+from src.server.stub_llm import StubLLM, StubRule, StubSettings, create_stub_app, split_tokens
+
+
+def run_with_server(settings: StubSettings, scenario):
+    """启动假服务，用指向它的 ChatOpenAI 运行场景，返回 (场景结果, 服务统计)"""
+    stub = StubLLM(settings)
+
+    async def main():
+        async with test_utils.TestServer(create_stub_app(stub)) as server:
+            llm = ChatOpenAI(
+                api_key="stub",
+                base_url=str(server.make_url("/v1")),
+                model="stub-model",
+                max_retries=0,
+                stream_usage=True
+            )
+            return await scenario(llm)
+
+    return asyncio.run(main()), stub.stats()
+
+
+class TestStubLLM:
+    """本地假 LLM 服务测试"""
+
+    def test_split_tokens(self):
+        """✂️ 测试近似分词可还原原文"""
+        text = '你好 world, {"path": "notes.txt"}  '
+        tokens = split_tokens(text)
+        assert "".join(tokens) == text
+        assert tokens[:3] == ["你", "好", " world"]
+
+    def test_text_completion(self):
+        """💬 测试非流式文本回复和 token 用量"""
+
+        async def scenario(llm):
+            return await llm.ainvoke([HumanMessage(content="总结一下")])
+
+        message, stats = run_with_server(StubSettings(ttft=0.01, tokens_per_second=0), scenario)
+        assert message.content == "好的，已经完成了。"
+        assert message.usage_metadata["output_tokens"] > 0
+        assert stats["statuses"] == {"200": 1}
+
+    def test_planner_stream_with_ttft(self):
+        """🗺️ 测试规划器流式工具调用：按系统提示中的 Agent 生成计划，首 token 延迟和输出速度生效"""
+
+        async def scenario(llm):
+            planner = llm.bind_tools([PlannerOutput], tool_choice="PlannerOutput")
+            messages = [
+                SystemMessage(content="可用 Agent：\n- search: 网络搜索\n  工具: google_search"),
+                HumanMessage(content="搜索北京天气")
+            ]
+            start = time.perf_counter()
+            first, chunks = None, None
+            async for chunk in planner.astream(messages):
+                if first is None:
+                    first = time.perf_counter() - start
+                chunks = chunk if chunks is None else chunks + chunk
+            return chunks, first, time.perf_counter() - start
+
+        settings = StubSettings(ttft=0.2, tokens_per_second=200)
+        (message, first, total), _ = run_with_server(settings, scenario)
+
+        plan = PlannerOutput.model_validate(message.tool_calls[0]["args"])
+        assert plan.steps[0].assigned_agent == "search"
+        assert plan.task == "搜索北京天气"
+        assert first >= 0.2
+        # 计划参数约 60 个 token，按 200 tokens/s 输出
+        assert total >= 0.2 + 0.25
+        assert message.usage_metadata["total_tokens"] > 0
+
+    def test_scripted_tool_call(self):
+        """🛠️ 测试脚本规则：Worker 先调用指定工具，拿到工具结果后给出最终答复"""
+        rules = [StubRule(match="创建", tool="create_file", args={"path": "notes.txt"}, content="文件已创建")]
+        tool = {
+            "type": "function",
+            "function": {
+                "name": "create_file",
+                "description": "创建文件",
+                "parameters": {"type": "object", "properties": {"path": {"type": "string"}}}
+            }
+        }
+
+        async def scenario(llm):
+            worker = llm.bind(tools=[tool])
+            messages = [HumanMessage(content="创建 notes.txt")]
+            call = await worker.ainvoke(messages)
+            result = ToolMessage(content="ok", tool_call_id=call.tool_calls[0]["id"])
+            final = await worker.ainvoke(messages + [call, result])
+            return call, final
+
+        (call, final), _ = run_with_server(StubSettings(ttft=0, tokens_per_second=0, rules=rules), scenario)
+        assert call.tool_calls[0]["name"] == "create_file"
+        assert call.tool_calls[0]["args"] == {"path": "notes.txt"}
+        assert final.content == "文件已创建"
+
+    def test_rate_limit_injection(self):
+        """🚫 测试故障注入：按比例返回 429"""
+
+        async def scenario(llm):
+            with pytest.raises(openai.RateLimitError):
+                await llm.ainvoke([HumanMessage(content="你好")])
+
+        _, stats = run_with_server(StubSettings(ttft=0, rate_limit_rate=1.0), scenario)
+        assert stats["statuses"] == {"429": 1}
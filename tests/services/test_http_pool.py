@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_http_pool.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from src.core.agent.entities.plan_entity import PlannerOutput
+from src.services.http_pool import LLMHttpPool
+from src.server.stub_llm import StubLLM, StubSettings, create_stub_app
+
+
+@pytest.fixture
+def stub():
+    return StubLLM(StubSettings(ttft=0.01, tokens_per_second=0))
+
+
+@pytest.fixture
+def stub_url(stub):
+    """在独立线程的事件循环中运行假 LLM 服务"""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_stub_app(stub))
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{port}/v1"
+
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def pool(stub_url):
+    pool = LLMHttpPool(stub_url, warm_connections=1)
+    yield pool
+    pool.close()
+
+
+def make_llm(pool: LLMHttpPool, model: str) -> ChatOpenAI:
+    return ChatOpenAI(
+        api_key="stub",
+        base_url=pool.base_url,
+        model=model,
+        max_retries=0,
+        http_client=pool.sync_client,
+        http_async_client=pool.async_client
+    )
+
+
+class TestLLMHttpPool:
+    """共享连接池测试"""
+
+    def test_instances_share_connections_across_event_loops(self, pool):
+        """🔗 测试预热后不同 LLM 实例、不同 asyncio.run 的调用都复用同一条连接"""
+        assert pool.warm().result(timeout=5) == 2  # 异步池 1 条 + 同步池 1 条
+
+        planner, summary = make_llm(pool, "planner"), make_llm(pool, "summary")
+        for llm in (planner, summary, planner):
+            message = asyncio.run(llm.ainvoke([HumanMessage(content="你好")]))
+            assert message.content == "好的，已经完成了。"
+        assert summary.invoke([HumanMessage(content="你好")]).content == "好的，已经完成了。"
+
+        stats = pool.stats()
+        assert stats["requests"] == 4
+        assert stats["new_connections"] == 0
+        assert stats["reuse_ratio"] == 1.0
+        assert stats["warmups"] == 2
+
+    def test_streaming_through_bridge(self, pool):
+        """🌊 测试流式响应逐块桥接回调用方事件循环"""
+        planner = make_llm(pool, "planner").bind_tools([PlannerOutput], tool_choice="PlannerOutput")
+        messages = [SystemMessage(content="- search: 网络搜索"), HumanMessage(content="搜索天气")]
+
+        async def stream():
+            chunks = None
+            async for chunk in planner.astream(messages):
+                chunks = chunk if chunks is None else chunks + chunk
+            return chunks
+
+        first = asyncio.run(stream())
+        second = asyncio.run(stream())
+
+        assert first.tool_calls[0]["args"]["steps"][0]["assigned_agent"] == "search"
+        assert second.tool_calls[0]["args"] == first.tool_calls[0]["args"]
+        assert pool.stats()["new_connections"] == 1
+
+    def test_cancelled_stream_releases_connection(self, stub, stub_url):
+        """✋ 测试流式读取中途取消后连接归还连接池（连接池只有 1 条连接），后续请求正常"""
+        stub.configure(ttft=0, tokens_per_second=20)
+        pool = LLMHttpPool(stub_url, max_connections=1)
+        llm = make_llm(pool, "worker")
+
+        async def cancelled():
+            async def consume():
+                async for _ in llm.astream([HumanMessage(content="你好")]):
+                    pass
+
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        try:
+            asyncio.run(cancelled())
+            stub.configure(tokens_per_second=0)
+            for _ in range(2):
+                message = asyncio.run(asyncio.wait_for(llm.ainvoke([HumanMessage(content="你好")]), timeout=5))
+                assert message.content == "好的，已经完成了。"
+        finally:
+            pool.close()
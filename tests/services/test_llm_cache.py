@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_llm_cache.py
+"""
+
+import asyncio
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel
+
+from src.services.llm_cache import CachedChatModel, CachePolicy, ResponseCache, query_similarity
+
+
+class Plan(BaseModel):
+    """计划"""
+    task: str
+
+
+class CountingLLM(BaseChatModel):
+    """记录调用次数的假模型：强制工具调用时返回计划，否则返回带编号的文本"""
+
+    calls: int = 0
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "counting-fake"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice)
+
+    def _message(self, messages, **kwargs) -> AIMessage:
+        self.calls += 1
+        usage = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+        if kwargs.get("tool_choice"):
+            args = {"task": messages[-1].content}
+            return AIMessage(content="", tool_calls=[{"name": "Plan", "args": args, "id": f"call_{self.calls}"}],
+                             usage_metadata=usage)
+        return AIMessage(content=f"回复 {self.calls}", usage_metadata=usage)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, **kwargs))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._message(messages, **kwargs)
+        for tool_call in message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[{
+                "name": tool_call["name"], "args": '{"task": "', "id": tool_call["id"], "index": 0
+            }]))
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[{
+                "name": None, "args": tool_call["args"]["task"] + '"}', "id": None, "index": 0
+            }]))
+        if message.content:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=message.content))
+
+
+def planner_messages(query: str):
+    return [SystemMessage(content="你是规划器"), HumanMessage(content=query), HumanMessage(content=query)]
+
+
+async def stream_plan(llm, query: str):
+    merged = None
+    async for chunk in llm.bind_tools([Plan], tool_choice="Plan").astream(planner_messages(query)):
+        merged = chunk if merged is None else merged + chunk
+    return merged
+
+
+class TestResponseCache:
+    """LLM 响应缓存测试"""
+
+    def test_exact_hit(self, tmp_path):
+        """🎯 测试相同请求直接返回缓存（不调用模型、不计用量），参数不同则不命中"""
+        cache = ResponseCache(str(tmp_path / "cache.db"))
+        delegate = CountingLLM()
+        llm = CachedChatModel(delegate=delegate, response_cache=cache, llm_type="summary")
+        messages = [SystemMessage(content="总结"), HumanMessage(content="创建文件成功")]
+
+        first = llm.invoke(messages)
+        second = llm.invoke(messages)
+        other = CachedChatModel(delegate=CountingLLM(temperature=0.7), response_cache=cache, llm_type="summary")
+
+        assert second.content == first.content == "回复 1"
+        assert second.response_metadata["cache"] == "exact"
+        assert not second.usage_metadata
+        assert delegate.calls == 1
+        assert other.invoke(messages).content == "回复 1" and other.delegate.calls == 1
+        assert cache.stats()["summary"]["exact_hits"] == 1
+
+    def test_planner_stream_and_semantic_hit(self, tmp_path):
+        """🧭 测试规划器流式命中，相似指令语义命中，文件名不同则不命中"""
+        delegate = CountingLLM()
+        policy = CachePolicy(semantic=True, threshold=0.8)
+        llm = CachedChatModel(delegate=delegate, response_cache=ResponseCache(str(tmp_path / "cache.db")),
+                              llm_type="planner", policy=policy)
+
+        first = asyncio.run(stream_plan(llm, "把会议纪要写入 todo.txt"))
+        exact = asyncio.run(stream_plan(llm, "把会议纪要写入 todo.txt"))
+        similar = asyncio.run(stream_plan(llm, "把会议纪要写入 todo.txt 吧"))
+        different = asyncio.run(stream_plan(llm, "把会议纪要写入 notes.txt"))
+
+        assert exact.tool_calls[0]["args"] == first.tool_calls[0]["args"]
+        assert similar.tool_calls[0]["args"] == first.tool_calls[0]["args"]
+        assert different.tool_calls[0]["args"] == {"task": "把会议纪要写入 notes.txt"}
+        assert delegate.calls == 2
+        stats = llm.response_cache.stats()["planner"]
+        assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+
+    def test_worker_tool_calls_bypassed(self, tmp_path):
+        """🛠️ 测试 Worker 工具调用循环（绑定工具、非强制调用）默认不缓存"""
+        delegate = CountingLLM()
+        llm = CachedChatModel(delegate=delegate, response_cache=ResponseCache(str(tmp_path / "cache.db")),
+                              llm_type="worker")
+        agent_llm = llm.bind(tools=[convert_to_openai_tool(Plan)])
+
+        for _ in range(2):
+            agent_llm.invoke([HumanMessage(content="创建文件")])
+
+        assert delegate.calls == 2
+        assert llm.response_cache.stats()["worker"]["bypassed"] == 2
+
+    def test_ttl_eviction_and_persistence(self, tmp_path):
+        """⏳ 测试过期不命中、超出容量按最近使用淘汰、重新打开后仍可命中"""
+        path = str(tmp_path / "cache.db")
+        cache = ResponseCache(path, max_entries=2)
+        delegate = CountingLLM()
+        llm = CachedChatModel(delegate=delegate, response_cache=cache, llm_type="summary")
+
+        for text in ("a", "b", "a", "c"):  # 写入 c 时淘汰最久未使用的 b
+            llm.invoke([HumanMessage(content=text)])
+            time.sleep(0.01)
+        assert len(cache) == 2
+        assert cache.stats()["summary"]["evicted"] == 1
+        cache.close()
+
+        reopened = CachedChatModel(delegate=delegate, response_cache=ResponseCache(path), llm_type="summary")
+        assert reopened.invoke([HumanMessage(content="a")]).content == "回复 1"
+        assert reopened.invoke([HumanMessage(content="b")]).content == "回复 4"
+
+        expired = CachedChatModel(delegate=delegate, response_cache=reopened.response_cache, llm_type="summary",
+                                  policy=CachePolicy(ttl=0))
+        assert expired.invoke([HumanMessage(content="a")]).content == "回复 5"
+
+    def test_query_similarity(self):
+        """🔤 测试指令相似度：英文/数字片段不同时为 0"""
+        assert query_similarity("搜索北京天气", "搜索北京天气。") > 0.999
+        assert query_similarity("搜索北京天气", "搜索上海天气") < 0.9
+        assert query_similarity("创建 a.txt", "创建 b.txt") == 0.0
+
+    def test_semantic_rejects_different_place(self, tmp_path):
+        """🗺️ 测试长指令只有地名不同时（二元组相似度超过阈值）不语义命中，只差语气词时仍命中"""
+        beijing = "帮我查一下明天北京的天气预报然后把结果写进桌面上的备忘录里面再提醒我带伞"
+        shanghai = beijing.replace("北京", "上海")
+        assert query_similarity(beijing, shanghai) == 0.0
+        assert query_similarity(beijing, "请" + beijing + "吧") > 0.9
+
+        delegate = CountingLLM()
+        llm = CachedChatModel(delegate=delegate, response_cache=ResponseCache(str(tmp_path / "cache.db")),
+                              llm_type="planner", policy=CachePolicy(semantic=True, threshold=0.9))
+
+        asyncio.run(stream_plan(llm, beijing))
+        other = asyncio.run(stream_plan(llm, shanghai))
+
+        assert other.tool_calls[0]["args"] == {"task": shanghai}
+        assert delegate.calls == 2
+        assert llm.response_cache.stats()["planner"]["semantic_hits"] == 0
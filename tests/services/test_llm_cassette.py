@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_llm_cassette.py
+"""
+
+import asyncio
+import json
+import time
+import uuid
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel
+
+from src.services.llm_cassette import Cassette, CassetteChatModel, CassetteMiss, LatencyModel
+
+
+class Plan(BaseModel):
+    """计划"""
+    steps: list
+
+
+class ToolLLM(BaseChatModel):
+    """绑定工具时返回工具调用、否则返回文本的假模型（按 OpenAI 方式通过 bind 传入工具）"""
+
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "tool-fake"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice)
+
+    def _message(self, **kwargs):
+        self.calls += 1
+        usage = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+        if kwargs.get("tools"):
+            return AIMessage(content="", tool_calls=[{"name": "Plan", "args": {"steps": ["a", "b"]}, "id": "call_1"}],
+                             usage_metadata=usage, response_metadata={"model_name": "fake"})
+        return AIMessage(content=f"回复 {self.calls}", usage_metadata=usage, response_metadata={"model_name": "fake"})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self._message(**kwargs))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._message(**kwargs)
+        arguments = json.dumps(message.tool_calls[0]["args"]) if message.tool_calls else ""
+        for i in range(0, len(arguments), 4):
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": "Plan" if i == 0 else None, "args": arguments[i:i + 4], "id": "call_1" if i == 0 else None,
+                 "index": 0}
+            ]))
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content=message.content, usage_metadata=message.usage_metadata,
+            response_metadata=message.response_metadata
+        ))
+
+
+def messages(task_id=None):
+    return [SystemMessage(content="你是规划器"), HumanMessage(content=f"任务 {task_id or uuid.uuid4()}：  搜索天气")]
+
+
+class TestLLMCassette:
+    """LLM 录制/回放测试"""
+
+    def record(self, path):
+        delegate = ToolLLM()
+        llm = CassetteChatModel(delegate=delegate, cassette=Cassette(str(path), mode="record"), name_in_cassette="planner")
+        structured = llm.bind_tools([Plan], tool_choice="Plan")
+
+        streamed = None
+        for chunk in structured.stream(messages()):
+            streamed = chunk if streamed is None else streamed + chunk
+        text = llm.invoke(messages())
+        return delegate, streamed, text
+
+    def replay(self, path, **kwargs):
+        delegate = ToolLLM()
+        cassette = Cassette(str(path), mode="replay", **kwargs)
+        return delegate, cassette, CassetteChatModel(delegate=delegate, cassette=cassette, name_in_cassette="planner")
+
+    def test_record_then_replay(self, tmp_path):
+        """📼 测试录制的工具调用和文本响应可离线回放（含流式和用量），不再调用真实模型"""
+        path = tmp_path / "cassette.jsonl"
+        _, recorded_stream, recorded_text = self.record(path)
+        assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+
+        delegate, cassette, llm = self.replay(path, latency=LatencyModel("none"))
+        replayed = None
+        for chunk in llm.bind_tools([Plan], tool_choice="Plan").stream(messages()):
+            replayed = chunk if replayed is None else replayed + chunk
+        text = asyncio.run(llm.ainvoke(messages()))
+
+        assert delegate.calls == 0
+        assert replayed.tool_calls[0]["args"] == recorded_stream.tool_calls[0]["args"] == {"steps": ["a", "b"]}
+        assert replayed.usage_metadata["total_tokens"] == 15
+        assert text.content == recorded_text.content
+        assert cassette.stats() == {"hits": 2, "misses": 0, "recorded": 0}
+
+    def test_miss_and_passthrough(self, tmp_path):
+        """🔍 测试请求不同时未命中报错，passthrough 模式调用真实模型并追加录制"""
+        path = tmp_path / "cassette.jsonl"
+        self.record(path)
+
+        _, _, strict = self.replay(path)
+        with pytest.raises(CassetteMiss):
+            strict.invoke([HumanMessage(content="另一个问题")])
+
+        delegate, cassette, lenient = self.replay(path, on_miss="passthrough", latency=LatencyModel("none"))
+        lenient.invoke([HumanMessage(content="另一个问题")])
+        lenient.invoke([HumanMessage(content="另一个问题")])
+
+        assert delegate.calls == 1
+        assert cassette.stats() == {"hits": 1, "misses": 1, "recorded": 1}
+        assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+
+    def test_simulated_latency(self, tmp_path):
+        """⏱️ 测试回放按延迟模型等待，固定种子的随机延迟可复现"""
+        path = tmp_path / "cassette.jsonl"
+        self.record(path)
+
+        _, _, llm = self.replay(path, latency=LatencyModel("fixed", fixed=0.2))
+        start = time.time()
+        llm.invoke(messages())
+        assert 0.2 <= time.time() - start < 0.5
+
+        first = [LatencyModel("lognormal", median=1.0, seed=7).sample(0) for _ in range(3)]
+        second = [LatencyModel("lognormal", median=1.0, seed=7).sample(0) for _ in range(3)]
+        assert first == second
+        assert LatencyModel("recorded", scale=2).sample(0.3) == pytest.approx(0.6)
+
+    def test_factory_wraps_empty_record_cassette(self, tmp_path, monkeypatch):
+        """🏭 测试 LLMFactory 在录制模式下包装模型（录制文件为空时也生效）"""
+        from src.services import LLMFactory as factory_module
+
+        options = {
+            "llm_cassette.mode": "record",
+            "llm_cassette.path": str(tmp_path / "cassette.jsonl"),
+            "qiniu.api_key": "test",
+        }
+        monkeypatch.setattr(factory_module.config, "get", lambda key, default=None: options.get(key, default))
+        monkeypatch.setattr(factory_module.LLMFactory, "_instances", {})
+        monkeypatch.setattr(factory_module.LLMFactory, "_cassette", None)
+
+        llm = factory_module.LLMFactory.get_llm("summary")
+        assert isinstance(llm, CassetteChatModel)
+        assert len(llm.cassette) == 0
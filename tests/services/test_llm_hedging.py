@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_llm_hedging.py
+"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.services.llm_hedging import HedgedChatModel, HedgePolicy, Hedger, benchmark, percentile
+
+
+class ScriptedLLM(BaseChatModel):
+    """按调用顺序使用脚本中的首 token 延迟（或异常、协程函数）的假模型，记录被取消的调用"""
+
+    script: list = []
+    calls: int = 0
+    cancelled: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    async def _wait(self):
+        index = self.calls
+        self.calls += 1
+        step = self.script[index] if index < len(self.script) else 0.0
+        if isinstance(step, Exception):
+            raise step
+        if callable(step):
+            await step()
+            return index
+        try:
+            await asyncio.sleep(step)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return index
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="同步"))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        index = await self._wait()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"回复 {index}"))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        index = await self._wait()
+        for piece in (f"回复 {index}", "。"):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+def hedged(script, **policy) -> HedgedChatModel:
+    options = dict(min_samples=0, min_delay=0.05, max_delay=0.05)
+    options.update(policy)
+    return HedgedChatModel(delegate=ScriptedLLM(script=script), hedger=Hedger(), llm_type="planner",
+                           policy=HedgePolicy(**options))
+
+
+class TestHedgedChatModel:
+    """LLM 对冲请求测试"""
+
+    def test_hedge_wins_and_cancels_slow_primary(self):
+        """🏁 测试主请求超过等待时间后发出对冲请求，先到者胜出，慢请求被取消"""
+        llm = hedged([1.0, 0.01])
+
+        async def stream():
+            start, text = time.perf_counter(), ""
+            async for chunk in llm.astream([HumanMessage(content="你好")]):
+                text += chunk.content
+            return text, time.perf_counter() - start
+
+        text, elapsed = asyncio.run(stream())
+
+        assert text == "回复 1。"
+        assert elapsed < 0.5
+        assert llm.delegate.cancelled == 1
+        stats = llm.hedger.stats()["planner"]
+        assert (stats["requests"], stats["hedged"], stats["hedge_wins"]) == (1, 1, 1)
+
+    def test_fast_primary_is_not_hedged(self):
+        """⚡ 测试主请求在等待时间内返回时不发出额外请求"""
+        llm = hedged([0.0] * 5, max_delay=0.5, min_delay=0.5)
+
+        for index in range(5):
+            assert asyncio.run(llm.ainvoke([HumanMessage(content="你好")])).content == f"回复 {index}"
+        assert llm.delegate.calls == 5
+        assert llm.hedger.stats()["planner"]["hedged"] == 0
+
+    def test_budget_caps_extra_requests(self):
+        """💰 测试额外请求受预算限制：每个主请求积累 0.1 个令牌，最多积攒 1 个"""
+        llm = hedged([0.06] * 100, budget_ratio=0.1, budget_burst=1)
+
+        async def run():
+            for _ in range(20):
+                await llm.ainvoke([HumanMessage(content="你好")])
+
+        asyncio.run(run())
+        stats = llm.hedger.stats()["planner"]
+        assert stats["hedged"] <= 1 + 20 * 0.1
+        assert stats["denied"] >= 15
+        assert stats["extra_ratio"] <= 0.15
+
+    def test_retry_after_connection_error(self):
+        """🔁 测试请求连接失败时在预算内立即重试，不可重试的错误直接抛出"""
+        llm = hedged([ConnectionError("reset"), 0.0], max_delay=1.0)
+        assert asyncio.run(llm.ainvoke([HumanMessage(content="你好")])).content == "回复 1"
+        assert llm.hedger.stats()["planner"]["retries"] == 1
+
+        llm = hedged([ValueError("bad request")], max_delay=1.0)
+        with pytest.raises(ValueError):
+            asyncio.run(llm.ainvoke([HumanMessage(content="你好")]))
+        assert llm.hedger.stats()["planner"]["failed"] == 1
+
+    def test_retry_restarts_hedge_timer(self):
+        """⏲️ 测试主请求和对冲请求都失败后，重试重新等待对冲时间，不会立即被对冲"""
+        failures = {}
+
+        async def fail_together():
+            # 主请求和对冲请求在同一时刻失败，此时对冲时间已过
+            loop = asyncio.get_running_loop()
+            await asyncio.sleep(failures.setdefault("at", loop.time() + 0.15) - loop.time())
+            raise ConnectionError("reset")
+
+        llm = hedged([fail_together, fail_together, 0.02])
+
+        assert asyncio.run(llm.ainvoke([HumanMessage(content="你好")])).content == "回复 2"
+        assert llm.delegate.calls == 3
+        stats = llm.hedger.stats()["planner"]
+        assert (stats["hedged"], stats["retries"]) == (1, 1)
+
+    def test_delay_follows_recent_percentile(self):
+        """📈 测试对冲等待时间取最近延迟的分位并限制在上下限内"""
+        hedger = Hedger(window=10)
+        policy = HedgePolicy(min_samples=5, percentile=0.9, min_delay=0.1, max_delay=2.0)
+        assert hedger.delay("planner:stream", policy) == 2.0
+
+        for latency in (0.2, 0.3, 0.25, 0.4, 0.35, 0.5, 0.3, 0.2, 0.45, 0.3):
+            hedger.record("planner:stream", latency)
+        assert hedger.delay("planner:stream", policy) == 0.45
+        assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.0
+
+    def test_tail_latency_with_stub_server(self):
+        """🐢 测试在假服务上（20% 请求首 token 延迟 0.6s）对冲显著降低 p90，额外请求不超过预算"""
+        policy = HedgePolicy(min_samples=5, percentile=0.5, min_delay=0.05, max_delay=0.2, budget_ratio=0.3)
+        results = asyncio.run(benchmark(
+            requests=60, concurrency=4, ttft=0.02, slow_rate=0.2, slow_ttft=0.6, policy=policy, seed=3
+        ))
+
+        assert results["baseline"]["p90"] >= 0.6
+        assert results["hedged"]["p90"] < 0.4
+        assert results["hedged"]["extra_ratio"] <= 0.3 + 3 / 60
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_llm_router.py
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from aiohttp import web
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+
+from src.core.agent.entities.plan_entity import PlannerOutput
+from src.server.stub_llm import StubLLM, StubSettings, create_stub_app
+from src.services.http_pool import LLMHttpPool
+from src.services.llm_router import BackendPolicy, LLMRouter, RoutedChatModel
+
+
+class StubEndpoint:
+    """在独立线程的事件循环中运行的假 LLM 服务（云端或本地模型的替身）"""
+
+    def __init__(self, **settings):
+        self.stub = StubLLM(StubSettings(tokens_per_second=0, **settings))
+        self._loop = asyncio.new_event_loop()
+        self._runner = web.AppRunner(create_stub_app(self.stub))
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        # 与 LLMFactory 一样经共享连接池访问，连接可跨 asyncio.run 复用
+        self.pool = LLMHttpPool(f"{self.base}/v1")
+
+    @property
+    def requests(self) -> int:
+        return self.stub.stats()["total"]
+
+    def llm(self) -> ChatOpenAI:
+        return ChatOpenAI(
+            api_key="stub",
+            base_url=self.pool.base_url,
+            model="stub",
+            max_retries=0,
+            http_client=self.pool.sync_client,
+            http_async_client=self.pool.async_client
+        )
+
+    def close(self):
+        self.pool.close()
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+@pytest.fixture
+def endpoints():
+    cloud, local = StubEndpoint(ttft=0.05), StubEndpoint(ttft=0.01)
+    yield cloud, local
+    cloud.close()
+    local.close()
+
+
+def routed(endpoints, policies) -> RoutedChatModel:
+    cloud, local = endpoints
+    router = LLMRouter({name: BackendPolicy(**options) for name, options in policies.items()}, window=5)
+    return RoutedChatModel(backends={"cloud": cloud.llm(), "local": local.llm()}, router=router, llm_type="worker")
+
+
+def ask(llm, n: int = 1):
+    for _ in range(n):
+        assert asyncio.run(llm.ainvoke([HumanMessage(content="你好")])).content == "好的，已经完成了。"
+
+
+class TestLLMRouter:
+    """云端/本地模型路由测试"""
+
+    def test_routes_to_faster_backend_and_follows_latency(self, endpoints):
+        """🏎️ 测试先验较低的本地模型被尝试并持续使用，本地变慢后切回云端"""
+        cloud, local = endpoints
+        llm = routed(endpoints, {"cloud": {"prior_latency": 0.3}, "local": {"prior_latency": 0.1}})
+
+        ask(llm, 3)
+        assert (cloud.requests, local.requests) == (0, 3)
+
+        local.stub.configure(ttft=0.6)  # 滚动均值超过云端的预期延迟后切换
+        ask(llm, 6)
+        stats = llm.router.stats()["worker"]
+        assert cloud.requests >= 3
+        assert stats["local"]["expected_latency"] > stats["cloud"]["expected_latency"]
+
+    def test_sheds_timing_out_backend(self, endpoints):
+        """🚧 测试本地模型挂起时首 token 超时转到云端，连续失败后熔断，不再接收流量"""
+        cloud, local = endpoints
+        local.stub.configure(timeout_rate=1.0, hang_seconds=1)
+        llm = routed(endpoints, {
+            "cloud": {"prior_latency": 0.5},
+            "local": {"prior_latency": 0.01, "timeout": 0.2, "max_failures": 1, "cooldown": 60}
+        })
+        planner = llm.bind_tools([PlannerOutput], tool_choice="PlannerOutput")
+        messages = [SystemMessage(content="- search: 网络搜索"), HumanMessage(content="搜索天气")]
+
+        async def stream():
+            chunks = None
+            async for chunk in planner.astream(messages):
+                chunks = chunk if chunks is None else chunks + chunk
+            return chunks
+
+        start = time.perf_counter()
+        message = asyncio.run(stream())
+        assert time.perf_counter() - start < 1.0
+        assert message.tool_calls[0]["args"]["steps"][0]["assigned_agent"] == "search"
+
+        ask(llm, 3)
+        stats = llm.router.stats()["worker"]
+        assert stats["local"]["shed"] and stats["local"]["errors"] == 1
+        assert (local.requests, cloud.requests) == (1, 4)
+
+    def test_sync_calls_time_out_and_shed(self, endpoints):
+        """🧵 测试同步调用（invoke / stream）同样受首 token 超时约束，挂起的后端被熔断"""
+        cloud, local = endpoints
+        local.stub.configure(timeout_rate=1.0, hang_seconds=1)
+        calls = {
+            "invoke": lambda llm, messages: llm.invoke(messages).content,
+            "stream": lambda llm, messages: "".join(chunk.content for chunk in llm.stream(messages))
+        }
+
+        for call in calls.values():
+            llm = routed(endpoints, {
+                "cloud": {"prior_latency": 0.5},
+                "local": {"prior_latency": 0.01, "timeout": 0.2, "max_failures": 1, "cooldown": 60}
+            })
+            start = time.perf_counter()
+            assert call(llm, [HumanMessage(content="你好")]) == "好的，已经完成了。"
+            assert time.perf_counter() - start < 1.0
+            assert llm.router.stats()["worker"]["local"]["shed"]
+
+        assert (local.requests, cloud.requests) == (2, 2)
+
+    def test_cooldown_and_rank(self):
+        """⏱️ 测试熔断冷却结束后后端重新参与排序，样本过期后按先验延迟估计"""
+        now = [0.0]
+        router = LLMRouter({
+            "cloud": BackendPolicy(prior_latency=1.0, stale_after=100),
+            "local": BackendPolicy(prior_latency=2.0, max_failures=2, cooldown=10)
+        }, clock=lambda: now[0])
+        assert router.rank("summary", ["cloud", "local"]) == ["cloud", "local"]
+
+        for _ in range(3):
+            router.record("cloud", "summary", 3.0, ok=True)
+        assert router.rank("summary", ["cloud", "local"]) == ["local", "cloud"]
+
+        router.record("local", "summary", 10.0, ok=False)
+        router.record("local", "summary", 10.0, ok=False)
+        assert router.rank("summary", ["cloud", "local"]) == ["cloud", "local"]
+        assert router.stats()["summary"]["local"]["shed"]
+
+        now[0] = 200.0  # 冷却结束且样本过期：都按先验延迟
+        assert router.rank("summary", ["cloud", "local"]) == ["cloud", "local"]
+        assert router.expected("cloud", "summary") == 1.0
+
+    def test_factory_applies_role_constraints(self, endpoints, monkeypatch):
+        """🏭 测试 LLMFactory 按 roles 约束：规划只用云端，Worker 在云端和本地 Ollama 间路由"""
+        from src.services import LLMFactory as factory_module
+
+        cloud, local = endpoints
+        options = {
+            "qiniu.api_key": "stub",
+            "qiniu.base_url": f"{cloud.base}/v1",
+            "ollama.enabled": True,
+            "ollama.base_url": local.base,
+            "llm_router.enabled": True,
+            "llm_router.roles.planner": ["cloud"],
+            "llm_router.roles.worker": ["cloud", "local"],
+            "llm_router.backends": {"local": {"prior_latency": 0.1}},
+        }
+        monkeypatch.setattr(factory_module.config, "get", lambda key, default=None: options.get(key, default))
+        for name, value in (("_instances", {}), ("_cassette", None), ("_router", None), ("_pools", {})):
+            monkeypatch.setattr(factory_module.LLMFactory, name, value)
+
+        try:
+            planner = factory_module.LLMFactory.get_llm("planner")
+            worker = factory_module.LLMFactory.get_llm("worker")
+
+            assert isinstance(planner, ChatOpenAI)
+            assert isinstance(worker, RoutedChatModel) and list(worker.backends) == ["cloud", "local"]
+            ask(worker, 2)
+            assert local.requests == 2
+            assert factory_module.LLMFactory.router_stats()["worker"]["local"]["requests"] == 2
+        finally:
+            for pool in factory_module.LLMFactory._pools.values():
+                pool.close()
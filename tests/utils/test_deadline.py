@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_deadline.py
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.runnables.config import run_in_executor
+
+from src.utils.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    OperationCancelled,
+    current_deadline,
+    deadline_scope,
+    run_with_deadline,
+    timeout_for,
+)
+
+
+class TestDeadline:
+    """Deadline 测试"""
+
+    def test_child_never_outlives_parent(self):
+        """⏳ 测试子截止时间不晚于父级"""
+        parent = Deadline(1.0)
+
+        assert parent.child(10).expires_at == parent.expires_at
+        assert parent.child(0.5).expires_at < parent.expires_at
+        assert Deadline(None, parent=parent).remaining() <= 1.0
+        assert Deadline().remaining() is None
+
+    def test_run_times_out_and_cancels_task(self):
+        """⏰ 测试超时时抛出 DeadlineExceeded 并取消进行中的协程"""
+        state = {"cancelled": False}
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+
+        start = time.time()
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(Deadline(0.1).run(slow()))
+
+        assert time.time() - start < 1
+        assert state["cancelled"] is True
+
+    def test_cancel_from_another_thread(self):
+        """🛑 测试从其他线程取消父级时中断子级等待"""
+        parent = Deadline()
+        child = parent.child(10)
+        threading.Timer(0.1, parent.cancel, args=("用户取消",)).start()
+
+        start = time.time()
+        with pytest.raises(OperationCancelled, match="用户取消"):
+            asyncio.run(child.run(asyncio.sleep(5)))
+
+        assert time.time() - start < 1
+        assert child.cancelled
+        with pytest.raises(OperationCancelled):
+            child.check()
+
+    def test_scope_propagates_to_tasks_and_threads(self):
+        """🧵 测试 Deadline 随上下文传递到 asyncio 任务和工具线程"""
+        deadline = Deadline(30)
+
+        async def read_in_executor():
+            return await run_in_executor(None, lambda: (current_deadline(), timeout_for(60)))
+
+        with deadline_scope(deadline):
+            seen, timeout = asyncio.run(run_with_deadline(read_in_executor()))
+
+        assert seen is deadline
+        assert timeout <= 30
+        assert current_deadline() is None
+        assert timeout_for(60) == 60
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_import_time.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# import src.core.assistant 的时间预算（秒），可通过环境变量调整
+IMPORT_BUDGET = float(os.getenv("VOXAGENT_IMPORT_BUDGET", "1.5"))
+
+# 冷启动时不应加载的重量级依赖
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "langchain_openai",
+    "langchain_classic",
+    "langchain_community",
+    "openai",
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import src.core.assistant
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def _import_assistant() -> dict:
+    """在全新解释器中导入 src.core.assistant，返回耗时和已加载模块"""
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if result.returncode != 0:
+        if "ModuleNotFoundError" in result.stderr:
+            pytest.skip(f"Missing dependency: {result.stderr.strip().splitlines()[-1]}")
+        pytest.fail(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def probe():
+    return _import_assistant()
+
+
+class TestImportTime:
+    """冷启动导入耗时测试"""
+
+    def test_import_within_budget(self, probe):
+        """⏱️ 测试 import src.core.assistant 不超过时间预算"""
+        assert probe["elapsed"] < IMPORT_BUDGET, (
+            f"import src.core.assistant took {probe['elapsed']:.2f}s (budget {IMPORT_BUDGET:.2f}s), "
+            f"run `python -X importtime -c 'import src.core.assistant'` to find the culprit"
+        )
+
+    def test_heavy_modules_not_loaded(self, probe):
+        """🪶 测试重量级依赖推迟到首次使用时才导入"""
+        loaded = set(probe["modules"])
+        eager = [name for name in HEAVY_MODULES if name in loaded]
+        assert not eager, f"Heavy modules imported eagerly: {eager}"
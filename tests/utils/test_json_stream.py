@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_json_stream.py
+"""
+
+from src.utils.json_stream import StreamingJSONParser
+
+PLAN_TEXT = (
+    '```json\n{"task": "t", "feasibility": "feasible", "reason": "含有 }[ 的说明", '
+    '"steps": [{"step_number": 1, "assigned_agent": "file", "description": "创建 {a}.txt"}, '
+    '{"step_number": 2, "assigned_agent": "search", "description": "搜索 \\"天气\\""}]}\n```'
+)
+
+
+class TestStreamingJSONParser:
+    """StreamingJSONParser 测试"""
+
+    def test_items_complete_incrementally(self):
+        """🧩 测试数组元素闭合时立即返回"""
+        parser = StreamingJSONParser("steps")
+        emitted = []
+        for i in range(0, len(PLAN_TEXT), 3):
+            for item in parser.feed(PLAN_TEXT[i:i + 3]):
+                emitted.append((i, item))
+
+        assert [item["step_number"] for _, item in emitted] == [1, 2]
+        # 第一个步骤在文本结束前就已返回
+        assert emitted[0][0] < len(PLAN_TEXT) - 60
+        assert emitted[1][1]["description"] == '搜索 "天气"'
+        assert parser.closed
+
+    def test_partial_header(self):
+        """📋 测试未完成时读取已输出的字段"""
+        parser = StreamingJSONParser("steps")
+        parser.feed('{"task": "t", "feasibility": "feasible", "steps": [{"step_number": 1, "descr')
+
+        partial = parser.partial()
+        assert partial["feasibility"] == "feasible"
+        assert parser.items == []
+
+    def test_nested_arrays_are_not_items(self):
+        """🔍 测试只有根对象中的目标数组才会被拆分"""
+        parser = StreamingJSONParser("steps")
+        items = parser.feed('{"meta": {"steps": [{"x": 1}]}, "steps": [{"y": [1, 2]}]}')
+
+        assert items == [{"y": [1, 2]}]
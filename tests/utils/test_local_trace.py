@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_local_trace.py
+"""
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+
+from src.utils.local_trace import LocalTraceHandler, query_slowest, query_summary, main
+
+
+@tool
+def echo(text: str) -> str:
+    """原样返回输入"""
+    return text
+
+
+class TestLocalTraceHandler:
+    """本地运行记录测试"""
+
+    @pytest.fixture
+    def handler(self, tmp_path):
+        handler = LocalTraceHandler(db_path=str(tmp_path / "runs.db"), max_rows=100, max_field_chars=20)
+        yield handler
+        handler.close()
+
+    def test_records_chain_llm_and_tool_runs(self, handler):
+        """🧾 测试 chain / llm / tool 运行都被记录，并保留父子关系"""
+        llm = FakeListChatModel(responses=["好的"])
+        chain = RunnableLambda(lambda x: x) | llm
+        chain.invoke("打开记事本", config={"callbacks": [handler]})
+        echo.invoke("hello", config={"callbacks": [handler]})
+        handler.flush()
+
+        rows = query_slowest(handler.db_path, limit=50)
+        types = {row["run_type"] for row in rows}
+        assert types == {"chain", "llm", "tool"}
+
+        llm_row = query_slowest(handler.db_path, run_type="llm")[0]
+        assert llm_row["parent_id"] is not None
+        assert "好的" in llm_row["outputs"]
+        assert llm_row["duration"] >= 0
+
+        tool_row = query_slowest(handler.db_path, run_type="tool")[0]
+        assert tool_row["name"] == "echo"
+
+    def test_inputs_are_truncated(self, handler):
+        """✂️ 测试输入被截断"""
+        echo.invoke("x" * 1000, config={"callbacks": [handler]})
+        handler.flush()
+
+        row = query_slowest(handler.db_path, run_type="tool")[0]
+        assert len(row["inputs"]) <= 23
+
+    def test_errors_are_recorded(self, handler):
+        """❌ 测试失败的运行记录错误信息"""
+        def fail(_):
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            RunnableLambda(fail).invoke("x", config={"callbacks": [handler]})
+        handler.flush()
+
+        row = query_slowest(handler.db_path)[0]
+        assert "boom" in row["error"]
+
+    def test_rows_are_bounded(self, tmp_path):
+        """📦 测试超出上限后删除最旧记录"""
+        handler = LocalTraceHandler(db_path=str(tmp_path / "runs.db"), max_rows=5)
+        try:
+            for i in range(12):
+                echo.invoke(str(i), config={"callbacks": [handler]})
+            handler.flush()
+
+            rows = query_slowest(handler.db_path, limit=100)
+            assert len(rows) == 5
+            assert {row["inputs"] for row in rows} == {str(i) for i in range(7, 12)}
+        finally:
+            handler.close()
+
+    def test_summary_and_cli(self, handler, capsys):
+        """📊 测试汇总查询和命令行输出"""
+        for _ in range(3):
+            echo.invoke("hi", config={"callbacks": [handler]})
+        handler.flush()
+
+        summary = query_summary(handler.db_path)
+        assert summary[0]["name"] == "echo"
+        assert summary[0]["count"] == 3
+
+        main(["--db", str(handler.db_path), "--slowest", "2", "--type", "tool"])
+        output = capsys.readouterr().out
+        assert output.count("echo") == 2
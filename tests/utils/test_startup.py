@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_startup.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.utils.startup import StartupGraph
+
+
+class TestStartupGraph:
+    """启动依赖图测试"""
+
+    def test_independent_stages_run_in_parallel(self):
+        """⚡ 测试无依赖的阶段并行执行"""
+        barrier = threading.Barrier(2, timeout=2)
+        graph = StartupGraph(max_workers=2)
+        graph.add("asr", barrier.wait)
+        graph.add("agents", barrier.wait)
+        graph.start()
+
+        # 两个阶段必须同时运行才能通过屏障
+        assert graph.wait_all(["asr", "agents"], timeout=3)
+
+    def test_dependencies_run_in_order(self):
+        """🔗 测试依赖阶段按顺序执行"""
+        order = []
+        graph = StartupGraph()
+        graph.add("recorder", lambda: order.append("recorder"))
+        graph.add("detector", lambda: order.append("detector"), deps=["recorder"])
+        graph.start()
+
+        assert graph.wait("detector", timeout=2)
+        assert order == ["recorder", "detector"]
+
+    def test_wait_blocks_until_ready(self):
+        """⏳ 测试等待尚未就绪的阶段"""
+        graph = StartupGraph()
+        graph.add("asr", lambda: time.sleep(0.2))
+        graph.start()
+
+        start = time.time()
+        assert graph.wait("asr", timeout=2)
+        assert time.time() - start >= 0.1
+
+    def test_failure_propagates_to_dependents(self):
+        """❌ 测试失败阶段及其下游都报告未就绪"""
+        def fail():
+            raise RuntimeError("no microphone")
+
+        ran = []
+        graph = StartupGraph()
+        graph.add("recorder", fail)
+        graph.add("detector", lambda: ran.append("detector"), deps=["recorder"])
+        graph.add("tts", lambda: False)
+        graph.start()
+
+        assert graph.wait("recorder", timeout=2) is False
+        assert graph.wait("detector", timeout=2) is False
+        assert graph.wait("tts", timeout=2) is False
+        assert ran == []
+
+    def test_unknown_dependency_rejected(self):
+        """🚫 测试未知依赖"""
+        graph = StartupGraph()
+        with pytest.raises(ValueError):
+            graph.add("detector", lambda: None, deps=["recorder"])
+
+    def test_timeline(self):
+        """📈 测试启动时间线"""
+        graph = StartupGraph()
+        graph.add("recorder", lambda: time.sleep(0.05))
+        graph.add("detector", lambda: None, deps=["recorder"])
+        graph.start()
+        graph.wait("detector", timeout=2)
+
+        timeline = {item["name"]: item for item in graph.timeline()}
+        assert timeline["detector"]["start"] >= timeline["recorder"]["end"]
+        assert all(item["ok"] for item in timeline.values())
+        assert "detector" in graph.format_timeline()
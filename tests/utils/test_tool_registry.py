@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_tool_registry.py
+"""
+
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from src.core.tools.registry import ToolRegistry
+
+
+def fake_tool(name: str):
+    tool = Mock()
+    tool.name = name
+    return tool
+
+
+class TestToolRegistryLazyLoad:
+    """工具注册中心延迟加载测试"""
+
+    def test_concurrent_access_waits_for_full_registry(self, monkeypatch):
+        """🧵 测试默认工具加载期间其他线程等待加载完成，不会读到一半的工具表"""
+        registry = ToolRegistry()
+
+        def register_defaults():
+            registry._add_default(fake_tool("file_create"))
+            time.sleep(0.1)
+            registry._add_default(fake_tool("file_read"))
+
+        monkeypatch.setattr(registry, "_register_default_tools", register_defaults)
+        loader = threading.Thread(target=registry.get_all_tool_names)
+        loader.start()
+        time.sleep(0.02)
+
+        assert registry.get_all_tool_names() == ["file_create", "file_read"]
+        loader.join()
+
+    def test_failed_load_is_retried(self, monkeypatch):
+        """🔁 测试默认工具加载抛错时不标记为已加载，下次访问重试"""
+        registry = ToolRegistry()
+        attempts = []
+
+        def register_defaults():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ImportError("broken tool module")
+            registry._add_default(fake_tool("app_control"))
+
+        monkeypatch.setattr(registry, "_register_default_tools", register_defaults)
+        with pytest.raises(ImportError):
+            registry.has_tool("app_control")
+
+        assert registry.has_tool("app_control")
+        assert len(attempts) == 2
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+@Time   : 10/19/26
+@Author : guojarrett@gmail.com
+@File   : test_tracing.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.utils.tracing import Tracer, format_waterfall, main
+
+
+class TestTracer:
+    """Tracer 核心功能测试"""
+
+    @pytest.fixture
+    def tracer(self):
+        return Tracer(max_traces=10, window=50)
+
+    def test_nested_spans_share_trace(self, tracer):
+        """🌳 测试父子 span 关系"""
+        with tracer.span("command") as root:
+            with tracer.span("asr") as child:
+                with tracer.span("asr.model") as grandchild:
+                    pass
+
+        assert child.parent_id == root.span_id
+        assert grandchild.parent_id == child.span_id
+        assert root.trace_id == child.trace_id == grandchild.trace_id
+
+        traces = tracer.recent_traces(1)
+        assert len(traces) == 1
+        assert {s["name"] for s in traces[0]} == {"command", "asr", "asr.model"}
+
+    def test_error_is_recorded(self, tracer):
+        """❌ 测试异常 span 也会结束并记录错误类型"""
+        with pytest.raises(ValueError):
+            with tracer.span("command"):
+                raise ValueError("boom")
+
+        trace = tracer.recent_traces(1)[0]
+        assert trace[0]["attributes"]["error"] == "ValueError"
+        assert trace[0]["end"] is not None
+
+    def test_rolling_percentiles(self, tracer):
+        """📊 测试滚动 p50/p95"""
+        for i in range(100):
+            tracer.record("planner.llm", start=0.0, end=(i + 1) / 100)
+
+        stats = tracer.percentiles("planner.llm")
+        assert stats["count"] == 50  # 窗口大小
+        assert stats["p50"] == pytest.approx(0.75, abs=0.02)
+        assert stats["p95"] == pytest.approx(0.98, abs=0.02)
+
+    def test_manual_span_across_threads(self, tracer):
+        """🧵 测试跨线程手动挂接父 span"""
+        with tracer.span("command") as root:
+            def worker():
+                span = tracer.start_span("tool.search", parent=root)
+                time.sleep(0.01)
+                tracer.end_span(span)
+
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+
+        trace = tracer.recent_traces(1)[0]
+        tool = next(s for s in trace if s["name"] == "tool.search")
+        assert tool["parent_id"] == root.span_id
+
+    def test_disabled(self, tracer):
+        """🚫 测试关闭追踪"""
+        tracer.configure(enabled=False)
+        with tracer.span("command") as span:
+            assert span is None
+        assert tracer.recent_traces() == []
+
+
+class TestTraceCli:
+    """瀑布图与命令行测试"""
+
+    def test_waterfall_and_cli(self, tmp_path, capsys):
+        """🌊 测试持久化后命令行输出瀑布图"""
+        trace_file = tmp_path / "traces.jsonl"
+        tracer = Tracer()
+        tracer.configure(trace_file=str(trace_file))
+
+        for _ in range(3):
+            with tracer.span("command"):
+                with tracer.span("asr"):
+                    time.sleep(0.01)
+                with tracer.span("planner.llm"):
+                    time.sleep(0.02)
+
+        assert len(trace_file.read_text().splitlines()) == 3
+
+        text = format_waterfall(tracer.recent_traces(1)[0], width=20)
+        assert "command" in text and "planner.llm" in text
+
+        main(["--file", str(trace_file), "--last", "2"])
+        output = capsys.readouterr().out
+        assert output.count("Trace ") == 2
+        assert "Stage latency over 3 commands" in output
+
+    def test_file_is_bounded(self, tmp_path):
+        """📦 测试文件条数上限"""
+        trace_file = tmp_path / "traces.jsonl"
+        tracer = Tracer()
+        tracer.configure(trace_file=str(trace_file), max_file_traces=5)
+
+        for _ in range(40):
+            with tracer.span("command", payload="x" * 4096):
+                pass
+
+        assert len(trace_file.read_text().splitlines()) <= 10
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])